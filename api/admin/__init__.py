@@ -2,4 +2,9 @@
 from .app_admin import *
 from .device_admin import *
 from .template_admin import *
-from .send_log_admin import *
\ No newline at end of file
+from .send_log_admin import *
+from .bulk_job_admin import *
+from .campaign_admin import *
+from .topic_admin import *
+from .scheduled_notification_admin import *
+from .dead_letter_admin import *
\ No newline at end of file
@@ -0,0 +1,17 @@
+from django.contrib import admin
+from ..models import BulkJob
+
+
+@admin.register(BulkJob)
+class BulkJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'app', 'status', 'total_received', 'queued', 'failed', 'created_at', 'completed_at']
+    list_filter = ['app', 'status', 'created_at']
+    search_fields = ['id', 'app__name']
+    readonly_fields = [
+        'id', 'app', 'status', 'total_received', 'processed', 'queued', 'failed',
+        'total_chunks', 'processed_chunks', 'completed_at', 'created_at', 'updated_at'
+    ]
+
+    def has_add_permission(self, request):
+        # Bulk jobs are only created through the API
+        return False
@@ -0,0 +1,19 @@
+from django.contrib import admin
+from ..models import Campaign
+
+
+@admin.register(Campaign)
+class CampaignAdmin(admin.ModelAdmin):
+    list_display = ['name', 'app', 'status', 'total_devices', 'sent', 'failed', 'created_at', 'completed_at']
+    list_filter = ['app', 'status', 'created_at']
+    search_fields = ['id', 'name', 'app__name']
+    readonly_fields = [
+        'id', 'app', 'template', 'topic', 'status', 'total_devices', 'processed', 'sent', 'failed',
+        'total_chunks', 'processed_chunks', 'last_device_id', 'provider_topic',
+        'provider_response', 'started_at', 'completed_at',
+        'created_at', 'updated_at'
+    ]
+
+    def has_add_permission(self, request):
+        # Campaigns are only created through the API
+        return False
@@ -0,0 +1,14 @@
+from django.contrib import admin
+from ..models import DeadLetter
+
+
+@admin.register(DeadLetter)
+class DeadLetterAdmin(admin.ModelAdmin):
+    list_display = ['id', 'app', 'platform', 'attempts', 'error_message', 'created_at']
+    list_filter = ['app', 'platform', 'created_at']
+    search_fields = ['id', 'send_log__id', 'app__name', 'error_message']
+    readonly_fields = ['id', 'app', 'send_log', 'platform', 'attempts', 'error_message', 'created_at']
+
+    def has_add_permission(self, request):
+        # Dead letters are only created by the delivery tasks
+        return False
@@ -0,0 +1,14 @@
+from django.contrib import admin
+from ..models import ScheduledNotification
+
+
+@admin.register(ScheduledNotification)
+class ScheduledNotificationAdmin(admin.ModelAdmin):
+    list_display = ['id', 'app', 'send_at', 'status', 'released_at', 'created_at']
+    list_filter = ['app', 'status', 'send_at']
+    search_fields = ['id', 'app__name']
+    readonly_fields = ['id', 'app', 'payload', 'result', 'released_at', 'created_at', 'updated_at']
+
+    def has_add_permission(self, request):
+        # Scheduled notifications are only created through the API
+        return False
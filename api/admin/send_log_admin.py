@@ -20,7 +20,7 @@ class SendLogAdmin(admin.ModelAdmin):
     readonly_fields = [
         'id', 'app', 'device', 'template', 'notification_type', 
         'title', 'body', 'subject', 'data', 'raw_request', 
-        'provider_response', 'error_message', 'sent_at', 
+        'provider_response', 'error_message', 'retry_count', 'sent_at', 
         'delivered_at', 'read_at', 'created_at', 'updated_at'
     ]
     
@@ -48,7 +48,7 @@ class SendLogAdmin(admin.ModelAdmin):
             'classes': ('collapse',) # Collapsible section
         }),
         ('Status & Timing', {
-            'fields': ('status', 'sent_at', 'delivered_at', 'read_at')
+            'fields': ('status', 'retry_count', 'sent_at', 'delivered_at', 'read_at')
         }),
         ('Metadata', {
             'fields': ('created_at', 'updated_at'),
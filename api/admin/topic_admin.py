@@ -0,0 +1,10 @@
+from django.contrib import admin
+from ..models import Topic
+
+
+@admin.register(Topic)
+class TopicAdmin(admin.ModelAdmin):
+    list_display = ['name', 'app', 'subscriber_count', 'created_at']
+    list_filter = ['app', 'created_at']
+    search_fields = ['name', 'app__name']
+    readonly_fields = ['id', 'subscriber_count', 'created_at', 'updated_at']
@@ -11,6 +11,8 @@ class ApiConfig(AppConfig):
         import api.admin
         # Import the middleware module if it defines signal handlers or similar
         import api.middleware
+        # Connect the cache invalidation signal handlers
+        import api.signals
 
         import django.conf.global_settings as default_settings 
         from django.conf import settings
@@ -0,0 +1,47 @@
+import json
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from api.utils.http_client import POOL_STATS_KEY
+from api.utils.redis_client import get_redis
+
+
+class Command(BaseCommand):
+    help = "Show the HTTP connection pool stats published by the worker processes"
+
+    def handle(self, *args, **options):
+        client = get_redis()
+        if client is None:
+            raise CommandError("Redis is not available")
+
+        entries = client.hgetall(POOL_STATS_KEY)
+        # Entries of processes that stopped publishing are left out
+        cutoff = time.time() - settings.HTTP_STATS_INTERVAL * 5
+        processes = []
+        for process, raw in entries.items():
+            stats = json.loads(raw)
+            if stats.get('published_at', 0) >= cutoff:
+                processes.append((process.decode() if isinstance(process, bytes) else process, stats))
+
+        if not processes:
+            self.stdout.write("No pool stats published yet")
+            return
+
+        total_requests = 0
+        total_connections = 0
+        for process, stats in sorted(processes):
+            self.stdout.write(f"{process}: {stats['requests']} requests over {stats['connections_opened']} connections")
+            for pool in stats['pools']:
+                self.stdout.write(
+                    f"  [{pool['session']}] {pool['host']}:{pool['port']} "
+                    f"requests={pool['requests']} connections={pool['connections_opened']} "
+                    f"idle={pool['idle_connections']}"
+                )
+            total_requests += stats['requests']
+            total_connections += stats['connections_opened']
+
+        reuse = 1 - total_connections / total_requests if total_requests else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Total: {total_requests} requests over {total_connections} connections "
+            f"({reuse:.1%} of requests reused a pooled connection)"
+        ))
@@ -0,0 +1,26 @@
+import asyncio
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from api.utils.delivery_engine import serve
+
+
+class Command(BaseCommand):
+    help = "Deliver push task messages from the broker with the asyncio delivery engine"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-Q', '--queues',
+            default=','.join(settings.DELIVERY_QUEUES),
+            help="Comma-separated queues to consume (default: DELIVERY_QUEUES)"
+        )
+        parser.add_argument(
+            '--prefetch', type=int, default=settings.DELIVERY_PREFETCH,
+            help="Task messages taken from the broker before they are acked"
+        )
+
+    def handle(self, *args, **options):
+        queues = [name.strip() for name in options['queues'].split(',') if name.strip()]
+        self.stdout.write(f"Delivery engine consuming {', '.join(queues)}")
+        # Runs until SIGTERM/SIGINT, then finishes and acks the messages it took
+        asyncio.run(serve(queues, prefetch=options['prefetch']))
+        self.stdout.write(self.style.SUCCESS("Delivery engine stopped"))
@@ -0,0 +1,120 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+import redis
+from ..utils.redis_client import get_redis, mark_unavailable
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = 'app_key_cache:invalidate'
+
+
+class AppKeyCache:
+    """
+    Per-process TTL/LRU cache of app_key -> App.
+
+    Unknown keys are cached as negative entries with a shorter TTL so that
+    key scans do not reach the database. Entries are dropped through the
+    App post_save/post_delete signals and, when APP_KEY_CACHE_PUBSUB is on,
+    through a Redis pub/sub broadcast so every node sees the change.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._subscriber_pid = None
+
+    def get(self, app_key):
+        """Return (hit, app). On a negative hit app is None."""
+        self._ensure_subscriber()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(app_key)
+            if entry is None:
+                return False, None
+            expires_at, app = entry
+            if expires_at <= now:
+                del self._entries[app_key]
+                return False, None
+            self._entries.move_to_end(app_key)
+            return True, app
+
+    def set(self, app_key, app):
+        ttl = settings.APP_KEY_CACHE_TTL if app is not None else settings.APP_KEY_CACHE_NEGATIVE_TTL
+        with self._lock:
+            self._entries[app_key] = (time.monotonic() + ttl, app)
+            self._entries.move_to_end(app_key)
+            while len(self._entries) > settings.APP_KEY_CACHE_MAX_ENTRIES:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, app_id=None, app_key=None):
+        """Drop the entry for app_key and any entry holding the App with app_id."""
+        with self._lock:
+            if app_key is not None:
+                self._entries.pop(app_key, None)
+            if app_id is not None:
+                stale = [
+                    key for key, (_, app) in self._entries.items()
+                    if app is not None and str(app.id) == str(app_id)
+                ]
+                for key in stale:
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def broadcast_invalidation(self, app_id, app_key):
+        """Invalidate locally and tell the other processes to do the same."""
+        self.invalidate(app_id=app_id, app_key=app_key)
+        if not settings.APP_KEY_CACHE_PUBSUB:
+            return
+        client = get_redis()
+        if client is None:
+            return
+        try:
+            client.publish(INVALIDATION_CHANNEL, json.dumps({'app_id': str(app_id), 'app_key': app_key}))
+        except redis.RedisError as e:
+            mark_unavailable(e)
+
+    def _ensure_subscriber(self):
+        # Started lazily so that each forked worker gets its own listener thread
+        if not settings.APP_KEY_CACHE_PUBSUB or self._subscriber_pid == os.getpid():
+            return
+        with self._lock:
+            if self._subscriber_pid == os.getpid():
+                return
+            self._subscriber_pid = os.getpid()
+        thread = threading.Thread(target=self._listen, name='app-key-cache-invalidation', daemon=True)
+        thread.start()
+
+    def _listen(self):
+        while True:
+            client = get_redis()
+            if client is None:
+                time.sleep(settings.REDIS_RETRY_INTERVAL)
+                continue
+            try:
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Anything may have changed while we were not subscribed
+                self.clear()
+                while True:
+                    message = pubsub.get_message(timeout=30)
+                    if message is None:
+                        continue
+                    payload = json.loads(message['data'])
+                    self.invalidate(app_id=payload.get('app_id'), app_key=payload.get('app_key'))
+            except redis.RedisError as e:
+                mark_unavailable(e)
+                time.sleep(settings.REDIS_RETRY_INTERVAL)
+            except Exception as e:
+                logger.error(f"App key cache invalidation listener error: {str(e)}", exc_info=True)
+                time.sleep(settings.REDIS_RETRY_INTERVAL)
+
+
+app_key_cache = AppKeyCache()
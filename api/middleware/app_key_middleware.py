@@ -1,28 +1,27 @@
 from django.http import JsonResponse
 from django.utils.deprecation import MiddlewareMixin
-from django.contrib import admin
 from ..models import App
+from .app_key_cache import app_key_cache
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Skip authentication for admin and health check endpoints
+# Also skip static and media files
+SKIP_PATHS = frozenset(['/health/'])
+SKIP_PREFIXES = (
+    '/admin/',
+    '/api/admin/',
+    '/static/',
+    '/media/',
+    '/favicon.ico',
+    '/api/docs/',
+)
+
 
 class AppKeyMiddleware(MiddlewareMixin):
     def process_request(self, request):
-        # Skip authentication for admin and health check endpoints
-        # Also skip static and media files
-        if (
-            request.path.startswith('/admin/') or 
-            request.path.startswith('/api/admin/') or 
-            request.path == '/health/' or 
-            request.path.startswith('/static/') or 
-            request.path.startswith('/media/') or
-            request.path.startswith('/favicon.ico') or
-            request.path.startswith('/admin/jsi18n/') or
-            request.path.startswith('/admin/static/') or
-            request.path.startswith('/static/admin/') or
-            request.path.startswith('/api/docs/')
-        ):
+        if request.path in SKIP_PATHS or request.path.startswith(SKIP_PREFIXES):
             return None
 
         # Check for app key in headers
@@ -35,10 +34,17 @@ class AppKeyMiddleware(MiddlewareMixin):
                 'data': None
             }, status=401)
 
-        try:
-            app_instance = App.objects.get(app_key=app_key, is_active=True)
-            request.app = app_instance
-        except App.DoesNotExist:
+        # Resolved apps and unknown keys are both cached, so the steady
+        # state request path does not query the database
+        hit, app_instance = app_key_cache.get(app_key)
+        if not hit:
+            try:
+                app_instance = App.objects.get(app_key=app_key, is_active=True)
+            except App.DoesNotExist:
+                app_instance = None
+            app_key_cache.set(app_key, app_instance)
+
+        if app_instance is None:
             logger.warning(f"Invalid app key attempted: {app_key[:8]}...")
             return JsonResponse({
                 'success': False,
@@ -46,4 +52,5 @@ class AppKeyMiddleware(MiddlewareMixin):
                 'data': None
             }, status=401)
 
-        return None
\ No newline at end of file
+        request.app = app_instance
+        return None
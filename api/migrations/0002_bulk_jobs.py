@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:24
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BulkJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('receiving', 'Receiving'), ('processing', 'Processing'), ('completed', 'Completed')], default='receiving', max_length=20)),
+                ('total_received', models.IntegerField(default=0, help_text='Lines read from the request body')),
+                ('processed', models.IntegerField(default=0, help_text='Notifications run through the ingest pipeline')),
+                ('queued', models.IntegerField(default=0, help_text='Notifications queued for delivery')),
+                ('failed', models.IntegerField(default=0, help_text='Lines rejected or notifications that could not be queued')),
+                ('total_chunks', models.IntegerField(default=0)),
+                ('processed_chunks', models.IntegerField(default=0)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('app', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bulk_jobs', to='api.app')),
+            ],
+            options={
+                'verbose_name': 'Bulk Job',
+                'verbose_name_plural': 'Bulk Jobs',
+                'db_table': 'push_bulk_jobs',
+            },
+        ),
+        migrations.CreateModel(
+            name='BulkJobChunk',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('sequence', models.IntegerField()),
+                ('payload', models.JSONField(default=list, help_text='Parsed notification lines with their line numbers')),
+                ('errors', models.JSONField(blank=True, default=list, help_text='Per-line failures from processing')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('done', 'Done')], default='pending', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='api.bulkjob')),
+            ],
+            options={
+                'verbose_name': 'Bulk Job Chunk',
+                'verbose_name_plural': 'Bulk Job Chunks',
+                'db_table': 'push_bulk_job_chunks',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='bulkjob',
+            index=models.Index(fields=['app', 'created_at'], name='push_bulk_j_app_id_586a44_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='bulkjobchunk',
+            unique_together={('job', 'sequence')},
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:36
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_bulk_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Campaign',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255)),
+                ('notification_type', models.CharField(max_length=255)),
+                ('title', models.TextField(blank=True, help_text='Direct title, used when no template is set')),
+                ('body', models.TextField(blank=True, help_text='Direct body, used when no template is set')),
+                ('subject', models.TextField(blank=True)),
+                ('data', models.JSONField(blank=True, default=dict, help_text='Extra data merged into every notification')),
+                ('context', models.JSONField(blank=True, default=dict, help_text='Template context shared by every recipient')),
+                ('platforms', models.JSONField(blank=True, default=list, help_text='Platforms to target, empty for all')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('dispatching', 'Dispatching'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('total_devices', models.IntegerField(default=0, help_text='Devices handed to the workers so far')),
+                ('processed', models.IntegerField(default=0, help_text='Notifications logged by the workers')),
+                ('sent', models.IntegerField(default=0)),
+                ('failed', models.IntegerField(default=0)),
+                ('total_chunks', models.IntegerField(default=0)),
+                ('processed_chunks', models.IntegerField(default=0)),
+                ('last_device_id', models.UUIDField(blank=True, help_text='Keyset cursor of the coordinator', null=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Campaign',
+                'verbose_name_plural': 'Campaigns',
+                'db_table': 'push_campaigns',
+            },
+        ),
+        migrations.CreateModel(
+            name='CampaignChunk',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('sequence', models.IntegerField()),
+                ('after_device_id', models.UUIDField(blank=True, null=True)),
+                ('last_device_id', models.UUIDField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('done', 'Done')], default='pending', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Campaign Chunk',
+                'verbose_name_plural': 'Campaign Chunks',
+                'db_table': 'push_campaign_chunks',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='device',
+            index=models.Index(fields=['app', 'is_active', 'id'], name='push_device_app_id_24b60c_idx'),
+        ),
+        migrations.AddField(
+            model_name='campaign',
+            name='app',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='campaigns', to='api.app'),
+        ),
+        migrations.AddField(
+            model_name='campaign',
+            name='template',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='campaigns', to='api.template'),
+        ),
+        migrations.AddField(
+            model_name='campaignchunk',
+            name='campaign',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='api.campaign'),
+        ),
+        migrations.AddIndex(
+            model_name='campaign',
+            index=models.Index(fields=['app', 'created_at'], name='push_campai_app_id_50dffd_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='campaignchunk',
+            unique_together={('campaign', 'sequence')},
+        ),
+    ]
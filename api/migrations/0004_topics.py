@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:38
+
+import django.core.validators
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_campaigns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campaign',
+            name='provider_response',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='campaign',
+            name='provider_topic',
+            field=models.CharField(blank=True, help_text='FCM topic the Android devices were reached through, if any', max_length=255),
+        ),
+        migrations.CreateModel(
+            name='Topic',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=200, validators=[django.core.validators.RegexValidator(message='Topic name can only contain letters, numbers and -_.~', regex='^[a-zA-Z0-9_.~-]+$')])),
+                ('subscriber_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('app', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='topics', to='api.app')),
+            ],
+            options={
+                'verbose_name': 'Topic',
+                'verbose_name_plural': 'Topics',
+                'db_table': 'push_topics',
+                'unique_together': {('app', 'name')},
+            },
+        ),
+        migrations.AddField(
+            model_name='campaign',
+            name='topic',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='campaigns', to='api.topic'),
+        ),
+        migrations.CreateModel(
+            name='TopicSubscription',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='topic_subscriptions', to='api.device')),
+                ('topic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subscriptions', to='api.topic')),
+            ],
+            options={
+                'verbose_name': 'Topic Subscription',
+                'verbose_name_plural': 'Topic Subscriptions',
+                'db_table': 'push_topic_subscriptions',
+                'unique_together': {('topic', 'device')},
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:40
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_topics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledNotification',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('send_at', models.DateTimeField()),
+                ('payload', models.JSONField(help_text='Validated notification request, without send_at')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('released', 'Released'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('result', models.JSONField(blank=True, default=dict, help_text='Ingest result once released')),
+                ('released_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('app', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scheduled_notifications', to='api.app')),
+            ],
+            options={
+                'verbose_name': 'Scheduled Notification',
+                'verbose_name_plural': 'Scheduled Notifications',
+                'db_table': 'push_scheduled_notifications',
+                'indexes': [models.Index(condition=models.Q(('status', 'pending')), fields=['send_at'], name='push_sched_pending_due_idx'), models.Index(fields=['app', 'created_at'], name='push_schedu_app_id_3dc1cc_idx')],
+            },
+        ),
+    ]
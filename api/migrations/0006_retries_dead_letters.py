@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:13
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_scheduled_notifications'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sendlog',
+            name='retry_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='sendlog',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('retrying', 'Retrying'), ('sent', 'Sent'), ('failed', 'Failed'), ('delivered', 'Delivered'), ('read', 'Read')], default='pending', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='DeadLetter',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('platform', models.CharField(max_length=20)),
+                ('attempts', models.IntegerField(default=0, help_text='Sends tried, the first one included')),
+                ('error_message', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('app', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dead_letters', to='api.app')),
+                ('send_log', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='dead_letter', to='api.sendlog')),
+            ],
+            options={
+                'verbose_name': 'Dead Letter',
+                'verbose_name_plural': 'Dead Letters',
+                'db_table': 'push_dead_letters',
+                'indexes': [models.Index(fields=['app', 'created_at'], name='push_dead_l_app_id_c2bf45_idx')],
+            },
+        ),
+    ]
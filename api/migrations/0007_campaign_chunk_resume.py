@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_retries_dead_letters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campaignchunk',
+            name='send_log_ids',
+            field=models.JSONField(blank=True, default=list, help_text='SendLogs created for the chunk'),
+        ),
+        migrations.AlterField(
+            model_name='campaign',
+            name='failed',
+            field=models.IntegerField(default=0, help_text='Notifications that failed for good'),
+        ),
+        migrations.AlterField(
+            model_name='campaign',
+            name='sent',
+            field=models.IntegerField(default=0, help_text='Notifications delivered, retries included'),
+        ),
+        migrations.AlterField(
+            model_name='campaignchunk',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('logged', 'Logged'), ('done', 'Done')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='campaignchunk',
+            index=models.Index(fields=['status', 'updated_at'], name='push_campai_status_be339e_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_campaign_chunk_resume'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='topicsubscription',
+            name='provider_token',
+            field=models.TextField(blank=True, default='', help_text='Token confirmed in the FCM topic'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_topic_subscription_provider_token'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedulednotification',
+            name='kind',
+            field=models.CharField(choices=[('request', 'Notification request'), ('redelivery', 'SendLog redelivery')], default='request', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='schedulednotification',
+            name='payload',
+            field=models.JSONField(help_text='Validated notification request without send_at, or send_log_ids/platform/queue of a redelivery'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_scheduled_redelivery'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sendlog',
+            name='park_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
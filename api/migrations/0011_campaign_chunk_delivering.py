@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_send_log_park_count'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='campaignchunk',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('logged', 'Logged'), ('delivering', 'Delivering'), ('done', 'Done')], default='pending', max_length=20),
+        ),
+    ]
@@ -3,5 +3,14 @@ from .app import App
 from .device import Device
 from .template import Template
 from .send_log import SendLog
+from .bulk_job import BulkJob, BulkJobChunk
+from .campaign import Campaign, CampaignChunk
+from .topic import Topic, TopicSubscription
+from .scheduled_notification import ScheduledNotification
+from .dead_letter import DeadLetter
 
-__all__ = ['App', 'Device', 'Template', 'SendLog']
\ No newline at end of file
+__all__ = [
+    'App', 'Device', 'Template', 'SendLog', 'BulkJob', 'BulkJobChunk',
+    'Campaign', 'CampaignChunk', 'Topic', 'TopicSubscription',
+    'ScheduledNotification', 'DeadLetter'
+]
@@ -0,0 +1,77 @@
+from django.db import models
+from django.db.models import F
+from django.utils import timezone
+import uuid
+
+
+class BulkJob(models.Model):
+    """
+    A streamed bulk send. The NDJSON body is split into fixed-size chunks
+    that are processed by Celery workers; the counters track progress.
+    """
+    STATUS_CHOICES = [
+        ('receiving', 'Receiving'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    app = models.ForeignKey('App', on_delete=models.CASCADE, related_name='bulk_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='receiving')
+    total_received = models.IntegerField(default=0, help_text="Lines read from the request body")
+    processed = models.IntegerField(default=0, help_text="Notifications run through the ingest pipeline")
+    queued = models.IntegerField(default=0, help_text="Notifications queued for delivery")
+    failed = models.IntegerField(default=0, help_text="Lines rejected or notifications that could not be queued")
+    total_chunks = models.IntegerField(default=0)
+    processed_chunks = models.IntegerField(default=0)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'push_bulk_jobs'
+        verbose_name = 'Bulk Job'
+        verbose_name_plural = 'Bulk Jobs'
+        indexes = [
+            models.Index(fields=['app', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.app.name} - {self.id} - {self.status}"
+
+    @classmethod
+    def finalize_if_done(cls, job_id):
+        """Mark the job completed once the upload is over and every chunk is processed."""
+        return cls.objects.filter(
+            pk=job_id,
+            status='processing',
+            processed_chunks=F('total_chunks')
+        ).update(status='completed', completed_at=timezone.now(), updated_at=timezone.now())
+
+
+class BulkJobChunk(models.Model):
+    """
+    A fixed-size slice of a bulk job waiting to be ingested by a worker.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    job = models.ForeignKey('BulkJob', on_delete=models.CASCADE, related_name='chunks')
+    sequence = models.IntegerField()
+    payload = models.JSONField(default=list, help_text="Parsed notification lines with their line numbers")
+    errors = models.JSONField(default=list, blank=True, help_text="Per-line failures from processing")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'push_bulk_job_chunks'
+        verbose_name = 'Bulk Job Chunk'
+        verbose_name_plural = 'Bulk Job Chunks'
+        unique_together = ['job', 'sequence']
+
+    def __str__(self):
+        return f"{self.job_id} - #{self.sequence} - {self.status}"
@@ -0,0 +1,117 @@
+from django.db import models
+from django.db.models import F
+from django.utils import timezone
+import uuid
+
+
+class Campaign(models.Model):
+    """
+    A broadcast to every active device of an app, or to the devices
+    subscribed to one of its topics.
+
+    A coordinator task walks the targeted devices in id order and records each
+    fixed-size slice as a CampaignChunk for the workers to render, log and
+    deliver; the counters track progress.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('dispatching', 'Dispatching'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    app = models.ForeignKey('App', on_delete=models.CASCADE, related_name='campaigns')
+    name = models.CharField(max_length=255)
+    notification_type = models.CharField(max_length=255)
+    template = models.ForeignKey('Template', on_delete=models.SET_NULL, null=True, blank=True, related_name='campaigns')
+    topic = models.ForeignKey('Topic', on_delete=models.CASCADE, null=True, blank=True, related_name='campaigns')
+    title = models.TextField(blank=True, help_text="Direct title, used when no template is set")
+    body = models.TextField(blank=True, help_text="Direct body, used when no template is set")
+    subject = models.TextField(blank=True)
+    data = models.JSONField(default=dict, blank=True, help_text="Extra data merged into every notification")
+    context = models.JSONField(default=dict, blank=True, help_text="Template context shared by every recipient")
+    platforms = models.JSONField(default=list, blank=True, help_text="Platforms to target, empty for all")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    total_devices = models.IntegerField(default=0, help_text="Devices handed to the workers so far")
+    processed = models.IntegerField(default=0, help_text="Notifications logged by the workers")
+    sent = models.IntegerField(default=0, help_text="Notifications delivered, retries included")
+    failed = models.IntegerField(default=0, help_text="Notifications that failed for good")
+    total_chunks = models.IntegerField(default=0)
+    processed_chunks = models.IntegerField(default=0)
+    last_device_id = models.UUIDField(null=True, blank=True, help_text="Keyset cursor of the coordinator")
+    provider_topic = models.CharField(
+        max_length=255, blank=True,
+        help_text="FCM topic the Android devices were reached through, if any"
+    )
+    provider_response = models.JSONField(default=dict, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'push_campaigns'
+        verbose_name = 'Campaign'
+        verbose_name_plural = 'Campaigns'
+        indexes = [
+            models.Index(fields=['app', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.app.name} - {self.name} - {self.status}"
+
+    @classmethod
+    def finalize_if_done(cls, campaign_id):
+        """
+        Mark the campaign completed once dispatch is over, every chunk is
+        processed and every logged notification was sent or failed for good
+        (none is left retrying or parked).
+        """
+        return cls.objects.filter(
+            pk=campaign_id,
+            status='processing',
+            processed_chunks=F('total_chunks'),
+            processed=F('sent') + F('failed')
+        ).update(status='completed', completed_at=timezone.now(), updated_at=timezone.now())
+
+
+class CampaignChunk(models.Model):
+    """
+    A keyset range of devices, (after_device_id, last_device_id], waiting
+    to be processed by a worker.
+
+    A chunk is 'logged' once its SendLogs are created, 'delivering' while a
+    worker hands them to the providers and 'done' after; a worker picking
+    up a logged chunk again delivers the SendLogs still pending instead of
+    logging new ones.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('logged', 'Logged'),
+        ('delivering', 'Delivering'),
+        ('done', 'Done'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    campaign = models.ForeignKey('Campaign', on_delete=models.CASCADE, related_name='chunks')
+    sequence = models.IntegerField()
+    after_device_id = models.UUIDField(null=True, blank=True)
+    last_device_id = models.UUIDField()
+    send_log_ids = models.JSONField(default=list, blank=True, help_text="SendLogs created for the chunk")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'push_campaign_chunks'
+        verbose_name = 'Campaign Chunk'
+        verbose_name_plural = 'Campaign Chunks'
+        unique_together = ['campaign', 'sequence']
+        indexes = [
+            models.Index(fields=['status', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.campaign_id} - #{self.sequence} - {self.status}"
@@ -0,0 +1,28 @@
+from django.db import models
+import uuid
+
+
+class DeadLetter(models.Model):
+    """
+    A notification that still failed with a transient error after
+    PUSH_MAX_RETRIES retries. Its SendLog is marked failed; the dead letter
+    is kept until the notification is replayed.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    app = models.ForeignKey('App', on_delete=models.CASCADE, related_name='dead_letters')
+    send_log = models.OneToOneField('SendLog', on_delete=models.CASCADE, related_name='dead_letter')
+    platform = models.CharField(max_length=20)
+    attempts = models.IntegerField(default=0, help_text="Sends tried, the first one included")
+    error_message = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'push_dead_letters'
+        verbose_name = 'Dead Letter'
+        verbose_name_plural = 'Dead Letters'
+        indexes = [
+            models.Index(fields=['app', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.app.name} - {self.send_log_id} - {self.attempts} attempts"
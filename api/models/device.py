@@ -32,6 +32,10 @@ class Device(models.Model):
         verbose_name = 'Device'
         verbose_name_plural = 'Devices'
         unique_together = ['app', 'user_identifier', 'platform']
+        indexes = [
+            # Keyset pagination over an app's active devices
+            models.Index(fields=['app', 'is_active', 'id']),
+        ]
 
     def __str__(self):
         return f"{self.app.name} - {self.platform} - {self.user_identifier}"
@@ -0,0 +1,51 @@
+from django.db import models
+from django.db.models import Q
+import uuid
+
+
+class ScheduledNotification(models.Model):
+    """
+    A notification request held back until its send_at time.
+
+    Pending rows live only in the database, ordered by a partial index on
+    send_at, until the scheduler releases them into the ingest pipeline.
+
+    'redelivery' rows instead hold existing SendLogs to queue again at
+    send_at (delayed retries and parked batches), so the delay is not
+    spent as an ETA message held by a worker or the delivery engine.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('released', 'Released'),
+        ('failed', 'Failed'),
+    ]
+    KIND_CHOICES = [
+        ('request', 'Notification request'),
+        ('redelivery', 'SendLog redelivery'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    app = models.ForeignKey('App', on_delete=models.CASCADE, related_name='scheduled_notifications')
+    send_at = models.DateTimeField()
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='request')
+    payload = models.JSONField(
+        help_text="Validated notification request without send_at, or send_log_ids/platform/queue of a redelivery"
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    result = models.JSONField(default=dict, blank=True, help_text="Ingest result once released")
+    released_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'push_scheduled_notifications'
+        verbose_name = 'Scheduled Notification'
+        verbose_name_plural = 'Scheduled Notifications'
+        indexes = [
+            # Due-time order of the rows the scheduler still has to release
+            models.Index(fields=['send_at'], condition=Q(status='pending'), name='push_sched_pending_due_idx'),
+            models.Index(fields=['app', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.app.name} - {self.send_at} - {self.status}"
@@ -9,6 +9,7 @@ class SendLog(models.Model):
     """
     STATUS_CHOICES = [
         ('pending', 'Pending'),
+        ('retrying', 'Retrying'),
         ('sent', 'Sent'),
         ('failed', 'Failed'),
         ('delivered', 'Delivered'),
@@ -28,6 +29,8 @@ class SendLog(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     provider_response = models.JSONField(default=dict, blank=True)  # Response from FCM/APNs
     error_message = models.TextField(blank=True)
+    retry_count = models.PositiveIntegerField(default=0)  # Retries scheduled after transient errors
+    park_count = models.PositiveIntegerField(default=0)  # Sends put off because the provider sent Retry-After
     sent_at = models.DateTimeField(null=True, blank=True)
     delivered_at = models.DateTimeField(null=True, blank=True)
     read_at = models.DateTimeField(null=True, blank=True)
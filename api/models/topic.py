@@ -0,0 +1,62 @@
+from django.db import models
+from django.core.validators import RegexValidator
+import uuid
+
+
+class Topic(models.Model):
+    """
+    A named group of devices within an app that can be sent to at once.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    app = models.ForeignKey('App', on_delete=models.CASCADE, related_name='topics')
+    name = models.CharField(
+        max_length=200,
+        validators=[
+            RegexValidator(
+                regex=r'^[a-zA-Z0-9_.~-]+$',
+                message='Topic name can only contain letters, numbers and -_.~'
+            )
+        ]
+    )
+    subscriber_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'push_topics'
+        verbose_name = 'Topic'
+        verbose_name_plural = 'Topics'
+        unique_together = ['app', 'name']
+
+    def __str__(self):
+        return f"{self.app.name} - {self.name}"
+
+    @property
+    def provider_topic(self):
+        """Topic name used with FCM, namespaced so apps sharing a project never collide."""
+        return f"{self.app_id.hex}_{self.name}"
+
+
+class TopicSubscription(models.Model):
+    """
+    Membership of a device in a topic.
+
+    ``provider_token`` is the device token FCM confirmed as a member of the
+    topic's FCM topic; an Android device is only left to the FCM topic
+    message while it still matches the device's current token.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    topic = models.ForeignKey('Topic', on_delete=models.CASCADE, related_name='subscriptions')
+    device = models.ForeignKey('Device', on_delete=models.CASCADE, related_name='topic_subscriptions')
+    provider_token = models.TextField(blank=True, default='', help_text="Token confirmed in the FCM topic")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'push_topic_subscriptions'
+        verbose_name = 'Topic Subscription'
+        verbose_name_plural = 'Topic Subscriptions'
+        # Also the covering index used to expand a topic in device order
+        unique_together = ['topic', 'device']
+
+    def __str__(self):
+        return f"{self.topic_id} - {self.device_id}"
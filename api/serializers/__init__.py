@@ -2,11 +2,21 @@
 from .app_serializer import AppSerializer, AppCreateSerializer
 from .device_serializer import DeviceSerializer, DeviceRegistrationSerializer
 from .template_serializer import TemplateSerializer, TemplatePreviewSerializer
-from .notification_serializer import NotificationRequestSerializer, BulkNotificationRequestSerializer
+from .notification_serializer import (
+    NotificationRequestSerializer, BulkNotificationRequestSerializer, UserNotificationRequestSerializer
+)
+from .bulk_job_serializer import BulkJobSerializer
+from .campaign_serializer import CampaignSerializer, CampaignCreateSerializer
+from .topic_serializer import TopicSerializer, TopicSubscriptionSerializer, TopicSendSerializer
+from .dead_letter_serializer import DeadLetterSerializer, DeadLetterReplaySerializer
 
 __all__ = [
     'AppSerializer', 'AppCreateSerializer',
     'DeviceSerializer', 'DeviceRegistrationSerializer',
     'TemplateSerializer', 'TemplatePreviewSerializer',
-    'NotificationRequestSerializer', 'BulkNotificationRequestSerializer'
+    'NotificationRequestSerializer', 'BulkNotificationRequestSerializer', 'UserNotificationRequestSerializer',
+    'BulkJobSerializer',
+    'CampaignSerializer', 'CampaignCreateSerializer',
+    'TopicSerializer', 'TopicSubscriptionSerializer', 'TopicSendSerializer',
+    'DeadLetterSerializer', 'DeadLetterReplaySerializer'
 ]
\ No newline at end of file
@@ -0,0 +1,26 @@
+from rest_framework import serializers
+from ..models import BulkJob
+
+
+class BulkJobSerializer(serializers.ModelSerializer):
+    job_id = serializers.UUIDField(source='id', read_only=True)
+    errors = serializers.SerializerMethodField()
+
+    class Meta:
+        model = BulkJob
+        fields = [
+            'job_id', 'status', 'total_received', 'processed', 'queued',
+            'failed', 'total_chunks', 'processed_chunks', 'errors',
+            'created_at', 'updated_at', 'completed_at'
+        ]
+        read_only_fields = fields
+
+    def get_errors(self, obj):
+        # Only a sample of per-line failures is returned to keep responses small
+        limit = self.context.get('error_limit', 50)
+        sample = []
+        for chunk_errors in obj.chunks.exclude(errors=[]).order_by('sequence').values_list('errors', flat=True):
+            sample.extend(chunk_errors)
+            if len(sample) >= limit:
+                break
+        return sample[:limit]
@@ -0,0 +1,52 @@
+from rest_framework import serializers
+from ..models import Campaign
+
+
+class CampaignCreateSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=255)
+    notification_type = serializers.CharField(max_length=255)
+    title = serializers.CharField(required=False, allow_blank=True, max_length=255)
+    body = serializers.CharField(required=False, allow_blank=True)
+    subject = serializers.CharField(required=False, allow_blank=True)
+    data = serializers.JSONField(default=dict)
+    context = serializers.JSONField(default=dict)
+    platforms = serializers.ListField(
+        child=serializers.ChoiceField(choices=['ios', 'android', 'web']),
+        required=False,
+        default=list
+    )
+
+    def validate_data(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Data must be a JSON object")
+        return value
+
+    def validate_context(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Context must be a JSON object")
+        return value
+
+    def validate(self, attrs):
+        # If title and body are provided, they override template rendering
+        if attrs.get('title') or attrs.get('body'):
+            if not attrs.get('title'):
+                raise serializers.ValidationError("Title is required when body is provided")
+            if not attrs.get('body'):
+                raise serializers.ValidationError("Body is required when title is provided")
+        return attrs
+
+
+class CampaignSerializer(serializers.ModelSerializer):
+    campaign_id = serializers.UUIDField(source='id', read_only=True)
+    template_version = serializers.IntegerField(source='template.version', read_only=True, default=None)
+    topic = serializers.CharField(source='topic.name', read_only=True, default=None)
+
+    class Meta:
+        model = Campaign
+        fields = [
+            'campaign_id', 'name', 'notification_type', 'template_version',
+            'topic', 'provider_topic', 'platforms', 'status', 'total_devices', 'processed', 'sent',
+            'failed', 'total_chunks', 'processed_chunks', 'created_at',
+            'updated_at', 'started_at', 'completed_at'
+        ]
+        read_only_fields = fields
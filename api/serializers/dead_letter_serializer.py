@@ -0,0 +1,23 @@
+from rest_framework import serializers
+from ..models import DeadLetter
+from ..utils.queues import PRIORITY_CHOICES
+
+
+class DeadLetterSerializer(serializers.ModelSerializer):
+    notification_type = serializers.CharField(source='send_log.notification_type', read_only=True)
+    device_token = serializers.CharField(source='send_log.device.device_token', read_only=True)
+
+    class Meta:
+        model = DeadLetter
+        fields = [
+            'id', 'send_log_id', 'notification_type', 'platform', 'device_token',
+            'attempts', 'error_message', 'created_at'
+        ]
+        read_only_fields = fields
+
+
+class DeadLetterReplaySerializer(serializers.Serializer):
+    # Without ids, every dead letter of the app (optionally of one platform) is replayed
+    ids = serializers.ListField(child=serializers.UUIDField(), required=False, max_length=10000)
+    platform = serializers.ChoiceField(choices=['ios', 'android', 'web'], required=False)
+    priority = serializers.ChoiceField(choices=PRIORITY_CHOICES, default='bulk')
@@ -1,6 +1,8 @@
+from django.utils import timezone
 from rest_framework import serializers
 from ..models import Device, Template
 from ..utils.template_renderer import validate_template_context
+from ..utils.queues import PRIORITY_CHOICES
 
 
 class NotificationRequestSerializer(serializers.Serializer):
@@ -11,6 +13,8 @@ class NotificationRequestSerializer(serializers.Serializer):
     data = serializers.JSONField(default=dict)
     title = serializers.CharField(required=False, allow_blank=True, max_length=255)
     body = serializers.CharField(required=False, allow_blank=True)
+    send_at = serializers.DateTimeField(required=False)
+    priority = serializers.ChoiceField(choices=PRIORITY_CHOICES, required=False)
 
     def validate_device_token(self, value):
         if not value or len(value.strip()) == 0:
@@ -29,6 +33,43 @@ class NotificationRequestSerializer(serializers.Serializer):
             raise serializers.ValidationError("Data must be a JSON object")
         return value
 
+    def validate(self, attrs):
+        # If title and body are provided, they override template rendering
+        if attrs.get('title') or attrs.get('body'):
+            if not attrs.get('title'):
+                raise serializers.ValidationError("Title is required when body is provided")
+            if not attrs.get('body'):
+                raise serializers.ValidationError("Body is required when title is provided")
+        # A send_at that is already due means "send now"
+        if attrs.get('send_at') and attrs['send_at'] <= timezone.now():
+            attrs.pop('send_at')
+        return attrs
+
+
+class UserNotificationRequestSerializer(serializers.Serializer):
+    notification_type = serializers.CharField(max_length=255)
+    user_identifier = serializers.CharField(max_length=255)
+    user = serializers.JSONField(default=dict)
+    data = serializers.JSONField(default=dict)
+    title = serializers.CharField(required=False, allow_blank=True, max_length=255)
+    body = serializers.CharField(required=False, allow_blank=True)
+    priority = serializers.ChoiceField(choices=PRIORITY_CHOICES, required=False)
+
+    def validate_user_identifier(self, value):
+        if not value or len(value.strip()) == 0:
+            raise serializers.ValidationError("User identifier cannot be empty")
+        return value.strip()
+
+    def validate_user(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("User must be a JSON object")
+        return value
+
+    def validate_data(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Data must be a JSON object")
+        return value
+
     def validate(self, attrs):
         # If title and body are provided, they override template rendering
         if attrs.get('title') or attrs.get('body'):
@@ -0,0 +1,28 @@
+from rest_framework import serializers
+from ..models import Topic
+from .campaign_serializer import CampaignCreateSerializer
+
+
+class TopicSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Topic
+        fields = ['id', 'name', 'subscriber_count', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+
+class TopicSubscriptionSerializer(serializers.Serializer):
+    device_tokens = serializers.ListField(
+        child=serializers.CharField(),
+        min_length=1,
+        max_length=1000
+    )
+
+    def validate_device_tokens(self, value):
+        tokens = [token.strip() for token in value if token and token.strip()]
+        if not tokens:
+            raise serializers.ValidationError("Device tokens cannot be empty")
+        return list(dict.fromkeys(tokens))
+
+
+class TopicSendSerializer(CampaignCreateSerializer):
+    name = serializers.CharField(max_length=255, required=False)
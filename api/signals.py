@@ -0,0 +1,77 @@
+# api/signals.py
+from celery.signals import worker_process_shutdown, worker_shutdown
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+from .models import App, Device, Template
+from .middleware.app_key_cache import app_key_cache
+from .tasks.topic_tasks import reconcile_device_topics
+from .utils.credentials import credential_registry
+from .utils.invalid_tokens import invalid_token_sink
+from .utils.template_cache import template_resolver
+
+
+@receiver(post_save, sender=App)
+@receiver(post_delete, sender=App)
+def invalidate_app_key_cache(sender, instance, **kwargs):
+    """
+    Drop cached app-key lookups when an App is created, changed or removed.
+
+    Every process drops them again once the change is committed: a
+    concurrent request may have cached the old row in between, which would
+    otherwise stay live until APP_KEY_CACHE_TTL.
+    """
+    app_id, app_key = instance.id, instance.app_key
+    app_key_cache.invalidate(app_id=app_id, app_key=app_key)
+    transaction.on_commit(lambda: app_key_cache.broadcast_invalidation(app_id, app_key))
+
+
+@receiver(post_save, sender=App)
+@receiver(post_delete, sender=App)
+def invalidate_app_credentials(sender, instance, **kwargs):
+    """Rebuild this process's provider clients for the App on its next send."""
+    credential_registry.invalidate(instance.id)
+
+
+@receiver(post_save, sender=Template)
+@receiver(post_delete, sender=Template)
+def invalidate_template_cache(sender, instance, **kwargs):
+    """
+    Make every worker reload the latest active version of this template
+    name, again once the change is committed: a worker may have cached the
+    old version in between, which would otherwise stay live until
+    TEMPLATE_CACHE_MAX_AGE.
+    """
+    app_id, name = instance.app_id, instance.name
+    template_resolver.invalidate(app_id, name)
+    transaction.on_commit(lambda: template_resolver.invalidate(app_id, name))
+
+
+@receiver(pre_save, sender=Device)
+def remember_device_token(sender, instance, **kwargs):
+    """Keep the stored token and state of an Android device about to be saved, see sync_device_topics()."""
+    instance._stored_token = None
+    if instance.platform == 'android' and not instance._state.adding:
+        instance._stored_token = Device.objects.filter(pk=instance.pk).values_list(
+            'device_token', 'is_active'
+        ).first()
+
+
+@receiver(post_save, sender=Device)
+def sync_device_topics(sender, instance, created, **kwargs):
+    """
+    Re-sync the FCM topics of an Android device once a change of its token
+    or active state is committed, so topic sends stop counting on a
+    membership FCM no longer has.
+    """
+    stored = getattr(instance, '_stored_token', None)
+    if created or stored is None or stored == (instance.device_token, instance.is_active):
+        return
+    transaction.on_commit(lambda: reconcile_device_topics(instance))
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def flush_invalid_tokens(**kwargs):
+    """Deactivate the invalid tokens a Celery worker still holds before it exits."""
+    invalid_token_sink.flush()
@@ -1 +1,7 @@
  
+# Import the task modules so that Celery's autodiscovery registers them
+from .push_tasks import send_push_notification_task, send_push_batch_task
+from .bulk_tasks import process_bulk_job_chunk
+from .campaign_tasks import dispatch_campaign, process_campaign_chunk
+from .topic_tasks import sync_fcm_topic_membership
+from .scheduler_tasks import release_due_notifications
@@ -0,0 +1,93 @@
+# api/tasks/bulk_tasks.py
+from celery import shared_task
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+import logging
+from ..models import BulkJob, BulkJobChunk
+from ..utils.rate_limiter import rate_limiter
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def process_bulk_job_chunk(chunk_id):
+    """
+    Celery task to run one chunk of a streamed bulk job through the ingest pipeline.
+
+    Every line counts against the app's rate limit: a chunk the bucket
+    cannot take yet is re-queued for when it will. The SendLogs and the
+    chunk's counters are committed together while the chunk is locked; the
+    push messages are published once they are.
+    """
+    # Imported here because the ingest pipeline itself imports the push tasks
+    from ..utils.bulk_ingest import BulkIngest
+
+    with transaction.atomic():
+        try:
+            chunk = BulkJobChunk.objects.select_for_update().select_related('job__app').get(id=chunk_id)
+        except BulkJobChunk.DoesNotExist:
+            logger.error(f"BulkJobChunk with id {chunk_id} does not exist")
+            return {'success': False, 'error': 'BulkJobChunk not found'}
+
+        if chunk.status == 'done':
+            # Redelivered message, the counters were already applied
+            return {'success': True, 'queued': 0, 'failed': 0}
+
+        entries = chunk.payload
+        allowed, retry_after = rate_limiter.consume(chunk.job.app, len(entries))
+        if not allowed:
+            transaction.on_commit(
+                lambda: process_bulk_job_chunk.apply_async(args=[chunk_id], countdown=retry_after)
+            )
+            return {'success': True, 'queued': 0, 'failed': 0, 'throttled': True}
+
+        ingest = BulkIngest(
+            chunk.job.app,
+            [entry['notification'] for entry in entries],
+            default_priority='bulk',
+            publish=False
+        )
+        results = ingest.run()
+
+        errors = []
+        for entry, result in zip(entries, results):
+            if not result['success']:
+                errors.append({
+                    'line': entry['line'],
+                    'message': result['message'],
+                    'errors': result.get('errors')
+                })
+        queued = len(results) - len(errors)
+
+        chunk.status = 'done'
+        chunk.errors = errors
+        chunk.payload = []
+        chunk.save(update_fields=['status', 'errors', 'payload', 'updated_at'])
+
+        BulkJob.objects.filter(pk=chunk.job_id).update(
+            processed=F('processed') + len(results),
+            queued=F('queued') + queued,
+            failed=F('failed') + len(errors),
+            processed_chunks=F('processed_chunks') + 1,
+            updated_at=timezone.now()
+        )
+
+    unqueued = ingest.publish()
+    if unqueued:
+        # Celery was unavailable: count those lines as failed after all
+        errors.extend(
+            {'line': entries[index]['line'], 'message': results[index]['message'], 'errors': None}
+            for index in unqueued
+        )
+        queued -= len(unqueued)
+        BulkJobChunk.objects.filter(pk=chunk.pk).update(errors=errors, updated_at=timezone.now())
+        BulkJob.objects.filter(pk=chunk.job_id).update(
+            queued=F('queued') - len(unqueued),
+            failed=F('failed') + len(unqueued),
+            updated_at=timezone.now()
+        )
+
+    BulkJob.finalize_if_done(chunk.job_id)
+    logger.info(f"Processed chunk #{chunk.sequence} of bulk job {chunk.job_id}: {queued} queued, {len(errors)} failed")
+    return {'success': True, 'queued': queued, 'failed': len(errors)}
@@ -0,0 +1,291 @@
+# api/tasks/campaign_tasks.py
+from datetime import timedelta
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+import logging
+from ..models import Campaign, CampaignChunk, Device, SendLog, TopicSubscription
+from ..utils.credentials import credential_registry
+from ..utils.fcm_sender import send_fcm_topic_notification
+from ..utils.template_renderer import TemplateRenderer
+from ..utils.queues import queue_for_priority
+from .push_tasks import deliver_send_logs
+
+logger = logging.getLogger(__name__)
+
+
+# Context keys that differ per device, see render_campaign()
+DEVICE_CONTEXT_KEYS = frozenset(['id', 'platform'])
+
+
+def campaign_devices(campaign):
+    """Active devices targeted by ``campaign``, served by the (app, is_active, id) index."""
+    devices = Device.objects.filter(app_id=campaign.app_id, is_active=True)
+    if campaign.topic_id:
+        devices = devices.filter(topic_subscriptions__topic_id=campaign.topic_id)
+    if campaign.platforms:
+        devices = devices.filter(platform__in=campaign.platforms)
+    if campaign.provider_topic:
+        # Android devices confirmed in the FCM topic were reached by its message
+        devices = devices.exclude(
+            platform='android',
+            id__in=TopicSubscription.objects.filter(
+                topic_id=campaign.topic_id, provider_token=F('device__device_token')
+            ).values('device_id')
+        )
+    return devices
+
+
+def campaign_device_ids(campaign):
+    """
+    Return (queryset, key) for walking the targeted device ids in order.
+
+    Topic campaigns are expanded through the (topic, device) unique index
+    of the subscription table alone; the workers apply the remaining
+    filters when they load each range.
+    """
+    if campaign.topic_id:
+        return TopicSubscription.objects.filter(topic_id=campaign.topic_id).order_by('device_id'), 'device_id'
+    return campaign_devices(campaign).order_by('id'), 'id'
+
+
+def send_provider_topic(campaign):
+    """
+    Reach the Android subscribers of a topic campaign with one FCM topic
+    message when every recipient gets the same content.
+
+    Returns True when the message was accepted, in which case the Android
+    devices whose FCM topic membership is confirmed are left out of the
+    per-device fan-out; the others still get their own notification.
+    """
+    if campaign.platforms and 'android' not in campaign.platforms:
+        return False
+    if campaign.template is not None:
+        renderer = TemplateRenderer(campaign.template)
+        if not renderer.compiled.keys.isdisjoint(DEVICE_CONTEXT_KEYS):
+            return False
+        rendered = renderer.render(campaign.context, campaign.data)
+    else:
+        rendered = {'title': campaign.title, 'body': campaign.body, 'data': campaign.data}
+
+    response = send_fcm_topic_notification(
+        campaign.topic.provider_topic,
+        rendered['title'],
+        rendered['body'],
+        rendered['data'],
+        server_key=credential_registry.get(campaign.app).fcm_server_key
+    )
+    campaign.provider_response = response
+    campaign.provider_topic = campaign.topic.provider_topic if response.get('success') else ''
+    Campaign.objects.filter(pk=campaign.pk).update(
+        provider_response=campaign.provider_response,
+        provider_topic=campaign.provider_topic,
+        updated_at=timezone.now()
+    )
+    return bool(campaign.provider_topic)
+
+
+@shared_task
+def dispatch_campaign(campaign_id):
+    """
+    Celery task coordinating a campaign.
+
+    Walks the targeted devices in id order with keyset pagination and
+    records each page as a CampaignChunk for the workers. Only one page of
+    ids is held at a time, and the cursor is saved with every chunk so a
+    redelivered coordinator resumes where the previous one stopped.
+    """
+    try:
+        campaign = Campaign.objects.select_related('app', 'topic', 'template').get(id=campaign_id)
+    except Campaign.DoesNotExist:
+        logger.error(f"Campaign with id {campaign_id} does not exist")
+        return {'success': False, 'error': 'Campaign not found'}
+
+    if campaign.status not in ('pending', 'dispatching'):
+        # Redelivered message, dispatch is already over
+        return {'success': True, 'chunks': 0}
+
+    Campaign.objects.filter(pk=campaign.pk).update(
+        status='dispatching',
+        started_at=campaign.started_at or timezone.now(),
+        updated_at=timezone.now()
+    )
+
+    if campaign.topic_id and campaign.last_device_id is None and not campaign.provider_response:
+        send_provider_topic(campaign)
+
+    chunk_size = settings.CAMPAIGN_CHUNK_SIZE
+    device_ids_queryset, key = campaign_device_ids(campaign)
+    cursor = campaign.last_device_id
+    sequence = campaign.total_chunks
+    dispatched = 0
+
+    while True:
+        page = device_ids_queryset.filter(**{f'{key}__gt': cursor}) if cursor else device_ids_queryset
+        device_ids = list(page.values_list(key, flat=True)[:chunk_size])
+        if not device_ids:
+            break
+
+        with transaction.atomic():
+            chunk = CampaignChunk.objects.create(
+                campaign=campaign,
+                sequence=sequence,
+                after_device_id=cursor,
+                last_device_id=device_ids[-1]
+            )
+            Campaign.objects.filter(pk=campaign.pk).update(
+                last_device_id=device_ids[-1],
+                total_devices=F('total_devices') + len(device_ids),
+                total_chunks=F('total_chunks') + 1,
+                updated_at=timezone.now()
+            )
+
+        try:
+            process_campaign_chunk.delay(str(chunk.id))
+        except Exception as e:
+            logger.error(f"Error queuing campaign chunk with Celery: {str(e)}", exc_info=True)
+            Campaign.objects.filter(pk=campaign.pk).update(status='failed', updated_at=timezone.now())
+            return {'success': False, 'error': f"Celery error: {str(e)}"}
+
+        cursor = device_ids[-1]
+        sequence += 1
+        dispatched += 1
+
+    Campaign.objects.filter(pk=campaign.pk, status='dispatching').update(
+        status='processing',
+        updated_at=timezone.now()
+    )
+    Campaign.finalize_if_done(campaign.pk)
+    logger.info(f"Dispatched {dispatched} chunks for campaign {campaign.pk}")
+    return {'success': True, 'chunks': dispatched}
+
+
+def render_campaign(campaign, devices):
+    """Return the rendered title/body/subject/data for each device, in order."""
+    if campaign.template is None:
+        content = {
+            'title': campaign.title,
+            'body': campaign.body,
+            'subject': campaign.subject,
+            'data': campaign.data,
+        }
+        return [content] * len(devices)
+
+    contexts = [
+        {**campaign.context, 'id': device.user_identifier, 'platform': device.platform}
+        for device in devices
+    ]
+    return TemplateRenderer(campaign.template).render_many(contexts, (campaign.data for _ in devices))
+
+
+@shared_task
+def process_campaign_chunk(chunk_id):
+    """
+    Celery task to render, log and deliver one chunk of a campaign.
+
+    The SendLogs are created and the chunk marked 'logged' in one
+    transaction, then delivered; a chunk picked up again after a worker
+    died in between delivers its SendLogs still pending. The chunk is
+    claimed as 'delivering' under its lock before sending, so a duplicate
+    message or the stalled-chunk reaper leaves it to the worker sending it.
+    The sent/failed counters are kept by deliver_send_logs as each
+    notification reaches a final status, retries included (see
+    record_campaign_outcomes).
+    """
+    with transaction.atomic():
+        try:
+            chunk = CampaignChunk.objects.select_for_update(of=('self',)).select_related(
+                'campaign__app', 'campaign__template'
+            ).get(id=chunk_id)
+        except CampaignChunk.DoesNotExist:
+            logger.error(f"CampaignChunk with id {chunk_id} does not exist")
+            return {'success': False, 'error': 'CampaignChunk not found'}
+
+        if chunk.status in ('delivering', 'done'):
+            # Redelivered message, the notifications are being or were already delivered
+            return {'success': True, 'delivered': 0}
+
+        campaign = chunk.campaign
+        if chunk.status == 'logged':
+            send_logs = list(
+                SendLog.objects.filter(id__in=chunk.send_log_ids, status='pending').select_related('device__app')
+            )
+        else:
+            send_logs = log_campaign_chunk(campaign, chunk)
+        chunk.status = 'delivering'
+        chunk.save(update_fields=['status', 'updated_at'])
+
+    deliver_send_logs(send_logs, queue=queue_for_priority('bulk'))
+
+    if CampaignChunk.objects.filter(pk=chunk.pk, status='delivering').update(status='done', updated_at=timezone.now()):
+        Campaign.objects.filter(pk=campaign.pk).update(
+            processed_chunks=F('processed_chunks') + 1,
+            updated_at=timezone.now()
+        )
+    Campaign.finalize_if_done(campaign.pk)
+    logger.info(f"Processed chunk #{chunk.sequence} of campaign {campaign.pk}: {len(send_logs)} delivered")
+    return {'success': True, 'delivered': len(send_logs)}
+
+
+def log_campaign_chunk(campaign, chunk):
+    """Create the SendLogs of ``chunk`` (locked by the caller) and mark it logged."""
+    devices = campaign_devices(campaign).filter(id__lte=chunk.last_device_id)
+    if chunk.after_device_id:
+        devices = devices.filter(id__gt=chunk.after_device_id)
+    devices = list(devices.order_by('id'))
+
+    send_logs = []
+    for device, rendered in zip(devices, render_campaign(campaign, devices)):
+        device.app = campaign.app
+        send_logs.append(SendLog(
+            app=campaign.app,
+            device=device,
+            template=campaign.template,
+            notification_type=campaign.notification_type,
+            title=rendered['title'],
+            body=rendered['body'],
+            subject=rendered['subject'],
+            data=rendered['data'],
+            raw_request={'campaign_id': str(campaign.pk)},
+            status='pending'
+        ))
+    SendLog.objects.bulk_create(send_logs)
+
+    chunk.status = 'logged'
+    chunk.send_log_ids = [str(send_log.id) for send_log in send_logs]
+    chunk.save(update_fields=['status', 'send_log_ids', 'updated_at'])
+    Campaign.objects.filter(pk=campaign.pk).update(
+        processed=F('processed') + len(send_logs),
+        updated_at=timezone.now()
+    )
+    return send_logs
+
+
+@shared_task
+def resume_stalled_campaign_chunks():
+    """
+    Periodic task (see CELERY_BEAT_SCHEDULE) queuing again the campaign
+    chunks left unfinished for CAMPAIGN_CHUNK_STALL_TIMEOUT seconds, whose
+    worker died before finishing them. Chunks being delivered are left
+    alone until then; past it they go back to 'logged' so their SendLogs
+    still pending are delivered.
+    """
+    now = timezone.now()
+    stalled_before = now - timedelta(seconds=settings.CAMPAIGN_CHUNK_STALL_TIMEOUT)
+    chunk_ids = list(
+        CampaignChunk.objects.filter(status__in=['pending', 'logged', 'delivering'], updated_at__lt=stalled_before)
+        .values_list('id', flat=True)[:settings.CAMPAIGN_CHUNK_SIZE]
+    )
+    if not chunk_ids:
+        return {'success': True, 'resumed': 0}
+
+    stalled = CampaignChunk.objects.filter(id__in=chunk_ids, updated_at__lt=stalled_before)
+    stalled.filter(status='delivering').update(status='logged', updated_at=now)
+    # Restart the clock so the chunks are not queued again on the next tick
+    stalled.update(updated_at=now)
+    for chunk_id in chunk_ids:
+        process_campaign_chunk.delay(str(chunk_id))
+    logger.warning(f"Queued {len(chunk_ids)} stalled campaign chunks again")
+    return {'success': True, 'resumed': len(chunk_ids)}
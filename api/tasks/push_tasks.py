@@ -1,23 +1,82 @@
 # api/tasks/push_tasks.py
+from collections import Counter
+from datetime import timedelta
 from celery import shared_task
 import logging
+import random
 import requests
 import json
+from django.conf import settings
+from django.db.models import F
 from django.utils import timezone
-from ..models import SendLog, Device # Import Device if needed to check/update status, though SendLog has device_id
-from ..utils.fcm_sender import send_fcm_notification
-from ..utils.apns_sender import send_apns_notification
-from ..utils.web_sender import send_web_notification
+from ..models import Campaign, DeadLetter, SendLog, Device # Import Device if needed to check/update status, though SendLog has device_id
+from ..utils.fcm_sender import send_fcm_multicast, send_fcm_notification
+from ..utils.fcm_v1_sender import send_fcm_v1_many, send_fcm_v1_notification
+from ..utils.apns_sender import send_apns_many, send_apns_notification
+from ..utils.circuit_breaker import PLATFORM_PROVIDERS, circuit_breaker, is_provider_failure
+from ..utils.credentials import credential_registry
+from ..utils.invalid_tokens import invalid_token_sink
+from ..utils.retry_policy import TRANSIENT, backoff_delay, classify
+from ..utils.web_sender import send_web_many, send_web_notification
+from .scheduler_tasks import schedule_redelivery
 
 logger = logging.getLogger(__name__)
 
 
+def deliver_notification(app, platform, device_token, title, body, data):
+    """
+    Send one notification through the provider for ``platform`` with the
+    App's credentials (see api/utils/credentials.py) and return the
+    provider response dict.
+    """
+    credentials = credential_registry.get(app)
+    if platform == 'android':
+        if credentials.fcm_v1:
+            return send_fcm_v1_notification(
+                device_token=device_token,
+                title=title,
+                body=body,
+                data=data
+            )
+        # Send via FCM - Uses keys from App model
+        return send_fcm_notification(
+            device_token=device_token,
+            title=title,
+            body=body,
+            data=data,
+            server_key=credentials.fcm_server_key
+        )
+    elif platform == 'ios':
+        # Send via APNs - Uses keys from App model
+        return send_apns_notification(
+            device_token=device_token,
+            title=title,
+            body=body,
+            data=data,
+            client=credentials.apns_client()
+        )
+    elif platform == 'web':
+        # Send via Web Push - Uses keys from App model
+        return send_web_notification(
+            device_token=device_token,
+            title=title,
+            body=body,
+            data=data,
+            vapid_public_key=credentials.vapid_public_key,
+            vapid_private_key=credentials.vapid_private_key
+        )
+    raise ValueError(f"Unsupported platform: {platform}")
+
+
 @shared_task(bind=True, max_retries=3)
 def send_push_notification_task(
     self, send_log_id, device_token, platform, title, body, data, subject=None
 ):
     """
     Celery task to send push notification via FCM, APNs, or web push.
+
+    Transient provider errors are retried with backoff on PUSH_RETRY_QUEUE
+    (see retry_send_logs), permanent ones fail the log at once.
     """
     try:
         send_log = SendLog.objects.get(id=send_log_id)
@@ -26,48 +85,47 @@ def send_push_notification_task(
         # Assuming SendLog.device.app is the correct path
         app = send_log.device.app
         
+        # Don't spend the request on a provider whose circuit is open
+        queue = (self.request.delivery_info or {}).get('routing_key')
+        provider = PLATFORM_PROVIDERS.get(platform, platform)
+        allowed, retry_in, _ = circuit_breaker.allow(provider, app.id)
+        if not allowed:
+            send_log.error_message = f"Parked: {provider} circuit open"
+            send_log.save(update_fields=['error_message', 'updated_at'])
+            park_send_logs([(send_log, retry_in)], queue)
+            return {'success': False, 'error': send_log.error_message, 'parked': True}
+
         # Update status to processing
         send_log.status = 'pending'
         send_log.sent_at = timezone.now()
         send_log.save(update_fields=['status', 'sent_at'])
 
-        if platform == 'android':
-            # Send via FCM - Uses keys from App model
-            response = send_fcm_notification(
-                device_token=device_token,
-                title=title,
-                body=body,
-                data=data
-            )
-        elif platform == 'ios':
-            # Send via APNs - Uses keys from App model
-            response = send_apns_notification(
-                device_token=device_token,
-                title=title,
-                body=body,
-                data=data
-            )
-        elif platform == 'web':
-            # Send via Web Push - Uses keys from App model
-            # Pass the keys from the App instance to the sender function
-            response = send_web_notification(
-                device_token=device_token,
-                title=title,
-                body=body,
-                data=data,
-                vapid_public_key=app.web_vapid_public_key, # Get from App model
-                vapid_private_key=app.web_vapid_private_key # Get from App model
-            )
-        else:
-            raise ValueError(f"Unsupported platform: {platform}")
+        try:
+            response = deliver_notification(app, platform, device_token, title, body, data)
+        except Exception as exc:
+            logger.error(f"Error sending {platform} notification: {str(exc)}", exc_info=True)
+            response = exc
+        if isinstance(response, dict):
+            circuit_breaker.record(provider, app.id, [response])
 
         # Update send log with response
-        send_log.provider_response = response
-        send_log.status = 'sent' if response.get('success') else 'failed'
-        send_log.error_message = response.get('error', '')
-        send_log.save(update_fields=['provider_response', 'status', 'error_message', 'updated_at'])
+        outcome = apply_response(send_log, response, timezone.now())
+        if outcome == 'park':
+            send_log.save(update_fields=['status', 'park_count', 'error_message', 'updated_at'])
+            park_send_logs([(send_log, response['retry_after'])], queue)
+            return response
+        send_log.save(update_fields=['provider_response', 'status', 'error_message', 'retry_count', 'updated_at'])
+        if outcome == 'retry':
+            retry_send_logs([send_log])
+        elif outcome == 'dead':
+            dead_letter_send_logs([send_log])
+        elif response.get('invalid_token'):
+            invalid_token_sink.add(app.id, [device_token])
+        invalid_token_sink.flush_due()
 
-        logger.info(f"Notification sent successfully to {platform} device. Response: {response}")
+        if isinstance(response, Exception):
+            return {'success': False, 'error': str(response), 'retrying': outcome == 'retry'}
+        logger.info(f"Notification sent to {platform} device. Response: {response}")
         return response
 
     except SendLog.DoesNotExist:
@@ -75,19 +133,313 @@ def send_push_notification_task(
         return {'success': False, 'error': 'SendLog not found'}
     
     except Exception as exc:
+        # The task itself failed (database or broker unavailable), not the send
         logger.error(f"Error sending notification: {str(exc)}", exc_info=True)
-        
-        # Update send log with error
+
+        if self.request.retries >= self.max_retries:
+            SendLog.objects.filter(id=send_log_id).update(
+                status='failed', error_message=str(exc), updated_at=timezone.now()
+            )
+        raise self.retry(exc=exc, countdown=backoff_delay(self.request.retries + 1), queue=settings.PUSH_RETRY_QUEUE)
+
+
+def send_android_many(app, messages):
+    credentials = credential_registry.get(app)
+    if credentials.fcm_v1:
+        return send_fcm_v1_many(messages)
+    if credentials.fcm_server_key:
+        return send_fcm_multicast(messages, server_key=credentials.fcm_server_key)
+    return None
+
+
+def send_ios_many(app, messages):
+    credentials = credential_registry.get(app)
+    if credentials.apns_configured:
+        return send_apns_many(messages, credentials.apns_client())
+    return None
+
+
+def send_web_push_many(app, messages):
+    credentials = credential_registry.get(app)
+    return send_web_many(messages, credentials.vapid_public_key, credentials.vapid_private_key)
+
+
+def batch_senders():
+    """
+    Map each platform to a ``send_many(app, messages)`` callable sending a
+    whole batch with the App's credentials: Android concurrently over FCM
+    v1 or as legacy multicasts, iOS as concurrent streams over HTTP/2, web
+    with parallel encryption. A callable returns None when the App has no
+    credentials for the provider; its messages are then sent one by one.
+    """
+    return {
+        'android': send_android_many,
+        'ios': send_ios_many,
+        'web': send_web_push_many,
+    }
+
+
+def apply_response(send_log, response, now):
+    """
+    Set the outcome of one send on ``send_log``: ``response`` is the
+    provider result dict, or the exception sending raised.
+
+    Returns 'park' when the provider asked to back off with Retry-After
+    (the log stays pending, up to PUSH_MAX_PARKS times; after that it is
+    handled as a transient error), 'retry' after a transient error while
+    retries are left (the log is marked retrying and its retry_count
+    raised), 'dead' when they are used up (the log is marked failed), None
+    otherwise.
+    """
+    send_log.updated_at = now
+    if isinstance(response, dict) and response.get('retry_after') and is_provider_failure(response) \
+            and send_log.park_count < settings.PUSH_MAX_PARKS:
+        send_log.status = 'pending'
+        send_log.park_count += 1
+        send_log.error_message = f"Parked: provider asked to retry after {response['retry_after']:.0f}s"
+        return 'park'
+
+    if classify(response) == TRANSIENT:
+        if isinstance(response, Exception):
+            send_log.error_message = str(response)
+        else:
+            send_log.provider_response = response
+            send_log.error_message = response.get('error', '')
+        if send_log.retry_count < settings.PUSH_MAX_RETRIES:
+            send_log.status = 'retrying'
+            send_log.retry_count += 1
+            return 'retry'
+        send_log.sent_at = now
+        send_log.status = 'failed'
+        return 'dead'
+
+    send_log.sent_at = now
+    send_log.provider_response = response
+    send_log.status = 'sent' if response.get('success') else 'failed'
+    send_log.error_message = response.get('error', '')
+    return None
+
+
+def park_send_logs(parked, queue=None):
+    """
+    Re-queue (send_log, delay) pairs to be sent once their provider can
+    take them again. Parking does not use up a retry: nothing was sent, or
+    the provider throttled the request (see PUSH_MAX_PARKS).
+    """
+    by_platform = {}
+    for send_log, delay in parked:
+        send_logs, longest = by_platform.get(send_log.device.platform, ([], 0.0))
+        send_logs.append(send_log)
+        by_platform[send_log.device.platform] = (send_logs, max(longest, delay))
+
+    for platform, (send_logs, delay) in by_platform.items():
+        logger.info(f"Parking {len(send_logs)} {platform} notifications for {delay:.0f}s")
+        # Spread the parked batches so they don't all hit a recovering provider at once
+        queue_send_logs_later(send_logs, platform, max(1.0, delay) * random.uniform(1.0, 1.2), queue)
+
+
+def retry_send_logs(send_logs):
+    """
+    Queue SendLogs marked retrying by apply_response() on PUSH_RETRY_QUEUE,
+    away from the delivery queues, after a jittered exponential backoff
+    (see api/utils/retry_policy.py). Logs are batched per platform and
+    retry number; each batch draws its own delay.
+    """
+    batches = {}
+    for send_log in send_logs:
+        batches.setdefault((send_log.device.platform, send_log.retry_count), []).append(send_log)
+
+    for (platform, retry), batch in batches.items():
+        delay = backoff_delay(retry)
+        logger.info(f"Retrying {len(batch)} {platform} notifications (retry {retry}) in {delay:.0f}s")
+        queue_send_logs_later(batch, platform, delay, settings.PUSH_RETRY_QUEUE)
+
+
+def queue_send_logs_later(send_logs, platform, delay, queue):
+    """
+    Queue a batch of SendLogs on ``queue`` in ``delay`` seconds: as an ETA
+    message up to PUSH_ETA_MAX_DELAY, through the scheduled-notification
+    store beyond, so long delays are not held in a worker's memory.
+    """
+    if delay > settings.PUSH_ETA_MAX_DELAY:
+        schedule_redelivery(send_logs, platform, timezone.now() + timedelta(seconds=delay), queue)
+        return
+    send_push_batch_task.apply_async(
+        kwargs={'send_log_ids': [str(send_log.id) for send_log in send_logs], 'platform': platform},
+        countdown=delay,
+        queue=queue
+    )
+
+
+def dead_letter_send_logs(send_logs):
+    """Record SendLogs that used up their retries, see DeadLetter."""
+    if not send_logs:
+        return
+    DeadLetter.objects.bulk_create(build_dead_letters(send_logs), ignore_conflicts=True)
+    logger.warning(f"{len(send_logs)} notifications moved to the dead letters after {settings.PUSH_MAX_RETRIES} retries")
+
+
+FINAL_STATUSES = ('sent', 'failed')
+
+
+def record_campaign_outcomes(send_logs, final_before=()):
+    """
+    Add the campaign SendLogs (raw_request carries their campaign_id) that
+    reached a final status to their campaign's sent/failed counters, and
+    complete the campaigns that are done. ``final_before`` holds the ids of
+    the logs already final before this delivery, counted back then.
+    """
+    counts = {}
+    for send_log in send_logs:
+        campaign_id = (send_log.raw_request or {}).get('campaign_id')
+        if not campaign_id or send_log.status not in FINAL_STATUSES or send_log.id in final_before:
+            continue
+        sent, failed = counts.get(campaign_id, (0, 0))
+        if send_log.status == 'sent':
+            counts[campaign_id] = (sent + 1, failed)
+        else:
+            counts[campaign_id] = (sent, failed + 1)
+
+    for campaign_id, (sent, failed) in counts.items():
+        Campaign.objects.filter(pk=campaign_id).update(
+            sent=F('sent') + sent,
+            failed=F('failed') + failed,
+            updated_at=timezone.now()
+        )
+        Campaign.finalize_if_done(campaign_id)
+
+
+def reopen_campaigns(send_logs):
+    """Take the failed campaign SendLogs about to be sent again off their campaign's failed count."""
+    counts = Counter(
+        raw_request['campaign_id']
+        for raw_request in send_logs.values_list('raw_request', flat=True)
+        if (raw_request or {}).get('campaign_id')
+    )
+    for campaign_id, failed in counts.items():
+        Campaign.objects.filter(pk=campaign_id).update(failed=F('failed') - failed, updated_at=timezone.now())
+        # A completed campaign is processing again until the replayed notifications complete
+        Campaign.objects.filter(pk=campaign_id, status='completed').update(status='processing', completed_at=None)
+
+
+def build_dead_letters(send_logs):
+    return [
+        DeadLetter(
+            app_id=send_log.app_id,
+            send_log=send_log,
+            platform=send_log.device.platform,
+            attempts=send_log.retry_count + 1,
+            error_message=send_log.error_message
+        )
+        for send_log in send_logs
+    ]
+
+
+def send_group(sender, app, platform, group_logs):
+    """Send logs of one platform and App; an exception raised for a log is returned as its result."""
+    messages = [
+        (send_log.device.device_token, send_log.title, send_log.body, send_log.data)
+        for send_log in group_logs
+    ]
+    if sender is not None:
         try:
-            send_log = SendLog.objects.get(id=send_log_id)
-            send_log.status = 'failed'
-            send_log.error_message = str(exc)
-            send_log.save(update_fields=['status', 'error_message', 'updated_at'])
-        except SendLog.DoesNotExist:
-            pass
-        
-        # Retry the task
-        raise self.retry(exc=exc, countdown=60)  # Retry after 1 minute
+            results = sender(app, messages)
+        except Exception as exc:
+            logger.error(f"Error sending {len(messages)} {platform} notifications: {str(exc)}", exc_info=True)
+            return [exc] * len(messages)
+        if results is not None:
+            return results
+
+    results = []
+    for message in messages:
+        try:
+            results.append(deliver_notification(app, platform, *message))
+        except Exception as exc:
+            logger.error(f"Error sending {platform} notification: {str(exc)}", exc_info=True)
+            results.append(exc)
+    return results
+
+
+def deliver_send_logs(send_logs, queue=None):
+    """
+    Deliver already-created SendLogs (with device__app selected) and write
+    the results back with one bulk_update.
+
+    Logs whose provider circuit is open (see api/utils/circuit_breaker.py)
+    or that the provider throttled are not sent but parked on ``queue``
+    until it recovers. Logs that hit a transient error are retried with
+    backoff, or moved to the dead letters once out of retries. Invalid
+    tokens go to the invalid-token sink and campaign logs that reached a
+    final status are counted on their campaign. Returns the ids of the
+    logs being retried.
+    """
+    now = timezone.now()
+    final_before = {send_log.id for send_log in send_logs if send_log.status in FINAL_STATUSES}
+    retrying = []
+    dead = []
+    parked = []
+    invalid_tokens = {}
+
+    senders = batch_senders()
+    groups = {}
+    for send_log in send_logs:
+        groups.setdefault((send_log.device.platform, send_log.device.app_id), []).append(send_log)
+
+    for (platform, app_id), group_logs in groups.items():
+        provider = PLATFORM_PROVIDERS.get(platform, platform)
+        group_logs, tripped, delay = circuit_breaker.admit(provider, app_id, group_logs)
+        for send_log in tripped:
+            send_log.updated_at = now
+            send_log.error_message = f"Parked: {provider} circuit open"
+            parked.append((send_log, delay))
+        if not group_logs:
+            continue
+
+        results = send_group(senders.get(platform), group_logs[0].device.app, platform, group_logs)
+        circuit_breaker.record(provider, app_id, [result for result in results if isinstance(result, dict)])
+        for send_log, response in zip(group_logs, results):
+            outcome = apply_response(send_log, response, now)
+            if outcome == 'retry':
+                retrying.append(send_log)
+            elif outcome == 'dead':
+                dead.append(send_log)
+            elif outcome == 'park':
+                parked.append((send_log, response['retry_after']))
+            elif response.get('invalid_token'):
+                invalid_tokens.setdefault(app_id, []).append(send_log.device.device_token)
+
+    SendLog.objects.bulk_update(
+        send_logs,
+        ['provider_response', 'status', 'error_message', 'sent_at', 'retry_count', 'park_count', 'updated_at']
+    )
+    dead_letter_send_logs(dead)
+    record_campaign_outcomes(send_logs, final_before)
+    for app_id, device_tokens in invalid_tokens.items():
+        invalid_token_sink.add(app_id, device_tokens)
+    invalid_token_sink.flush_due()
+    if retrying:
+        retry_send_logs(retrying)
+    if parked:
+        park_send_logs(parked, queue)
+    return [str(send_log.id) for send_log in retrying]
+
+
+@shared_task(bind=True)
+def send_push_batch_task(self, send_log_ids, platform):
+    """
+    Celery task to send a batch of pending SendLogs for one platform.
+
+    The logs are loaded in one query and their results written back with
+    one bulk_update. Logs that hit a transient error are queued again as
+    smaller batches on PUSH_RETRY_QUEUE (see retry_send_logs).
+    """
+    send_logs = list(
+        SendLog.objects.filter(id__in=send_log_ids).select_related('device__app')
+    )
+    retry_ids = deliver_send_logs(send_logs, queue=(self.request.delivery_info or {}).get('routing_key'))
+    logger.info(f"Sent batch of {len(send_logs)} {platform} notifications, {len(retry_ids)} to retry")
+
+    return {'sent': len(send_logs) - len(retry_ids), 'retrying': len(retry_ids)}
 
 
 # ... other tasks ...
\ No newline at end of file
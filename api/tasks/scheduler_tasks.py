@@ -0,0 +1,145 @@
+# api/tasks/scheduler_tasks.py
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+import logging
+from ..models import ScheduledNotification
+
+logger = logging.getLogger(__name__)
+
+
+def claim_due_notifications(limit):
+    """
+    Lock up to ``limit`` due notifications, oldest first, in the caller's
+    transaction.
+
+    Rows locked by a concurrent release are skipped, so overlapping beat
+    ticks never release the same notification twice.
+    """
+    return list(
+        ScheduledNotification.objects
+        .select_for_update(skip_locked=True, of=('self',))
+        .select_related('app')
+        .filter(status='pending', send_at__lte=timezone.now())
+        .order_by('send_at')[:limit]
+    )
+
+
+def schedule_redelivery(send_logs, platform, send_at, queue=None):
+    """
+    Queue ``send_logs`` of ``platform`` again on ``queue`` at ``send_at``,
+    through a 'redelivery' ScheduledNotification per App.
+    """
+    by_app = {}
+    for send_log in send_logs:
+        by_app.setdefault(send_log.app_id, []).append(str(send_log.id))
+    ScheduledNotification.objects.bulk_create([
+        ScheduledNotification(
+            app_id=app_id,
+            send_at=send_at,
+            kind='redelivery',
+            payload={'send_log_ids': send_log_ids, 'platform': platform, 'queue': queue}
+        )
+        for app_id, send_log_ids in by_app.items()
+    ])
+
+
+def release_notifications(due):
+    """
+    Run claimed notifications through the ingest pipeline, one batch per
+    app, and record their outcome, in the transaction that claimed them: if
+    ingesting raises, the rows are pending again for the next tick.
+
+    Returns (BulkIngest, notifications) pairs and the claimed redeliveries,
+    whose messages are to be published once the transaction commits, see
+    publish_released().
+    """
+    # Imported here because the ingest pipeline itself imports the push tasks
+    from ..utils.bulk_ingest import BulkIngest
+
+    now = timezone.now()
+    by_app = {}
+    redeliveries = []
+    for scheduled in due:
+        if scheduled.kind == 'redelivery':
+            scheduled.status = 'released'
+            scheduled.released_at = now
+            scheduled.updated_at = now
+            redeliveries.append(scheduled)
+        else:
+            by_app.setdefault(scheduled.app_id, []).append(scheduled)
+
+    ingests = []
+    for batch in by_app.values():
+        app = batch[0].app
+        if app.is_active:
+            ingest = BulkIngest(app, [scheduled.payload for scheduled in batch], publish=False)
+            results = ingest.run()
+            ingests.append((ingest, batch))
+        else:
+            results = [{'success': False, 'message': 'App is not active'}] * len(batch)
+
+        for scheduled, result in zip(batch, results):
+            scheduled.status = 'released' if result['success'] else 'failed'
+            scheduled.result = result
+            scheduled.released_at = now
+            scheduled.updated_at = now
+
+    ScheduledNotification.objects.bulk_update(due, ['status', 'result', 'released_at', 'updated_at'])
+    return ingests, redeliveries
+
+
+def publish_released(ingests, redeliveries):
+    """
+    Publish the released notifications; those Celery did not take are
+    marked failed, redeliveries are left pending for the next tick.
+    """
+    from .push_tasks import send_push_batch_task
+
+    unqueued = []
+    for ingest, batch in ingests:
+        for index in ingest.publish():
+            batch[index].status = 'failed'
+            batch[index].result = ingest.results[index]
+            unqueued.append(batch[index])
+    for scheduled in redeliveries:
+        try:
+            send_push_batch_task.apply_async(
+                kwargs={'send_log_ids': scheduled.payload['send_log_ids'], 'platform': scheduled.payload['platform']},
+                queue=scheduled.payload.get('queue')
+            )
+        except Exception as e:
+            logger.error(f"Error queuing scheduled redelivery with Celery: {str(e)}", exc_info=True)
+            scheduled.status = 'pending'
+            unqueued.append(scheduled)
+    if unqueued:
+        ScheduledNotification.objects.bulk_update(unqueued, ['status', 'result'])
+
+
+@shared_task
+def release_due_notifications():
+    """
+    Periodic task (see CELERY_BEAT_SCHEDULE) releasing scheduled
+    notifications whose send_at has passed.
+
+    Due rows are read in send_at order from the partial pending index, in
+    batches of SCHEDULER_BATCH_SIZE, so pending notifications cost nothing
+    in the broker or the workers until they are due. Each batch is claimed
+    and ingested in one transaction and published once it commits.
+    """
+    released = 0
+    for _ in range(settings.SCHEDULER_MAX_BATCHES):
+        with transaction.atomic():
+            due = claim_due_notifications(settings.SCHEDULER_BATCH_SIZE)
+            ingests, redeliveries = release_notifications(due)
+        if not due:
+            break
+        publish_released(ingests, redeliveries)
+        released += len(due)
+        if len(due) < settings.SCHEDULER_BATCH_SIZE:
+            break
+
+    if released:
+        logger.info(f"Released {released} scheduled notifications")
+    return {'released': released}
@@ -0,0 +1,77 @@
+# api/tasks/topic_tasks.py
+from celery import shared_task
+import logging
+from ..models import Topic, TopicSubscription
+from ..utils.credentials import credential_registry
+from ..utils.fcm_sender import update_fcm_topic_subscriptions
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, max_retries=3)
+def sync_fcm_topic_membership(self, topic_id, device_tokens, subscribe=True):
+    """
+    Celery task to mirror topic subscriptions of Android devices into FCM,
+    so topic sends can reach them with a single FCM topic message.
+
+    Subscribed tokens FCM accepted are recorded as confirmed on their
+    TopicSubscription; until then (and for tokens FCM rejected) the devices
+    keep getting topic sends one by one.
+    """
+    try:
+        topic = Topic.objects.select_related('app').get(id=topic_id)
+    except Topic.DoesNotExist:
+        logger.error(f"Topic with id {topic_id} does not exist")
+        return {'success': False, 'error': 'Topic not found'}
+
+    response = update_fcm_topic_subscriptions(
+        topic.provider_topic,
+        device_tokens,
+        subscribe=subscribe,
+        server_key=credential_registry.get(topic.app).fcm_server_key
+    )
+
+    if not response['success']:
+        logger.error(f"Error syncing FCM topic {topic.provider_topic}: {response['error']}")
+        if 'status_code' in response:
+            # Rejected or unreachable: try again, batchAdd/batchRemove are idempotent
+            raise self.retry(exc=Exception(response['error']), countdown=60)  # Retry after 1 minute
+        return response
+
+    rejected = {error['device_token'] for error in response.get('errors', [])}
+    if rejected:
+        logger.warning(f"{len(rejected)} tokens rejected by FCM topic {topic.provider_topic}")
+    if subscribe:
+        subscriptions = list(
+            TopicSubscription.objects.filter(topic=topic, device__device_token__in=device_tokens)
+            .exclude(device__device_token__in=rejected)
+            .select_related('device')
+        )
+        for subscription in subscriptions:
+            subscription.provider_token = subscription.device.device_token
+        TopicSubscription.objects.bulk_update(subscriptions, ['provider_token'])
+    return response
+
+
+def reconcile_device_topics(device):
+    """
+    Bring the FCM topics of an Android device in line after its token
+    changed or it was deactivated or reactivated: the tokens confirmed in
+    its topics are dropped from them, and an active device is subscribed
+    again with its current token.
+    """
+    subscriptions = list(TopicSubscription.objects.filter(device=device))
+    TopicSubscription.objects.filter(device=device).exclude(provider_token='').update(provider_token='')
+
+    try:
+        for subscription in subscriptions:
+            stale = subscription.provider_token and (
+                not device.is_active or subscription.provider_token != device.device_token
+            )
+            if stale:
+                sync_fcm_topic_membership.delay(str(subscription.topic_id), [subscription.provider_token], False)
+            if device.is_active:
+                sync_fcm_topic_membership.delay(str(subscription.topic_id), [device.device_token], True)
+    except Exception as e:
+        # The device stays in the per-device fan-out of its topics
+        logger.error(f"Error queuing FCM topic sync with Celery: {str(e)}", exc_info=True)
@@ -0,0 +1,116 @@
+"""
+Local stand-in for APNs: a cleartext HTTP/2 server (prior knowledge, as
+httpx speaks it with http1=False) used by the tests.
+
+Device tokens starting with ``invalid`` are answered with 410
+Unregistered. It records how many connections were opened and the peak
+number of streams in flight at once.
+"""
+import asyncio
+import json
+import threading
+import uuid
+import jwt
+from h2.config import H2Configuration
+from h2.connection import H2Connection
+from h2.events import ConnectionTerminated, DataReceived, RequestReceived, StreamEnded
+from h2.settings import SettingCodes
+
+
+class APNsStubProtocol(asyncio.Protocol):
+    def __init__(self, stub):
+        self.stub = stub
+        self.conn = H2Connection(H2Configuration(client_side=False, header_encoding='utf-8'))
+        self.streams = {}
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.stub.connections += 1
+        self.conn.initiate_connection()
+        self.conn.update_settings({SettingCodes.MAX_CONCURRENT_STREAMS: self.stub.max_concurrent_streams})
+        transport.write(self.conn.data_to_send())
+
+    def data_received(self, data):
+        for event in self.conn.receive_data(data):
+            if isinstance(event, RequestReceived):
+                self.streams[event.stream_id] = (dict(event.headers), bytearray())
+            elif isinstance(event, DataReceived):
+                self.streams[event.stream_id][1].extend(event.data)
+                self.conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+            elif isinstance(event, StreamEnded):
+                headers, body = self.streams.pop(event.stream_id)
+                self.stub.in_flight += 1
+                self.stub.max_in_flight = max(self.stub.max_in_flight, self.stub.in_flight)
+                asyncio.get_running_loop().call_later(
+                    self.stub.latency, self.respond, event.stream_id, headers, bytes(body)
+                )
+            elif isinstance(event, ConnectionTerminated):
+                self.transport.close()
+        self.transport.write(self.conn.data_to_send())
+
+    def respond(self, stream_id, headers, body):
+        self.stub.in_flight -= 1
+        if self.transport.is_closing():
+            return
+        status, payload = self.stub.handle(headers, json.loads(body))
+        response_headers = [(':status', str(status)), ('apns-id', str(uuid.uuid4()).upper())]
+        if payload is None:
+            self.conn.send_headers(stream_id, response_headers, end_stream=True)
+        else:
+            data = json.dumps(payload).encode()
+            response_headers += [('content-type', 'application/json'), ('content-length', str(len(data)))]
+            self.conn.send_headers(stream_id, response_headers)
+            self.conn.send_data(stream_id, data, end_stream=True)
+        self.transport.write(self.conn.data_to_send())
+
+
+class APNsStub:
+    """
+    Run the stub on a random local port for the duration of a ``with`` block.
+
+    When ``public_key`` is given, provider tokens must be ES256 JWTs signed
+    by the matching key; tokens added to ``expired_tokens`` are answered
+    with 403 ExpiredProviderToken.
+    """
+
+    def __init__(self, latency=0.0, public_key=None, max_concurrent_streams=1000):
+        self.latency = latency
+        self.public_key = public_key
+        self.max_concurrent_streams = max_concurrent_streams
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = []
+        self.provider_tokens = set()
+        self.expired_tokens = set()
+
+    def __enter__(self):
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        self.server = asyncio.run_coroutine_threadsafe(
+            self.loop.create_server(lambda: APNsStubProtocol(self), '127.0.0.1', 0), self.loop
+        ).result()
+        self.url = f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.close()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def handle(self, headers, payload):
+        self.requests.append((headers, payload))
+        if self.public_key is not None:
+            token = headers.get('authorization', '').removeprefix('bearer ')
+            if token in self.expired_tokens:
+                return 403, {'reason': 'ExpiredProviderToken'}
+            try:
+                # iat is not checked so tests can move the sender's clock forward
+                jwt.decode(token, self.public_key, algorithms=['ES256'], options={'verify_iat': False})
+            except jwt.InvalidTokenError:
+                return 403, {'reason': 'InvalidProviderToken'}
+            self.provider_tokens.add(token)
+
+        if headers[':path'].removeprefix('/3/device/').startswith('invalid'):
+            return 410, {'reason': 'Unregistered', 'timestamp': 0}
+        return 200, None
@@ -0,0 +1,142 @@
+"""
+Local stand-in for the Google OAuth2 token endpoint and the FCM HTTP v1
+API, used by the tests and benchmarks/bench_fcm_v1.py.
+
+Tokens starting with ``invalid`` are answered with UNREGISTERED, like a
+device that uninstalled the app.
+"""
+import itertools
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+SEND_PATH = re.compile(r'^/v1/projects/(?P<project>[^/]+)/messages:send$')
+
+
+class FCMStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, don't let Nagle hold the body
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        stub = self.server.stub
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        if self.path == '/token':
+            return self.respond(200, stub.issue_token(parse_qs(body.decode())['assertion'][0]))
+
+        match = SEND_PATH.match(self.path)
+        if match is None:
+            return self.respond(404, {'error': {'code': 404, 'status': 'NOT_FOUND'}})
+        if stub.latency:
+            time.sleep(stub.latency)
+
+        token = self.headers.get('Authorization', '').removeprefix('Bearer ')
+        if token not in stub.valid_tokens:
+            return self.respond(401, {'error': {'code': 401, 'status': 'UNAUTHENTICATED'}})
+
+        message = json.loads(body)['message']
+        stub.messages.append(message)
+        if message['token'].startswith('invalid'):
+            return self.respond(404, {'error': {
+                'code': 404,
+                'status': 'NOT_FOUND',
+                'details': [{
+                    '@type': 'type.googleapis.com/google.firebase.fcm.v1.FcmError',
+                    'errorCode': 'UNREGISTERED'
+                }]
+            }})
+        return self.respond(200, {'name': f"projects/{match['project']}/messages/{next(stub.message_ids)}"})
+
+    def respond(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FCMStubServer(ThreadingHTTPServer):
+    # Async clients open many connections at once, don't drop their SYNs
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+class FCMStub:
+    """
+    Run the stub on a random local port for the duration of a ``with`` block.
+
+    ``latency`` delays every send to mimic the round trip to Google;
+    ``expires_in`` is the lifetime of the access tokens it issues.
+    """
+
+    def __init__(self, latency=0.0, expires_in=3600, project_id='stub-project'):
+        self.latency = latency
+        self.expires_in = expires_in
+        self.project_id = project_id
+        self.private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.valid_tokens = set()
+        self.token_requests = 0
+        self.messages = []
+        self.message_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self.server = FCMStubServer(('127.0.0.1', 0), FCMStubHandler)
+        self.server.stub = self
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def service_account(self):
+        """Service-account JSON whose token_uri points at this stub."""
+        return {
+            'type': 'service_account',
+            'project_id': self.project_id,
+            'private_key_id': 'stub-key',
+            'private_key': self.private_key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption()
+            ).decode(),
+            'client_email': f'push@{self.project_id}.iam.gserviceaccount.com',
+            'token_uri': f'{self.url}/token',
+        }
+
+    def issue_token(self, assertion):
+        # Rejects assertions that were not signed with the service-account key;
+        # iat is not checked so tests can move the sender's clock forward
+        claims = jwt.decode(
+            assertion,
+            self.private_key.public_key(),
+            algorithms=['RS256'],
+            audience=f'{self.url}/token',
+            options={'verify_iat': False}
+        )
+        with self._lock:
+            self.token_requests += 1
+            token = f"stub-token-{self.token_requests}"
+            self.valid_tokens.add(token)
+        return {
+            'access_token': token,
+            'expires_in': self.expires_in,
+            'token_type': 'Bearer',
+            'scope': claims['scope'],
+        }
+
+    def revoke_tokens(self):
+        self.valid_tokens.clear()
@@ -0,0 +1,95 @@
+import tempfile
+import time
+from unittest import mock
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from django.test import TestCase, override_settings
+from ..models import App, Device, SendLog
+from ..tasks.push_tasks import deliver_send_logs
+from ..utils import apns_sender
+from ..utils.invalid_tokens import invalid_token_sink
+from .apns_stub import APNsStub
+
+
+class APNsSenderTest(TestCase):
+    def setUp(self):
+        apns_sender.provider_tokens.clear()
+        invalid_token_sink.clear()
+        signing_key = ec.generate_private_key(ec.SECP256R1())
+        self.stub = APNsStub(latency=0.05, public_key=signing_key.public_key()).__enter__()
+        self.addCleanup(self.stub.__exit__, None, None, None)
+
+        key_file = tempfile.NamedTemporaryFile('wb', suffix='.p8')
+        key_file.write(signing_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        ))
+        key_file.flush()
+        self.addCleanup(key_file.close)
+
+        overrides = override_settings(
+            APNS_HOST=self.stub.url,
+            APNS_TOPIC='com.example.app',
+            APNS_AUTH_KEY_PATH=key_file.name,
+            APNS_KEY_ID='ABC123DEFG',
+            APNS_TEAM_ID='TEAM123456',
+            APNS_TOKEN_TTL=3000,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_concurrent_pushes_share_one_connection(self):
+        messages = [(f'token_{i}', 'Hi', 'Body', {'order_id': i}) for i in range(50)]
+
+        results = apns_sender.send_apns_many(messages)
+
+        self.assertTrue(all(result['success'] for result in results))
+        self.assertEqual(self.stub.connections, 1)
+        self.assertGreater(self.stub.max_in_flight, 1)
+        # One provider token signed for the whole batch
+        self.assertEqual(len(self.stub.provider_tokens), 1)
+        self.assertEqual(self.stub.requests[0][0]['apns-topic'], 'com.example.app')
+
+    def test_provider_token_is_rotated_after_ttl(self):
+        apns_sender.send_apns_notification_with_auth_key('token_1', 'Hi', 'Body')
+
+        later = time.time() + 3000
+        with mock.patch('api.utils.apns_sender.time') as mock_time:
+            mock_time.time.return_value = later
+            apns_sender.send_apns_notification_with_auth_key('token_1', 'Hi', 'Body')
+            apns_sender.send_apns_notification_with_auth_key('token_1', 'Hi', 'Body')
+
+        self.assertEqual(len(self.stub.provider_tokens), 2)
+
+    def test_expired_provider_token_is_replaced(self):
+        apns_sender.send_apns_notification('token_1', 'Hi', 'Body')
+        self.stub.expired_tokens.update(self.stub.provider_tokens)
+
+        later = time.time() + 1
+        with mock.patch('api.utils.apns_sender.time') as mock_time:
+            mock_time.time.return_value = later
+            result = apns_sender.send_apns_notification('token_1', 'Hi', 'Body')
+
+        self.assertTrue(result['success'])
+        self.assertEqual(len(self.stub.provider_tokens), 2)
+
+    def test_results_map_back_to_send_logs(self):
+        app = App.objects.create(name='Test App', app_key='apns_key')
+        for token in ['token_1', 'invalid_2']:
+            device = Device.objects.create(app=app, user_identifier=token, platform='ios', device_token=token)
+            SendLog.objects.create(app=app, device=device, notification_type='welcome', title='Hi', body='Body', raw_request={})
+        send_logs = list(SendLog.objects.select_related('device__app'))
+
+        deliver_send_logs(send_logs)
+
+        statuses = {
+            send_log.device.device_token: (send_log.status, send_log.error_message)
+            for send_log in SendLog.objects.select_related('device')
+        }
+        self.assertEqual(statuses, {
+            'token_1': ('sent', ''),
+            'invalid_2': ('failed', 'APNs error: Unregistered'),
+        })
+        self.assertEqual(invalid_token_sink.flush(), {app.id: 1})
+        self.assertFalse(Device.objects.get(device_token='invalid_2').is_active)
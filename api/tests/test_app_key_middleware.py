@@ -0,0 +1,51 @@
+from django.test import TestCase, RequestFactory
+from ..middleware.app_key_middleware import AppKeyMiddleware
+from ..middleware.app_key_cache import app_key_cache
+from ..models import App
+
+
+class AppKeyMiddlewareTest(TestCase):
+    def setUp(self):
+        app_key_cache.clear()
+        self.factory = RequestFactory()
+        self.middleware = AppKeyMiddleware(lambda request: None)
+        self.app = App.objects.create(name='Test App', app_key='middleware_key')
+
+    def process(self, app_key):
+        request = self.factory.get('/api/templates/', HTTP_X_APP_KEY=app_key)
+        return request, self.middleware.process_request(request)
+
+    def test_resolved_app_is_cached(self):
+        with self.assertNumQueries(1):
+            self.process('middleware_key')
+        with self.assertNumQueries(0):
+            request, response = self.process('middleware_key')
+
+        self.assertIsNone(response)
+        self.assertEqual(request.app.id, self.app.id)
+
+    def test_unknown_keys_are_negatively_cached(self):
+        with self.assertNumQueries(1):
+            _, response = self.process('unknown_key')
+        with self.assertNumQueries(0):
+            _, cached_response = self.process('unknown_key')
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(cached_response.status_code, 401)
+
+    def test_saving_app_invalidates_entry(self):
+        self.process('middleware_key')
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.app.is_active = False
+            self.app.save()
+            # Re-cached by a concurrent request before the commit
+            app_key_cache.set('middleware_key', self.app)
+        self.assertEqual(len(callbacks), 1)
+
+        _, response = self.process('middleware_key')
+        self.assertEqual(response.status_code, 401)
+
+    def test_skip_paths_need_no_key(self):
+        request = self.factory.get('/admin/login/')
+        self.assertIsNone(self.middleware.process_request(request))
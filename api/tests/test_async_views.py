@@ -0,0 +1,57 @@
+from unittest import mock
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from ..models import App, Template, SendLog
+
+
+class AsyncNotificationViewTest(TestCase):
+    def setUp(self):
+        self.app = App.objects.create(name='Test App', app_key='async_test_key')
+        Template.objects.create(
+            app=self.app,
+            name='welcome',
+            title_template='Welcome $name!',
+            body_template='Hello $name',
+            is_active=True
+        )
+
+    @mock.patch('api.views.async_notification_views.send_push_notification_task.apply_async')
+    async def test_async_send(self, mock_apply_async):
+        response = await self.async_client.post(
+            reverse('async-send-notification'),
+            data={
+                'notification_type': 'welcome',
+                'device_token': 'async_token',
+                'platform': 'android',
+                'user': {'id': 'user_1', 'name': 'Jane'}
+            },
+            content_type='application/json',
+            headers={'X-App-Key': self.app.app_key}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        send_log = await SendLog.objects.aget(id=response.json()['data']['send_log_id'])
+        self.assertEqual(send_log.title, 'Welcome Jane!')
+        mock_apply_async.assert_called_once()
+
+    @mock.patch('api.utils.bulk_ingest.group')
+    async def test_async_bulk(self, mock_group):
+        response = await self.async_client.post(
+            reverse('async-bulk-send-notification'),
+            data={'notifications': [
+                {
+                    'notification_type': 'welcome',
+                    'device_token': f'async_token_{i}',
+                    'platform': 'ios',
+                    'user': {'id': f'user_{i}', 'name': 'Jane'}
+                }
+                for i in range(3)
+            ]},
+            content_type='application/json',
+            headers={'X-App-Key': self.app.app_key}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.json()['data']['total_processed'], 3)
+        self.assertEqual(await SendLog.objects.acount(), 3)
@@ -0,0 +1,75 @@
+from unittest import mock
+from django.test import TestCase
+from ..models import App, Device, Template, SendLog
+from ..utils.bulk_ingest import BulkIngest
+from ..utils.template_cache import template_resolver
+
+
+def make_notification(index, notification_type='welcome', platform='android'):
+    return {
+        'notification_type': notification_type,
+        'device_token': f'token_{index}',
+        'platform': platform,
+        'user': {'id': f'user_{index}', 'name': f'User {index}'},
+        'data': {}
+    }
+
+
+@mock.patch('api.utils.bulk_ingest.group')
+class BulkIngestTest(TestCase):
+    def setUp(self):
+        template_resolver.clear()
+        self.app = App.objects.create(name='Test App', app_key='bulk_test_key')
+        Template.objects.create(
+            app=self.app,
+            name='welcome',
+            title_template='Welcome $name!',
+            body_template='Hello $name',
+            is_active=True
+        )
+
+    def test_queries_do_not_grow_with_batch_size(self, mock_group):
+        small = [make_notification(i) for i in range(2)]
+        large = [make_notification(i) for i in range(2, 52)]
+
+        # existing devices, new devices, re-read, template, savepoint + insert + release
+        with self.assertNumQueries(7):
+            BulkIngest(self.app, small).run()
+        # the template is now served from the cache
+        with self.assertNumQueries(6):
+            results = BulkIngest(self.app, large).run()
+
+        self.assertTrue(all(result['success'] for result in results))
+        self.assertEqual(SendLog.objects.count(), 52)
+        self.assertEqual(Device.objects.filter(app=self.app).count(), 52)
+        mock_group.return_value.apply_async.assert_called()
+
+    def test_results_keep_request_order(self, mock_group):
+        notifications = [
+            make_notification(1),
+            {'notification_type': 'welcome', 'platform': 'android'},
+            make_notification(2, notification_type='missing'),
+        ]
+
+        results = BulkIngest(self.app, notifications).run()
+
+        self.assertTrue(results[0]['success'])
+        self.assertEqual(results[0]['data']['send_log_id'], str(SendLog.objects.get().id))
+        self.assertEqual(results[1]['message'], 'Invalid notification data')
+        self.assertEqual(results[2]['message'], 'Template "missing" not found')
+
+    def test_broker_failure_marks_logs_failed(self, mock_group):
+        mock_group.return_value.apply_async.side_effect = ConnectionError('broker down')
+
+        results = BulkIngest(self.app, [make_notification(1)]).run()
+
+        self.assertFalse(results[0]['success'])
+        self.assertEqual(SendLog.objects.get().status, 'failed')
+
+    def test_messages_are_routed_by_priority(self, mock_group):
+        urgent = dict(make_notification(1), priority='high')
+
+        BulkIngest(self.app, [urgent, make_notification(2)], default_priority='bulk').run()
+
+        signatures = mock_group.call_args.args[0]
+        self.assertEqual([signature.options['queue'] for signature in signatures], ['push_high', 'push_bulk'])
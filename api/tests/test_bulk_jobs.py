@@ -0,0 +1,121 @@
+import json
+from unittest import mock
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from ..models import App, Template, BulkJob, BulkJobChunk, SendLog
+from ..tasks.bulk_tasks import process_bulk_job_chunk
+
+
+@override_settings(BULK_JOB_CHUNK_SIZE=2)
+@mock.patch('api.utils.bulk_ingest.group')
+class BulkJobViewTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.app = App.objects.create(name='Test App', app_key='bulk_job_key')
+        self.client.defaults['HTTP_X_APP_KEY'] = self.app.app_key
+        Template.objects.create(
+            app=self.app,
+            name='welcome',
+            title_template='Welcome $name!',
+            body_template='Hello $name',
+            is_active=True
+        )
+
+    def post_lines(self, lines):
+        with mock.patch('api.views.bulk_job_views.process_bulk_job_chunk.delay') as mock_delay:
+            response = self.client.post(
+                reverse('bulk-job-create'),
+                data='\n'.join(lines),
+                content_type='application/x-ndjson'
+            )
+        return response, mock_delay
+
+    def test_body_is_split_into_chunks(self, mock_group):
+        lines = [
+            json.dumps({
+                'notification_type': 'welcome',
+                'device_token': f'token_{i}',
+                'platform': 'android',
+                'user': {'id': f'user_{i}', 'name': 'Jane'}
+            })
+            for i in range(5)
+        ]
+        lines.insert(2, '{not json')
+
+        response, mock_delay = self.post_lines(lines)
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job = BulkJob.objects.get(id=response.data['data']['job_id'])
+        self.assertEqual(job.total_received, 6)
+        self.assertEqual(job.total_chunks, 3)
+        self.assertEqual(job.failed, 1)
+        self.assertEqual(mock_delay.call_count, 3)
+
+        for chunk_id, in (call.args for call in mock_delay.call_args_list):
+            process_bulk_job_chunk(chunk_id)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.queued, 5)
+        self.assertEqual(job.processed, 5)
+
+        detail = self.client.get(reverse('bulk-job-detail', kwargs={'pk': job.id}))
+        self.assertEqual(detail.status_code, status.HTTP_200_OK)
+        self.assertEqual(detail.data['data']['errors'][0]['line'], 3)
+
+    def test_chunk_redelivery_is_ignored(self, mock_group):
+        response, mock_delay = self.post_lines([json.dumps({
+            'notification_type': 'welcome',
+            'device_token': 'token_1',
+            'platform': 'android',
+            'user': {'id': 'user_1'}
+        })])
+        chunk_id = mock_delay.call_args.args[0]
+
+        process_bulk_job_chunk(chunk_id)
+        process_bulk_job_chunk(chunk_id)
+
+        job = BulkJob.objects.get(id=response.data['data']['job_id'])
+        self.assertEqual(job.processed, 1)
+        self.assertEqual(BulkJobChunk.objects.get(id=chunk_id).payload, [])
+
+    def post_one(self):
+        response, mock_delay = self.post_lines([json.dumps({
+            'notification_type': 'welcome',
+            'device_token': 'token_1',
+            'platform': 'android',
+            'user': {'id': 'user_1'}
+        })])
+        return BulkJob.objects.get(id=response.data['data']['job_id']), mock_delay.call_args.args[0]
+
+    def test_messages_are_published_once_the_chunk_commits(self, mock_group):
+        depths = []
+        mock_group.return_value.apply_async.side_effect = lambda: depths.append(len(connection.atomic_blocks))
+        job, chunk_id = self.post_one()
+
+        process_bulk_job_chunk(chunk_id)
+
+        # Published outside the chunk's transaction (the test's own blocks only)
+        self.assertEqual(depths, [len(connection.atomic_blocks)])
+
+    def test_unpublished_lines_count_as_failed(self, mock_group):
+        mock_group.return_value.apply_async.side_effect = ConnectionError('down')
+        job, chunk_id = self.post_one()
+
+        process_bulk_job_chunk(chunk_id)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.queued, job.failed), ('completed', 0, 1))
+        self.assertEqual(SendLog.objects.get().status, 'failed')
+        self.assertEqual(BulkJobChunk.objects.get(id=chunk_id).errors[0]['line'], 1)
+
+    def test_other_apps_cannot_read_job(self, mock_group):
+        other_app = App.objects.create(name='Other App', app_key='other_key')
+        job = BulkJob.objects.create(app=other_app)
+
+        response = self.client.get(reverse('bulk-job-detail', kwargs={'pk': job.id}))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
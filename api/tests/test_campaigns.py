@@ -0,0 +1,189 @@
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from ..models import App, Device, Template, SendLog, Campaign, CampaignChunk
+from ..tasks.campaign_tasks import dispatch_campaign, process_campaign_chunk, resume_stalled_campaign_chunks
+from ..tasks.push_tasks import deliver_send_logs, send_push_batch_task
+from ..utils.template_cache import template_resolver
+
+
+class CampaignTestMixin:
+    def setUp(self):
+        template_resolver.clear()
+        self.app = App.objects.create(name='Test App', app_key='campaign_key')
+        Template.objects.create(
+            app=self.app,
+            name='promo',
+            title_template='Hi $id',
+            body_template='$offer on $platform',
+            is_active=True
+        )
+        for i in range(5):
+            Device.objects.create(
+                app=self.app,
+                user_identifier=f'user_{i}',
+                platform='android' if i % 2 else 'ios',
+                device_token=f'token_{i}'
+            )
+        Device.objects.filter(user_identifier='user_4').update(is_active=False)
+
+
+class CampaignViewTest(CampaignTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.defaults['HTTP_X_APP_KEY'] = self.app.app_key
+
+    @mock.patch('api.views.campaign_views.dispatch_campaign.delay')
+    def test_create_and_poll(self, mock_delay):
+        response = self.client.post(reverse('campaign-list'), data={
+            'name': 'Spring sale',
+            'notification_type': 'promo',
+            'context': {'offer': '20% off'}
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        campaign_id = response.data['data']['campaign_id']
+        mock_delay.assert_called_once_with(campaign_id)
+
+        response = self.client.get(reverse('campaign-detail', args=[campaign_id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data']['status'], 'pending')
+        self.assertEqual(response.data['data']['template_version'], 1)
+
+    def test_unknown_template(self):
+        response = self.client.post(reverse('campaign-list'), data={
+            'name': 'Spring sale',
+            'notification_type': 'missing'
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Campaign.objects.exists())
+
+
+@override_settings(CAMPAIGN_CHUNK_SIZE=2)
+class CampaignTaskTest(CampaignTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.campaign = Campaign.objects.create(
+            app=self.app,
+            name='Spring sale',
+            notification_type='promo',
+            template=Template.objects.get(),
+            context={'offer': '20% off'}
+        )
+
+    @mock.patch('api.tasks.push_tasks.send_apns_notification', return_value={'success': True})
+    @mock.patch('api.tasks.push_tasks.send_fcm_notification', return_value={'success': False, 'error': 'Unregistered'})
+    def test_devices_are_paged_into_chunks(self, mock_fcm, mock_apns):
+        with mock.patch('api.tasks.campaign_tasks.process_campaign_chunk.delay') as mock_delay:
+            dispatch_campaign(str(self.campaign.id))
+
+        chunks = list(CampaignChunk.objects.order_by('sequence'))
+        self.assertEqual(len(chunks), 2)
+        self.assertIsNone(chunks[0].after_device_id)
+        self.assertEqual(chunks[1].after_device_id, chunks[0].last_device_id)
+        self.assertEqual(mock_delay.call_count, 2)
+
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, 'processing')
+        self.assertEqual(self.campaign.total_devices, 4)
+
+        for chunk in chunks:
+            process_campaign_chunk(str(chunk.id))
+        # Redelivered messages are ignored
+        process_campaign_chunk(str(chunks[0].id))
+
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, 'completed')
+        self.assertEqual((self.campaign.processed, self.campaign.sent, self.campaign.failed), (4, 2, 2))
+        self.assertEqual(SendLog.objects.count(), 4)
+        self.assertEqual(
+            SendLog.objects.get(device__user_identifier='user_0').body,
+            '20% off on ios'
+        )
+
+    @mock.patch('api.tasks.push_tasks.send_push_batch_task.apply_async')
+    @mock.patch('api.tasks.push_tasks.send_apns_notification', return_value={'success': True})
+    @mock.patch('api.tasks.push_tasks.send_fcm_notification', side_effect=ConnectionError('reset'))
+    def test_retried_notifications_are_counted_once_final(self, mock_fcm, mock_apns, mock_apply_async):
+        with mock.patch('api.tasks.campaign_tasks.process_campaign_chunk.delay'):
+            dispatch_campaign(str(self.campaign.id))
+        for chunk in CampaignChunk.objects.all():
+            process_campaign_chunk(str(chunk.id))
+
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, 'processing')
+        self.assertEqual((self.campaign.processed_chunks, self.campaign.sent, self.campaign.failed), (2, 2, 0))
+        self.assertEqual(SendLog.objects.filter(status='retrying').count(), 2)
+
+        mock_fcm.side_effect = None
+        mock_fcm.return_value = {'success': True}
+        for call in mock_apply_async.call_args_list:
+            send_push_batch_task.apply(kwargs=call.kwargs['kwargs'])
+
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, 'completed')
+        self.assertEqual((self.campaign.sent, self.campaign.failed), (4, 0))
+
+    @mock.patch('api.tasks.push_tasks.send_apns_notification', return_value={'success': True})
+    @mock.patch('api.tasks.push_tasks.send_fcm_notification', return_value={'success': True})
+    def test_interrupted_chunk_is_resumed(self, mock_fcm, mock_apns):
+        with mock.patch('api.tasks.campaign_tasks.process_campaign_chunk.delay'):
+            dispatch_campaign(str(self.campaign.id))
+        chunk = CampaignChunk.objects.get(sequence=0)
+        # The worker died after logging the chunk, before delivering it
+        with mock.patch('api.tasks.campaign_tasks.deliver_send_logs', side_effect=SystemExit):
+            with self.assertRaises(SystemExit):
+                process_campaign_chunk(str(chunk.id))
+        chunk.refresh_from_db()
+        self.assertEqual((chunk.status, len(chunk.send_log_ids)), ('delivering', 2))
+
+        CampaignChunk.objects.update(updated_at=chunk.updated_at - timedelta(hours=1))
+        with mock.patch('api.tasks.campaign_tasks.process_campaign_chunk.delay') as mock_delay:
+            self.assertEqual(resume_stalled_campaign_chunks()['resumed'], 2)
+            self.assertEqual(resume_stalled_campaign_chunks()['resumed'], 0)
+        for call in mock_delay.call_args_list:
+            process_campaign_chunk(*call.args)
+
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, 'completed')
+        self.assertEqual((self.campaign.processed, self.campaign.sent, self.campaign.failed), (4, 4, 0))
+        self.assertEqual(SendLog.objects.count(), 4)
+
+    @mock.patch('api.tasks.push_tasks.send_apns_notification', return_value={'success': True})
+    @mock.patch('api.tasks.push_tasks.send_fcm_notification', return_value={'success': True})
+    def test_chunk_being_delivered_is_not_sent_twice(self, mock_fcm, mock_apns):
+        with mock.patch('api.tasks.campaign_tasks.process_campaign_chunk.delay'):
+            dispatch_campaign(str(self.campaign.id))
+        chunk = CampaignChunk.objects.get(sequence=0)
+        resumed = []
+
+        def slow_delivery(send_logs, queue=None):
+            # A redelivered message and the reaper run while this worker is still sending
+            resumed.append(process_campaign_chunk(str(chunk.id)))
+            with mock.patch('api.tasks.campaign_tasks.process_campaign_chunk.delay') as mock_delay:
+                resume_stalled_campaign_chunks()
+            resumed.append(mock_delay.call_count)
+            return deliver_send_logs(send_logs, queue=queue)
+
+        CampaignChunk.objects.update(updated_at=chunk.updated_at - timedelta(hours=1))
+        with mock.patch('api.tasks.campaign_tasks.deliver_send_logs', side_effect=slow_delivery):
+            process_campaign_chunk(str(chunk.id))
+
+        # Only the other chunk, never started, was queued again
+        self.assertEqual(resumed, [{'success': True, 'delivered': 0}, 1])
+        self.assertEqual(mock_fcm.call_count + mock_apns.call_count, 2)
+        self.campaign.refresh_from_db()
+        self.assertEqual((self.campaign.processed_chunks, self.campaign.sent), (1, 2))
+
+    def test_empty_campaign_completes(self):
+        Device.objects.update(is_active=False)
+
+        dispatch_campaign(str(self.campaign.id))
+
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, 'completed')
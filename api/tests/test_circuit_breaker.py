@@ -0,0 +1,200 @@
+import asyncio
+from unittest import mock
+from django.test import SimpleTestCase, TestCase, override_settings
+from ..models import App, Device, SendLog
+from ..tasks.push_tasks import deliver_send_logs
+from ..utils.adaptive_concurrency import AsyncConcurrencyLimit, ConcurrencyLimit
+from ..utils.circuit_breaker import CircuitBreaker, circuit_breaker, parse_retry_after
+
+FAILURE = {'success': False, 'error': 'Service unavailable', 'status_code': 503}
+SUCCESS = {'success': True, 'response': 'ok', 'status_code': 200}
+
+
+@override_settings(
+    CIRCUIT_WINDOW=30,
+    CIRCUIT_MIN_REQUESTS=4,
+    CIRCUIT_FAILURE_RATIO=0.5,
+    CIRCUIT_OPEN_SECONDS=30,
+    CIRCUIT_MAX_OPEN_SECONDS=600,
+    CIRCUIT_PROBE_INTERVAL=5,
+)
+@mock.patch('api.utils.circuit_breaker.get_redis', return_value=None)
+class CircuitBreakerTest(SimpleTestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker()
+        self.now = 1000.0
+        clock = mock.patch('api.utils.circuit_breaker.time.time', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def test_opens_on_failure_ratio(self, mock_redis):
+        self.breaker.record('fcm', 'app', [SUCCESS, FAILURE])
+        # Below CIRCUIT_MIN_REQUESTS nothing trips
+        self.assertTrue(self.breaker.allow('fcm', 'app')[0])
+
+        self.assertEqual(self.breaker.record('fcm', 'app', [FAILURE, FAILURE]), 'open')
+        allowed, retry_in, _ = self.breaker.allow('fcm', 'other_app')
+        # A provider-wide outage blocks every app, other providers are untouched
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(retry_in, 30.0)
+        self.assertTrue(self.breaker.allow('apns', 'app')[0])
+
+    def test_failures_outside_the_window_are_forgotten(self, mock_redis):
+        self.breaker.record('fcm', 'app', [FAILURE] * 3)
+        self.now += 31
+        self.assertEqual(self.breaker.record('fcm', 'app', [FAILURE, SUCCESS]), 'closed')
+
+    def test_bad_tokens_are_not_provider_failures(self, mock_redis):
+        unregistered = {'success': False, 'error': 'UNREGISTERED', 'invalid_token': True, 'status_code': 404}
+        self.assertEqual(self.breaker.record('fcm', 'app', [unregistered] * 10), 'closed')
+
+    def test_throttled_app_opens_for_retry_after(self, mock_redis):
+        throttled = {'success': False, 'error': 'QUOTA_EXCEEDED', 'status_code': 429, 'retry_after': 120.0}
+        self.assertEqual(self.breaker.record('fcm', 'app', [throttled]), 'open')
+
+        allowed, retry_in, _ = self.breaker.allow('fcm', 'app')
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(retry_in, 120.0)
+        # Only the throttled app waits
+        self.assertTrue(self.breaker.allow('fcm', 'other_app')[0])
+
+    def test_half_open_probe(self, mock_redis):
+        self.breaker.record('apns', 'app', [FAILURE] * 4)
+        self.now += 30
+
+        send, park, delay = self.breaker.admit('apns', 'app', ['a', 'b', 'c'])
+        self.assertEqual((send, park, delay), (['a'], ['b', 'c'], 5))
+        # One probe per CIRCUIT_PROBE_INTERVAL
+        self.assertFalse(self.breaker.allow('apns', 'app')[0])
+
+        # The probe failed: open again for twice as long
+        self.assertEqual(self.breaker.record('apns', 'app', [FAILURE]), 'open')
+        allowed, retry_in, _ = self.breaker.allow('apns', 'app')
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(retry_in, 60.0)
+
+        self.now += 60
+        self.assertTrue(self.breaker.allow('apns', 'app')[2])
+        self.assertEqual(self.breaker.record('apns', 'app', [SUCCESS]), 'closed')
+        self.assertEqual(self.breaker.allow('apns', 'app'), (True, 0.0, False))
+
+    def test_throttling_does_not_trip_the_provider(self, mock_redis):
+        throttled = {'success': False, 'error': 'QUOTA_EXCEEDED', 'status_code': 429}
+        self.assertEqual(self.breaker.record('fcm', 'app', [throttled] * 4), 'open')
+
+        self.assertFalse(self.breaker.allow('fcm', 'app')[0])
+        self.assertEqual(self.breaker.allow('fcm', 'other_app'), (True, 0.0, False))
+
+    def test_probe_is_kept_when_the_app_is_open(self, mock_redis):
+        throttled = {'success': False, 'error': 'QUOTA_EXCEEDED', 'status_code': 429, 'retry_after': 120.0}
+        self.breaker.record('fcm', 'throttled_app', [throttled])
+        self.breaker.record('fcm', 'app', [FAILURE] * 4)
+        self.now += 30
+
+        # The provider is half-open but the throttled app still waits
+        self.assertFalse(self.breaker.allow('fcm', 'throttled_app')[0])
+        self.assertEqual(self.breaker.allow('fcm', 'other_app'), (True, 0.0, True))
+
+
+class ParseRetryAfterTest(SimpleTestCase):
+    def test_seconds_and_http_date(self):
+        self.assertEqual(parse_retry_after('120'), 120.0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after('soon'))
+        with mock.patch('api.utils.circuit_breaker.time.time', return_value=784111717.0):
+            self.assertEqual(parse_retry_after('Sun, 06 Nov 1994 08:49:37 GMT'), 60.0)
+
+
+@override_settings(
+    FCM_V1_CONCURRENCY=8,
+    ADAPTIVE_CONCURRENCY_TARGET_LATENCY=1.0,
+    ADAPTIVE_CONCURRENCY_BACKOFF=0.5,
+    ADAPTIVE_CONCURRENCY_MIN=1,
+)
+class AdaptiveConcurrencyTest(SimpleTestCase):
+    def test_backs_off_once_per_burst_and_recovers(self):
+        limit = ConcurrencyLimit('FCM_V1_CONCURRENCY')
+        started = [limit.acquire() for _ in range(8)]
+        for start in started:
+            limit.release(start, failed=True)
+        # A burst of failures in flight halves the limit once
+        self.assertEqual(limit.limit, 4)
+
+        for _ in range(40):
+            limit.release(limit.acquire())
+        self.assertEqual(limit.limit, 8)
+
+    def test_slow_responses_back_off(self):
+        limit = ConcurrencyLimit('FCM_V1_CONCURRENCY')
+        limit.release(limit.acquire() - 2.0)
+        self.assertEqual(limit.limit, 4)
+
+    async def test_async_waiters_get_freed_slots_in_order(self):
+        with override_settings(FCM_V1_CONCURRENCY=1):
+            limit = AsyncConcurrencyLimit('FCM_V1_CONCURRENCY')
+            first = await limit.acquire()
+            order = []
+
+            async def wait(name):
+                started = await limit.acquire()
+                order.append(name)
+                limit.release(started)
+
+            waiters = [asyncio.create_task(wait(name)) for name in ('a', 'b')]
+            await asyncio.sleep(0)
+            self.assertEqual(order, [])
+            limit.release(first)
+            await asyncio.gather(*waiters)
+        self.assertEqual(order, ['a', 'b'])
+
+
+@mock.patch('api.utils.circuit_breaker.get_redis', return_value=None)
+class ParkingTest(TestCase):
+    def setUp(self):
+        circuit_breaker.clear()
+        self.addCleanup(circuit_breaker.clear)
+        self.app = App.objects.create(name='Test App', app_key='circuit_key')
+
+    def create_send_logs(self, count):
+        send_logs = []
+        for i in range(count):
+            device = Device.objects.create(
+                app=self.app, user_identifier=f'user_{i}', platform='android', device_token=f'token_{i}'
+            )
+            SendLog.objects.create(
+                app=self.app, device=device, notification_type='welcome', title='Hi', body='Body', raw_request={}
+            )
+        return list(SendLog.objects.select_related('device__app'))
+
+    @override_settings(CIRCUIT_MIN_REQUESTS=2, CIRCUIT_OPEN_SECONDS=30)
+    def test_open_circuit_parks_without_sending(self, mock_redis):
+        circuit_breaker.record('fcm', self.app.id, [FAILURE, FAILURE])
+        sender = mock.Mock()
+
+        with mock.patch('api.tasks.push_tasks.batch_senders', return_value={'android': sender}), \
+                mock.patch('api.tasks.push_tasks.send_push_batch_task.apply_async') as apply_async:
+            retry_ids = deliver_send_logs(self.create_send_logs(3), queue='push_bulk')
+
+        self.assertEqual(retry_ids, [])
+        sender.assert_not_called()
+        apply_async.assert_called_once()
+        self.assertEqual(len(apply_async.call_args.kwargs['kwargs']['send_log_ids']), 3)
+        self.assertEqual(apply_async.call_args.kwargs['queue'], 'push_bulk')
+        self.assertGreaterEqual(apply_async.call_args.kwargs['countdown'], 29)
+        self.assertEqual(SendLog.objects.filter(status='pending', error_message='Parked: fcm circuit open').count(), 3)
+
+    @override_settings(PUSH_ETA_MAX_DELAY=300)
+    def test_retry_after_parks_the_throttled_logs(self, mock_redis):
+        throttled = {'success': False, 'error': 'QUOTA_EXCEEDED', 'status_code': 429, 'retry_after': 90.0}
+        sender = mock.Mock(return_value=[SUCCESS, throttled])
+
+        with mock.patch('api.tasks.push_tasks.batch_senders', return_value={'android': sender}), \
+                mock.patch('api.tasks.push_tasks.send_push_batch_task.apply_async') as apply_async:
+            deliver_send_logs(self.create_send_logs(2))
+
+        statuses = sorted(SendLog.objects.values_list('status', flat=True))
+        self.assertEqual(statuses, ['pending', 'sent'])
+        self.assertEqual(len(apply_async.call_args.kwargs['kwargs']['send_log_ids']), 1)
+        self.assertGreaterEqual(apply_async.call_args.kwargs['countdown'], 90)
+        # The app is throttled until then
+        self.assertFalse(circuit_breaker.allow('fcm', self.app.id)[0])
@@ -0,0 +1,62 @@
+from unittest import mock
+from django.test import TestCase, override_settings
+from ..models import App
+from ..tasks.push_tasks import send_android_many
+from ..utils.credentials import credential_registry
+
+MESSAGES = [('token_1', 'Hi', 'Body', {})]
+
+
+@override_settings(
+    FCM_SERVER_KEY='global_key',
+    FCM_SERVICE_ACCOUNT_FILE='',
+    APNS_HOST='https://api.push.apple.com',
+    APNS_TOPIC='com.example.app',
+    APNS_CERT_PATH='/etc/apns/global.pem',
+    APNS_AUTH_KEY_PATH='',
+)
+class CredentialRegistryTest(TestCase):
+    def setUp(self):
+        credential_registry.clear()
+        self.addCleanup(credential_registry.clear)
+        self.app = App.objects.create(name='Test App', app_key='credentials_key')
+
+    def test_entry_is_reused_until_the_app_changes(self):
+        credentials = credential_registry.get(self.app)
+        self.assertIs(credential_registry.get(self.app), credentials)
+
+        self.app.fcm_server_key = 'app_key'
+        self.app.save()
+
+        credentials = credential_registry.get(self.app)
+        self.assertEqual(credentials.fcm_server_key, 'app_key')
+        # Changed behind the signals' back (another process): the fingerprint differs
+        App.objects.filter(pk=self.app.pk).update(fcm_server_key='rotated_key')
+        self.app.refresh_from_db()
+        self.assertEqual(credential_registry.get(self.app).fcm_server_key, 'rotated_key')
+
+    def test_app_credentials_take_precedence(self):
+        other = App.objects.create(
+            name='Tenant', app_key='tenant_key', fcm_server_key='tenant_fcm',
+            apns_cert_path='/etc/apns/tenant.pem', apns_topic='com.tenant.app'
+        )
+
+        defaults = credential_registry.get(self.app)
+        tenant = credential_registry.get(other)
+
+        self.assertEqual(defaults.fcm_server_key, 'global_key')
+        self.assertEqual(defaults.apns_key, ('https://api.push.apple.com', '/etc/apns/global.pem', 'com.example.app'))
+        self.assertEqual(tenant.fcm_server_key, 'tenant_fcm')
+        self.assertEqual(tenant.apns_key, ('https://api.push.apple.com', '/etc/apns/tenant.pem', 'com.tenant.app'))
+
+    def test_app_server_key_is_sent_over_legacy_fcm(self):
+        other = App.objects.create(name='Tenant', app_key='tenant_key', fcm_server_key='tenant_fcm')
+
+        with override_settings(FCM_SERVICE_ACCOUNT_FILE='/etc/fcm/service-account.json'), \
+                mock.patch('api.tasks.push_tasks.send_fcm_multicast') as multicast, \
+                mock.patch('api.tasks.push_tasks.send_fcm_v1_many') as v1_many:
+            send_android_many(self.app, MESSAGES)
+            send_android_many(other, MESSAGES)
+
+        v1_many.assert_called_once_with(MESSAGES)
+        multicast.assert_called_once_with(MESSAGES, server_key='tenant_fcm')
@@ -0,0 +1,292 @@
+import asyncio
+import json
+import tempfile
+import uuid
+from datetime import timedelta
+from unittest import mock
+import httpx
+from asgiref.sync import sync_to_async
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from django.test import SimpleTestCase, TestCase, override_settings
+from kombu import Connection, Exchange, Queue
+from django.utils import timezone
+from ..models import App, DeadLetter, Device, ScheduledNotification, SendLog
+from ..tasks.scheduler_tasks import release_due_notifications
+from ..utils import apns_sender, delivery_engine, fcm_v1_sender
+from ..utils.invalid_tokens import invalid_token_sink
+from .apns_stub import APNsStub
+from .fcm_stub import FCMStub
+from .test_web_sender import make_subscription, make_vapid_key
+
+
+class DeliveryEngineTest(TestCase):
+    def setUp(self):
+        invalid_token_sink.clear()
+        self.addCleanup(invalid_token_sink.clear)
+        fcm_v1_sender.access_tokens.clear()
+        apns_sender.provider_tokens.clear()
+        self.fcm = FCMStub(latency=0.02).__enter__()
+        self.addCleanup(self.fcm.__exit__, None, None, None)
+        signing_key = ec.generate_private_key(ec.SECP256R1())
+        self.apns = APNsStub(latency=0.02, public_key=signing_key.public_key()).__enter__()
+        self.addCleanup(self.apns.__exit__, None, None, None)
+
+        service_account_file = tempfile.NamedTemporaryFile('w', suffix='.json')
+        json.dump(self.fcm.service_account(), service_account_file)
+        service_account_file.flush()
+        self.addCleanup(service_account_file.close)
+        key_file = tempfile.NamedTemporaryFile('wb', suffix='.p8')
+        key_file.write(signing_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        ))
+        key_file.flush()
+        self.addCleanup(key_file.close)
+
+        overrides = override_settings(
+            FCM_SERVICE_ACCOUNT_FILE=service_account_file.name,
+            FCM_API_URL=self.fcm.url,
+            APNS_HOST=self.apns.url,
+            APNS_TOPIC='com.example.app',
+            APNS_AUTH_KEY_PATH=key_file.name,
+            APNS_KEY_ID='ABC123DEFG',
+            APNS_TEAM_ID='TEAM123456',
+            DELIVERY_FCM_CONCURRENCY=50,
+            DELIVERY_WEB_CONCURRENCY=50,
+            DELIVERY_WRITE_BATCH=500,
+            DELIVERY_WRITE_INTERVAL=1.0,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.app = App.objects.create(
+            name='Test App',
+            app_key='engine_key',
+            web_vapid_public_key='public_key',
+            web_vapid_private_key=make_vapid_key()
+        )
+        self.push_service_requests = []
+
+    @sync_to_async
+    def create_send_logs(self, platform, tokens):
+        send_logs = []
+        for token in tokens:
+            device = Device.objects.create(app=self.app, user_identifier=token, platform=platform, device_token=token)
+            send_logs.append(SendLog.objects.create(
+                app=self.app, device=device, notification_type='welcome', title='Hi', body='Body', raw_request={}
+            ))
+        return [str(send_log.id) for send_log in send_logs]
+
+    def push_service(self, request):
+        self.push_service_requests.append(request)
+        if request.url.path.startswith('/gone'):
+            return httpx.Response(410, text='Subscription expired')
+        return httpx.Response(201)
+
+    async def start_engine(self):
+        engine = delivery_engine.DeliveryEngine()
+        await engine.start()
+        engine.providers['web'].client = httpx.AsyncClient(transport=httpx.MockTransport(self.push_service))
+        return engine
+
+    async def test_batches_are_delivered_concurrently_and_saved_together(self):
+        android_ids = await self.create_send_logs('android', [f'token_{i}' for i in range(20)] + ['invalid_android'])
+        ios_ids = await self.create_send_logs('ios', [f'apns_{i}' for i in range(20)] + ['invalid_ios'])
+        gone = make_subscription('https://push.example.com/gone')
+        web_ids = await self.create_send_logs('web', [make_subscription('https://push.example.com/ok'), gone])
+
+        engine = await self.start_engine()
+        with mock.patch.object(SendLog.objects, 'abulk_update', wraps=SendLog.objects.abulk_update) as bulk_update:
+            await asyncio.gather(*(
+                engine.handle(delivery_engine.BATCH_TASK, [], {'send_log_ids': ids, 'platform': platform})
+                for platform, ids in [('android', android_ids), ('ios', ios_ids), ('web', web_ids)]
+            ))
+        await engine.close()
+
+        # The three messages finished within one write interval
+        self.assertEqual(bulk_update.call_count, 1)
+        statuses = {
+            send_log.device.device_token: (send_log.status, send_log.error_message)
+            async for send_log in SendLog.objects.select_related('device')
+        }
+        self.assertEqual(sum(status == 'sent' for status, _ in statuses.values()), 41)
+        self.assertEqual(statuses['invalid_android'], ('failed', 'UNREGISTERED'))
+        self.assertEqual(statuses['invalid_ios'], ('failed', 'APNs error: Unregistered'))
+        self.assertTrue(statuses[gone][1].startswith('Push failed: 410'))
+        inactive = {device.device_token async for device in Device.objects.filter(is_active=False)}
+        self.assertEqual(inactive, {'invalid_android', 'invalid_ios', gone})
+
+        self.assertEqual(self.fcm.token_requests, 1)
+        self.assertEqual(self.apns.connections, 1)
+        self.assertGreater(self.apns.max_in_flight, 1)
+        self.assertEqual(len(self.push_service_requests), 2)
+        self.assertEqual(self.push_service_requests[0].headers['content-encoding'], 'aes128gcm')
+
+    async def test_single_notification_message(self):
+        [send_log_id] = await self.create_send_logs('ios', ['apns_1'])
+
+        engine = await self.start_engine()
+        await engine.handle(
+            delivery_engine.SINGLE_TASK,
+            [send_log_id, 'apns_1', 'ios', 'Hi', 'Body', {}],
+            {'subject': None}
+        )
+        await engine.close()
+
+        send_log = await SendLog.objects.aget(id=send_log_id)
+        self.assertEqual(send_log.status, 'sent')
+        self.assertIsNotNone(send_log.sent_at)
+
+    async def test_logs_that_raise_are_retried(self):
+        ids = await self.create_send_logs('android', ['token_1', 'token_2'])
+
+        engine = await self.start_engine()
+        with mock.patch.object(engine.providers['android'], 'send_many', side_effect=RuntimeError('boom')), \
+                mock.patch('api.tasks.push_tasks.send_push_batch_task.apply_async') as apply_async:
+            await engine.handle(delivery_engine.BATCH_TASK, [ids, 'android'], {}, queue='push_normal')
+        await engine.close()
+
+        self.assertEqual(
+            await SendLog.objects.filter(status='retrying', error_message='boom', retry_count=1).acount(), 2
+        )
+        apply_async.assert_called_once()
+        self.assertEqual(sorted(apply_async.call_args.kwargs['kwargs']['send_log_ids']), sorted(ids))
+        self.assertEqual(apply_async.call_args.kwargs['queue'], 'push_retry')
+
+    @override_settings(PUSH_MAX_RETRIES=1)
+    async def test_logs_out_of_retries_become_dead_letters(self):
+        ids = await self.create_send_logs('android', ['token_1'])
+        await SendLog.objects.filter(id__in=ids).aupdate(retry_count=1)
+
+        engine = await self.start_engine()
+        with mock.patch.object(engine.providers['android'], 'send_many', side_effect=RuntimeError('boom')), \
+                mock.patch('api.tasks.push_tasks.send_push_batch_task.apply_async') as apply_async:
+            await engine.handle(delivery_engine.BATCH_TASK, [ids, 'android'], {})
+        await engine.close()
+
+        apply_async.assert_not_called()
+        self.assertEqual(await SendLog.objects.filter(status='failed').acount(), 1)
+        dead_letter = await DeadLetter.objects.aget(send_log_id=ids[0])
+        self.assertEqual((dead_letter.platform, dead_letter.attempts, dead_letter.error_message), ('android', 2, 'boom'))
+
+    async def test_messages_due_later_are_moved_to_the_scheduler(self):
+        ids = await self.create_send_logs('android', ['token_1', 'token_2'])
+        eta = timezone.now() + timedelta(minutes=5)
+        message = mock.Mock(
+            headers={'task': delivery_engine.BATCH_TASK, 'eta': eta.isoformat()},
+            delivery_info={'routing_key': 'push_high'}
+        )
+
+        engine = await self.start_engine()
+        with mock.patch.object(engine, 'handle') as handle:
+            await delivery_engine.process_message(engine, [[ids, 'android'], {}, {}], message)
+        await engine.close()
+
+        handle.assert_not_called()
+        scheduled = await ScheduledNotification.objects.aget()
+        self.assertEqual((scheduled.kind, scheduled.send_at), ('redelivery', eta))
+        self.assertEqual(sorted(scheduled.payload.pop('send_log_ids')), sorted(ids))
+        self.assertEqual(scheduled.payload, {'platform': 'android', 'queue': 'push_high'})
+
+        await ScheduledNotification.objects.aupdate(send_at=timezone.now())
+        with mock.patch('api.tasks.push_tasks.send_push_batch_task.apply_async') as apply_async:
+            released = await sync_to_async(release_due_notifications)()
+        self.assertEqual(released['released'], 1)
+        apply_async.assert_called_once()
+        self.assertEqual(sorted(apply_async.call_args.kwargs['kwargs']['send_log_ids']), sorted(ids))
+        self.assertEqual(apply_async.call_args.kwargs['queue'], 'push_high')
+
+
+class BrokerConsumerTest(SimpleTestCase):
+    def setUp(self):
+        # Stopping the engine flushes the sink, which must not reach the database here
+        invalid_token_sink.clear()
+        self.addCleanup(invalid_token_sink.clear)
+
+    def publish(self, connection, queue_name, headers, body):
+        exchange = Exchange(queue_name, type='direct')
+        queue = Queue(queue_name, exchange, routing_key=queue_name)
+        with connection.Producer() as producer:
+            producer.publish(
+                body,
+                exchange=exchange,
+                routing_key=queue_name,
+                declare=[queue],
+                serializer='json',
+                headers=headers,
+            )
+
+    async def test_celery_messages_are_handled_then_acked(self):
+        queue_name = f'engine_test_{uuid.uuid4().hex}'
+        kwargs = {'send_log_ids': ['1', '2'], 'platform': 'android'}
+        with Connection('memory://') as connection:
+            # Celery message protocol 2, as apply_async sends it
+            self.publish(connection, queue_name, {'task': delivery_engine.BATCH_TASK, 'id': 'a', 'retries': 0}, [[], kwargs, {}])
+            # Protocol 1
+            self.publish(connection, queue_name, {}, {'task': delivery_engine.BATCH_TASK, 'id': 'b', 'args': [], 'kwargs': kwargs})
+
+        stop_event = asyncio.Event()
+        handled = []
+
+        async def handle(self, task_name, args, kwargs, queue=None):
+            handled.append((task_name, args, kwargs, queue))
+            if len(handled) == 2:
+                stop_event.set()
+
+        with mock.patch.object(delivery_engine.DeliveryEngine, 'handle', handle):
+            await asyncio.wait_for(
+                delivery_engine.serve([queue_name], broker_url='memory://', prefetch=10, stop_event=stop_event),
+                timeout=10
+            )
+
+        self.assertEqual(handled, [(delivery_engine.BATCH_TASK, [], kwargs, queue_name)] * 2)
+        with Connection('memory://') as connection:
+            # Both messages were acked, nothing is left to redeliver
+            self.assertEqual(connection.SimpleQueue(queue_name).qsize(), 0)
+
+    async def serve_failing_message(self, queue_name, retry_message_later):
+        with Connection('memory://') as connection:
+            self.publish(connection, queue_name, {'task': delivery_engine.BATCH_TASK, 'id': 'a', 'retries': 0},
+                         [[], {'send_log_ids': ['1'], 'platform': 'android'}, {}])
+
+        stop_event = asyncio.Event()
+
+        async def handle(self, task_name, args, kwargs, queue=None):
+            await self.writer.write([])
+
+        def reschedule(body, message):
+            stop_event.set()
+            retry_message_later(body, message)
+
+        with mock.patch.object(delivery_engine.DeliveryEngine, 'handle', handle), \
+                mock.patch.object(delivery_engine.ResultWriter, 'write', side_effect=OSError('database unavailable')), \
+                mock.patch.object(delivery_engine, 'retry_message_later', side_effect=reschedule):
+            await asyncio.wait_for(
+                delivery_engine.serve([queue_name], broker_url='memory://', prefetch=10, stop_event=stop_event),
+                timeout=10
+            )
+
+        with Connection('memory://') as connection:
+            return connection.SimpleQueue(queue_name).qsize()
+
+    async def test_failed_messages_are_rescheduled_before_ack(self):
+        queue_name = f'engine_test_{uuid.uuid4().hex}'
+        rescheduled = []
+
+        left = await self.serve_failing_message(queue_name, lambda body, message: rescheduled.append(body))
+
+        self.assertEqual(rescheduled, [[[], {'send_log_ids': ['1'], 'platform': 'android'}, {}]])
+        self.assertEqual(left, 0)
+
+    async def test_failed_messages_are_requeued_when_they_cannot_be_rescheduled(self):
+        queue_name = f'engine_test_{uuid.uuid4().hex}'
+
+        def reschedule(body, message):
+            raise OSError('database unavailable')
+
+        left = await self.serve_failing_message(queue_name, reschedule)
+
+        # Not acked: the message is back on the queue for the next consumer
+        self.assertEqual(left, 1)
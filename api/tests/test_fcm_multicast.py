@@ -0,0 +1,68 @@
+import json
+from unittest import mock
+import requests
+from django.test import TestCase, override_settings
+from ..models import App, Device, SendLog
+from ..tasks.push_tasks import deliver_send_logs
+from ..utils.invalid_tokens import invalid_token_sink
+
+
+def fcm_response(payload):
+    """Fake legacy FCM reply: NotRegistered for tokens starting with 'gone'."""
+    tokens = payload['registration_ids']
+    response = mock.Mock(status_code=200)
+    response.json.return_value = {
+        'multicast_id': 42,
+        'results': [
+            {'error': 'NotRegistered'} if token.startswith('gone') else {'message_id': f'msg_{token}'}
+            for token in tokens
+        ]
+    }
+    return response
+
+
+@override_settings(FCM_SERVER_KEY='server_key', FCM_SERVICE_ACCOUNT_FILE=None, FCM_MULTICAST_SIZE=3)
+@mock.patch('api.utils.fcm_sender.get_session')
+class FCMMulticastTest(TestCase):
+    def setUp(self):
+        invalid_token_sink.clear()
+        self.app = App.objects.create(name='Test App', app_key='multicast_key')
+
+    def create_log(self, token, title='Sale', body='50% off'):
+        device = Device.objects.create(app=self.app, user_identifier=token, platform='android', device_token=token)
+        return SendLog.objects.create(
+            app=self.app, device=device, notification_type='promo', title=title, body=body, raw_request={}
+        )
+
+    def test_identical_payloads_are_multicast(self, mock_session):
+        mock_session.return_value.post.side_effect = lambda url, data, **kwargs: fcm_response(json.loads(data))
+        for i in range(7):
+            self.create_log(f'gone_{i}' if i == 4 else f'token_{i}')
+        self.create_log('token_personal', title='Hi Ada')
+        send_logs = list(SendLog.objects.select_related('device__app').order_by('created_at'))
+
+        deliver_send_logs(send_logs)
+
+        # 7 identical payloads in multicasts of 3, 3 and 1, plus the personal one
+        self.assertEqual(mock_session.return_value.post.call_count, 4)
+        statuses = dict(SendLog.objects.values_list('device__device_token', 'status'))
+        self.assertEqual(statuses.pop('gone_4'), 'failed')
+        self.assertEqual(set(statuses.values()), {'sent'})
+        self.assertEqual(
+            SendLog.objects.get(device__device_token='token_0').provider_response['response']['results'],
+            [{'message_id': 'msg_token_0'}]
+        )
+        self.assertEqual(invalid_token_sink.flush(), {self.app.id: 1})
+        self.assertFalse(Device.objects.get(device_token='gone_4').is_active)
+
+    def test_failed_multicast_retries_every_log(self, mock_session):
+        mock_session.return_value.post.return_value.raise_for_status.side_effect = requests.HTTPError('503')
+        for i in range(2):
+            self.create_log(f'token_{i}')
+
+        with mock.patch('api.tasks.push_tasks.send_push_batch_task.apply_async') as apply_async:
+            deliver_send_logs(list(SendLog.objects.select_related('device__app')))
+
+        self.assertEqual(mock_session.return_value.post.call_count, 1)
+        self.assertEqual(set(SendLog.objects.values_list('status', flat=True)), {'retrying'})
+        self.assertEqual(len(apply_async.call_args.kwargs['kwargs']['send_log_ids']), 2)
@@ -0,0 +1,86 @@
+import json
+import tempfile
+import time
+from unittest import mock
+from django.test import TestCase, override_settings
+from ..models import App, Device, SendLog
+from ..tasks.push_tasks import deliver_send_logs
+from ..utils import fcm_v1_sender
+from ..utils.invalid_tokens import invalid_token_sink
+from .fcm_stub import FCMStub
+
+
+class FCMV1SenderTest(TestCase):
+    def setUp(self):
+        fcm_v1_sender.access_tokens.clear()
+        invalid_token_sink.clear()
+        self.stub = FCMStub().__enter__()
+        self.addCleanup(self.stub.__exit__, None, None, None)
+
+        service_account_file = tempfile.NamedTemporaryFile('w', suffix='.json')
+        json.dump(self.stub.service_account(), service_account_file)
+        service_account_file.flush()
+        self.addCleanup(service_account_file.close)
+
+        overrides = override_settings(
+            FCM_SERVICE_ACCOUNT_FILE=service_account_file.name,
+            FCM_API_URL=self.stub.url,
+            FCM_V1_CONCURRENCY=4,
+            FCM_TOKEN_REFRESH_MARGIN=300,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_access_token_is_cached(self):
+        for _ in range(3):
+            result = fcm_v1_sender.send_fcm_v1_notification('token_1', 'Hi', 'Body', {'count': 2})
+            self.assertTrue(result['success'])
+
+        self.assertEqual(self.stub.token_requests, 1)
+        self.assertEqual(self.stub.messages[0]['data'], {'count': '2'})
+
+    def test_access_token_is_refreshed_before_expiry(self):
+        fcm_v1_sender.send_fcm_v1_notification('token_1', 'Hi', 'Body')
+
+        # 299s before the one-hour token expires, inside the 300s margin
+        later = time.time() + 3600 - 299
+        with mock.patch('api.utils.fcm_v1_sender.time') as mock_time:
+            mock_time.time.return_value = later
+            fcm_v1_sender.send_fcm_v1_notification('token_1', 'Hi', 'Body')
+            fcm_v1_sender.send_fcm_v1_notification('token_1', 'Hi', 'Body')
+
+        self.assertEqual(self.stub.token_requests, 2)
+
+    def test_revoked_token_is_replaced(self):
+        fcm_v1_sender.send_fcm_v1_notification('token_1', 'Hi', 'Body')
+        self.stub.revoke_tokens()
+
+        result = fcm_v1_sender.send_fcm_v1_notification('token_1', 'Hi', 'Body')
+
+        self.assertTrue(result['success'])
+        self.assertEqual(self.stub.token_requests, 2)
+
+    def test_results_map_back_to_send_logs(self):
+        app = App.objects.create(name='Test App', app_key='fcm_v1_key')
+        for token in ['token_1', 'invalid_2', 'token_3']:
+            device = Device.objects.create(app=app, user_identifier=token, platform='android', device_token=token)
+            SendLog.objects.create(app=app, device=device, notification_type='welcome', title='Hi', body='Body', raw_request={})
+        send_logs = list(SendLog.objects.select_related('device__app').order_by('device__device_token'))
+
+        retry_ids = deliver_send_logs(send_logs)
+
+        self.assertEqual(retry_ids, [])
+        statuses = {
+            send_log.device.device_token: (send_log.status, send_log.error_message)
+            for send_log in SendLog.objects.select_related('device')
+        }
+        self.assertEqual(statuses, {
+            'token_1': ('sent', ''),
+            'invalid_2': ('failed', 'UNREGISTERED'),
+            'token_3': ('sent', ''),
+        })
+        # Deactivated with the next flush of the invalid-token sink
+        self.assertTrue(Device.objects.get(device_token='invalid_2').is_active)
+        self.assertEqual(invalid_token_sink.flush(), {app.id: 1})
+        self.assertFalse(Device.objects.get(device_token='invalid_2').is_active)
+        self.assertEqual(self.stub.token_requests, 1)
@@ -0,0 +1,76 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from django.test import SimpleTestCase
+from ..utils import http_client
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.posts.append(self.path)
+        if self.path == '/throttled':
+            body = b'{"error": "QuotaExceeded"}'
+            self.send_response(429)
+            self.send_header('Retry-After', '2')
+        else:
+            body = b'{"success": 1}'
+            self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@mock.patch('api.utils.http_client.get_redis', return_value=None)
+class PooledSessionTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+        cls.server.posts = []
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+        cls.url = f'{cls.base_url}/send'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        http_client._sessions.clear()
+        http_client._sessions_pid = None
+        self.server.posts.clear()
+
+    def test_connection_is_reused_across_requests(self, mock_redis):
+        for _ in range(5):
+            response = http_client.get_session('fcm').post(self.url, json={'to': 'token'}, timeout=5)
+            self.assertEqual(response.status_code, 200)
+
+        stats = http_client.pool_stats()
+        self.assertEqual(stats['requests'], 5)
+        self.assertEqual(stats['connections_opened'], 1)
+
+    def test_sessions_are_rebuilt_after_fork(self, mock_redis):
+        session = http_client.get_session('fcm')
+        self.assertIs(http_client.get_session('fcm'), session)
+
+        with mock.patch('api.utils.http_client.os.getpid', return_value=-1):
+            self.assertIsNot(http_client.get_session('fcm'), session)
+
+    def test_throttled_response_is_returned_after_one_attempt(self, mock_redis):
+        started = time.monotonic()
+        response = http_client.get_session('fcm').post(f'{self.base_url}/throttled', json={'to': 'token'}, timeout=5)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], '2')
+        self.assertEqual(self.server.posts, ['/throttled'])
+        self.assertLess(time.monotonic() - started, 1)
@@ -0,0 +1,113 @@
+import asyncio
+import json
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from ..models import App, SendLog
+from ..utils.idempotency import IdempotencyStore, idempotent
+
+
+@mock.patch('api.utils.idempotency.get_redis', return_value=None)
+class IdempotencyKeyTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.app = App.objects.create(name='Test App', app_key='idempotency_key')
+        self.client.defaults['HTTP_X_APP_KEY'] = self.app.app_key
+        self.store = IdempotencyStore()
+        patcher = mock.patch('api.utils.idempotency.idempotency_store', self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def send(self, key):
+        with mock.patch('api.views.notification_views.send_push_notification_task.apply_async') as mock_apply_async:
+            response = self.client.post(
+                reverse('send-notification'),
+                data=json.dumps({
+                    'notification_type': 'custom',
+                    'device_token': 'token_1',
+                    'platform': 'android',
+                    'user': {'id': 'user_1'},
+                    'title': 'Title',
+                    'body': 'Body'
+                }),
+                content_type='application/json',
+                HTTP_IDEMPOTENCY_KEY=key
+            )
+        return response, mock_apply_async
+
+    def test_retry_replays_original_response(self, mock_redis):
+        first, first_delay = self.send('retry-1')
+        second, second_delay = self.send('retry-1')
+
+        self.assertEqual(first.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(second.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(SendLog.objects.count(), 1)
+        first_delay.assert_called_once()
+        second_delay.assert_not_called()
+
+    def test_keys_are_scoped_per_app(self, mock_redis):
+        claimed, _ = self.store.claim(self.app.id, 'shared')
+        other_claimed, _ = self.store.claim('other-app', 'shared')
+
+        self.assertTrue(claimed)
+        self.assertTrue(other_claimed)
+
+    def test_in_flight_key_conflicts(self, mock_redis):
+        self.store.claim(self.app.id, 'in-flight')
+
+        response, mock_apply_async = self.send('in-flight')
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        mock_apply_async.assert_not_called()
+
+    def test_server_errors_are_not_stored(self, mock_redis):
+        self.store.claim(self.app.id, 'failed')
+        self.store.release(self.app.id, 'failed')
+
+        claimed, record = self.store.claim(self.app.id, 'failed')
+
+        self.assertTrue(claimed)
+        self.assertIsNone(record)
+
+    @override_settings(IDEMPOTENCY_PENDING_TTL=0)
+    def test_in_flight_lock_expires_before_stored_response(self, mock_redis):
+        self.store.claim(self.app.id, 'crashed')
+
+        claimed, record = self.store.claim(self.app.id, 'crashed')
+        self.assertTrue(claimed)
+        self.assertIsNone(record)
+
+        self.store.store(self.app.id, 'crashed', 202, {'success': True})
+        self.assertEqual(self.store.lookup(self.app.id, 'crashed'), {'status': 202, 'body': {'success': True}})
+
+    @mock.patch('api.utils.rate_limiter.get_redis', return_value=None)
+    def test_replay_is_not_rate_limited(self, mock_rate_redis, mock_redis):
+        self.app.rate_limit = 1
+        self.app.save()
+
+        first, _ = self.send('throttled-retry')
+        second, second_delay = self.send('throttled-retry')
+        other, _ = self.send('other-key')
+
+        self.assertEqual(first.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(second.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        second_delay.assert_not_called()
+        self.assertEqual(other.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_cancelled_request_releases_key(self, mock_redis):
+        class View:
+            @idempotent
+            async def post(self, request):
+                raise asyncio.CancelledError()
+
+        request = mock.Mock(app=self.app, META={'HTTP_IDEMPOTENCY_KEY': 'cancelled'})
+        with self.assertRaises(asyncio.CancelledError):
+            asyncio.run(View().post(request))
+
+        claimed, _ = self.store.claim(self.app.id, 'cancelled')
+        self.assertTrue(claimed)
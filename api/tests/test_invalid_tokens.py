@@ -0,0 +1,89 @@
+from unittest import mock
+import pywebpush
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from ..models import App, Device, SendLog
+from ..tasks.push_tasks import send_push_notification_task
+from ..utils.invalid_tokens import invalid_token_sink
+from ..utils.web_sender import send_web_notification
+from .test_web_sender import make_subscription, make_vapid_key
+
+
+@override_settings(INVALID_TOKEN_FLUSH_SIZE=3, INVALID_TOKEN_FLUSH_INTERVAL=1.0)
+class InvalidTokenSinkTest(TestCase):
+    def setUp(self):
+        invalid_token_sink.clear()
+        self.addCleanup(invalid_token_sink.clear)
+        self.apps = [App.objects.create(name=f'App {i}', app_key=f'sink_key_{i}') for i in range(2)]
+        for i in range(4):
+            Device.objects.create(
+                app=self.apps[i % 2], user_identifier=f'user_{i}', platform='android', device_token=f'token_{i}'
+            )
+        self.now = 100.0
+        clock = mock.patch('api.utils.invalid_tokens.time.monotonic', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def inactive(self):
+        return set(Device.objects.filter(is_active=False).values_list('device_token', flat=True))
+
+    def test_flushes_every_n_tokens_with_counts_per_app(self):
+        invalid_token_sink.add(self.apps[0].id, ['token_0', 'token_2'])
+        self.assertEqual(invalid_token_sink.flush_due(), {})
+        self.assertEqual(self.inactive(), set())
+
+        invalid_token_sink.add(self.apps[1].id, ['token_1'])
+        with self.assertNumQueries(1):
+            counts = invalid_token_sink.flush_due()
+
+        self.assertEqual(counts, {self.apps[0].id: 2, self.apps[1].id: 1})
+        self.assertEqual(self.inactive(), {'token_0', 'token_1', 'token_2'})
+        self.assertIsNone(invalid_token_sink.pending())
+
+    def test_flushes_after_the_interval(self):
+        invalid_token_sink.add(self.apps[1].id, ['token_3'])
+        self.now += 0.6
+        self.assertAlmostEqual(invalid_token_sink.pending(), 0.4)
+        self.assertEqual(invalid_token_sink.flush_due(), {})
+
+        self.now += 0.4
+        self.assertEqual(invalid_token_sink.flush_due(), {self.apps[1].id: 1})
+        self.assertEqual(self.inactive(), {'token_3'})
+
+    def test_failed_update_keeps_the_tokens(self):
+        invalid_token_sink.add(self.apps[0].id, ['token_0'])
+        with mock.patch.object(Device.objects, 'filter', side_effect=DatabaseError('locked')):
+            self.assertEqual(invalid_token_sink.flush(), {})
+
+        self.assertEqual(invalid_token_sink.flush(), {self.apps[0].id: 1})
+        self.assertEqual(self.inactive(), {'token_0'})
+
+
+@override_settings(INVALID_TOKEN_FLUSH_SIZE=1)
+@mock.patch('api.utils.circuit_breaker.get_redis', return_value=None)
+class ExpiredWebSubscriptionTest(TestCase):
+    def setUp(self):
+        invalid_token_sink.clear()
+        self.addCleanup(invalid_token_sink.clear)
+
+    @mock.patch('api.utils.web_sender.pywebpush.webpush')
+    def test_gone_subscription_is_deactivated(self, mock_webpush, mock_redis):
+        subscription = make_subscription('https://push.example.com/gone')
+        mock_webpush.side_effect = pywebpush.WebPushException('Gone', response=mock.Mock(status_code=410))
+        app = App.objects.create(
+            name='Test App', app_key='web_gone_key',
+            web_vapid_public_key='public_key', web_vapid_private_key=make_vapid_key()
+        )
+        device = Device.objects.create(app=app, user_identifier='user_1', platform='web', device_token=subscription)
+        send_log = SendLog.objects.create(
+            app=app, device=device, notification_type='welcome', title='Hi', body='Body', raw_request={}
+        )
+
+        result = send_web_notification(subscription, 'Hi', 'Body', {}, 'public_key', app.web_vapid_private_key)
+        self.assertTrue(result['invalid_token'])
+
+        send_push_notification_task.apply(args=[str(send_log.id), subscription, 'web', 'Hi', 'Body', {}])
+
+        device.refresh_from_db()
+        self.assertFalse(device.is_active)
+        self.assertEqual(SendLog.objects.get().status, 'failed')
@@ -0,0 +1,98 @@
+import json
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from ..models import App, BulkJob
+from ..tasks.bulk_tasks import process_bulk_job_chunk
+from ..utils.rate_limiter import AppRateLimiter
+
+
+@mock.patch('api.utils.rate_limiter.get_redis', return_value=None)
+class AppRateLimiterTest(TestCase):
+    def setUp(self):
+        self.app = App.objects.create(name='Test App', app_key='rate_limit_key', rate_limit=10)
+        self.limiter = AppRateLimiter()
+
+    def test_bucket_refills_over_time(self, mock_redis):
+        with mock.patch('api.utils.rate_limiter.time.monotonic', return_value=100.0):
+            self.assertTrue(self.limiter.consume(self.app, 10)[0])
+            allowed, retry_after = self.limiter.consume(self.app, 1)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(retry_after, 6.0)
+
+        with mock.patch('api.utils.rate_limiter.time.monotonic', return_value=106.0):
+            self.assertTrue(self.limiter.consume(self.app, 1)[0])
+
+    def test_bulk_items_count_individually(self, mock_redis):
+        client = APIClient()
+        client.defaults['HTTP_X_APP_KEY'] = self.app.app_key
+        payload = json.dumps({'notifications': [
+            {'notification_type': 'custom', 'device_token': f'token_{i}', 'platform': 'android',
+             'user': {'id': f'user_{i}'}, 'title': 'Title', 'body': 'Body'}
+            for i in range(6)
+        ]})
+
+        with mock.patch('api.utils.rate_limiter.rate_limiter', self.limiter), \
+                mock.patch('api.utils.bulk_ingest.group'):
+            first = client.post(reverse('bulk-send-notification'), data=payload, content_type='application/json')
+            second = client.post(reverse('bulk-send-notification'), data=payload, content_type='application/json')
+
+        self.assertEqual(first.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(second.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', second)
+
+    def test_oversized_cost_waits_for_a_full_bucket_and_leaves_debt(self, mock_redis):
+        with mock.patch('api.utils.rate_limiter.time.monotonic', return_value=100.0):
+            self.assertTrue(self.limiter.consume(self.app, 1)[0])
+            # 25 notifications do not fit a 10-token bucket that is not full
+            allowed, retry_after = self.limiter.consume(self.app, 25)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(retry_after, 6.0)
+
+        with mock.patch('api.utils.rate_limiter.time.monotonic', return_value=106.0):
+            self.assertTrue(self.limiter.consume(self.app, 25)[0])
+            allowed, retry_after = self.limiter.consume(self.app, 1)
+        # The 15 tokens over capacity are paid off before anything else goes through
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(retry_after, 96.0)
+
+    def test_only_send_endpoints_are_throttled(self, mock_redis):
+        client = APIClient()
+        client.defaults['HTTP_X_APP_KEY'] = self.app.app_key
+        self.limiter.consume(self.app, 10)
+
+        with mock.patch('api.utils.rate_limiter.rate_limiter', self.limiter):
+            templates = client.get(reverse('template-list'))
+            campaigns = client.get(reverse('campaign-list'))
+            send = client.post(reverse('send-notification'), data={}, format='json')
+
+        self.assertEqual(templates.status_code, status.HTTP_200_OK)
+        self.assertEqual(campaigns.status_code, status.HTTP_200_OK)
+        self.assertEqual(send.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(BULK_JOB_CHUNK_SIZE=20)
+    def test_bulk_job_lines_are_charged_when_their_chunk_runs(self, mock_redis):
+        client = APIClient()
+        client.defaults['HTTP_X_APP_KEY'] = self.app.app_key
+        lines = '\n'.join(json.dumps({
+            'notification_type': 'custom', 'device_token': f'token_{i}', 'platform': 'android',
+            'user': {'id': f'user_{i}'}, 'title': 'Title', 'body': 'Body'
+        }) for i in range(12))
+
+        with mock.patch('api.utils.rate_limiter.rate_limiter', self.limiter), \
+                mock.patch('api.tasks.bulk_tasks.rate_limiter', self.limiter), \
+                mock.patch('api.views.bulk_job_views.process_bulk_job_chunk.delay') as mock_delay, \
+                mock.patch('api.tasks.bulk_tasks.process_bulk_job_chunk.apply_async') as apply_async, \
+                mock.patch('api.utils.bulk_ingest.group'):
+            response = client.post(reverse('bulk-job-create'), data=lines, content_type='application/x-ndjson')
+            self.limiter.consume(self.app, 1)
+            with self.captureOnCommitCallbacks(execute=True):
+                result = process_bulk_job_chunk(mock_delay.call_args.args[0])
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertTrue(result['throttled'])
+        self.assertEqual(apply_async.call_args.kwargs['args'], [mock_delay.call_args.args[0]])
+        self.assertGreater(apply_async.call_args.kwargs['countdown'], 0)
+        self.assertEqual(BulkJob.objects.get().processed, 0)
@@ -0,0 +1,182 @@
+from unittest import mock
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from ..models import App, DeadLetter, Device, ScheduledNotification, SendLog
+from ..tasks.push_tasks import send_push_notification_task
+from ..utils.invalid_tokens import invalid_token_sink
+from ..utils.retry_policy import PERMANENT, TRANSIENT, backoff_delay, classify
+
+
+class RetryPolicyTest(SimpleTestCase):
+    def test_classify(self):
+        self.assertIsNone(classify({'success': True, 'status_code': 200}))
+        self.assertEqual(classify(RuntimeError('boom')), TRANSIENT)
+        self.assertEqual(classify({'success': False, 'error': 'timed out', 'unavailable': True}), TRANSIENT)
+        self.assertEqual(classify({'success': False, 'error': 'INTERNAL', 'status_code': 500}), TRANSIENT)
+        self.assertEqual(classify({'success': False, 'error': 'Unavailable', 'status_code': 200}), TRANSIENT)
+        self.assertEqual(classify({'success': False, 'error': 'UNREGISTERED', 'invalid_token': True}), PERMANENT)
+        self.assertEqual(classify({'success': False, 'error': 'INVALID_ARGUMENT', 'status_code': 400}), PERMANENT)
+        self.assertEqual(classify({'success': False, 'error': 'APNs configuration not set'}), PERMANENT)
+
+    @override_settings(PUSH_RETRY_BASE_DELAY=30, PUSH_RETRY_MAX_DELAY=300)
+    def test_backoff_is_jittered_below_a_doubling_ceiling(self):
+        with mock.patch('api.utils.retry_policy.random.uniform', side_effect=lambda low, high: high):
+            self.assertEqual([backoff_delay(retry) for retry in range(1, 6)], [30, 60, 120, 240, 300])
+        with mock.patch('api.utils.retry_policy.random.uniform', side_effect=lambda low, high: low):
+            self.assertEqual(backoff_delay(3), 1.0)
+
+        delays = {round(backoff_delay(4)) for _ in range(50)}
+        self.assertGreater(len(delays), 10)
+        self.assertTrue(all(1 <= delay <= 240 for delay in delays))
+
+
+@mock.patch('api.utils.circuit_breaker.get_redis', return_value=None)
+@mock.patch('api.tasks.push_tasks.send_push_batch_task.apply_async')
+class SendTaskRetryTest(TestCase):
+    def setUp(self):
+        invalid_token_sink.clear()
+        self.addCleanup(invalid_token_sink.clear)
+        self.app = App.objects.create(name='Test App', app_key='retry_key')
+        device = Device.objects.create(app=self.app, user_identifier='user_1', platform='android', device_token='token_1')
+        self.send_log = SendLog.objects.create(
+            app=self.app, device=device, notification_type='welcome', title='Hi', body='Body', raw_request={}
+        )
+
+    def send(self):
+        return send_push_notification_task.apply(
+            args=[str(self.send_log.id), 'token_1', 'android', 'Hi', 'Body', {}]
+        ).get()
+
+    @mock.patch('api.tasks.push_tasks.deliver_notification', side_effect=ConnectionError('reset'))
+    def test_transient_error_is_retried_on_the_retry_queue(self, mock_deliver, apply_async, mock_redis):
+        result = self.send()
+
+        self.assertTrue(result['retrying'])
+        self.send_log.refresh_from_db()
+        self.assertEqual((self.send_log.status, self.send_log.retry_count), ('retrying', 1))
+        apply_async.assert_called_once()
+        self.assertEqual(apply_async.call_args.kwargs['kwargs']['send_log_ids'], [str(self.send_log.id)])
+        self.assertEqual(apply_async.call_args.kwargs['queue'], 'push_retry')
+
+    @mock.patch('api.tasks.push_tasks.deliver_notification', return_value={
+        'success': False, 'error': 'UNREGISTERED', 'invalid_token': True, 'status_code': 404
+    })
+    def test_permanent_error_fails_without_retry(self, mock_deliver, apply_async, mock_redis):
+        self.send()
+
+        self.send_log.refresh_from_db()
+        self.assertEqual((self.send_log.status, self.send_log.error_message), ('failed', 'UNREGISTERED'))
+        apply_async.assert_not_called()
+        self.assertFalse(DeadLetter.objects.exists())
+
+    @override_settings(PUSH_RETRY_BASE_DELAY=600, PUSH_ETA_MAX_DELAY=60)
+    @mock.patch('api.utils.retry_policy.random.uniform', side_effect=lambda low, high: high)
+    @mock.patch('api.tasks.push_tasks.deliver_notification', side_effect=ConnectionError('reset'))
+    def test_long_retry_delay_waits_in_the_scheduler(self, mock_deliver, mock_uniform, apply_async, mock_redis):
+        self.send()
+
+        apply_async.assert_not_called()
+        scheduled = ScheduledNotification.objects.get()
+        self.assertEqual(scheduled.kind, 'redelivery')
+        self.assertEqual(scheduled.payload['queue'], 'push_retry')
+        self.assertAlmostEqual((scheduled.send_at - self.send_log.created_at).total_seconds(), 600, delta=5)
+
+    @override_settings(PUSH_MAX_PARKS=2)
+    @mock.patch('api.tasks.push_tasks.deliver_notification', return_value={
+        'success': False, 'error': 'QUOTA_EXCEEDED', 'status_code': 429, 'retry_after': 5.0
+    })
+    def test_retry_after_is_honoured_a_limited_number_of_times(self, mock_deliver, apply_async, mock_redis):
+        # Keep the throttled app's breaker from parking the sends before they are made
+        allow = mock.patch('api.tasks.push_tasks.circuit_breaker.allow', return_value=(True, 0.0, False))
+        allow.start()
+        self.addCleanup(allow.stop)
+        for _ in range(2):
+            self.assertEqual(self.send()['status_code'], 429)
+        self.send_log.refresh_from_db()
+        self.assertEqual((self.send_log.status, self.send_log.park_count, self.send_log.retry_count), ('pending', 2, 0))
+
+        # Out of parks: the next Retry-After uses up a retry
+        self.send()
+        self.send_log.refresh_from_db()
+        self.assertEqual((self.send_log.status, self.send_log.retry_count), ('retrying', 1))
+        self.assertEqual(apply_async.call_args.kwargs['queue'], 'push_retry')
+
+    @override_settings(PUSH_MAX_RETRIES=2)
+    @mock.patch('api.tasks.push_tasks.deliver_notification', return_value={
+        'success': False, 'error': 'UNAVAILABLE', 'status_code': 503
+    })
+    def test_exhausted_retries_become_a_dead_letter(self, mock_deliver, apply_async, mock_redis):
+        SendLog.objects.filter(pk=self.send_log.pk).update(retry_count=2)
+
+        self.send()
+
+        self.send_log.refresh_from_db()
+        self.assertEqual(self.send_log.status, 'failed')
+        apply_async.assert_not_called()
+        dead_letter = DeadLetter.objects.get()
+        self.assertEqual((dead_letter.send_log_id, dead_letter.attempts), (self.send_log.id, 3))
+
+
+class DeadLetterViewTest(TestCase):
+    def setUp(self):
+        self.app = App.objects.create(name='Test App', app_key='dead_letter_key')
+        self.client = APIClient()
+        self.client.defaults['HTTP_X_APP_KEY'] = self.app.app_key
+        self.dead_letters = []
+        for i, platform in enumerate(['android', 'android', 'ios']):
+            device = Device.objects.create(
+                app=self.app, user_identifier=f'user_{i}', platform=platform, device_token=f'token_{i}'
+            )
+            send_log = SendLog.objects.create(
+                app=self.app, device=device, notification_type='welcome', title='Hi', body='Body',
+                raw_request={}, status='failed', retry_count=5, error_message='UNAVAILABLE'
+            )
+            self.dead_letters.append(DeadLetter.objects.create(
+                app=self.app, send_log=send_log, platform=platform, attempts=6, error_message='UNAVAILABLE'
+            ))
+
+    def test_list(self):
+        response = self.client.get(reverse('dead-letter-list'), {'platform': 'android'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data']['total'], 2)
+        self.assertEqual(response.data['data']['dead_letters'][0]['device_token'], 'token_1')
+
+    @mock.patch('api.views.dead_letter_views.send_push_batch_task.apply_async')
+    def test_replay(self, apply_async):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.client.post(reverse('dead-letter-replay'), data={'platform': 'android'}, format='json')
+            # Published once the reset SendLogs are committed
+            apply_async.assert_not_called()
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual((response.data['data']['replayed'], response.data['data']['remaining']), (2, 0))
+        apply_async.assert_called_once()
+        self.assertEqual(apply_async.call_args.kwargs['queue'], 'push_bulk')
+        self.assertEqual(
+            sorted(apply_async.call_args.kwargs['kwargs']['send_log_ids']),
+            sorted(str(dead_letter.send_log_id) for dead_letter in self.dead_letters[:2])
+        )
+        self.assertEqual(
+            list(SendLog.objects.filter(device__platform='android').values_list('status', 'retry_count').distinct()),
+            [('pending', 0)]
+        )
+        self.assertEqual(list(DeadLetter.objects.values_list('platform', flat=True)), ['ios'])
+
+    @mock.patch('api.views.dead_letter_views.send_push_batch_task.apply_async', side_effect=ConnectionError('down'))
+    def test_replay_is_left_to_the_scheduler_when_celery_is_down(self, apply_async):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('dead-letter-replay'), data={'ids': [str(self.dead_letters[2].id)]}, format='json'
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(DeadLetter.objects.count(), 2)
+        scheduled = ScheduledNotification.objects.get()
+        self.assertEqual((scheduled.kind, scheduled.status), ('redelivery', 'pending'))
+        self.assertEqual(scheduled.payload, {
+            'send_log_ids': [str(self.dead_letters[2].send_log_id)], 'platform': 'ios', 'queue': 'push_bulk'
+        })
@@ -0,0 +1,106 @@
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from ..models import App, Template, SendLog, ScheduledNotification
+from ..tasks.scheduler_tasks import release_due_notifications
+from ..utils.template_cache import template_resolver
+
+
+def make_notification(index, send_at=None):
+    notification = {
+        'notification_type': 'welcome',
+        'device_token': f'token_{index}',
+        'platform': 'android',
+        'user': {'id': f'user_{index}', 'name': 'Jane'}
+    }
+    if send_at is not None:
+        notification['send_at'] = send_at.isoformat()
+    return notification
+
+
+class ScheduledSendTest(TestCase):
+    def setUp(self):
+        template_resolver.clear()
+        self.client = APIClient()
+        self.app = App.objects.create(name='Test App', app_key='scheduler_key')
+        self.client.defaults['HTTP_X_APP_KEY'] = self.app.app_key
+        Template.objects.create(
+            app=self.app,
+            name='welcome',
+            title_template='Welcome $name!',
+            body_template='Hello $name',
+            is_active=True
+        )
+
+    def test_future_send_is_stored_not_sent(self):
+        send_at = timezone.now() + timedelta(hours=1)
+
+        response = self.client.post(reverse('send-notification'), data=make_notification(1, send_at), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        scheduled = ScheduledNotification.objects.get(id=response.data['data']['scheduled_notification_id'])
+        self.assertEqual(scheduled.send_at, send_at)
+        self.assertNotIn('send_at', scheduled.payload)
+        self.assertFalse(SendLog.objects.exists())
+
+    @mock.patch('api.utils.bulk_ingest.group')
+    def test_bulk_mixes_immediate_and_scheduled(self, mock_group):
+        later = timezone.now() + timedelta(minutes=5)
+        earlier = timezone.now() - timedelta(minutes=5)
+
+        response = self.client.post(reverse('bulk-send-notification'), data={'notifications': [
+            make_notification(1, later),
+            make_notification(2, earlier),
+            make_notification(3),
+        ]}, format='json')
+
+        results = response.data['data']['results']
+        self.assertEqual(results[0]['message'], 'Notification scheduled')
+        self.assertEqual(results[1]['message'], 'Notification queued for sending')
+        self.assertEqual(ScheduledNotification.objects.count(), 1)
+        self.assertEqual(SendLog.objects.count(), 2)
+
+    @mock.patch('api.utils.bulk_ingest.group')
+    def test_release_due_notifications(self, mock_group):
+        later = timezone.now() + timedelta(minutes=5)
+        self.client.post(reverse('bulk-send-notification'), data={'notifications': [
+            make_notification(i, later) for i in range(3)
+        ]}, format='json')
+        inactive_app = App.objects.create(name='Inactive App', app_key='inactive_key', is_active=False)
+        ScheduledNotification.objects.create(app=inactive_app, send_at=later, payload=make_notification(9))
+
+        # Nothing is due yet
+        self.assertEqual(release_due_notifications()['released'], 0)
+
+        ScheduledNotification.objects.exclude(payload__device_token='token_2').update(
+            send_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        self.assertEqual(release_due_notifications()['released'], 3)
+        self.assertEqual(
+            dict(ScheduledNotification.objects.values_list('payload__device_token', 'status')),
+            {'token_0': 'released', 'token_1': 'released', 'token_2': 'pending', 'token_9': 'failed'}
+        )
+        self.assertEqual(SendLog.objects.count(), 2)
+        self.assertEqual(release_due_notifications()['released'], 0)
+
+    def test_failed_release_leaves_notifications_pending(self):
+        ScheduledNotification.objects.create(
+            app=self.app, send_at=timezone.now() - timedelta(seconds=1), payload=make_notification(1)
+        )
+
+        with mock.patch('api.utils.bulk_ingest.BulkIngest.run', side_effect=RuntimeError('database went away')):
+            with self.assertRaises(RuntimeError):
+                release_due_notifications()
+        self.assertEqual(ScheduledNotification.objects.get().status, 'pending')
+
+        with mock.patch('api.utils.bulk_ingest.group') as mock_group:
+            mock_group.return_value.apply_async.side_effect = ConnectionError('broker down')
+            self.assertEqual(release_due_notifications()['released'], 1)
+        scheduled = ScheduledNotification.objects.get()
+        self.assertEqual(scheduled.status, 'failed')
+        self.assertFalse(scheduled.result['success'])
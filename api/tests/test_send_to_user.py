@@ -0,0 +1,95 @@
+from unittest import mock
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from ..models import App, Device, Template, SendLog
+from ..tasks.push_tasks import send_push_batch_task
+
+
+class SendToUserViewTest(TestCase):
+    def setUp(self):
+        self.app = App.objects.create(name='Test App', app_key='send_to_user_key')
+        Template.objects.create(
+            app=self.app,
+            name='welcome',
+            title_template='Welcome $name!',
+            body_template='Hello $name',
+            is_active=True
+        )
+        for platform in ['android', 'ios', 'web']:
+            Device.objects.create(
+                app=self.app,
+                user_identifier='user_1',
+                platform=platform,
+                device_token=f'{platform}_token'
+            )
+        Device.objects.filter(platform='web').update(is_active=False)
+
+    def post(self, data):
+        return self.client.post(
+            reverse('send-to-user'),
+            data=data,
+            content_type='application/json',
+            headers={'X-App-Key': self.app.app_key}
+        )
+
+    @mock.patch('api.views.notification_views.group')
+    def test_fans_out_to_active_devices(self, mock_group):
+        response = self.post({
+            'notification_type': 'welcome',
+            'user_identifier': 'user_1',
+            'user': {'name': 'Jane'}
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.json()['data']['total_devices'], 2)
+        self.assertEqual(
+            set(SendLog.objects.values_list('device__platform', 'title')),
+            {('android', 'Welcome Jane!'), ('ios', 'Welcome Jane!')}
+        )
+        # One batch task per platform
+        self.assertEqual(len(list(mock_group.call_args.args[0])), 2)
+
+    def test_unknown_user(self):
+        response = self.post({'notification_type': 'welcome', 'user_identifier': 'nobody'})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(SendLog.objects.exists())
+
+
+class SendPushBatchTaskTest(TestCase):
+    def setUp(self):
+        self.app = App.objects.create(name='Test App', app_key='batch_task_key')
+        self.send_logs = []
+        for i in range(3):
+            device = Device.objects.create(
+                app=self.app,
+                user_identifier=f'user_{i}',
+                platform='android',
+                device_token=f'token_{i}'
+            )
+            self.send_logs.append(SendLog.objects.create(
+                app=self.app,
+                device=device,
+                notification_type='welcome',
+                title='Hi',
+                body='Hello',
+                raw_request={}
+            ))
+
+    @mock.patch('api.tasks.push_tasks.send_fcm_notification')
+    def test_results_are_written_back(self, mock_send):
+        mock_send.side_effect = [
+            {'success': True},
+            {'success': False, 'error': 'InvalidRegistration'},
+            {'success': True},
+        ]
+
+        send_push_batch_task.apply(kwargs={
+            'send_log_ids': [str(send_log.id) for send_log in self.send_logs],
+            'platform': 'android'
+        })
+
+        statuses = set(SendLog.objects.values_list('status', 'error_message'))
+        self.assertEqual(statuses, {('sent', ''), ('failed', 'InvalidRegistration')})
+        self.assertFalse(SendLog.objects.filter(sent_at__isnull=True).exists())
@@ -0,0 +1,58 @@
+from unittest import mock
+from django.test import TestCase
+from ..models import App, Template
+from ..utils.template_cache import template_resolver
+
+
+@mock.patch('api.utils.template_cache.get_redis', return_value=None)
+class TemplateResolverTest(TestCase):
+    def setUp(self):
+        template_resolver.clear()
+        self.app = App.objects.create(name='Test App', app_key='template_cache_key')
+        self.template = Template.objects.create(
+            app=self.app,
+            name='welcome',
+            title_template='Welcome $name!',
+            body_template='Hello $name',
+            version=1
+        )
+
+    def test_lookups_are_served_from_memory(self, mock_redis):
+        with self.assertNumQueries(1):
+            self.assertEqual(template_resolver.get(self.app, 'welcome'), self.template)
+        with self.assertNumQueries(0):
+            self.assertEqual(template_resolver.get(self.app, 'welcome'), self.template)
+
+    def test_missing_templates_are_cached(self, mock_redis):
+        with self.assertNumQueries(1):
+            self.assertIsNone(template_resolver.get(self.app, 'missing'))
+        with self.assertNumQueries(0):
+            self.assertIsNone(template_resolver.get(self.app, 'missing'))
+
+    def test_new_version_invalidates_entry(self, mock_redis):
+        template_resolver.get(self.app, 'welcome')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            new_version = Template.objects.create(
+                app=self.app,
+                name='welcome',
+                title_template='Welcome back $name!',
+                body_template='Hello again $name',
+                version=2
+            )
+
+        self.assertEqual(template_resolver.get(self.app, 'welcome'), new_version)
+
+    def test_deactivation_invalidates_entry(self, mock_redis):
+        template_resolver.get(self.app, 'welcome')
+        key = (self.app.id, 'welcome')
+        old_entry = dict(template_resolver._entries[key])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.template.is_active = False
+            self.template.save()
+            # A worker that read the old version before the commit caches it again
+            old_entry['generation'] = template_resolver._generations(self.app.id, ['welcome'])['welcome']
+            template_resolver._entries[key] = old_entry
+
+        self.assertIsNone(template_resolver.get(self.app, 'welcome'))
@@ -0,0 +1,100 @@
+from string import Template as StringTemplate
+from types import SimpleNamespace
+from django.test import SimpleTestCase
+from django.utils.html import escape
+from ..utils.template_renderer import CompiledField, TemplateRenderer, compiled_templates, sanitize_template
+
+
+def make_template(**fields):
+    defaults = {
+        'id': 'template-id',
+        'version': 1,
+        'updated_at': None,
+        'title_template': '',
+        'body_template': '',
+        'subject_template': '',
+        'data_template': {},
+    }
+    defaults.update(fields)
+    return SimpleNamespace(**defaults)
+
+
+class CompiledFieldTest(SimpleTestCase):
+    def assert_matches_string_template(self, template_str, context):
+        expected = escape(StringTemplate(sanitize_template(template_str)).safe_substitute(**context))
+        self.assertEqual(CompiledField(template_str).render(context), expected)
+
+    def test_matches_string_template_semantics(self):
+        context = {'name': 'Jane &amp; co', 'count': 3}
+        for template_str in [
+            'Hello $name',
+            'Hello ${name}!',
+            'Costs $$5 for $count items',
+            'Missing $nobody and ${nobody}',
+            'Trailing $',
+            '{user.name} stays literal',
+            'Strip {{ request.user }}{% if x %}{# note #} tags for $name',
+            '<b>$name</b>',
+        ]:
+            with self.subTest(template_str=template_str):
+                self.assert_matches_string_template(template_str, context)
+
+    def test_placeholder_keys_are_extracted(self):
+        self.assertEqual(CompiledField('$first and ${second} $$third').keys, ('first', 'second'))
+
+
+class TemplateRendererTest(SimpleTestCase):
+    def setUp(self):
+        compiled_templates.clear()
+
+    def test_render_all_fields(self):
+        template = make_template(
+            title_template='Hi $name',
+            body_template='Welcome, $name',
+            subject_template='Subject for $name',
+            data_template='{"greeting": "Hey $name", "priority": 2}'
+        )
+
+        rendered = TemplateRenderer(template).render({'name': 'Jane'}, {'extra': 'value'})
+
+        self.assertEqual(rendered, {
+            'title': 'Hi Jane',
+            'body': 'Welcome, Jane',
+            'subject': 'Subject for Jane',
+            'data': {'greeting': 'Hey Jane', 'priority': 2, 'extra': 'value'},
+        })
+
+    def test_compiled_form_is_cached_per_version(self):
+        template = make_template(title_template='Hi $name')
+
+        first = TemplateRenderer(template).compiled
+        self.assertIs(TemplateRenderer(template).compiled, first)
+
+        template.version = 2
+        self.assertIsNot(TemplateRenderer(template).compiled, first)
+
+    def test_invalid_data_template_falls_back_to_additional_data(self):
+        template = make_template(title_template='Hi', data_template='{not json')
+
+        self.assertEqual(TemplateRenderer(template).render_data({}, {'a': 1}), {'a': 1})
+
+    def test_render_many_matches_render(self):
+        template = make_template(
+            title_template='Hi $name',
+            body_template='Order ${order} for $name <$missing>',
+            subject_template='Static subject',
+            data_template={'order': '$order', 'priority': 2}
+        )
+        contexts = [
+            {'name': 'Jane & co', 'order': 1, 'profile': {'city': 'Lagos'}},
+            {'name': {'first': 'nested'}, 'order': 'x' * 1200},
+            {},
+        ]
+        extras = [{'a': 1}, None, {}]
+
+        renderer = TemplateRenderer(template)
+
+        self.assertEqual(
+            renderer.render_many(contexts, extras),
+            [renderer.render(context, extra) for context, extra in zip(contexts, extras)]
+        )
@@ -0,0 +1,188 @@
+from unittest import mock
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from ..models import App, Device, Template, SendLog, Campaign, CampaignChunk, Topic, TopicSubscription
+from ..tasks.campaign_tasks import dispatch_campaign, process_campaign_chunk
+from ..tasks.topic_tasks import sync_fcm_topic_membership
+from ..utils.template_cache import template_resolver
+
+
+class TopicTestMixin:
+    def setUp(self):
+        template_resolver.clear()
+        self.client = APIClient()
+        self.app = App.objects.create(name='Test App', app_key='topic_key')
+        self.client.defaults['HTTP_X_APP_KEY'] = self.app.app_key
+        self.devices = [
+            Device.objects.create(
+                app=self.app,
+                user_identifier=f'user_{i}',
+                platform='android' if i % 2 else 'ios',
+                device_token=f'token_{i}'
+            )
+            for i in range(4)
+        ]
+
+    def subscribe(self, tokens, name='news'):
+        with mock.patch('api.views.topic_views.sync_fcm_topic_membership.delay') as mock_sync:
+            response = self.client.post(
+                reverse('topic-subscribe', args=[name]),
+                data={'device_tokens': tokens},
+                format='json'
+            )
+        return response, mock_sync
+
+
+class TopicSubscriptionViewTest(TopicTestMixin, TestCase):
+    def test_subscribe_and_unsubscribe(self):
+        response, mock_sync = self.subscribe(['token_0', 'token_1', 'unknown'])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data']['subscribed'], 2)
+        self.assertEqual(response.data['data']['unknown_tokens'], ['unknown'])
+        topic = Topic.objects.get(app=self.app, name='news')
+        mock_sync.assert_called_once_with(str(topic.id), ['token_1'], True)
+
+        # Subscribing again does not double count
+        self.subscribe(['token_0', 'token_2'])
+        topic.refresh_from_db()
+        self.assertEqual(topic.subscriber_count, 3)
+
+        response = self.client.post(
+            reverse('topic-unsubscribe', args=['news']),
+            data={'device_tokens': ['token_0', 'token_3']},
+            format='json'
+        )
+
+        self.assertEqual(response.data['data']['unsubscribed'], 1)
+        topic.refresh_from_db()
+        self.assertEqual(topic.subscriber_count, 2)
+        self.assertEqual(TopicSubscription.objects.filter(topic=topic).count(), 2)
+
+    @mock.patch('api.tasks.topic_tasks.update_fcm_topic_subscriptions')
+    def test_membership_is_confirmed_by_fcm(self, mock_update):
+        self.subscribe(['token_1', 'token_3'])
+        topic = Topic.objects.get(name='news')
+        self.app.fcm_server_key = 'topic_app_key'
+        self.app.save()
+        mock_update.return_value = {
+            'success': True, 'errors': [{'device_token': 'token_3', 'error': 'INVALID_ARGUMENT'}]
+        }
+
+        sync_fcm_topic_membership.apply(args=[str(topic.id), ['token_1', 'token_3'], True])
+
+        mock_update.assert_called_once_with(
+            topic.provider_topic, ['token_1', 'token_3'], subscribe=True, server_key='topic_app_key'
+        )
+        self.assertEqual(
+            dict(TopicSubscription.objects.values_list('device__device_token', 'provider_token')),
+            {'token_1': 'token_1', 'token_3': ''}
+        )
+
+    @mock.patch('api.tasks.topic_tasks.update_fcm_topic_subscriptions', return_value={'success': True, 'errors': []})
+    def test_token_change_resyncs_membership(self, mock_update):
+        self.subscribe(['token_1'])
+        topic = Topic.objects.get(name='news')
+        sync_fcm_topic_membership.apply(args=[str(topic.id), ['token_1'], True])
+
+        device = self.devices[1]
+        device.device_token = 'token_1b'
+        with mock.patch('api.tasks.topic_tasks.sync_fcm_topic_membership.delay') as mock_sync, \
+                self.captureOnCommitCallbacks(execute=True):
+            device.save()
+
+        self.assertEqual(TopicSubscription.objects.get().provider_token, '')
+        mock_sync.assert_has_calls([
+            mock.call(str(topic.id), ['token_1'], False),
+            mock.call(str(topic.id), ['token_1b'], True),
+        ])
+
+        device.is_active = False
+        with mock.patch('api.tasks.topic_tasks.sync_fcm_topic_membership.delay') as mock_sync, \
+                self.captureOnCommitCallbacks(execute=True):
+            device.save()
+        # Nothing confirmed is left to remove
+        mock_sync.assert_not_called()
+
+    def test_invalid_topic_name(self):
+        response, _ = self.subscribe(['token_0'], name='bad name!')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Topic.objects.exists())
+
+
+@override_settings(CAMPAIGN_CHUNK_SIZE=2)
+class TopicSendTest(TopicTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.subscribe(['token_0', 'token_1', 'token_2'])
+        Template.objects.create(
+            app=self.app,
+            name='breaking',
+            title_template='Breaking news',
+            body_template='$headline',
+            is_active=True
+        )
+
+    def send(self):
+        with mock.patch('api.views.campaign_views.dispatch_campaign.delay'):
+            response = self.client.post(
+                reverse('topic-send', args=['news']),
+                data={'notification_type': 'breaking', 'context': {'headline': 'It happened'}},
+                format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        return Campaign.objects.get(id=response.data['data']['campaign_id'])
+
+    def run_campaign(self, campaign):
+        with mock.patch('api.tasks.campaign_tasks.process_campaign_chunk.delay'):
+            dispatch_campaign(str(campaign.id))
+        for chunk in CampaignChunk.objects.filter(campaign=campaign):
+            process_campaign_chunk(str(chunk.id))
+        campaign.refresh_from_db()
+
+    @mock.patch('api.tasks.push_tasks.send_apns_notification', return_value={'success': True})
+    @mock.patch('api.tasks.campaign_tasks.send_fcm_topic_notification', return_value={'success': True})
+    @mock.patch('api.tasks.topic_tasks.update_fcm_topic_subscriptions', return_value={'success': True, 'errors': []})
+    def test_android_goes_through_fcm_topic(self, mock_update, mock_topic, mock_apns):
+        sync_fcm_topic_membership.apply(args=[str(Topic.objects.get().id), ['token_1'], True])
+        campaign = self.send()
+        self.run_campaign(campaign)
+
+        topic = Topic.objects.get(name='news')
+        mock_topic.assert_called_once_with(
+            topic.provider_topic, 'Breaking news', 'It happened', {}, server_key=settings.FCM_SERVER_KEY
+        )
+        self.assertEqual(campaign.status, 'completed')
+        self.assertEqual(campaign.provider_topic, topic.provider_topic)
+        self.assertEqual(
+            sorted(SendLog.objects.values_list('device__device_token', flat=True)),
+            ['token_0', 'token_2']
+        )
+
+    @mock.patch('api.tasks.push_tasks.send_fcm_notification', return_value={'success': True})
+    @mock.patch('api.tasks.push_tasks.send_apns_notification', return_value={'success': True})
+    @mock.patch('api.tasks.campaign_tasks.send_fcm_topic_notification', return_value={'success': True})
+    def test_unconfirmed_android_devices_are_sent_one_by_one(self, mock_topic, mock_apns, mock_fcm):
+        campaign = self.send()
+        self.run_campaign(campaign)
+
+        self.assertEqual(campaign.status, 'completed')
+        self.assertEqual(campaign.provider_topic, Topic.objects.get().provider_topic)
+        self.assertEqual(campaign.sent, 3)
+        mock_fcm.assert_called_once()
+
+    @mock.patch('api.tasks.push_tasks.send_fcm_notification', return_value={'success': True})
+    @mock.patch('api.tasks.push_tasks.send_apns_notification', return_value={'success': True})
+    @mock.patch('api.tasks.campaign_tasks.send_fcm_topic_notification', return_value={'success': False, 'error': 'down'})
+    def test_falls_back_to_per_device_delivery(self, mock_topic, mock_apns, mock_fcm):
+        campaign = self.send()
+        self.run_campaign(campaign)
+
+        self.assertEqual(campaign.status, 'completed')
+        self.assertEqual(campaign.provider_topic, '')
+        self.assertEqual(campaign.sent, 3)
+        mock_fcm.assert_called_once()
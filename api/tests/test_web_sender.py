@@ -0,0 +1,128 @@
+import base64
+import json
+import os
+import time
+from unittest import mock
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+import http_ece
+from django.test import SimpleTestCase, TestCase, override_settings
+from ..models import App, Device
+from ..utils import web_sender
+
+
+def b64url(data):
+    return base64.urlsafe_b64encode(data).strip(b'=').decode()
+
+
+def make_subscription(endpoint, browser_key=None, auth_secret=None):
+    browser_key = browser_key or ec.generate_private_key(ec.SECP256R1())
+    return json.dumps({
+        'endpoint': endpoint,
+        'keys': {
+            'p256dh': b64url(browser_key.public_key().public_bytes(
+                serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint
+            )),
+            'auth': b64url(auth_secret or os.urandom(16)),
+        }
+    })
+
+
+def make_vapid_key():
+    vapid_key = ec.generate_private_key(ec.SECP256R1())
+    return b64url(vapid_key.private_numbers().private_value.to_bytes(32, 'big'))
+
+
+@mock.patch('api.utils.web_sender.get_session')
+class VapidCacheTest(SimpleTestCase):
+    def setUp(self):
+        web_sender.vapid_cache.clear()
+        self.private_key = make_vapid_key()
+
+    def send(self, endpoint):
+        result = web_sender.send_web_notification(
+            make_subscription(endpoint), 'Hi', 'Body', {}, 'public_key', self.private_key
+        )
+        self.assertTrue(result['success'])
+
+    def authorization_headers(self, mock_session):
+        return [call.kwargs['headers']['Authorization'] for call in mock_session.return_value.post.call_args_list]
+
+    def test_headers_are_signed_once_per_audience(self, mock_session):
+        mock_session.return_value.post.return_value = mock.Mock(status_code=201, text='')
+
+        with mock.patch.object(web_sender.pywebpush.Vapid, 'from_string', wraps=web_sender.pywebpush.Vapid.from_string) as mock_parse:
+            self.send('https://fcm.googleapis.com/fcm/send/a')
+            self.send('https://fcm.googleapis.com/fcm/send/b')
+            self.send('https://updates.push.services.mozilla.com/wpush/v2/c')
+
+        self.assertEqual(mock_parse.call_count, 1)
+        first, second, third = self.authorization_headers(mock_session)
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, third)
+
+    def test_headers_are_re_signed_before_expiry(self, mock_session):
+        mock_session.return_value.post.return_value = mock.Mock(status_code=201, text='')
+        self.send('https://fcm.googleapis.com/fcm/send/a')
+
+        # 299s before the one-hour header expires, inside the 300s margin
+        later = time.time() + 3600 - 299
+        with mock.patch('api.utils.web_sender.time') as mock_time:
+            mock_time.time.return_value = later
+            self.send('https://fcm.googleapis.com/fcm/send/a')
+
+        first, second = self.authorization_headers(mock_session)
+        self.assertNotEqual(first, second)
+
+
+@override_settings(WEB_PUSH_ENCRYPT_PROCESSES=2)
+@mock.patch('api.utils.web_sender.get_session')
+class WebBatchTest(TestCase):
+    def test_batch_is_encrypted_in_parallel_and_posted(self, mock_session):
+        browser_key = ec.generate_private_key(ec.SECP256R1())
+        auth_secret = os.urandom(16)
+        messages = [
+            (make_subscription(f'https://fcm.googleapis.com/fcm/send/{i}', browser_key, auth_secret), 'Hi', f'Body {i}', {'n': i})
+            for i in range(web_sender.ENCRYPT_POOL_MIN_BATCH)
+        ]
+        messages[3] = (make_subscription('https://fcm.googleapis.com/fcm/send/gone'), 'Hi', 'Body 3', {})
+        app = App.objects.create(name='Test App', app_key='web_batch_key')
+        Device.objects.create(app=app, user_identifier='user_3', platform='web', device_token=messages[3][0])
+        mock_session.return_value.post.side_effect = lambda endpoint, data, headers, timeout: mock.Mock(
+            status_code=410 if endpoint.endswith('/gone') else 201, reason='Gone', text=''
+        )
+
+        results = web_sender.send_web_many(messages, 'public_key', make_vapid_key())
+
+        self.assertFalse(results[3]['success'])
+        self.assertTrue(results[3]['invalid_token'])
+        self.assertTrue(all(result['success'] for index, result in enumerate(results) if index != 3))
+        # Deactivating is left to whoever writes the results back
+        self.assertTrue(Device.objects.get(user_identifier='user_3').is_active)
+
+        posts = {call.args[0]: call.kwargs for call in mock_session.return_value.post.call_args_list}
+        post = posts['https://fcm.googleapis.com/fcm/send/7']
+        self.assertEqual(post['headers']['content-encoding'], 'aes128gcm')
+        payload = http_ece.decrypt(post['data'], private_key=browser_key, auth_secret=auth_secret, version='aes128gcm')
+        self.assertEqual(json.loads(payload), {'title': 'Hi', 'body': 'Body 7', 'n': 7})
+
+
+@override_settings(WEB_PUSH_ENCRYPT_PROCESSES=2)
+class EncryptionPoolTest(SimpleTestCase):
+    def setUp(self):
+        self.addCleanup(setattr, web_sender, '_encryption_pool_failed_pid', None)
+        self.addCleanup(setattr, web_sender, '_encryption_pool', None)
+        web_sender._encryption_pool = None
+
+    @mock.patch('api.utils.web_sender.ProcessPoolExecutor')
+    def test_failed_pool_is_not_retried_per_batch(self, mock_pool):
+        mock_pool.return_value.map.side_effect = AssertionError('daemonic processes are not allowed to have children')
+        subscriptions = [json.loads(make_subscription(f'https://fcm.googleapis.com/fcm/send/{i}')) for i in range(web_sender.ENCRYPT_POOL_MIN_BATCH)]
+        payloads = [b'{}'] * len(subscriptions)
+
+        for _ in range(3):
+            encrypted = list(web_sender._encrypt_all(subscriptions, payloads))
+            self.assertTrue(all(error is None for _, error in encrypted))
+
+        mock_pool.assert_called_once()
+        self.assertIsNone(web_sender.get_encryption_pool())
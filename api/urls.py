@@ -1,13 +1,32 @@
 from django.urls import path
-from .views.notification_views import SendNotificationView, BulkSendNotificationView
+from .views.notification_views import SendNotificationView, BulkSendNotificationView, SendToUserView
 from .views.app_views import AppListView, AppDetailView
 from .views.device_views import DeviceRegistrationView
 from .views.template_views import TemplateListView, TemplateDetailView, TemplatePreviewView
+from .views.bulk_job_views import BulkJobCreateView, BulkJobDetailView
+from .views.async_notification_views import AsyncSendNotificationView, AsyncBulkSendNotificationView
+from .views.campaign_views import CampaignListView, CampaignDetailView
+from .views.topic_views import TopicListView, TopicSubscribeView, TopicUnsubscribeView, TopicSendView
+from .views.dead_letter_views import DeadLetterListView, DeadLetterReplayView
 from . import views
 
 urlpatterns = [
     path('notifications/send/', SendNotificationView.as_view(), name='send-notification'),
     path('notifications/bulk/', BulkSendNotificationView.as_view(), name='bulk-send-notification'),
+    path('notifications/send-to-user/', SendToUserView.as_view(), name='send-to-user'),
+    path('notifications/jobs/', BulkJobCreateView.as_view(), name='bulk-job-create'),
+    path('notifications/jobs/<uuid:pk>/', BulkJobDetailView.as_view(), name='bulk-job-detail'),
+    path('notifications/dead-letters/', DeadLetterListView.as_view(), name='dead-letter-list'),
+    path('notifications/dead-letters/replay/', DeadLetterReplayView.as_view(), name='dead-letter-replay'),
+    path('campaigns/', CampaignListView.as_view(), name='campaign-list'),
+    path('campaigns/<uuid:pk>/', CampaignDetailView.as_view(), name='campaign-detail'),
+    path('topics/', TopicListView.as_view(), name='topic-list'),
+    path('topics/<str:name>/subscribe/', TopicSubscribeView.as_view(), name='topic-subscribe'),
+    path('topics/<str:name>/unsubscribe/', TopicUnsubscribeView.as_view(), name='topic-unsubscribe'),
+    path('topics/<str:name>/send/', TopicSendView.as_view(), name='topic-send'),
+    # Native async ingest endpoints, meant to be served by the ASGI application
+    path('async/notifications/send/', AsyncSendNotificationView.as_view(), name='async-send-notification'),
+    path('async/notifications/bulk/', AsyncBulkSendNotificationView.as_view(), name='async-bulk-send-notification'),
     path('apps/', AppListView.as_view(), name='app-list'),
     path('apps/<uuid:pk>/', AppDetailView.as_view(), name='app-detail'),
     path('devices/register/', DeviceRegistrationView.as_view(), name='device-register'),
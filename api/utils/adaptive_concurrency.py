@@ -0,0 +1,113 @@
+import asyncio
+import collections
+import threading
+import time
+from django.conf import settings
+
+
+class AIMDLimit:
+    """
+    Additive-increase / multiplicative-decrease limit on the requests one
+    process keeps in flight to a provider.
+
+    The limit starts at the configured concurrency (the ``setting`` it is
+    named after) and is multiplied by ADAPTIVE_CONCURRENCY_BACKOFF when a
+    request fails with a provider failure or takes longer than
+    ADAPTIVE_CONCURRENCY_TARGET_LATENCY, at most once per target latency so
+    one burst of failures in flight cuts it once. Each request that is fast
+    and succeeds adds 1/limit back, so the limit grows by one per round of
+    requests until it is back at the configured concurrency.
+    """
+
+    def __init__(self, setting):
+        self.setting = setting
+        self._limit = None
+        self._in_flight = 0
+        self._last_decrease = 0.0
+
+    @property
+    def maximum(self):
+        return max(1, getattr(settings, self.setting))
+
+    @property
+    def limit(self):
+        if self._limit is None or self._limit > self.maximum:
+            self._limit = float(self.maximum)
+        return self._limit
+
+    def _has_capacity(self):
+        return self._in_flight < max(settings.ADAPTIVE_CONCURRENCY_MIN, int(self.limit))
+
+    def _record(self, latency, failed):
+        limit = self.limit
+        now = time.monotonic()
+        if failed or latency > settings.ADAPTIVE_CONCURRENCY_TARGET_LATENCY:
+            if now - self._last_decrease >= settings.ADAPTIVE_CONCURRENCY_TARGET_LATENCY:
+                self._last_decrease = now
+                self._limit = max(settings.ADAPTIVE_CONCURRENCY_MIN, limit * settings.ADAPTIVE_CONCURRENCY_BACKOFF)
+        else:
+            self._limit = min(self.maximum, limit + 1 / limit)
+
+
+class ConcurrencyLimit(AIMDLimit):
+    """AIMDLimit shared by the threads of a process: acquire(), then release() with the outcome."""
+
+    def __init__(self, setting):
+        super().__init__(setting)
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Wait for a free slot and return the start time to pass to release()."""
+        with self._condition:
+            self._condition.wait_for(self._has_capacity)
+            self._in_flight += 1
+        return time.monotonic()
+
+    def release(self, started, failed=False):
+        with self._condition:
+            self._in_flight -= 1
+            self._record(time.monotonic() - started, failed)
+            self._condition.notify_all()
+
+
+class AsyncConcurrencyLimit(AIMDLimit):
+    """
+    AIMDLimit for the coroutines of one event loop. Waiters are woken in
+    order, only as many as there are free slots.
+    """
+
+    def __init__(self, setting):
+        super().__init__(setting)
+        self._waiters = collections.deque()
+
+    async def acquire(self):
+        """Wait for a free slot and return the start time to pass to release()."""
+        if not self._waiters and self._has_capacity():
+            self._in_flight += 1
+            return time.monotonic()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Woken and cancelled at once, hand the slot on
+                self._in_flight -= 1
+                self._wake()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+        return time.monotonic()
+
+    def release(self, started, failed=False):
+        self._in_flight -= 1
+        self._record(time.monotonic() - started, failed)
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self._has_capacity():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._in_flight += 1
+                waiter.set_result(None)
@@ -1,30 +1,274 @@
 import jwt
 import time
 import json
-import requests
-from cryptography.hazmat.primitives import serialization
+import os
+import asyncio
+import ssl
+import threading
+from functools import lru_cache
+import httpx
 from cryptography.hazmat.primitives.serialization import load_pem_private_key
 from cryptography.hazmat.backends import default_backend
 import logging
 from django.conf import settings
+from .adaptive_concurrency import AsyncConcurrencyLimit
+from .circuit_breaker import is_provider_failure, response_retry_after
 
 logger = logging.getLogger(__name__)
 
+APNS_PRODUCTION_HOST = 'https://api.push.apple.com'
+APNS_SANDBOX_HOST = 'https://api.sandbox.push.apple.com'
 
-def send_apns_notification(device_token, title, body, data=None):
+# APNs reasons meaning the token will never be deliverable again
+INVALID_TOKEN_REASONS = frozenset(['Unregistered', 'BadDeviceToken', 'DeviceTokenNotForTopic'])
+
+# httpx opens at most 100 concurrent streams on one HTTP/2 connection
+STREAMS_PER_CONNECTION = 100
+
+
+def apns_token_auth_configured():
+    """True when a .p8 auth key is configured for token-based authentication."""
+    return bool(settings.APNS_AUTH_KEY_PATH and settings.APNS_KEY_ID and settings.APNS_TEAM_ID)
+
+
+def apns_configured():
+    return bool(settings.APNS_TOPIC and (apns_token_auth_configured() or settings.APNS_CERT_PATH))
+
+
+def apns_host():
+    if settings.APNS_HOST:
+        return settings.APNS_HOST
+    return APNS_SANDBOX_HOST if settings.APNS_USE_SANDBOX else APNS_PRODUCTION_HOST
+
+
+@lru_cache(maxsize=8)
+def load_auth_key(path):
+    """Read and cache an APNs .p8 signing key."""
+    with open(path, 'rb') as f:
+        return load_pem_private_key(f.read(), password=None, backend=default_backend())
+
+
+class ProviderToken:
     """
-    Send push notification via Apple Push Notification Service.
+    Process-wide cache of the ES256 provider token sent to APNs.
+
+    APNs rejects tokens older than an hour and throttles providers that
+    replace them more than every 20 minutes, so one token is signed and
+    reused by every request until APNS_TOKEN_TTL seconds have passed.
     """
-    apns_cert_path = settings.APNS_CERT_PATH
-    apns_topic = settings.APNS_TOPIC
-    
-    if not apns_cert_path or not apns_topic:
-        return {
-            'success': False,
-            'error': 'APNs configuration not set'
-        }
 
-    # Prepare the payload
+    def __init__(self):
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def get(self):
+        key = (settings.APNS_KEY_ID, settings.APNS_TEAM_ID)
+        entry = self._tokens.get(key)
+        if entry is not None and time.time() - entry[1] < settings.APNS_TOKEN_TTL:
+            return entry[0]
+
+        with self._lock:
+            entry = self._tokens.get(key)
+            if entry is None or time.time() - entry[1] >= settings.APNS_TOKEN_TTL:
+                issued_at = int(time.time())
+                token = jwt.encode(
+                    {'iss': settings.APNS_TEAM_ID, 'iat': issued_at},
+                    load_auth_key(settings.APNS_AUTH_KEY_PATH),
+                    algorithm='ES256',
+                    headers={'kid': settings.APNS_KEY_ID},
+                )
+                entry = self._tokens[key] = (token, issued_at)
+        return entry[0]
+
+    def invalidate(self, token):
+        """Drop ``token`` so the next get() signs a new one."""
+        with self._lock:
+            for key, entry in list(self._tokens.items()):
+                if entry[0] == token:
+                    del self._tokens[key]
+
+    def clear(self):
+        with self._lock:
+            self._tokens.clear()
+
+
+provider_tokens = ProviderToken()
+
+
+class APNsClient:
+    """
+    Persistent HTTP/2 client for APNs, for one host, topic and
+    authentication: the client certificate at ``cert_path``, or the
+    shared .p8 provider token when there is none.
+
+    The client lives on a background event loop so that synchronous callers
+    (Celery tasks) share its multiplexed connections: a batch of sends is
+    submitted to the loop and up to APNS_MAX_CONCURRENT_STREAMS of them are
+    in flight as concurrent streams, fewer while APNs is slow or failing
+    (see AsyncConcurrencyLimit). A connection is filled up to
+    STREAMS_PER_CONNECTION streams before the next of APNS_MAX_CONNECTIONS
+    is opened.
+    """
+
+    def __init__(self, host, cert_path=None, topic=None, loop=None):
+        self.host = host
+        self.cert_path = cert_path
+        self.topic = topic or settings.APNS_TOPIC
+        self._ssl_context = None
+        self._clients = [None] * settings.APNS_MAX_CONNECTIONS
+        self._in_flight = [0] * settings.APNS_MAX_CONNECTIONS
+        self._limit = AsyncConcurrencyLimit('APNS_MAX_CONCURRENT_STREAMS')
+        if loop is not None:
+            # Driven by the caller's event loop, see api/utils/delivery_engine.py
+            self.loop = loop
+            return
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name='apns-client', daemon=True)
+        self._thread.start()
+
+    def _build_client(self):
+        if self.cert_path and self._ssl_context is None:
+            # Certificate-based authentication, the certificate is loaded
+            # once and shared by every connection
+            self._ssl_context = ssl.create_default_context()
+            self._ssl_context.load_cert_chain(self.cert_path)
+        return httpx.AsyncClient(
+            base_url=self.host,
+            http1=False,
+            http2=True,
+            verify=self._ssl_context or True,
+            timeout=10,
+            limits=httpx.Limits(max_connections=1),
+        )
+
+    def _acquire_connection(self):
+        """Index of the first connection with a free stream, else the least busy one."""
+        for index, in_flight in enumerate(self._in_flight):
+            if in_flight < STREAMS_PER_CONNECTION:
+                break
+        else:
+            index = self._in_flight.index(min(self._in_flight))
+        if self._clients[index] is None:
+            self._clients[index] = self._build_client()
+        self._in_flight[index] += 1
+        return index
+
+    async def send_async(self, device_token, title, body, data=None):
+        """Send one notification; must run on this client's loop."""
+        started = await self._limit.acquire()
+        result = None
+        try:
+            result = await self._post(device_token, json.dumps(build_payload(title, body, data)))
+            return result
+        finally:
+            self._limit.release(started, result is None or is_provider_failure(result))
+
+    async def _post(self, device_token, payload):
+        index = self._acquire_connection()
+        try:
+            for attempt in range(2):
+                headers = {
+                    'apns-topic': self.topic,
+                    'apns-push-type': 'alert',
+                    'content-type': 'application/json'
+                }
+                token = None
+                if not self.cert_path and apns_token_auth_configured():
+                    token = provider_tokens.get()
+                    headers['authorization'] = f'bearer {token}'
+
+                response = await self._clients[index].post(f'/3/device/{device_token}', headers=headers, content=payload)
+                reason = ''
+                if response.content:
+                    try:
+                        reason = response.json().get('reason', '')
+                    except ValueError:
+                        pass
+                if reason == 'ExpiredProviderToken' and token and attempt == 0:
+                    provider_tokens.invalidate(token)
+                    continue
+                break
+
+            if response.status_code == 200:
+                return {
+                    'success': True,
+                    'response': response.headers.get('apns-id', ''),
+                    'status_code': response.status_code
+                }
+            return {
+                'success': False,
+                'error': f'APNs error: {reason or response.text}',
+                'invalid_token': response.status_code == 410 or reason in INVALID_TOKEN_REASONS,
+                'status_code': response.status_code,
+                'retry_after': response_retry_after(response)
+            }
+
+        except httpx.HTTPError as e:
+            logger.error(f"APNs request failed: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e),
+                'unavailable': True
+            }
+        except Exception as e:
+            logger.error(f"APNs send error: {str(e)}", exc_info=True)
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        finally:
+            self._in_flight[index] -= 1
+
+    async def send_many_async(self, messages):
+        return await asyncio.gather(*(self.send_async(*message) for message in messages))
+
+    def send_many(self, messages):
+        """Send (device_token, title, body, data) messages from synchronous code."""
+        return asyncio.run_coroutine_threadsafe(self.send_many_async(messages), self.loop).result()
+
+    async def aclose(self):
+        for client in self._clients:
+            if client is not None:
+                await client.aclose()
+        self._clients = [None] * len(self._clients)
+
+
+_clients = {}
+_clients_pid = None
+_clients_lock = threading.Lock()
+
+
+def apns_client_key(cert_path=None, topic=None):
+    """
+    (host, certificate path, topic) of the APNsClient for an App's own
+    certificate and topic, or for the global settings where they are blank.
+    """
+    if not cert_path:
+        cert_path = None if apns_token_auth_configured() else settings.APNS_CERT_PATH
+    return apns_host(), cert_path, topic or settings.APNS_TOPIC
+
+
+def get_apns_client(key=None):
+    """
+    Return this process's APNsClient for ``key`` (see apns_client_key(),
+    the global settings by default).
+
+    A forked worker starts its own loop and connection instead of reusing
+    the parent's.
+    """
+    global _clients_pid
+    key = key or apns_client_key()
+    with _clients_lock:
+        if _clients_pid != os.getpid():
+            _clients.clear()
+            _clients_pid = os.getpid()
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = APNsClient(*key)
+    return client
+
+
+def build_payload(title, body, data=None):
     apns_payload = {
         'aps': {
             'alert': {
@@ -35,64 +279,47 @@ def send_apns_notification(device_token, title, body, data=None):
             'sound': 'default'
         }
     }
-    
+
     if data:
         apns_payload.update(data)
+    return apns_payload
 
-    headers = {
-        'apns-topic': apns_topic,
-        'content-type': 'application/json'
-    }
 
-    try:
-        # For APNs with certificate-based authentication
-        response = requests.post(
-            f'https://api.push.apple.com/3/device/{device_token}',
-            headers=headers,
-            data=json.dumps(apns_payload),
-            cert=apns_cert_path,
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            return {
-                'success': True,
-                'response': response.text,
-                'status_code': response.status_code
-            }
-        else:
-            # Check for specific error codes
-            error_msg = response.text
-            if response.status_code == 410:  # Device token expired
-                # Mark device as inactive
-                from api.models import Device
-                Device.objects.filter(device_token=device_token).update(is_active=False)
-            
-            return {
-                'success': False,
-                'error': f'APNs error: {error_msg}',
-                'status_code': response.status_code
-            }
-        
-    except requests.exceptions.RequestException as e:
-        logger.error(f"APNs request failed: {str(e)}")
-        return {
-            'success': False,
-            'error': str(e),
-            'status_code': getattr(e.response, 'status_code', None)
-        }
-    except Exception as e:
-        logger.error(f"APNs send error: {str(e)}", exc_info=True)
-        return {
-            'success': False,
-            'error': str(e)
-        }
+def send_apns_many(messages, client=None):
+    """
+    Send many (device_token, title, body, data) messages over the shared
+    HTTP/2 connection of ``client`` (an App's, see
+    api/utils/credentials.py), or of the globally configured one. Returns
+    one result dict per message, in order; tokens APNs rejects for good
+    are flagged ``invalid_token`` for the caller to deactivate.
+    """
+    messages = list(messages)
+    if not messages:
+        return []
+    if client is None:
+        if not apns_configured():
+            return [{'success': False, 'error': 'APNs configuration not set'} for _ in messages]
+        client = get_apns_client()
+
+    return client.send_many(messages)
+
+
+def send_apns_notification(device_token, title, body, data=None, client=None):
+    """
+    Send push notification via Apple Push Notification Service.
+
+    Uses the .p8 auth key when configured, the client certificate otherwise.
+    """
+    return send_apns_many([(device_token, title, body, data)], client)[0]
 
 
 def send_apns_notification_with_auth_key(device_token, title, body, data=None):
     """
     Alternative method using JWT authentication for APNs.
     """
-    # You would need to implement JWT token generation here
-    # This requires your APNs auth key and team ID
-    pass
\ No newline at end of file
+    if not apns_token_auth_configured():
+        return {
+            'success': False,
+            'error': 'APNs auth key not configured'
+        }
+    return send_apns_notification(device_token, title, body, data)
@@ -0,0 +1,337 @@
+import logging
+from asgiref.sync import sync_to_async
+from celery import group
+from django.db import transaction
+from django.utils import timezone
+from ..models import Device, SendLog, ScheduledNotification
+from ..serializers import NotificationRequestSerializer
+from ..tasks.push_tasks import send_push_notification_task
+from .template_renderer import TemplateRenderer
+from .template_cache import template_resolver
+from .scheduler import is_deferred, build_scheduled_notification, scheduled_result
+from .queues import DEFAULT_PRIORITY, queue_for_priority
+
+logger = logging.getLogger(__name__)
+
+
+class BulkIngest:
+    """
+    Set-based ingestion pipeline for a batch of notification requests.
+
+    Devices are resolved with one lookup plus one upsert, each distinct
+    template is resolved once through the template cache and rendered in
+    one batch across all of its contexts, every SendLog is written with a
+    single bulk_create and all Celery messages are published in one group.
+    Items with a future send_at are stored as ScheduledNotifications in
+    one more bulk_create instead.
+    The number of queries depends on the batch shape, not its size.
+    """
+
+    def __init__(self, app, notifications, default_priority=DEFAULT_PRIORITY, publish=True):
+        self.app = app
+        self.notifications = list(notifications)
+        # Delivery priority for items that do not set their own
+        self.default_priority = default_priority
+        # False when run() is called inside the caller's transaction: the
+        # messages are then published by publish() once it has committed,
+        # so no worker looks for a SendLog that is not visible yet
+        self.publish_on_run = publish
+        self.unpublished = []
+        self.results = [None] * len(self.notifications)
+        # (index, validated_data) pairs that passed validation
+        self.items = []
+        # (index, ScheduledNotification) pairs for items with a future send_at
+        self.deferred = []
+
+    def run(self):
+        """Process the batch and return one result dict per notification, in order."""
+        self._validate()
+
+        if self.deferred:
+            ScheduledNotification.objects.bulk_create([scheduled for _, scheduled in self.deferred])
+            self._set_scheduled_results()
+
+        if self.items:
+            devices = self._resolve_devices()
+            templates = self._resolve_templates()
+            pending = self._build_send_logs(devices, templates)
+
+            if pending:
+                with transaction.atomic():
+                    SendLog.objects.bulk_create([send_log for _, send_log, _ in pending])
+                if self.publish_on_run:
+                    self._enqueue(pending)
+                else:
+                    self.unpublished = pending
+                    self._set_queue_results(pending, queued=True)
+
+        return self.results
+
+    def publish(self):
+        """
+        Publish the messages left unpublished by ``run`` when the ingest was
+        created with ``publish=False``, and return the indexes of the
+        notifications that could not be queued.
+        """
+        pending, self.unpublished = self.unpublished, []
+        if not pending:
+            return []
+        self._enqueue(pending)
+        return [index for index, _, _ in pending if not self.results[index]['success']]
+
+    async def arun(self):
+        """
+        Async variant of run() for ASGI views.
+
+        Uses Django's async ORM for the queries and publishes to the broker
+        from a worker thread so the event loop is never blocked.
+        """
+        self._validate()
+
+        if self.deferred:
+            await ScheduledNotification.objects.abulk_create([scheduled for _, scheduled in self.deferred])
+            self._set_scheduled_results()
+
+        if self.items:
+            devices = await self._aresolve_devices()
+            templates = await self._aresolve_templates()
+            pending = self._build_send_logs(devices, templates)
+
+            if pending:
+                await SendLog.objects.abulk_create([send_log for _, send_log, _ in pending])
+                await self._aenqueue(pending)
+
+        return self.results
+
+    def _validate(self):
+        for index, notification_data in enumerate(self.notifications):
+            serializer = NotificationRequestSerializer(data=notification_data)
+            if not serializer.is_valid():
+                self.results[index] = {
+                    'success': False,
+                    'message': 'Invalid notification data',
+                    'errors': serializer.errors
+                }
+                continue
+            if is_deferred(serializer.validated_data):
+                self.deferred.append((index, build_scheduled_notification(self.app, serializer.validated_data)))
+                continue
+            self.items.append((index, serializer.validated_data))
+
+    def _set_scheduled_results(self):
+        for index, scheduled in self.deferred:
+            self.results[index] = scheduled_result(scheduled)
+
+    def _resolve_devices(self):
+        """
+        Return a device_token -> Device map for every validated item.
+
+        Existing devices are fetched in one query and the missing ones are
+        inserted in one bulk_create. Conflicting inserts are ignored, so the
+        new rows are read back to pick up whatever actually landed.
+        """
+        tokens = {validated_data['device_token'] for _, validated_data in self.items}
+        devices = {
+            device.device_token: device
+            for device in Device.objects.filter(app=self.app, device_token__in=tokens)
+        }
+
+        new_devices = self._new_devices(devices)
+        if new_devices:
+            Device.objects.bulk_create(new_devices.values(), ignore_conflicts=True)
+            devices.update({
+                device.device_token: device
+                for device in Device.objects.filter(app=self.app, device_token__in=new_devices.keys())
+            })
+
+        return devices
+
+    async def _aresolve_devices(self):
+        tokens = {validated_data['device_token'] for _, validated_data in self.items}
+        devices = {
+            device.device_token: device
+            async for device in Device.objects.filter(app=self.app, device_token__in=tokens)
+        }
+
+        new_devices = self._new_devices(devices)
+        if new_devices:
+            await Device.objects.abulk_create(new_devices.values(), ignore_conflicts=True)
+            devices.update({
+                device.device_token: device
+                async for device in Device.objects.filter(app=self.app, device_token__in=new_devices.keys())
+            })
+
+        return devices
+
+    def _new_devices(self, devices):
+        """Build unsaved Device rows for tokens missing from ``devices``."""
+        new_devices = {}
+        for _, validated_data in self.items:
+            token = validated_data['device_token']
+            if token in devices or token in new_devices:
+                continue
+            new_devices[token] = Device(
+                app=self.app,
+                device_token=token,
+                platform=validated_data['platform'],
+                user_identifier=validated_data['user'].get('id', 'unknown'),
+                is_active=True
+            )
+        return new_devices
+
+    def _resolve_templates(self):
+        """Return a name -> latest active Template map from the template cache."""
+        return template_resolver.get_many(self.app, self._template_names())
+
+    async def _aresolve_templates(self):
+        return await sync_to_async(template_resolver.get_many)(self.app, self._template_names())
+
+    def _template_names(self):
+        return {
+            validated_data['notification_type']
+            for _, validated_data in self.items
+            if not (validated_data.get('title') and validated_data.get('body'))
+        }
+
+    def _render_templates(self, devices, templates):
+        """
+        Return an index -> rendered map for every templated item that will
+        be sent, rendering each template once across all of its contexts.
+        """
+        batches = {}
+        for index, validated_data in self.items:
+            if validated_data.get('title') and validated_data.get('body'):
+                continue
+            device = devices.get(validated_data['device_token'])
+            if device is None or not device.is_active:
+                continue
+            name = validated_data['notification_type']
+            if name in templates:
+                batches.setdefault(name, []).append((index, validated_data))
+
+        rendered = {}
+        for name, batch in batches.items():
+            outputs = TemplateRenderer(templates[name]).render_many(
+                [validated_data['user'] for _, validated_data in batch],
+                [validated_data['data'] for _, validated_data in batch]
+            )
+            rendered.update(zip((index for index, _ in batch), outputs))
+        return rendered
+
+    def _build_send_logs(self, devices, templates):
+        rendered_items = self._render_templates(devices, templates)
+        pending = []
+
+        for index, validated_data in self.items:
+            device = devices.get(validated_data['device_token'])
+            if device is None:
+                self.results[index] = {
+                    'success': False,
+                    'message': 'Device could not be registered'
+                }
+                continue
+
+            if not device.is_active:
+                self.results[index] = {
+                    'success': False,
+                    'message': 'Device is not active'
+                }
+                continue
+
+            template = None
+            if validated_data.get('title') and validated_data.get('body'):
+                title = validated_data['title']
+                body = validated_data['body']
+                subject = validated_data.get('subject', '')
+                data = validated_data.get('data', {})
+            else:
+                template = templates.get(validated_data['notification_type'])
+                if not template:
+                    self.results[index] = {
+                        'success': False,
+                        'message': f'Template "{validated_data["notification_type"]}" not found'
+                    }
+                    continue
+
+                rendered = rendered_items[index]
+                title = rendered['title']
+                body = rendered['body']
+                subject = rendered['subject']
+                data = rendered['data']
+
+            send_log = SendLog(
+                app=self.app,
+                device=device,
+                template=template,
+                notification_type=validated_data['notification_type'],
+                title=title,
+                body=body,
+                subject=subject,
+                data=data,
+                raw_request=validated_data,
+                status='pending'
+            )
+            pending.append((index, send_log, validated_data))
+
+        return pending
+
+    def _enqueue(self, pending):
+        try:
+            self._publish(pending)
+        except Exception as e:
+            logger.error(f"Error queuing bulk notifications with Celery: {str(e)}", exc_info=True)
+            SendLog.objects.filter(id__in=[send_log.id for _, send_log, _ in pending]).update(
+                status='failed',
+                error_message=f"Celery error: {str(e)}",
+                updated_at=timezone.now()
+            )
+            self._set_queue_results(pending, queued=False)
+        else:
+            self._set_queue_results(pending, queued=True)
+
+    async def _aenqueue(self, pending):
+        try:
+            await sync_to_async(self._publish, thread_sensitive=False)(pending)
+        except Exception as e:
+            logger.error(f"Error queuing bulk notifications with Celery: {str(e)}", exc_info=True)
+            await SendLog.objects.filter(id__in=[send_log.id for _, send_log, _ in pending]).aupdate(
+                status='failed',
+                error_message=f"Celery error: {str(e)}",
+                updated_at=timezone.now()
+            )
+            self._set_queue_results(pending, queued=False)
+        else:
+            self._set_queue_results(pending, queued=True)
+
+    def _publish(self, pending):
+        """Publish one Celery message per SendLog over a single producer connection."""
+        signatures = [
+            send_push_notification_task.s(
+                send_log_id=str(send_log.id),
+                device_token=send_log.device.device_token,
+                platform=validated_data['platform'],
+                title=send_log.title,
+                body=send_log.body,
+                data=send_log.data,
+                subject=send_log.subject
+            ).set(queue=queue_for_priority(validated_data.get('priority') or self.default_priority))
+            for _, send_log, validated_data in pending
+        ]
+        group(signatures).apply_async()
+
+    def _set_queue_results(self, pending, queued):
+        for index, send_log, _ in pending:
+            if not queued:
+                self.results[index] = {
+                    'success': False,
+                    'message': 'Failed to queue notification (Celery unavailable)'
+                }
+                continue
+            self.results[index] = {
+                'success': True,
+                'message': 'Notification queued for sending',
+                'data': {
+                    'send_log_id': str(send_log.id),
+                    'device_id': str(send_log.device.id)
+                }
+            }
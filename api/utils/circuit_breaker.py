@@ -0,0 +1,319 @@
+import email.utils
+import logging
+import threading
+import time
+import redis
+from django.conf import settings
+from .redis_client import get_redis, mark_unavailable
+
+logger = logging.getLogger(__name__)
+
+# Provider behind each device platform
+PLATFORM_PROVIDERS = {
+    'android': 'fcm',
+    'ios': 'apns',
+    'web': 'webpush',
+}
+
+# Scope of a provider's breaker shared by every app
+ALL_APPS = '*'
+
+# KEYS: breaker keys, all of which must let traffic through. Returns
+# {allowed, seconds until the next attempt, probe}. An open breaker lets one
+# probe through per CIRCUIT_PROBE_INTERVAL once its open period is over
+# (half-open); the probe slots are only taken when every breaker allows.
+ALLOW_SCRIPT = """
+local probe_interval = tonumber(ARGV[1])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local probing = {}
+for _, key in ipairs(KEYS) do
+    local state = redis.call('HMGET', key, 'open_until', 'probe_until')
+    local open_until = tonumber(state[1]) or 0
+    if open_until > 0 then
+        if now < open_until then
+            return {0, tostring(open_until - now), 0}
+        end
+        local probe_until = tonumber(state[2]) or 0
+        if now < probe_until then
+            return {0, tostring(probe_until - now), 0}
+        end
+        table.insert(probing, key)
+    end
+end
+for _, key in ipairs(probing) do
+    redis.call('HSET', key, 'probe_until', tostring(now + probe_interval))
+end
+return {1, '0', #probing > 0 and 1 or 0}
+"""
+
+# KEYS[1]: breaker key. ARGV: successes, failures, retry_after, window,
+# min_requests, failure_ratio, open_seconds, max_open_seconds.
+# Returns the state after recording: closed or open.
+RECORD_SCRIPT = """
+local successes = tonumber(ARGV[1])
+local failures = tonumber(ARGV[2])
+local retry_after = tonumber(ARGV[3])
+local window = tonumber(ARGV[4])
+local min_requests = tonumber(ARGV[5])
+local failure_ratio = tonumber(ARGV[6])
+local open_seconds = tonumber(ARGV[7])
+local max_open = tonumber(ARGV[8])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'window_start', 'requests', 'failures', 'open_until', 'trips')
+local window_start = tonumber(state[1]) or now
+local requests = tonumber(state[2]) or 0
+local failed = tonumber(state[3]) or 0
+local open_until = tonumber(state[4]) or 0
+local trips = tonumber(state[5]) or 0
+
+if open_until > 0 then
+    if now < open_until then
+        -- Results of requests sent before the breaker opened
+        return 'open'
+    end
+    if failures == 0 and retry_after == 0 then
+        redis.call('DEL', KEYS[1])
+        return 'closed'
+    end
+    -- The probe failed: open again, twice as long each time
+    trips = trips + 1
+    local duration = math.max(retry_after, math.min(max_open, open_seconds * 2 ^ (trips - 1)))
+    redis.call('HSET', KEYS[1], 'open_until', tostring(now + duration), 'trips', trips, 'probe_until', 0)
+    redis.call('EXPIRE', KEYS[1], math.ceil(duration + window))
+    return 'open'
+end
+
+if now - window_start > window then
+    window_start = now
+    requests = 0
+    failed = 0
+end
+requests = requests + successes + failures
+failed = failed + failures
+
+if retry_after > 0 or (requests >= min_requests and failed >= requests * failure_ratio) then
+    local duration = math.max(retry_after, open_seconds)
+    redis.call('HSET', KEYS[1], 'open_until', tostring(now + duration), 'trips', 1, 'probe_until', 0,
+        'window_start', tostring(now), 'requests', 0, 'failures', 0)
+    redis.call('EXPIRE', KEYS[1], math.ceil(duration + window))
+    return 'open'
+end
+redis.call('HSET', KEYS[1], 'window_start', tostring(window_start), 'requests', requests, 'failures', failed)
+redis.call('EXPIRE', KEYS[1], math.ceil(window))
+return 'closed'
+"""
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delay-seconds or HTTP-date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def response_retry_after(response):
+    """Seconds a 429 or 5xx ``response`` (requests or httpx) asked to wait, or None."""
+    if response.status_code != 429 and response.status_code < 500:
+        return None
+    return parse_retry_after(response.headers.get('Retry-After'))
+
+
+def is_provider_failure(result):
+    """
+    True when a send failed because the provider is throttling, failing or
+    unreachable (429, 5xx, timeouts), as opposed to a bad token or payload.
+    """
+    if result.get('success'):
+        return False
+    status_code = result.get('status_code')
+    if status_code is not None:
+        return status_code == 429 or status_code >= 500
+    return bool(result.get('unavailable'))
+
+
+class CircuitBreaker:
+    """
+    Circuit breakers per provider, both for all apps and per app.
+
+    A breaker opens when at least CIRCUIT_FAILURE_RATIO of the last
+    CIRCUIT_MIN_REQUESTS or more sends within CIRCUIT_WINDOW seconds were
+    provider failures (see is_provider_failure), or as soon as the provider
+    answers with Retry-After. It stays open for CIRCUIT_OPEN_SECONDS (or
+    the Retry-After delay), then lets one probe through per
+    CIRCUIT_PROBE_INTERVAL; a failed probe doubles the open period, up to
+    CIRCUIT_MAX_OPEN_SECONDS.
+
+    State lives in Redis so every worker process sees a tripped breaker;
+    while Redis is unavailable each process keeps its own.
+    """
+
+    def __init__(self):
+        self._scripts = {}
+        self._script_client = None
+        self._local = {}
+        self._lock = threading.Lock()
+
+    def allow(self, provider, app_id):
+        """
+        Check the provider-wide and the app's breaker.
+
+        Returns (allowed, seconds until traffic should be tried again,
+        probe); ``probe`` is True when a half-open breaker lets one request
+        through to test the provider. A half-open breaker only hands out
+        its probe when the other breaker lets traffic through too.
+        """
+        return self._allow([f"circuit:{provider}:{ALL_APPS}", f"circuit:{provider}:{app_id}"])
+
+    def admit(self, provider, app_id, items):
+        """
+        Split ``items`` bound for ``provider`` into (to send, to park,
+        seconds to park them for): nothing is sent while a breaker is open
+        and only the first item while it is probing.
+        """
+        allowed, retry_in, probe = self.allow(provider, app_id)
+        if not allowed:
+            return [], list(items), retry_in
+        if probe:
+            return list(items[:1]), list(items[1:]), settings.CIRCUIT_PROBE_INTERVAL
+        return list(items), [], 0.0
+
+    def record(self, provider, app_id, results):
+        """
+        Record the results of sends to ``provider`` for ``app_id``.
+
+        A 429 only counts against the app (it is throttling that app), and
+        its Retry-After throttles the app; 5xx and unreachable results count
+        against the whole provider too, and a Retry-After on them throttles
+        every app. Returns the new state of the app's breaker.
+        """
+        successes = failures = throttled = 0
+        app_retry_after = provider_retry_after = 0.0
+        for result in results:
+            if not is_provider_failure(result):
+                successes += 1
+                continue
+            failures += 1
+            retry_after = result.get('retry_after') or 0.0
+            if result.get('status_code') == 429:
+                throttled += 1
+                app_retry_after = max(app_retry_after, retry_after)
+            else:
+                provider_retry_after = max(provider_retry_after, retry_after)
+        if not successes and not failures:
+            return 'closed'
+
+        provider_state = 'closed'
+        if successes or failures > throttled:
+            provider_state = self._record(
+                f"circuit:{provider}:{ALL_APPS}", successes, failures - throttled, provider_retry_after
+            )
+        state = self._record(f"circuit:{provider}:{app_id}", successes, failures, app_retry_after)
+        if 'open' in (state, provider_state) and failures:
+            logger.warning(
+                f"{provider} circuit open for {'all apps' if provider_state == 'open' else f'app {app_id}'}: "
+                f"{failures} of {successes + failures} sends failed"
+            )
+        return state
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+    def _get_script(self, client, name, source):
+        if self._script_client is not client:
+            self._scripts = {}
+            self._script_client = client
+        if name not in self._scripts:
+            self._scripts[name] = client.register_script(source)
+        return self._scripts[name]
+
+    def _allow(self, keys):
+        client = get_redis()
+        if client is not None:
+            try:
+                allowed, retry_in, probe = self._get_script(client, 'allow', ALLOW_SCRIPT)(
+                    keys=keys, args=[settings.CIRCUIT_PROBE_INTERVAL]
+                )
+                return bool(int(allowed)), float(retry_in), bool(int(probe))
+            except redis.RedisError as e:
+                mark_unavailable(e)
+        return self._allow_local(keys)
+
+    def _record(self, key, successes, failures, retry_after):
+        client = get_redis()
+        if client is not None:
+            try:
+                state = self._get_script(client, 'record', RECORD_SCRIPT)(
+                    keys=[key],
+                    args=[
+                        successes, failures, retry_after,
+                        settings.CIRCUIT_WINDOW, settings.CIRCUIT_MIN_REQUESTS, settings.CIRCUIT_FAILURE_RATIO,
+                        settings.CIRCUIT_OPEN_SECONDS, settings.CIRCUIT_MAX_OPEN_SECONDS,
+                    ]
+                )
+                return state.decode() if isinstance(state, bytes) else state
+            except redis.RedisError as e:
+                mark_unavailable(e)
+        return self._record_local(key, successes, failures, retry_after)
+
+    def _allow_local(self, keys):
+        now = time.time()
+        with self._lock:
+            probing = []
+            for key in keys:
+                state = self._local.get(key)
+                if state is None or not state.get('open_until'):
+                    continue
+                if now < state['open_until']:
+                    return False, state['open_until'] - now, False
+                if now < state['probe_until']:
+                    return False, state['probe_until'] - now, False
+                probing.append(state)
+            for state in probing:
+                state['probe_until'] = now + settings.CIRCUIT_PROBE_INTERVAL
+            return True, 0.0, bool(probing)
+
+    def _record_local(self, key, successes, failures, retry_after):
+        now = time.time()
+        with self._lock:
+            state = self._local.setdefault(key, {'window_start': now, 'requests': 0, 'failures': 0})
+            if state.get('open_until'):
+                if now < state['open_until']:
+                    return 'open'
+                if not failures and not retry_after:
+                    del self._local[key]
+                    return 'closed'
+                state['trips'] += 1
+                duration = max(retry_after, min(
+                    settings.CIRCUIT_MAX_OPEN_SECONDS, settings.CIRCUIT_OPEN_SECONDS * 2 ** (state['trips'] - 1)
+                ))
+                state.update(open_until=now + duration, probe_until=0)
+                return 'open'
+
+            if now - state['window_start'] > settings.CIRCUIT_WINDOW:
+                state.update(window_start=now, requests=0, failures=0)
+            state['requests'] += successes + failures
+            state['failures'] += failures
+            if retry_after or (
+                state['requests'] >= settings.CIRCUIT_MIN_REQUESTS
+                and state['failures'] >= state['requests'] * settings.CIRCUIT_FAILURE_RATIO
+            ):
+                self._local[key] = {
+                    'window_start': now, 'requests': 0, 'failures': 0,
+                    'open_until': now + max(retry_after, settings.CIRCUIT_OPEN_SECONDS),
+                    'probe_until': 0, 'trips': 1,
+                }
+                return 'open'
+            return 'closed'
+
+
+circuit_breaker = CircuitBreaker()
@@ -0,0 +1,98 @@
+import logging
+import os
+import threading
+from django.conf import settings
+from .apns_sender import apns_client_key, apns_token_auth_configured, get_apns_client
+from .fcm_v1_sender import fcm_v1_configured
+from .web_sender import vapid_cache
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_credentials(app):
+    """
+    The provider credentials ``app`` sends with: its own where set, the
+    global settings otherwise. Compared on every lookup to tell whether a
+    cached AppCredentials is still current.
+    """
+    return (
+        app.fcm_server_key or settings.FCM_SERVER_KEY,
+        # An App with its own server key sends through its own (legacy)
+        # Firebase project, not the service account of the global one
+        not app.fcm_server_key and fcm_v1_configured(),
+        apns_client_key(app.apns_cert_path, app.apns_topic),
+        app.web_vapid_public_key,
+        app.web_vapid_private_key,
+    )
+
+
+class AppCredentials:
+    """
+    One App's provider credentials with their clients ready to send:
+    the FCM server key, the APNs client for its certificate (or the shared
+    provider token) and topic, and its parsed VAPID key.
+    """
+
+    def __init__(self, app, resolved):
+        self.app_id = app.id
+        self.resolved = resolved
+        (self.fcm_server_key, self.fcm_v1, self.apns_key,
+         self.vapid_public_key, self.vapid_private_key) = resolved
+        _, cert_path, topic = self.apns_key
+        self.apns_configured = bool(topic and (cert_path or apns_token_auth_configured()))
+        self._apns_client = None
+
+        if self.vapid_private_key:
+            try:
+                vapid_cache.key(self.vapid_private_key)
+            except Exception as e:
+                # Reported per message by the web sender
+                logger.warning(f"Invalid VAPID private key for app {app.id}: {str(e)}")
+
+    def apns_client(self):
+        """This process's APNsClient for the App, or None when APNs is not configured for it."""
+        if self._apns_client is None and self.apns_configured:
+            self._apns_client = get_apns_client(self.apns_key)
+        return self._apns_client
+
+
+class CredentialRegistry:
+    """
+    Per-process cache of App id -> AppCredentials.
+
+    An entry is rebuilt when the App's credentials (or the global settings
+    they fall back to) differ from the ones it was built from, and dropped
+    by the App post_save/post_delete signals. Clients are shared between
+    Apps with the same credentials; a forked worker builds its own.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get(self, app):
+        resolved = resolve_credentials(app)
+        with self._lock:
+            if self._pid != os.getpid():
+                self._entries.clear()
+                self._pid = os.getpid()
+            credentials = self._entries.get(app.id)
+            if credentials is not None and credentials.resolved == resolved:
+                return credentials
+
+        credentials = AppCredentials(app, resolved)
+        with self._lock:
+            self._entries[app.id] = credentials
+        return credentials
+
+    def invalidate(self, app_id):
+        with self._lock:
+            self._entries.pop(app_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+credential_registry = CredentialRegistry()
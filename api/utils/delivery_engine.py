@@ -0,0 +1,665 @@
+"""
+Asyncio delivery engine: one process consuming the push queues and keeping
+thousands of provider requests in flight, instead of one blocking Celery
+task per push.
+
+    BrokerConsumer   kombu consumer thread reading Celery task messages
+                     from the push queues, DELIVERY_PREFETCH unacked at most
+    DeliveryEngine   loads the SendLogs of each message, sends them through
+                     the async providers and hands the results to the writer
+    ResultWriter     writes results back with one bulk_update per
+                     DELIVERY_WRITE_BATCH logs / DELIVERY_WRITE_INTERVAL
+                     seconds; a message is acked once its results are saved.
+                     Invalid tokens are deactivated on the schedule of the
+                     invalid-token sink (api/utils/invalid_tokens.py)
+
+Each provider bounds its own requests in flight: DELIVERY_FCM_CONCURRENCY
+for FCM v1, APNS_MAX_CONCURRENT_STREAMS over the APNs HTTP/2 connections
+and DELIVERY_WEB_CONCURRENCY for web push, lowered while the provider is
+slow or failing (api/utils/adaptive_concurrency.py). Traffic for a provider
+whose circuit is open (api/utils/circuit_breaker.py) is parked instead of
+sent. Messages with an ETA ahead (parked batches) are moved to the
+scheduled-notification store rather than held until due. Transient failures
+are retried on PUSH_RETRY_QUEUE like the Celery tasks do (see
+retry_send_logs in api/tasks/push_tasks.py). A message the engine fails to
+run is only acked once it has been handed back to the scheduled store,
+otherwise it is returned to the broker. Platforms without an async path
+(legacy FCM, unconfigured providers) go through the synchronous senders in
+a thread.
+
+Run it with ``python manage.py run_delivery_engine``.
+"""
+import asyncio
+import logging
+import queue
+import signal
+import socket
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from kombu import Connection, Exchange, Queue
+from api.models import DeadLetter, SendLog
+from .adaptive_concurrency import AsyncConcurrencyLimit
+from .apns_sender import APNsClient
+from .circuit_breaker import PLATFORM_PROVIDERS, circuit_breaker, is_provider_failure, response_retry_after
+from .credentials import credential_registry
+from .fcm_sender import send_fcm_multicast
+from .fcm_v1_sender import (
+    INVALID_TOKEN_ERRORS, access_tokens, build_message, load_service_account, parse_error
+)
+from .invalid_tokens import invalid_token_sink
+from .web_sender import (
+    ENCRYPT_POOL_MIN_BATCH, audience_for, encrypt_many, get_encryption_pool, prepare_messages, vapid_cache
+)
+
+logger = logging.getLogger(__name__)
+
+BATCH_TASK = 'api.tasks.push_tasks.send_push_batch_task'
+SINGLE_TASK = 'api.tasks.push_tasks.send_push_notification_task'
+
+# Web push payloads handed to an encryption worker at a time
+ENCRYPT_CHUNK_SIZE = 64
+
+SEND_LOG_FIELDS = ['provider_response', 'status', 'error_message', 'sent_at', 'retry_count', 'park_count', 'updated_at']
+
+
+class FCMProvider:
+    """FCM HTTP v1 over one async client, up to DELIVERY_FCM_CONCURRENCY requests in flight."""
+
+    def __init__(self):
+        self.limit = AsyncConcurrencyLimit('DELIVERY_FCM_CONCURRENCY')
+        self.client = httpx.AsyncClient(
+            http2=True,
+            timeout=10,
+            limits=httpx.Limits(max_connections=settings.DELIVERY_FCM_CONCURRENCY),
+        )
+
+    async def send_many(self, app, messages):
+        """Return the results for the messages; None when FCM is not configured."""
+        credentials = credential_registry.get(app)
+        if not credentials.fcm_v1:
+            if credentials.fcm_server_key:
+                # The legacy API takes up to FCM_MULTICAST_SIZE tokens per request
+                return await asyncio.to_thread(send_fcm_multicast, messages, credentials.fcm_server_key)
+            return None
+
+        try:
+            service_account = load_service_account(settings.FCM_SERVICE_ACCOUNT_FILE)
+            token = await asyncio.to_thread(access_tokens.get, service_account)
+        except Exception as e:
+            logger.error(f"FCM v1 authentication failed: {str(e)}", exc_info=True)
+            return [{'success': False, 'error': f"Authentication failed: {str(e)}"} for _ in messages]
+
+        return await asyncio.gather(*(self.send(service_account, token, *message) for message in messages))
+
+    async def send(self, service_account, token, device_token, title, body, data):
+        started = await self.limit.acquire()
+        result = None
+        try:
+            result = await self.post(service_account, token, device_token, title, body, data)
+            return result
+        finally:
+            self.limit.release(started, result is None or is_provider_failure(result))
+
+    async def post(self, service_account, token, device_token, title, body, data):
+        url = f"{settings.FCM_API_URL}/v1/projects/{service_account['project_id']}/messages:send"
+        message = {'message': build_message(device_token, title, body, data)}
+        try:
+            for attempt in range(2):
+                response = await self.client.post(url, headers={'Authorization': f'Bearer {token}'}, json=message)
+                if response.status_code == 401 and attempt == 0:
+                    # Token revoked or expired early, fetch a new one once
+                    access_tokens.invalidate(service_account, token)
+                    token = await asyncio.to_thread(access_tokens.get, service_account)
+                    continue
+                break
+
+            if response.is_success:
+                return {
+                    'success': True,
+                    'response': response.json(),
+                    'status_code': response.status_code
+                }
+            error = parse_error(response)
+            return {
+                'success': False,
+                'error': error,
+                'invalid_token': error in INVALID_TOKEN_ERRORS,
+                'status_code': response.status_code,
+                'retry_after': response_retry_after(response)
+            }
+        except httpx.HTTPError as e:
+            logger.error(f"FCM v1 request failed: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e),
+                'unavailable': True
+            }
+        except Exception as e:
+            logger.error(f"FCM v1 send error: {str(e)}", exc_info=True)
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class APNsProvider:
+    """APNs through APNsClients driven by the engine's own loop, one per App credentials."""
+
+    def __init__(self):
+        self.clients = {}
+
+    async def send_many(self, app, messages):
+        credentials = credential_registry.get(app)
+        if not credentials.apns_configured:
+            return None
+        key = credentials.apns_key
+        client = self.clients.get(key)
+        if client is None:
+            client = self.clients[key] = APNsClient(*key, loop=asyncio.get_running_loop())
+        return await client.send_many_async(messages)
+
+    async def close(self):
+        for client in self.clients.values():
+            await client.aclose()
+
+
+class WebPushProvider:
+    """
+    Web push: payloads are encrypted in chunks off the loop (on the
+    encryption process pool when configured) and posted by one async client,
+    up to DELIVERY_WEB_CONCURRENCY requests in flight.
+    """
+
+    def __init__(self):
+        self.limit = AsyncConcurrencyLimit('DELIVERY_WEB_CONCURRENCY')
+        self.client = httpx.AsyncClient(
+            http2=True,
+            timeout=30,
+            limits=httpx.Limits(max_connections=settings.DELIVERY_WEB_CONCURRENCY),
+        )
+
+    async def send_many(self, app, messages):
+        credentials = credential_registry.get(app)
+        vapid_private_key = credentials.vapid_private_key
+        if not credentials.vapid_public_key or not vapid_private_key:
+            return [{'success': False, 'error': 'Web VAPID keys not provided'} for _ in messages]
+
+        results, indexes, subscriptions, payloads = prepare_messages(messages)
+        loop = asyncio.get_running_loop()
+        pool = get_encryption_pool() if len(subscriptions) >= ENCRYPT_POOL_MIN_BATCH else None
+
+        async def send_chunk(start):
+            chunk = slice(start, start + ENCRYPT_CHUNK_SIZE)
+            encrypted = await loop.run_in_executor(pool, encrypt_many, subscriptions[chunk], payloads[chunk])
+            sends = []
+            for index, subscription_info, (body, error) in zip(indexes[chunk], subscriptions[chunk], encrypted):
+                if error is not None:
+                    results[index] = {'success': False, 'error': error}
+                else:
+                    sends.append((index, self.post(subscription_info, body, vapid_private_key)))
+            sent = await asyncio.gather(*(send for _, send in sends))
+            for (index, _), result in zip(sends, sent):
+                results[index] = result
+
+        await asyncio.gather(*(send_chunk(start) for start in range(0, len(subscriptions), ENCRYPT_CHUNK_SIZE)))
+        return results
+
+    async def post(self, subscription_info, body, vapid_private_key):
+        headers = dict(vapid_cache.headers(vapid_private_key, audience_for(subscription_info)))
+        headers.update({'content-encoding': 'aes128gcm', 'ttl': '0'})
+        started = await self.limit.acquire()
+        try:
+            response = await self.client.post(subscription_info['endpoint'], content=body, headers=headers)
+        except Exception as e:
+            self.limit.release(started, True)
+            logger.error(f"Web push send error: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e),
+                'unavailable': True
+            }
+
+        if response.status_code > 202:
+            result = {
+                'success': False,
+                'error': f"Push failed: {response.status_code} {response.reason_phrase}\nResponse body:{response.text}",
+                'invalid_token': response.status_code in (404, 410),
+                'status_code': response.status_code,
+                'retry_after': response_retry_after(response)
+            }
+            self.limit.release(started, is_provider_failure(result))
+            return result
+        self.limit.release(started)
+        return {
+            'success': True,
+            'response': response.text,
+            'status_code': response.status_code
+        }
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class ResultWriter:
+    """
+    Buffer delivered SendLogs and save them with one bulk_update (plus one
+    insert of dead letters) per DELIVERY_WRITE_BATCH logs or
+    DELIVERY_WRITE_INTERVAL seconds, whichever comes first. The invalid-token
+    sink is flushed along with them once it is due.
+    """
+
+    def __init__(self):
+        self._send_logs = []
+        self._dead_letters = []
+        self._waiters = []
+        self._timer = None
+        self._token_timer = None
+        self._flushes = set()
+        self._lock = asyncio.Lock()
+
+    async def write(self, send_logs, dead_letters=()):
+        """Queue ``send_logs`` and return once they are saved."""
+        waiter = asyncio.get_running_loop().create_future()
+        self._send_logs.extend(send_logs)
+        self._dead_letters.extend(dead_letters)
+        self._waiters.append(waiter)
+        if len(self._send_logs) >= settings.DELIVERY_WRITE_BATCH:
+            self._schedule_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(settings.DELIVERY_WRITE_INTERVAL, self._schedule_flush)
+        await waiter
+
+    def _schedule_flush(self):
+        task = asyncio.ensure_future(self.flush())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def flush(self):
+        async with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            send_logs, self._send_logs = self._send_logs, []
+            dead_letters, self._dead_letters = self._dead_letters, []
+            waiters, self._waiters = self._waiters, []
+            if not waiters:
+                await self.flush_invalid_tokens()
+                return
+
+            error = None
+            try:
+                if send_logs:
+                    await SendLog.objects.abulk_update(send_logs, SEND_LOG_FIELDS, batch_size=settings.DELIVERY_WRITE_BATCH)
+                if dead_letters:
+                    await DeadLetter.objects.abulk_create(dead_letters, ignore_conflicts=True)
+            except Exception as e:
+                logger.error(f"Failed to save {len(send_logs)} delivery results: {str(e)}", exc_info=True)
+                error = e
+
+            for waiter in waiters:
+                if waiter.done():
+                    continue
+                if error is None:
+                    waiter.set_result(None)
+                else:
+                    waiter.set_exception(error)
+            await self.flush_invalid_tokens()
+
+    async def flush_invalid_tokens(self, force=False):
+        """
+        Deactivate the tokens in the invalid-token sink when they are due (or
+        ``force``), and come back when the ones left will be.
+        """
+        if self._token_timer is not None:
+            self._token_timer.cancel()
+            self._token_timer = None
+        await sync_to_async(invalid_token_sink.flush if force else invalid_token_sink.flush_due)()
+        due_in = invalid_token_sink.pending()
+        if due_in is not None and not force:
+            self._token_timer = asyncio.get_running_loop().call_later(due_in, self._schedule_flush)
+
+
+class DeliveryEngine:
+    """
+    Deliver the SendLogs named by push task messages through the async
+    providers. Must be started on the loop it runs on.
+    """
+
+    def __init__(self):
+        self.providers = {}
+        self.writer = None
+
+    async def start(self):
+        self.providers = {
+            'android': FCMProvider(),
+            'ios': APNsProvider(),
+            'web': WebPushProvider(),
+        }
+        self.writer = ResultWriter()
+
+    async def close(self):
+        await self.writer.flush()
+        await self.writer.flush_invalid_tokens(force=True)
+        for provider in self.providers.values():
+            await provider.close()
+
+    async def handle(self, task_name, args, kwargs, queue=None):
+        """Run one Celery task message."""
+        if task_name == BATCH_TASK:
+            send_log_ids = kwargs.get('send_log_ids', args[0] if args else [])
+        elif task_name == SINGLE_TASK:
+            send_log_ids = [kwargs.get('send_log_id', args[0] if args else None)]
+        else:
+            # Anything else routed to the push queues runs as a plain task
+            from push.celery import app as celery_app
+            await asyncio.to_thread(celery_app.tasks[task_name].apply, args=args, kwargs=kwargs)
+            return
+
+        send_logs = [
+            send_log async for send_log in SendLog.objects.filter(id__in=send_log_ids).select_related('device__app')
+        ]
+        if not send_logs:
+            return
+        from api.tasks.push_tasks import (
+            FINAL_STATUSES, build_dead_letters, park_send_logs, record_campaign_outcomes, retry_send_logs
+        )
+        final_before = {send_log.id for send_log in send_logs if send_log.status in FINAL_STATUSES}
+        retrying, dead, parked = await self.deliver(send_logs)
+
+        await self.writer.write(send_logs, build_dead_letters(dead))
+        await sync_to_async(record_campaign_outcomes)(send_logs, final_before)
+        # Long delays are stored in the database, see queue_send_logs_later()
+        if retrying:
+            await sync_to_async(retry_send_logs)(retrying)
+        if parked:
+            await sync_to_async(park_send_logs)(parked, queue)
+
+    async def deliver(self, send_logs):
+        """
+        Send ``send_logs`` (with device__app selected) grouped by platform
+        and App, all groups concurrently, and set their results in place.
+        Groups whose provider circuit is open are not sent.
+
+        Invalid tokens go to the invalid-token sink. Returns (logs to retry,
+        logs out of retries, (send_log, delay) pairs to park).
+        """
+        from api.tasks.push_tasks import apply_response
+
+        groups = {}
+        for send_log in send_logs:
+            groups.setdefault((send_log.device.platform, send_log.device.app_id), []).append(send_log)
+
+        outcomes = await asyncio.gather(
+            *(self.deliver_group(platform, app_id, group_logs) for (platform, app_id), group_logs in groups.items()),
+            return_exceptions=True
+        )
+
+        now = timezone.now()
+        retrying, dead, parked = [], [], []
+        for ((_, app_id), group_logs), outcome in zip(groups.items(), outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"Error sending {len(group_logs)} notifications: {str(outcome)}", exc_info=outcome)
+                outcome = (group_logs, [outcome] * len(group_logs), [], 0.0)
+            sent_logs, results, tripped, delay = outcome
+            invalid_tokens = []
+
+            for send_log in tripped:
+                send_log.updated_at = now
+                send_log.error_message = f"Parked: {PLATFORM_PROVIDERS.get(send_log.device.platform)} circuit open"
+                parked.append((send_log, delay))
+            for send_log, response in zip(sent_logs, results):
+                outcome = apply_response(send_log, response, now)
+                if outcome == 'retry':
+                    retrying.append(send_log)
+                elif outcome == 'dead':
+                    dead.append(send_log)
+                elif outcome == 'park':
+                    parked.append((send_log, response['retry_after']))
+                elif response.get('invalid_token'):
+                    invalid_tokens.append(send_log.device.device_token)
+            invalid_token_sink.add(app_id, invalid_tokens)
+        return retrying, dead, parked
+
+    async def deliver_group(self, platform, app_id, group_logs):
+        """
+        Send logs sharing a platform and App. Returns (logs sent, their
+        results, logs to park, seconds to park them for).
+        """
+        provider_name = PLATFORM_PROVIDERS.get(platform, platform)
+        group_logs, tripped, delay = await asyncio.to_thread(circuit_breaker.admit, provider_name, app_id, group_logs)
+        if not group_logs:
+            return [], [], tripped, delay
+
+        app = group_logs[0].device.app
+        messages = [
+            (send_log.device.device_token, send_log.title, send_log.body, send_log.data)
+            for send_log in group_logs
+        ]
+        provider = self.providers.get(platform)
+        results = await provider.send_many(app, messages) if provider is not None else None
+        if results is None:
+            # No async path for this platform, send one by one like the tasks do
+            from api.tasks.push_tasks import deliver_notification
+
+            async def send(message):
+                try:
+                    return await asyncio.to_thread(deliver_notification, app, platform, *message)
+                except Exception as e:
+                    logger.error(f"Error sending {platform} notification: {str(e)}", exc_info=True)
+                    return e
+
+            results = await asyncio.gather(*(send(message) for message in messages))
+
+        await asyncio.to_thread(
+            circuit_breaker.record, provider_name, app_id, [result for result in results if isinstance(result, dict)]
+        )
+        return group_logs, results, tripped, delay
+
+
+def decode_task(body, message):
+    """Return (task name, args, kwargs, eta) of a Celery task message (protocol 1 or 2)."""
+    headers = message.headers or {}
+    if 'task' in headers:
+        args, kwargs, _ = body
+        return headers['task'], args, kwargs, headers.get('eta')
+    return body['task'], body.get('args', []), body.get('kwargs', {}), body.get('eta')
+
+
+class BrokerConsumer(threading.Thread):
+    """
+    Consume Celery task messages from ``queues`` on a thread of its own and
+    pass them to ``dispatch(body, message)`` on ``loop``.
+
+    kombu channels are not thread-safe, so messages are acked (or requeued)
+    on this thread: ack() and requeue() only queue them.
+    """
+
+    def __init__(self, broker_url, queues, prefetch, loop, dispatch):
+        super().__init__(name='delivery-consumer', daemon=True)
+        self.broker_url = broker_url
+        self.queues = queues
+        self.prefetch = prefetch
+        self.loop = loop
+        self.dispatch = dispatch
+        self.ready = threading.Event()
+        self.stopping = threading.Event()
+        self.stopped = threading.Event()
+        self._acks = queue.SimpleQueue()
+
+    def ack(self, message):
+        self._acks.put((message, False))
+
+    def requeue(self, message):
+        self._acks.put((message, True))
+
+    def stop(self):
+        self.stopping.set()
+
+    def close(self):
+        """Ack what is left and disconnect."""
+        self.stopped.set()
+        self.join()
+
+    def run(self):
+        try:
+            with Connection(self.broker_url) as connection:
+                queues = [Queue(name, Exchange(name, type='direct'), routing_key=name) for name in self.queues]
+                with connection.Consumer(queues, callbacks=[self.on_message], accept=['json'],
+                                         prefetch_count=self.prefetch) as consumer:
+                    self.ready.set()
+                    while not self.stopping.is_set():
+                        self.flush_acks()
+                        try:
+                            connection.drain_events(timeout=0.1)
+                        except socket.timeout:
+                            pass
+                    consumer.cancel()
+                    # Keep acking until the engine has finished what it took
+                    while not self.stopped.wait(0.05):
+                        self.flush_acks()
+                    self.flush_acks()
+        except Exception as e:
+            logger.error(f"Delivery consumer stopped: {str(e)}", exc_info=True)
+            self.loop.call_soon_threadsafe(self.dispatch, None, None)
+        finally:
+            self.ready.set()
+
+    def on_message(self, body, message):
+        if self.stopping.is_set():
+            message.requeue()
+            return
+        self.loop.call_soon_threadsafe(self.dispatch, body, message)
+
+    def flush_acks(self):
+        while True:
+            try:
+                message, requeue = self._acks.get_nowait()
+            except queue.Empty:
+                return
+            if requeue:
+                message.requeue()
+            else:
+                message.ack()
+
+
+async def process_message(engine, body, message):
+    """
+    Decode and run one task message. A message whose ETA is still ahead is
+    handed off instead of held (unacked, taking a DELIVERY_PREFETCH slot)
+    until then, see defer_message().
+    """
+    task_name, args, kwargs, eta = decode_task(body, message)
+    queue = (message.delivery_info or {}).get('routing_key')
+    if eta:
+        eta = datetime.fromisoformat(eta)
+        if eta.tzinfo is None:
+            eta = eta.replace(tzinfo=dt_timezone.utc)
+        if eta > timezone.now():
+            await sync_to_async(defer_message)(task_name, args, kwargs, eta, queue)
+            return
+    await engine.handle(task_name, args, kwargs, queue=queue)
+
+
+def defer_message(task_name, args, kwargs, eta, queue):
+    """
+    Send the SendLogs of a push task message due at ``eta`` through the
+    scheduled-notification store, which queues them again on ``queue`` once
+    due. Other tasks are republished with their ETA on PUSH_RETRY_QUEUE,
+    left to the Celery workers.
+    """
+    if task_name == BATCH_TASK:
+        send_log_ids = kwargs.get('send_log_ids', args[0] if args else [])
+        platform = kwargs.get('platform', args[1] if len(args) > 1 else None)
+    elif task_name == SINGLE_TASK:
+        send_log_ids = [kwargs.get('send_log_id', args[0] if args else None)]
+        platform = kwargs.get('platform', args[2] if len(args) > 2 else None)
+    else:
+        from push.celery import app as celery_app
+        celery_app.tasks[task_name].apply_async(args=args, kwargs=kwargs, eta=eta, queue=settings.PUSH_RETRY_QUEUE)
+        return
+
+    from api.tasks.scheduler_tasks import schedule_redelivery
+    schedule_redelivery(SendLog.objects.filter(id__in=send_log_ids).only('id', 'app_id'), platform, eta, queue)
+
+
+def retry_message_later(body, message):
+    """
+    Hand a message the engine failed to run back to the scheduled store (see
+    defer_message), due again in PUSH_RETRY_BASE_DELAY seconds.
+    """
+    task_name, args, kwargs, _ = decode_task(body, message)
+    queue = (message.delivery_info or {}).get('routing_key')
+    eta = timezone.now() + timedelta(seconds=settings.PUSH_RETRY_BASE_DELAY)
+    defer_message(task_name, args, kwargs, eta, queue)
+
+
+async def serve(queues, broker_url=None, prefetch=None, stop_event=None):
+    """
+    Consume ``queues`` until SIGTERM/SIGINT (or ``stop_event`` is set), then
+    finish the messages already taken, save their results and ack them.
+    Messages that fail are rescheduled before being acked, or requeued.
+    """
+    loop = asyncio.get_running_loop()
+    engine = DeliveryEngine()
+    await engine.start()
+    stop_event = stop_event or asyncio.Event()
+    in_flight = set()
+
+    def dispatch(body, message):
+        if message is None:
+            # The consumer thread died
+            stop_event.set()
+            return
+        if stop_event.is_set():
+            # Left unacked, the broker redelivers it once the channel closes
+            return
+
+        async def run():
+            try:
+                await process_message(engine, body, message)
+            except Exception as e:
+                logger.error(f"Delivery task failed: {str(e)}", exc_info=True)
+                try:
+                    await sync_to_async(retry_message_later)(body, message)
+                except Exception as e:
+                    logger.error(f"Could not reschedule failed delivery task, requeueing it: {str(e)}", exc_info=True)
+                    consumer.requeue(message)
+                    return
+            consumer.ack(message)
+
+        task = loop.create_task(run())
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(signum, stop_event.set)
+        except (NotImplementedError, RuntimeError, ValueError):
+            # Not the main thread, the caller sets stop_event
+            pass
+
+    consumer = BrokerConsumer(
+        broker_url or settings.CELERY_BROKER_URL,
+        queues,
+        prefetch or settings.DELIVERY_PREFETCH,
+        loop,
+        dispatch,
+    )
+    consumer.start()
+    logger.info(f"Delivery engine consuming {', '.join(queues)}")
+    try:
+        await stop_event.wait()
+    finally:
+        logger.info(f"Delivery engine stopping, finishing {len(in_flight)} messages")
+        consumer.stop()
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
+        await engine.close()
+        await asyncio.to_thread(consumer.close)
@@ -2,15 +2,40 @@ import requests
 import json
 import logging
 from django.conf import settings
+from .circuit_breaker import response_retry_after
+from .http_client import get_session
 
 logger = logging.getLogger(__name__)
 
 
-def send_fcm_notification(device_token, title, body, data=None):
+# Legacy error codes meaning the token will never be deliverable again
+INVALID_TOKEN_ERRORS = frozenset(['InvalidRegistration', 'NotRegistered'])
+
+
+def request_error(e):
+    """Result dict of a failed request, with the Retry-After FCM sent on 429/5xx."""
+    if e.response is None:
+        # Timeout or connection error, FCM never answered
+        return {
+            'success': False,
+            'error': str(e),
+            'status_code': None,
+            'unavailable': True
+        }
+    return {
+        'success': False,
+        'error': str(e),
+        'status_code': e.response.status_code,
+        'retry_after': response_retry_after(e.response)
+    }
+
+
+def send_fcm_notification(device_token, title, body, data=None, server_key=None):
     """
-    Send push notification via Firebase Cloud Messaging.
+    Send push notification via Firebase Cloud Messaging, with ``server_key``
+    (an App's own) or the global FCM_SERVER_KEY.
     """
-    fcm_server_key = settings.FCM_SERVER_KEY
+    fcm_server_key = server_key or settings.FCM_SERVER_KEY
     
     if not fcm_server_key:
         return {
@@ -33,7 +58,7 @@ def send_fcm_notification(device_token, title, body, data=None):
     }
 
     try:
-        response = requests.post(
+        response = get_session('fcm').post(
             'https://fcm.googleapis.com/fcm/send',
             headers=headers,
             data=json.dumps(payload),
@@ -44,25 +69,20 @@ def send_fcm_notification(device_token, title, body, data=None):
         
         result = response.json()
         
-        # Check if the token is invalid
-        if result.get('results') and result['results'][0].get('error') == 'InvalidRegistration':
-            # Mark device as inactive
-            from api.models import Device
-            Device.objects.filter(device_token=device_token).update(is_active=False)
-        
-        return {
+        response_dict = {
             'success': True,
             'response': result,
             'status_code': response.status_code
         }
+        # Flag tokens that will never be deliverable again, the caller
+        # deactivates them (see api/utils/invalid_tokens.py)
+        if result.get('results') and result['results'][0].get('error') in INVALID_TOKEN_ERRORS:
+            response_dict['invalid_token'] = True
+        return response_dict
         
     except requests.exceptions.RequestException as e:
         logger.error(f"FCM request failed: {str(e)}")
-        return {
-            'success': False,
-            'error': str(e),
-            'status_code': getattr(e.response, 'status_code', None)
-        }
+        return request_error(e)
     except Exception as e:
         logger.error(f"FCM send error: {str(e)}", exc_info=True)
         return {
@@ -71,11 +91,11 @@ def send_fcm_notification(device_token, title, body, data=None):
         }
 
 
-def send_fcm_notification_batch(device_tokens, title, body, data=None):
+def send_fcm_notification_batch(device_tokens, title, body, data=None, server_key=None):
     """
     Send push notification to multiple devices via FCM (batch).
     """
-    fcm_server_key = settings.FCM_SERVER_KEY
+    fcm_server_key = server_key or settings.FCM_SERVER_KEY
     
     if not fcm_server_key:
         return {
@@ -98,7 +118,7 @@ def send_fcm_notification_batch(device_tokens, title, body, data=None):
     }
 
     try:
-        response = requests.post(
+        response = get_session('fcm').post(
             'https://fcm.googleapis.com/fcm/send',
             headers=headers,
             data=json.dumps(payload),
@@ -109,14 +129,6 @@ def send_fcm_notification_batch(device_tokens, title, body, data=None):
         
         result = response.json()
         
-        # Handle invalid tokens
-        if result.get('results'):
-            for i, result_item in enumerate(result['results']):
-                if result_item.get('error') == 'InvalidRegistration':
-                    invalid_token = device_tokens[i]
-                    from api.models import Device
-                    Device.objects.filter(device_token=invalid_token).update(is_active=False)
-        
         return {
             'success': True,
             'response': result,
@@ -125,14 +137,175 @@ def send_fcm_notification_batch(device_tokens, title, body, data=None):
         
     except requests.exceptions.RequestException as e:
         logger.error(f"FCM batch request failed: {str(e)}")
+        return request_error(e)
+    except Exception as e:
+        logger.error(f"FCM batch send error: {str(e)}", exc_info=True)
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+def send_fcm_multicast(messages, server_key=None):
+    """
+    Send many (device_token, title, body, data) messages, grouping those
+    with an identical payload into multicasts of up to FCM_MULTICAST_SIZE
+    tokens, with ``server_key`` or the global FCM_SERVER_KEY.
+
+    Returns one result dict per message, in order, shaped like the result
+    of send_fcm_notification() for that token alone.
+    """
+    messages = list(messages)
+    groups = {}
+    for index, (device_token, title, body, data) in enumerate(messages):
+        key = (title, body, json.dumps(data or {}, sort_keys=True))
+        groups.setdefault(key, []).append(index)
+
+    results = [None] * len(messages)
+    size = settings.FCM_MULTICAST_SIZE
+    for indexes in groups.values():
+        _, title, body, data = messages[indexes[0]]
+        for start in range(0, len(indexes), size):
+            batch = indexes[start:start + size]
+            response = send_fcm_notification_batch(
+                [messages[index][0] for index in batch], title, body, data, server_key=server_key
+            )
+            if not response['success']:
+                for index in batch:
+                    results[index] = dict(response)
+                continue
+
+            multicast = response['response']
+            items = multicast.get('results') or [{}] * len(batch)
+            for index, item in zip(batch, items):
+                results[index] = {
+                    'success': 'message_id' in item,
+                    'response': {'multicast_id': multicast.get('multicast_id'), 'results': [item]},
+                    'status_code': response['status_code'],
+                }
+                if item.get('error'):
+                    results[index]['error'] = item['error']
+                    results[index]['invalid_token'] = item['error'] in INVALID_TOKEN_ERRORS
+    return results
+
+# The instance ID API accepts at most 1000 tokens per batchAdd/batchRemove
+FCM_TOPIC_BATCH_SIZE = 1000
+
+
+def send_fcm_topic_notification(topic, title, body, data=None, server_key=None):
+    """
+    Send one push notification to every device subscribed to an FCM topic,
+    with ``server_key`` (an App's own) or the global FCM_SERVER_KEY.
+    """
+    fcm_server_key = server_key or settings.FCM_SERVER_KEY
+
+    if not fcm_server_key:
+        return {
+            'success': False,
+            'error': 'FCM server key not configured'
+        }
+
+    headers = {
+        'Authorization': f'key={fcm_server_key}',
+        'Content-Type': 'application/json'
+    }
+
+    payload = {
+        'to': f'/topics/{topic}',
+        'notification': {
+            'title': title,
+            'body': body
+        },
+        'data': data or {}
+    }
+
+    try:
+        response = get_session('fcm').post(
+            'https://fcm.googleapis.com/fcm/send',
+            headers=headers,
+            data=json.dumps(payload),
+            timeout=10
+        )
+
+        response.raise_for_status()
+
+        result = response.json()
+        if result.get('error'):
+            return {
+                'success': False,
+                'error': result['error'],
+                'response': result,
+                'status_code': response.status_code
+            }
+
+        return {
+            'success': True,
+            'response': result,
+            'status_code': response.status_code
+        }
+
+    except requests.exceptions.RequestException as e:
+        logger.error(f"FCM topic request failed: {str(e)}")
         return {
             'success': False,
             'error': str(e),
             'status_code': getattr(e.response, 'status_code', None)
         }
     except Exception as e:
-        logger.error(f"FCM batch send error: {str(e)}", exc_info=True)
+        logger.error(f"FCM topic send error: {str(e)}", exc_info=True)
         return {
             'success': False,
             'error': str(e)
-        }
\ No newline at end of file
+        }
+
+
+def update_fcm_topic_subscriptions(topic, device_tokens, subscribe=True, server_key=None):
+    """
+    Add device tokens to (or remove them from) an FCM topic in batches,
+    with ``server_key`` (an App's own) or the global FCM_SERVER_KEY.
+    """
+    fcm_server_key = server_key or settings.FCM_SERVER_KEY
+
+    if not fcm_server_key:
+        return {
+            'success': False,
+            'error': 'FCM server key not configured'
+        }
+
+    headers = {
+        'Authorization': f'key={fcm_server_key}',
+        'Content-Type': 'application/json'
+    }
+    action = 'batchAdd' if subscribe else 'batchRemove'
+    errors = []
+
+    try:
+        for start in range(0, len(device_tokens), FCM_TOPIC_BATCH_SIZE):
+            batch = device_tokens[start:start + FCM_TOPIC_BATCH_SIZE]
+            response = get_session('fcm').post(
+                f'https://iid.googleapis.com/iid/v1:{action}',
+                headers=headers,
+                data=json.dumps({
+                    'to': f'/topics/{topic}',
+                    'registration_tokens': batch
+                }),
+                timeout=10
+            )
+
+            response.raise_for_status()
+
+            for token, result_item in zip(batch, response.json().get('results', [])):
+                if result_item.get('error'):
+                    errors.append({'device_token': token, 'error': result_item['error']})
+
+        return {
+            'success': True,
+            'errors': errors
+        }
+
+    except requests.exceptions.RequestException as e:
+        logger.error(f"FCM topic {action} request failed: {str(e)}")
+        return {
+            'success': False,
+            'error': str(e),
+            'status_code': getattr(e.response, 'status_code', None)
+        }
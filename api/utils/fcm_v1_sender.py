@@ -0,0 +1,248 @@
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import jwt
+import requests
+from django.conf import settings
+from .adaptive_concurrency import ConcurrencyLimit
+from .circuit_breaker import is_provider_failure, response_retry_after
+from .http_client import get_session
+
+logger = logging.getLogger(__name__)
+
+FCM_SCOPE = 'https://www.googleapis.com/auth/firebase.messaging'
+GOOGLE_TOKEN_URI = 'https://oauth2.googleapis.com/token'
+# Lifetime requested for the signed assertion; Google caps it at one hour
+ASSERTION_LIFETIME = 3600
+
+# FCM error codes meaning the token will never be deliverable again
+INVALID_TOKEN_ERRORS = frozenset(['UNREGISTERED', 'SENDER_ID_MISMATCH'])
+
+
+def fcm_v1_configured():
+    """True when a service account is configured, so Android goes through the v1 API."""
+    return bool(getattr(settings, 'FCM_SERVICE_ACCOUNT_FILE', None))
+
+
+@lru_cache(maxsize=8)
+def load_service_account(path):
+    """Read and cache a Google service-account JSON file."""
+    with open(path) as f:
+        service_account = json.load(f)
+    for field in ('client_email', 'private_key', 'project_id'):
+        if not service_account.get(field):
+            raise ValueError(f"Service account {path} has no {field}")
+    return service_account
+
+
+class AccessTokenCache:
+    """
+    Process-wide cache of OAuth2 access tokens, one per service account.
+
+    A token is reused until FCM_TOKEN_REFRESH_MARGIN seconds (at most half
+    its lifetime) before it expires; only one thread fetches a replacement
+    while the others wait for it instead of hitting the token endpoint
+    themselves.
+    """
+
+    def __init__(self):
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def get(self, service_account):
+        key = service_account['client_email']
+        entry = self._tokens.get(key)
+        if entry is not None and time.time() < entry[1]:
+            return entry[0]
+
+        with self._lock:
+            entry = self._tokens.get(key)
+            if entry is None or time.time() >= entry[1]:
+                token, expires_at = fetch_access_token(service_account)
+                lifetime = expires_at - time.time()
+                refresh_at = expires_at - min(settings.FCM_TOKEN_REFRESH_MARGIN, lifetime / 2)
+                entry = self._tokens[key] = (token, refresh_at)
+        return entry[0]
+
+    def invalidate(self, service_account, token):
+        """Drop ``token`` so the next get() fetches a new one."""
+        with self._lock:
+            entry = self._tokens.get(service_account['client_email'])
+            if entry is not None and entry[0] == token:
+                del self._tokens[service_account['client_email']]
+
+    def clear(self):
+        with self._lock:
+            self._tokens.clear()
+
+
+access_tokens = AccessTokenCache()
+
+# Requests in flight from this process, adapted to FCM's latency and errors
+fcm_v1_limit = ConcurrencyLimit('FCM_V1_CONCURRENCY')
+
+
+def fetch_access_token(service_account):
+    """
+    Exchange a signed JWT assertion for an access token.
+
+    Returns (access_token, expires_at) with expires_at as a Unix timestamp.
+    """
+    token_uri = service_account.get('token_uri') or GOOGLE_TOKEN_URI
+    now = int(time.time())
+    assertion = jwt.encode(
+        {
+            'iss': service_account['client_email'],
+            'scope': FCM_SCOPE,
+            'aud': token_uri,
+            'iat': now,
+            'exp': now + ASSERTION_LIFETIME,
+        },
+        service_account['private_key'],
+        algorithm='RS256',
+        headers={'kid': service_account.get('private_key_id')},
+    )
+    response = get_session('fcm').post(
+        token_uri,
+        data={
+            'grant_type': 'urn:ietf:params:oauth:grant-type:jwt-bearer',
+            'assertion': assertion,
+        },
+        timeout=10
+    )
+    response.raise_for_status()
+    result = response.json()
+    return result['access_token'], now + int(result.get('expires_in', ASSERTION_LIFETIME))
+
+
+def build_message(device_token, title, body, data=None):
+    """Return the v1 ``message`` for one device; data values must be strings."""
+    return {
+        'token': device_token,
+        'notification': {
+            'title': title,
+            'body': body
+        },
+        'data': {
+            key: value if isinstance(value, str) else json.dumps(value)
+            for key, value in (data or {}).items()
+        }
+    }
+
+
+def parse_error(response):
+    """Return the FCM error code (e.g. UNREGISTERED) of a failed response."""
+    try:
+        error = response.json().get('error', {})
+    except ValueError:
+        return f"HTTP {response.status_code}"
+    for detail in error.get('details', []):
+        if detail.get('errorCode'):
+            return detail['errorCode']
+    return error.get('status') or error.get('message') or f"HTTP {response.status_code}"
+
+
+def _send(service_account, device_token, title, body, data):
+    started = fcm_v1_limit.acquire()
+    result = None
+    try:
+        result = _post(service_account, device_token, title, body, data)
+        return result
+    finally:
+        fcm_v1_limit.release(started, result is None or is_provider_failure(result))
+
+
+def _post(service_account, device_token, title, body, data):
+    url = f"{settings.FCM_API_URL}/v1/projects/{service_account['project_id']}/messages:send"
+    payload = json.dumps({'message': build_message(device_token, title, body, data)})
+
+    try:
+        for attempt in range(2):
+            token = access_tokens.get(service_account)
+            response = get_session('fcm').post(
+                url,
+                headers={
+                    'Authorization': f'Bearer {token}',
+                    'Content-Type': 'application/json'
+                },
+                data=payload,
+                timeout=10
+            )
+            if response.status_code == 401 and attempt == 0:
+                # Token revoked or expired early, fetch a new one once
+                access_tokens.invalidate(service_account, token)
+                continue
+            break
+
+        if response.ok:
+            return {
+                'success': True,
+                'response': response.json(),
+                'status_code': response.status_code
+            }
+
+        error = parse_error(response)
+        return {
+            'success': False,
+            'error': error,
+            'invalid_token': error in INVALID_TOKEN_ERRORS,
+            'status_code': response.status_code,
+            'retry_after': response_retry_after(response)
+        }
+
+    except requests.exceptions.RequestException as e:
+        logger.error(f"FCM v1 request failed: {str(e)}")
+        return {
+            'success': False,
+            'error': str(e),
+            'status_code': getattr(e.response, 'status_code', None),
+            'unavailable': True
+        }
+    except Exception as e:
+        logger.error(f"FCM v1 send error: {str(e)}", exc_info=True)
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+
+def send_fcm_v1_notification(device_token, title, body, data=None):
+    """
+    Send push notification via the FCM HTTP v1 API.
+    """
+    return send_fcm_v1_many([(device_token, title, body, data)])[0]
+
+
+def send_fcm_v1_many(messages):
+    """
+    Send many (device_token, title, body, data) messages via the FCM HTTP
+    v1 API, up to FCM_V1_CONCURRENCY at a time over the pooled session.
+
+    Returns one result dict per message, in order. Tokens FCM reports as
+    unregistered are flagged ``invalid_token`` for the caller to deactivate.
+    """
+    messages = list(messages)
+    if not messages:
+        return []
+    if not fcm_v1_configured():
+        error = {'success': False, 'error': 'FCM service account not configured'}
+        return [dict(error) for _ in messages]
+
+    try:
+        service_account = load_service_account(settings.FCM_SERVICE_ACCOUNT_FILE)
+        # Fetch the token up front rather than from every worker thread
+        access_tokens.get(service_account)
+    except Exception as e:
+        logger.error(f"FCM v1 authentication failed: {str(e)}", exc_info=True)
+        return [{'success': False, 'error': f"Authentication failed: {str(e)}"} for _ in messages]
+
+    workers = min(settings.FCM_V1_CONCURRENCY, len(messages))
+    if workers == 1:
+        results = [_send(service_account, *message) for message in messages]
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fcm-v1') as executor:
+            results = list(executor.map(lambda message: _send(service_account, *message), messages))
+    return results
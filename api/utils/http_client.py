@@ -0,0 +1,155 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import redis
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
+from .redis_client import get_redis, mark_unavailable
+
+logger = logging.getLogger(__name__)
+
+# Redis hash holding the latest pool stats of every process, see publish_pool_stats()
+POOL_STATS_KEY = 'http_pool_stats'
+
+_sessions = {}
+_sessions_pid = None
+_lock = threading.Lock()
+_stats_published_at = 0.0
+
+
+class KeepAliveAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose sockets send TCP keep-alive probes, so idle pooled
+    connections to the providers are not silently dropped by middleboxes.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        socket_options = list(HTTPConnection.default_socket_options)
+        socket_options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+        if hasattr(socket, 'TCP_KEEPIDLE'):
+            socket_options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, settings.HTTP_KEEPALIVE_IDLE))
+        kwargs['socket_options'] = socket_options
+        super().init_poolmanager(*args, **kwargs)
+
+
+def build_session():
+    """Return a new Session with the pool and retry settings from HTTP_*."""
+    retry = Retry(
+        total=settings.HTTP_RETRY_TOTAL,
+        connect=settings.HTTP_RETRY_TOTAL,
+        # Only retry connections that never reached the provider; never resend
+        # a request it may already have processed. 429/5xx responses and their
+        # Retry-After go back to the caller, where apply_response, the circuit
+        # breaker and the push retry policy decide when to try again.
+        read=0,
+        status=0,
+        other=0,
+        backoff_factor=settings.HTTP_RETRY_BACKOFF,
+        allowed_methods=frozenset(['GET', 'POST']),
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    )
+    adapter = KeepAliveAdapter(
+        pool_connections=settings.HTTP_POOL_CONNECTIONS,
+        pool_maxsize=settings.HTTP_POOL_MAXSIZE,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session(name='default'):
+    """
+    Return this process's pooled Session for ``name``.
+
+    Sessions are created lazily per process; a forked Celery worker never
+    reuses the sockets of its parent. Connections stay open between sends,
+    so only the first request to a host pays the TCP and TLS handshake.
+    """
+    global _sessions_pid
+    pid = os.getpid()
+    if _sessions_pid != pid:
+        with _lock:
+            if _sessions_pid != pid:
+                _sessions.clear()
+                _sessions_pid = pid
+
+    session = _sessions.get(name)
+    if session is None:
+        with _lock:
+            session = _sessions.get(name)
+            if session is None:
+                session = _sessions[name] = build_session()
+
+    if time.monotonic() - _stats_published_at > settings.HTTP_STATS_INTERVAL:
+        publish_pool_stats()
+    return session
+
+
+def pool_stats():
+    """
+    Connection pool counters of this process.
+
+    ``connections_opened`` is the number of connections (and so TCP/TLS
+    handshakes) made to a host and ``requests`` the number of requests
+    sent over them.
+    """
+    pools = []
+    for name, session in list(_sessions.items()):
+        adapters = {id(adapter): adapter for adapter in session.adapters.values()}
+        for adapter in adapters.values():
+            manager = adapter.poolmanager
+            for key in list(manager.pools.keys()):
+                pool = manager.pools.get(key)
+                if pool is None:
+                    continue
+                pools.append({
+                    'session': name,
+                    'host': pool.host,
+                    'port': pool.port,
+                    'connections_opened': pool.num_connections,
+                    'requests': pool.num_requests,
+                    'idle_connections': pool.pool.qsize() if pool.pool is not None else 0,
+                })
+
+    return {
+        'pid': os.getpid(),
+        'connections_opened': sum(pool['connections_opened'] for pool in pools),
+        'requests': sum(pool['requests'] for pool in pools),
+        'pools': pools,
+    }
+
+
+def publish_pool_stats():
+    """
+    Store this process's pool stats in Redis for `manage.py http_pool_stats`.
+    """
+    global _stats_published_at
+    _stats_published_at = time.monotonic()
+
+    stats = pool_stats()
+    if not stats['requests']:
+        return
+    logger.info(
+        f"HTTP pool stats: {stats['requests']} requests over {stats['connections_opened']} connections"
+    )
+
+    client = get_redis()
+    if client is None:
+        return
+    stats['published_at'] = time.time()
+    try:
+        pipe = client.pipeline(transaction=False)
+        pipe.hset(POOL_STATS_KEY, f"{socket.gethostname()}:{stats['pid']}", json.dumps(stats))
+        pipe.expire(POOL_STATS_KEY, int(settings.HTTP_STATS_INTERVAL * 5))
+        pipe.execute()
+    except redis.RedisError as e:
+        mark_unavailable(e)
@@ -0,0 +1,243 @@
+import asyncio
+import functools
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from rest_framework import status
+from rest_framework.response import Response
+import redis
+from .redis_client import get_redis, mark_unavailable
+
+logger = logging.getLogger(__name__)
+
+PENDING = b'__pending__'
+REPLAY_HEADER = 'Idempotent-Replayed'
+
+
+class IdempotencyStore:
+    """
+    Per-app record of Idempotency-Key results with a TTL.
+
+    Backed by Redis so every worker and node sees the same keys; falls back
+    to a bounded in-process map while Redis is unavailable. Claiming a key
+    is a single SET NX GET round trip (Redis 7+).
+    """
+
+    def __init__(self, max_local_entries=10000):
+        self.max_local_entries = max_local_entries
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, app_id, idempotency_key):
+        return f"idempotency:{app_id}:{idempotency_key}"
+
+    def claim(self, app_id, idempotency_key):
+        """
+        Try to reserve a key for a new request.
+
+        Returns (claimed, record). When claimed is False, record is the stored
+        response, or None if the original request is still in flight.
+
+        The in-flight marker only lives for IDEMPOTENCY_PENDING_TTL, so a key
+        whose request died without releasing it can be retried soon after;
+        the stored response gets the full IDEMPOTENCY_KEY_TTL.
+        """
+        key = self._key(app_id, idempotency_key)
+        ttl = settings.IDEMPOTENCY_PENDING_TTL
+        client = get_redis()
+        if client is not None:
+            try:
+                previous = client.set(key, PENDING, nx=True, ex=ttl, get=True)
+            except redis.RedisError as e:
+                mark_unavailable(e)
+            else:
+                if previous is None:
+                    return True, None
+                return False, None if previous == PENDING else json.loads(previous)
+
+        return self._claim_local(key, ttl)
+
+    def lookup(self, app_id, idempotency_key):
+        """Return the stored response for a key, or None if there is none yet."""
+        key = self._key(app_id, idempotency_key)
+        client = get_redis()
+        if client is not None:
+            try:
+                value = client.get(key)
+            except redis.RedisError as e:
+                mark_unavailable(e)
+            else:
+                return None if value is None or value == PENDING else json.loads(value)
+
+        with self._lock:
+            entry = self._local.get(key)
+        if entry is None or entry[0] <= time.monotonic() or entry[1] == PENDING:
+            return None
+        return json.loads(entry[1])
+
+    def store(self, app_id, idempotency_key, status_code, body):
+        key = self._key(app_id, idempotency_key)
+        ttl = settings.IDEMPOTENCY_KEY_TTL
+        value = json.dumps({'status': status_code, 'body': body})
+        client = get_redis()
+        if client is not None:
+            try:
+                client.set(key, value, ex=ttl)
+                return
+            except redis.RedisError as e:
+                mark_unavailable(e)
+        with self._lock:
+            if key in self._local:
+                self._local[key] = (time.monotonic() + ttl, value.encode())
+
+    def release(self, app_id, idempotency_key):
+        """Forget a key so that the client can retry, e.g. after a 5xx."""
+        key = self._key(app_id, idempotency_key)
+        client = get_redis()
+        if client is not None:
+            try:
+                client.delete(key)
+                return
+            except redis.RedisError as e:
+                mark_unavailable(e)
+        with self._lock:
+            self._local.pop(key, None)
+
+    def _claim_local(self, key, ttl):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None and entry[0] > now:
+                value = entry[1]
+                return False, None if value == PENDING else json.loads(value)
+
+            self._local[key] = (now + ttl, PENDING)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_local_entries:
+                self._local.popitem(last=False)
+            return True, None
+
+
+idempotency_store = IdempotencyStore()
+
+
+def _response_body(response):
+    data = getattr(response, 'data', None)
+    if data is not None:
+        return data
+    return json.loads(response.content)
+
+
+def _check_key(request):
+    idempotency_key = request.META.get('HTTP_IDEMPOTENCY_KEY')
+    app = getattr(request, 'app', None)
+    if not idempotency_key or app is None:
+        return None, None
+    return app.id, idempotency_key.strip()
+
+
+def has_stored_response(request):
+    """
+    Whether the request's Idempotency-Key already has a stored response.
+
+    Lets AppRateThrottle, which DRF runs before the handler, pass retries
+    through to the replay instead of charging them or answering 429.
+    """
+    app_id, idempotency_key = _check_key(request)
+    if idempotency_key is None or len(idempotency_key) > 255:
+        return False
+    return idempotency_store.lookup(app_id, idempotency_key) is not None
+
+
+def _error(message, status_code, drf):
+    payload = {'success': False, 'message': message, 'data': None}
+    if drf:
+        return Response(payload, status=status_code)
+    return JsonResponse(payload, status=status_code)
+
+
+def _claim(app_id, idempotency_key, drf):
+    """Return a response to short-circuit with, or None when the request should run."""
+    if len(idempotency_key) > 255:
+        return _error('Idempotency-Key must be at most 255 characters', status.HTTP_400_BAD_REQUEST, drf)
+
+    claimed, record = idempotency_store.claim(app_id, idempotency_key)
+    if claimed:
+        return None
+    if record is None:
+        return _error(
+            'A request with this Idempotency-Key is still being processed',
+            status.HTTP_409_CONFLICT, drf
+        )
+
+    if drf:
+        response = Response(record['body'], status=record['status'])
+    else:
+        response = JsonResponse(record['body'], status=record['status'], safe=False)
+    response[REPLAY_HEADER] = 'true'
+    return response
+
+
+def _finish(app_id, idempotency_key, response):
+    if response.status_code >= 500 or response.status_code == status.HTTP_429_TOO_MANY_REQUESTS:
+        idempotency_store.release(app_id, idempotency_key)
+    else:
+        idempotency_store.store(app_id, idempotency_key, response.status_code, _response_body(response))
+
+
+def idempotent(view_method):
+    """
+    Honour the Idempotency-Key header on a view's handler method.
+
+    The first request with a key runs normally and its response is stored
+    for IDEMPOTENCY_KEY_TTL seconds; while it runs the key is locked for at
+    most IDEMPOTENCY_PENDING_TTL seconds. Retries inside that window get the
+    stored response back without touching the database or the broker.
+    Server errors and 429s are not stored so the client can retry them. Works on
+    both DRF handlers and the native async views.
+    """
+    if asyncio.iscoroutinefunction(view_method):
+        @functools.wraps(view_method)
+        async def async_wrapper(self, request, *args, **kwargs):
+            app_id, idempotency_key = _check_key(request)
+            if idempotency_key is None:
+                return await view_method(self, request, *args, **kwargs)
+
+            # Redis calls run off the event loop
+            replay = await sync_to_async(_claim, thread_sensitive=False)(app_id, idempotency_key, drf=False)
+            if replay is not None:
+                return replay
+            try:
+                response = await view_method(self, request, *args, **kwargs)
+            except BaseException:
+                # Also on cancellation, or the key stays locked until it expires
+                await sync_to_async(idempotency_store.release, thread_sensitive=False)(app_id, idempotency_key)
+                raise
+            await sync_to_async(_finish, thread_sensitive=False)(app_id, idempotency_key, response)
+            return response
+
+        return async_wrapper
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        app_id, idempotency_key = _check_key(request)
+        if idempotency_key is None:
+            return view_method(self, request, *args, **kwargs)
+
+        replay = _claim(app_id, idempotency_key, drf=True)
+        if replay is not None:
+            return replay
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except BaseException:
+            idempotency_store.release(app_id, idempotency_key)
+            raise
+        _finish(app_id, idempotency_key, response)
+        return response
+
+    return wrapper
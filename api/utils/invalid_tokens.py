@@ -0,0 +1,93 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidTokenSink:
+    """
+    Device tokens a provider rejected for good (FCM, APNs, web push),
+    deactivated together with one UPDATE once INVALID_TOKEN_FLUSH_SIZE of
+    them are buffered or the oldest has waited INVALID_TOKEN_FLUSH_INTERVAL
+    seconds, instead of one UPDATE per token in the middle of delivery.
+
+    Senders only flag such results with ``invalid_token``; whoever writes
+    the results back reports them with add() and calls flush_due(). Each
+    flush logs the number of devices deactivated per App.
+    """
+
+    def __init__(self):
+        self._tokens = {}
+        self._since = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def add(self, app_id, device_tokens):
+        """Buffer ``device_tokens`` of App ``app_id``."""
+        with self._lock:
+            if self._pid != os.getpid():
+                # A forked worker starts empty, its parent flushes its own
+                self._tokens = {}
+                self._since = None
+                self._pid = os.getpid()
+            for device_token in device_tokens:
+                self._tokens.setdefault(device_token, app_id)
+            if self._tokens and self._since is None:
+                self._since = time.monotonic()
+
+    def pending(self):
+        """Seconds until the buffered tokens are due, None when there are none."""
+        with self._lock:
+            if not self._tokens or self._pid != os.getpid():
+                return None
+            if len(self._tokens) >= settings.INVALID_TOKEN_FLUSH_SIZE:
+                return 0.0
+            return max(0.0, self._since + settings.INVALID_TOKEN_FLUSH_INTERVAL - time.monotonic())
+
+    def flush_due(self):
+        """flush() if enough tokens are buffered or they have waited long enough."""
+        if self.pending() == 0.0:
+            return self.flush()
+        return {}
+
+    def flush(self):
+        """
+        Deactivate the buffered tokens and return {app_id: count}. Tokens
+        are kept for the next flush when the update fails.
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                return {}
+            tokens, self._tokens = self._tokens, {}
+            self._since = None
+        if not tokens:
+            return {}
+
+        from api.models import Device
+        try:
+            Device.objects.filter(device_token__in=list(tokens), is_active=True).update(is_active=False)
+        except Exception as e:
+            logger.error(f"Failed to deactivate {len(tokens)} invalid device tokens: {str(e)}", exc_info=True)
+            with self._lock:
+                for device_token, app_id in tokens.items():
+                    self._tokens.setdefault(device_token, app_id)
+                if self._since is None:
+                    self._since = time.monotonic()
+            return {}
+
+        counts = Counter(tokens.values())
+        for app_id, count in counts.items():
+            logger.info(f"Deactivated {count} invalid device tokens for app {app_id}")
+        return dict(counts)
+
+    def clear(self):
+        with self._lock:
+            self._tokens = {}
+            self._since = None
+
+
+invalid_token_sink = InvalidTokenSink()
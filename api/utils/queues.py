@@ -0,0 +1,14 @@
+from django.conf import settings
+
+PRIORITY_CHOICES = ['high', 'normal', 'bulk']
+DEFAULT_PRIORITY = 'normal'
+
+
+def queue_for_priority(priority):
+    """
+    Return the Celery queue that delivers notifications of ``priority``.
+
+    Each queue is consumed by its own worker pool (see docker-compose.yml),
+    so transactional pushes never wait behind a bulk backlog.
+    """
+    return settings.PUSH_PRIORITY_QUEUES.get(priority or DEFAULT_PRIORITY, settings.PUSH_PRIORITY_QUEUES[DEFAULT_PRIORITY])
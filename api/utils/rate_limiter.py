@@ -0,0 +1,140 @@
+import logging
+import math
+import threading
+import time
+import redis
+from rest_framework.throttling import BaseThrottle
+from .idempotency import has_stored_response
+from .redis_client import get_redis, mark_unavailable
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1]: bucket key. ARGV: capacity, refill rate (tokens/s), cost.
+# Uses the Redis clock so every node refills the bucket identically. A cost
+# above capacity is admitted on a full bucket and leaves it negative.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local required = math.min(cost, capacity)
+local allowed = 0
+local retry_after = 0
+if tokens >= required then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (required - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate) + 1)
+return {allowed, tostring(retry_after)}
+"""
+
+
+class AppRateLimiter:
+    """
+    Token-bucket limiter enforcing App.rate_limit (notifications per minute).
+
+    The bucket holds one minute of traffic and refills continuously. State
+    lives in Redis so the limit holds across every worker and node, and each
+    check is a single EVALSHA round trip. While Redis is unavailable the
+    limit is enforced per process instead.
+    """
+
+    def __init__(self):
+        self._script = None
+        self._script_client = None
+        self._local = {}
+        self._lock = threading.Lock()
+
+    def consume(self, app, cost=1):
+        """
+        Take ``cost`` tokens from the app's bucket.
+
+        A cost larger than the bucket is only admitted when the bucket is
+        full and leaves it in debt, so the following requests wait until
+        the excess has been refilled: the charge is spread over time rather
+        than capped at one bucket.
+
+        Returns (allowed, retry_after_seconds).
+        """
+        capacity = float(app.rate_limit)
+        if capacity <= 0:
+            return True, 0.0
+        rate = capacity / 60.0
+        cost = float(cost)
+
+        client = get_redis()
+        if client is not None:
+            try:
+                allowed, retry_after = self._get_script(client)(
+                    keys=[f"rate_limit:{app.id}"],
+                    args=[capacity, rate, cost]
+                )
+                return bool(int(allowed)), float(retry_after)
+            except redis.RedisError as e:
+                mark_unavailable(e)
+
+        return self._consume_local(app.id, capacity, rate, cost)
+
+    def _get_script(self, client):
+        if self._script is None or self._script_client is not client:
+            self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+            self._script_client = client
+        return self._script
+
+    def _consume_local(self, app_id, capacity, rate, cost):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._local.get(app_id, (capacity, now))
+            tokens = min(capacity, tokens + max(0.0, now - updated_at) * rate)
+            required = min(cost, capacity)
+            if tokens >= required:
+                self._local[app_id] = (tokens - cost, now)
+                return True, 0.0
+            self._local[app_id] = (tokens, now)
+            return False, (required - tokens) / rate
+
+
+rate_limiter = AppRateLimiter()
+
+
+def retry_after_header(retry_after):
+    """Format a wait time for the Retry-After header (whole seconds, at least 1)."""
+    return str(max(1, int(math.ceil(retry_after))))
+
+
+class AppRateThrottle(BaseThrottle):
+    """
+    DRF throttle applying the per-app token bucket to app-key requests.
+    Set as ``throttle_classes`` on the views that send notifications only.
+
+    Views can define ``get_throttle_cost(request)`` so that bulk requests
+    count every notification instead of the request as a whole. Retries of
+    a request whose Idempotency-Key already has a stored response are not
+    charged, so they always get the replay.
+    """
+
+    def __init__(self):
+        self.retry_after = None
+
+    def allow_request(self, request, view):
+        app = getattr(request, 'app', None)
+        if app is None or has_stored_response(request):
+            return True
+
+        get_cost = getattr(view, 'get_throttle_cost', None)
+        cost = get_cost(request) if get_cost else 1
+        allowed, self.retry_after = rate_limiter.consume(app, cost)
+        if not allowed:
+            logger.info(f"Rate limit exceeded for app {app.name} (cost {cost}, retry after {self.retry_after:.1f}s)")
+        return allowed
+
+    def wait(self):
+        return self.retry_after
@@ -0,0 +1,46 @@
+import logging
+import threading
+import time
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_clients = {}
+_lock = threading.Lock()
+_unavailable_until = 0.0
+
+
+def get_redis():
+    """
+    Return the shared Redis client for this process, or None.
+
+    None is returned when REDIS_URL is not configured or while Redis is
+    considered unreachable after a recent connection error, so callers
+    can fall back to their in-process implementation without paying a
+    connection timeout on every request.
+    """
+    url = getattr(settings, 'REDIS_URL', None)
+    if not url or time.monotonic() < _unavailable_until:
+        return None
+
+    client = _clients.get(url)
+    if client is None:
+        with _lock:
+            client = _clients.get(url)
+            if client is None:
+                client = redis.Redis.from_url(
+                    url,
+                    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                    socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                )
+                _clients[url] = client
+    return client
+
+
+def mark_unavailable(exc):
+    """Stop using Redis for REDIS_RETRY_INTERVAL seconds after a connection error."""
+    global _unavailable_until
+    if time.monotonic() >= _unavailable_until:
+        logger.warning(f"Redis unavailable, using local fallback for {settings.REDIS_RETRY_INTERVAL}s: {str(exc)}")
+    _unavailable_until = time.monotonic() + settings.REDIS_RETRY_INTERVAL
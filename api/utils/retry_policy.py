@@ -0,0 +1,44 @@
+import random
+from django.conf import settings
+from .circuit_breaker import is_provider_failure
+
+TRANSIENT = 'transient'
+PERMANENT = 'permanent'
+
+# Provider error codes worth retrying even when the HTTP status is 200 (legacy
+# FCM reports per-token errors inside a successful multicast response)
+TRANSIENT_ERRORS = frozenset([
+    'Unavailable', 'InternalServerError',  # FCM legacy
+    'UNAVAILABLE', 'INTERNAL',  # FCM HTTP v1
+])
+
+
+def classify(response):
+    """
+    Classify the outcome of one send: None when it succeeded, TRANSIENT
+    when trying again later may succeed (the sender raised, the provider
+    throttled, failed or could not be reached) and PERMANENT otherwise
+    (invalid token, rejected payload, missing credentials).
+    """
+    if isinstance(response, Exception):
+        return TRANSIENT
+    if response.get('success'):
+        return None
+    if response.get('invalid_token'):
+        return PERMANENT
+    if is_provider_failure(response) or response.get('error') in TRANSIENT_ERRORS:
+        return TRANSIENT
+    return PERMANENT
+
+
+def backoff_delay(retry):
+    """
+    Seconds to wait before retry number ``retry`` (1 for the first).
+
+    The ceiling doubles with each retry from PUSH_RETRY_BASE_DELAY up to
+    PUSH_RETRY_MAX_DELAY and the delay is drawn uniformly below it ("full
+    jitter"), so messages that failed together during an outage come back
+    spread over the whole interval instead of at once.
+    """
+    ceiling = min(settings.PUSH_RETRY_MAX_DELAY, settings.PUSH_RETRY_BASE_DELAY * 2 ** max(0, retry - 1))
+    return max(1.0, random.uniform(0, ceiling))
@@ -0,0 +1,24 @@
+from ..models import ScheduledNotification
+
+
+def is_deferred(validated_data):
+    """True when a validated notification request carries a future send_at."""
+    return validated_data.get('send_at') is not None
+
+
+def build_scheduled_notification(app, validated_data):
+    """Return an unsaved ScheduledNotification for a deferred request."""
+    payload = {key: value for key, value in validated_data.items() if key != 'send_at'}
+    return ScheduledNotification(app=app, send_at=validated_data['send_at'], payload=payload)
+
+
+def scheduled_result(scheduled):
+    """Result entry reported for a notification that was scheduled instead of sent."""
+    return {
+        'success': True,
+        'message': 'Notification scheduled',
+        'data': {
+            'scheduled_notification_id': str(scheduled.id),
+            'send_at': scheduled.send_at.isoformat()
+        }
+    }
@@ -0,0 +1,128 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+import redis
+from ..models import Template
+from .redis_client import get_redis, mark_unavailable
+
+logger = logging.getLogger(__name__)
+
+
+class TemplateResolver:
+    """
+    In-memory index of (app_id, name) -> latest active Template.
+
+    Entries are filled lazily and also remember when a name has no active
+    template. Every Template save or delete bumps a per-name generation
+    counter in Redis; cached entries are checked against it at most every
+    TEMPLATE_CACHE_CHECK_INTERVAL seconds (one MGET for all the names in a
+    lookup), so every worker picks up new versions and is_active flips
+    without querying the database in steady state. While Redis is
+    unavailable a local counter is used and entries expire after
+    TEMPLATE_CACHE_MAX_AGE seconds.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._local_generations = {}
+        self._lock = threading.Lock()
+
+    def _generation_key(self, app_id, name):
+        return f"template_generation:{app_id}:{name}"
+
+    def get(self, app, name):
+        """Return the latest active Template called ``name`` for ``app``, or None."""
+        return self.get_many(app, [name]).get(name)
+
+    def get_many(self, app, names):
+        """Return a name -> latest active Template map; names without one are left out."""
+        names = set(names)
+        if not names:
+            return {}
+
+        now = time.monotonic()
+        resolved = {}
+        stale = {}
+        with self._lock:
+            for name in names:
+                entry = self._entries.get((app.id, name))
+                if entry is None or now - entry['loaded_at'] > settings.TEMPLATE_CACHE_MAX_AGE:
+                    stale[name] = None
+                elif now - entry['checked_at'] > settings.TEMPLATE_CACHE_CHECK_INTERVAL:
+                    stale[name] = entry
+                else:
+                    resolved[name] = entry['template']
+
+        if stale:
+            # Read generations before querying so a concurrent save is never masked
+            generations = self._generations(app.id, stale.keys())
+            reload = []
+            with self._lock:
+                for name, entry in stale.items():
+                    if entry is not None and entry['generation'] == generations[name]:
+                        entry['checked_at'] = now
+                        resolved[name] = entry['template']
+                    else:
+                        reload.append(name)
+
+            if reload:
+                loaded = {}
+                queryset = Template.objects.filter(
+                    app=app,
+                    name__in=reload,
+                    is_active=True
+                ).order_by('name', '-version')
+                for template in queryset:
+                    loaded.setdefault(template.name, template)
+
+                with self._lock:
+                    for name in reload:
+                        template = loaded.get(name)
+                        self._entries[(app.id, name)] = {
+                            'template': template,
+                            'generation': generations[name],
+                            'loaded_at': now,
+                            'checked_at': now,
+                        }
+                        self._entries.move_to_end((app.id, name))
+                        resolved[name] = template
+                    while len(self._entries) > settings.TEMPLATE_CACHE_MAX_ENTRIES:
+                        self._entries.popitem(last=False)
+
+        return {name: template for name, template in resolved.items() if template is not None}
+
+    def invalidate(self, app_id, name):
+        """Bump the generation of (app_id, name) so every process reloads it."""
+        with self._lock:
+            self._entries.pop((app_id, name), None)
+            self._local_generations[(app_id, name)] = self._local_generations.get((app_id, name), 0) + 1
+
+        client = get_redis()
+        if client is None:
+            return
+        try:
+            client.incr(self._generation_key(app_id, name))
+        except redis.RedisError as e:
+            mark_unavailable(e)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _generations(self, app_id, names):
+        names = list(names)
+        client = get_redis()
+        if client is not None:
+            try:
+                values = client.mget([self._generation_key(app_id, name) for name in names])
+                return {name: int(value or 0) for name, value in zip(names, values)}
+            except redis.RedisError as e:
+                mark_unavailable(e)
+        with self._lock:
+            # Negative values keep local generations distinct from Redis ones
+            return {name: -self._local_generations.get((app_id, name), 0) - 1 for name in names}
+
+
+template_resolver = TemplateResolver()
@@ -1,65 +1,302 @@
 import re
 import json
+import threading
+from collections import OrderedDict
+from html import escape as html_escape
 from string import Template
-from django.utils.html import escape
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Django-style template syntax stripped from templates to prevent code execution
+DJANGO_SYNTAX_PATTERNS = (
+    re.compile(r'\{\{.*?\}\}'),  # Remove {{ }}
+    re.compile(r'\{%.*?%\}'),  # Remove {% %}
+    re.compile(r'\{#.*?#\}'),  # Remove {# #}
+)
+SAFE_CONTEXT_KEY = re.compile(r'^[a-zA-Z0-9_.]+$')
+PLACEHOLDER_PATTERN = re.compile(r'\{([a-zA-Z_][a-zA-Z0-9_]*(\.[a-zA-Z_][a-zA-Z0-9_]*)*)\}')
+
+# Number of compiled templates kept per process
+COMPILED_TEMPLATE_CACHE_SIZE = 1024
+
+_MISSING = object()
+
+
+def escape(value):
+    """
+    HTML-escape ``value``.
+
+    Produces the same text as django.utils.html.escape without the
+    SafeString wrapper, which dominates the cost of rendering a field.
+    """
+    return html_escape(str(value))
+
+
+def sanitize_template(template_str):
+    """
+    Sanitize template string to prevent code injection.
+    Only allow safe variable patterns.
+    """
+    sanitized = template_str
+    for pattern in DJANGO_SYNTAX_PATTERNS:
+        sanitized = pattern.sub('', sanitized)
+    return sanitized
+
+
+class CompiledField:
+    """
+    A single template string, sanitized and parsed once.
+
+    The string is split into literal text and string.Template placeholders
+    so rendering is a plain substitution with the same result as
+    ``escape(Template(s).safe_substitute(context))``.
+    """
+    __slots__ = ('parts', 'keys', 'static')
+
+    def __init__(self, template_str):
+        sanitized = sanitize_template(template_str)
+        parts = []
+        keys = []
+        literal = []
+        position = 0
+
+        for match in Template.pattern.finditer(sanitized):
+            literal.append(sanitized[position:match.start()])
+            position = match.end()
+
+            if match.group('escaped') is not None:
+                literal.append(Template.delimiter)
+                continue
+
+            name = match.group('named') or match.group('braced')
+            if name is None:
+                # Invalid placeholders are left untouched by safe_substitute
+                literal.append(match.group(0))
+                continue
+
+            if literal:
+                parts.append(''.join(literal))
+                literal = []
+            parts.append((name, match.group(0)))
+            keys.append(name)
+
+        literal.append(sanitized[position:])
+        if any(literal):
+            parts.append(''.join(literal))
+
+        self.parts = tuple(parts)
+        self.keys = tuple(keys)
+        # Fields without placeholders render to the same string every time
+        self.static = escape(''.join(parts)) if not keys else None
+
+    def render(self, safe_context):
+        if self.static is not None:
+            return self.static
+        output = []
+        for part in self.parts:
+            if part.__class__ is str:
+                output.append(part)
+                continue
+            value = safe_context.get(part[0], _MISSING)
+            output.append(part[1] if value is _MISSING else str(value))
+        # Escape HTML to prevent XSS
+        return escape(''.join(output))
+
+
+class CompiledTemplate:
+    """
+    Pre-sanitized, pre-parsed form of a Template's title, body, subject
+    and data template.
+    """
+
+    def __init__(self, template):
+        self.title = CompiledField(template.title_template or '')
+        self.body = CompiledField(template.body_template or '')
+        self.subject = CompiledField(template.subject_template) if template.subject_template else None
+
+        self.data = None
+        self.data_error = None
+        try:
+            # Parse the data template as JSON string once
+            if isinstance(template.data_template, str):
+                template_data = json.loads(template.data_template)
+            else:
+                template_data = dict(template.data_template or {})
+            self.data = tuple(
+                (key, CompiledField(value) if isinstance(value, str) else value)
+                for key, value in template_data.items()
+            )
+        except Exception as e:
+            self.data_error = e
+
+        keys = set(self.title.keys) | set(self.body.keys)
+        if self.subject is not None:
+            keys.update(self.subject.keys)
+        for _, value in self.data or ():
+            if isinstance(value, CompiledField):
+                keys.update(value.keys)
+        self.keys = frozenset(keys)
+
+
+class CompiledTemplateCache:
+    """
+    Process-wide LRU of compiled templates.
+
+    Keyed by (id, version, updated_at) so that a new version or an in-place
+    edit through the admin compiles a fresh entry.
+    """
+
+    def __init__(self, max_entries=COMPILED_TEMPLATE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, template):
+        template_id = getattr(template, 'id', None)
+        if template_id is None:
+            return CompiledTemplate(template)
+
+        key = (template_id, getattr(template, 'version', None), getattr(template, 'updated_at', None))
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self._entries.move_to_end(key)
+                return compiled
+
+        compiled = CompiledTemplate(template)
+        with self._lock:
+            self._entries[key] = compiled
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return compiled
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+compiled_templates = CompiledTemplateCache()
+
 
 class TemplateRenderer:
     """
     Utility class to render notification templates with user context.
     """
-    
+
     def __init__(self, template):
         self.template = template
+        self.compiled = compiled_templates.get(template)
+
+    def render(self, context, additional_data=None):
+        """
+        Render title, body, subject and data in one pass.
+
+        The context is flattened once and shared by every field.
+        """
+        safe_context = self._create_safe_context(context)
+        return {
+            'title': self._render_title(safe_context),
+            'body': self._render_body(safe_context),
+            'subject': self._render_subject(safe_context),
+            'data': self._render_data(safe_context, additional_data),
+        }
+
+    def render_many(self, contexts, additional_data=None):
+        """
+        Render title, body, subject and data for many contexts at once.
+
+        Placeholders are extracted once per template, and only the context
+        values they reference are looked up and escaped for each context
+        instead of flattening the whole context. ``additional_data`` may be
+        an iterable of per-context dicts aligned with ``contexts``.
+        Returns a list of dicts shaped like render().
+        """
+        compiled = self.compiled
+        key_paths = [(key, key.split('.')) for key in compiled.keys]
+        if additional_data is None:
+            additional_data = iter(lambda: None, 0)
+
+        rendered = []
+        for context, extra in zip(contexts, additional_data):
+            safe_context = {}
+            for key, path in key_paths:
+                value = context
+                for part in path:
+                    if not isinstance(value, dict) or part not in value:
+                        value = _MISSING
+                        break
+                    value = value[part]
+                if value is _MISSING or isinstance(value, dict):
+                    continue
+                if isinstance(value, str):
+                    value = escape(value)
+                    if len(value) > 1000:
+                        value = value[:1000] + "..."
+                safe_context[key] = value
+
+            rendered.append({
+                'title': self._render_title(safe_context),
+                'body': self._render_body(safe_context),
+                'subject': self._render_subject(safe_context),
+                'data': self._render_data(safe_context, extra),
+            })
+        return rendered
 
     def render_title(self, context):
         """Render the title template with user context."""
+        return self._render_title(self._create_safe_context(context))
+
+    def render_body(self, context):
+        """Render the body template with user context."""
+        return self._render_body(self._create_safe_context(context))
+
+    def render_subject(self, context):
+        """Render the subject template with user context."""
+        return self._render_subject(self._create_safe_context(context))
+
+    def render_data(self, context, additional_data=None):
+        """Render the data template with user context."""
+        return self._render_data(self._create_safe_context(context), additional_data)
+
+    def _render_title(self, safe_context):
         try:
-            return self._safe_render(self.template.title_template, context)
+            return self.compiled.title.render(safe_context)
         except Exception as e:
             logger.error(f"Error rendering title template: {str(e)}")
             return self.template.title_template
 
-    def render_body(self, context):
-        """Render the body template with user context."""
+    def _render_body(self, safe_context):
         try:
-            return self._safe_render(self.template.body_template, context)
+            return self.compiled.body.render(safe_context)
         except Exception as e:
             logger.error(f"Error rendering body template: {str(e)}")
             return self.template.body_template
 
-    def render_subject(self, context):
-        """Render the subject template with user context."""
+    def _render_subject(self, safe_context):
         try:
-            return self._safe_render(self.template.subject_template, context) if self.template.subject_template else ""
+            return self.compiled.subject.render(safe_context) if self.compiled.subject else ""
         except Exception as e:
             logger.error(f"Error rendering subject template: {str(e)}")
             return self.template.subject_template or ""
 
-    def render_data(self, context, additional_data=None):
-        """Render the data template with user context."""
+    def _render_data(self, safe_context, additional_data=None):
+        if self.compiled.data_error is not None:
+            logger.error(f"Error rendering data template: {str(self.compiled.data_error)}")
+            return additional_data or {}
         try:
-            # Parse the data template as JSON string and render its values
-            if isinstance(self.template.data_template, str):
-                template_data = json.loads(self.template.data_template)
-            else:
-                template_data = self.template.data_template.copy()
-            
             # Render each value in the data template
             rendered_data = {}
-            for key, value in template_data.items():
-                if isinstance(value, str):
-                    rendered_data[key] = self._safe_render(value, context)
+            for key, value in self.compiled.data:
+                if isinstance(value, CompiledField):
+                    rendered_data[key] = value.render(safe_context)
                 else:
                     rendered_data[key] = value
-            
+
             # Add any additional data provided
             if additional_data:
                 rendered_data.update(additional_data)
-                
+
             return rendered_data
         except Exception as e:
             logger.error(f"Error rendering data template: {str(e)}")
@@ -72,20 +309,8 @@ class TemplateRenderer:
         if not template_str:
             return ""
 
-        # Sanitize the template string to prevent code execution
-        # Only allow safe variable placeholders like {user.name}, {user.email}
-        sanitized_template = self._sanitize_template(template_str)
-        
-        # Create a safe context with only allowed variables
-        safe_context = self._create_safe_context(context)
-        
         try:
-            # Use string.Template for safe substitution
-            template = Template(sanitized_template)
-            rendered = template.safe_substitute(**safe_context)
-            
-            # Escape HTML to prevent XSS
-            return escape(rendered)
+            return CompiledField(template_str).render(self._create_safe_context(context))
         except Exception:
             # If safe substitution fails, return original template
             return template_str
@@ -95,25 +320,14 @@ class TemplateRenderer:
         Sanitize template string to prevent code injection.
         Only allow safe variable patterns.
         """
-        # Replace Django-style template tags with safe placeholders
-        # This prevents execution of Django template code
-        sanitized = re.sub(r'\{\{.*?\}\}', '', template_str)  # Remove {{ }}
-        sanitized = re.sub(r'\{%.*?%\}', '', sanitized)  # Remove {% %}
-        sanitized = re.sub(r'\{#.*?#\}', '', sanitized)  # Remove {# #}
-        
-        # Only allow safe variable placeholders like {user.name}
-        # This regex matches {word.word} patterns
-        safe_vars = re.findall(r'\{([a-zA-Z_][a-zA-Z0-9_]*(\.[a-zA-Z_][a-zA-Z0-9_]*)*)\}', sanitized)
-        
-        # Return the template with only safe variable placeholders
-        return sanitized
+        return sanitize_template(template_str)
 
     def _create_safe_context(self, context):
         """
         Create a safe context by flattening nested objects and sanitizing values.
         """
         safe_context = {}
-        
+
         def flatten_dict(d, parent_key='', sep='.'):
             items = []
             for k, v in d.items():
@@ -127,19 +341,19 @@ class TemplateRenderer:
                     else:
                         items.append((new_key, v))
             return dict(items)
-        
+
         # Flatten the context to support nested access like {user.name}
         flattened = flatten_dict(context)
-        
+
         # Limit the context to prevent access to dangerous attributes
         for key, value in flattened.items():
             # Only allow alphanumeric keys with dots (for nested access)
-            if re.match(r'^[a-zA-Z0-9_.]+$', key):
+            if SAFE_CONTEXT_KEY.match(key):
                 # Limit string length to prevent abuse
                 if isinstance(value, str) and len(value) > 1000:
                     value = value[:1000] + "..."
                 safe_context[key] = value
-        
+
         return safe_context
 
 
@@ -154,13 +368,13 @@ def validate_template_context(template_str, context):
             'subject_template': '',
             'data_template': {}
         })())
-        
+
         # Try to render the template
         result = renderer._safe_render(template_str, context)
-        
+
         # Check if all placeholders were replaced
-        remaining_placeholders = re.findall(r'\{([a-zA-Z_][a-zA-Z0-9_]*(\.[a-zA-Z_][a-zA-Z0-9_]*)*)\}', result)
-        
+        remaining_placeholders = PLACEHOLDER_PATTERN.findall(result)
+
         return {
             'valid': len(remaining_placeholders) == 0,
             'missing_variables': remaining_placeholders,
@@ -171,4 +385,4 @@ def validate_template_context(template_str, context):
             'valid': False,
             'error': str(e),
             'rendered': None
-        }
\ No newline at end of file
+        }
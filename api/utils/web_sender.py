@@ -1,12 +1,87 @@
 # api/utils/web_sender.py
 import pywebpush
 import json
+import requests
 import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from urllib.parse import urlparse
-# DO NOT import settings from django.conf here for VAPID keys
+from django.conf import settings  # DO NOT read VAPID keys from settings, they come from the App
+from .adaptive_concurrency import ConcurrencyLimit
+from .circuit_breaker import is_provider_failure, response_retry_after
+from .http_client import get_session
 
 logger = logging.getLogger(__name__)
 
+# Number of parsed keys / signed headers kept per process
+VAPID_CACHE_SIZE = 1024
+
+# Smaller batches are encrypted inline, the process round trip costs more
+ENCRYPT_POOL_MIN_BATCH = 64
+
+
+class VapidCache:
+    """
+    Process-wide LRU of parsed VAPID keys and signed VAPID headers.
+
+    Parsing an App's private key and signing the ES256 JWT are the
+    expensive parts of a web push, so a key is parsed once and the signed
+    headers for each (key, push service audience) pair are reused until
+    VAPID_REFRESH_MARGIN seconds before their VAPID_TOKEN_TTL expiry.
+    """
+
+    def __init__(self, max_entries=VAPID_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._keys = OrderedDict()
+        self._headers = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, entries, key):
+        with self._lock:
+            value = entries.get(key)
+            if value is not None:
+                entries.move_to_end(key)
+            return value
+
+    def _put(self, entries, key, value):
+        with self._lock:
+            entries[key] = value
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def key(self, private_key):
+        vapid = self._get(self._keys, private_key)
+        if vapid is None:
+            vapid = pywebpush.Vapid.from_string(private_key=private_key)
+            self._put(self._keys, private_key, vapid)
+        return vapid
+
+    def headers(self, private_key, audience):
+        cache_key = (private_key, audience, settings.WEB_PUSH_VAPID_SUBJECT)
+        entry = self._get(self._headers, cache_key)
+        if entry is not None and time.time() < entry[1] - settings.VAPID_REFRESH_MARGIN:
+            return entry[0]
+
+        expires_at = int(time.time()) + settings.VAPID_TOKEN_TTL
+        headers = self.key(private_key).sign({
+            'aud': audience,
+            'exp': expires_at,
+            'sub': settings.WEB_PUSH_VAPID_SUBJECT
+        })
+        self._put(self._headers, cache_key, (headers, expires_at))
+        return headers
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+            self._headers.clear()
+
+
+vapid_cache = VapidCache()
+
 
 def send_web_notification(device_token, title, body, data, vapid_public_key, vapid_private_key):
     """
@@ -40,22 +115,15 @@ def send_web_notification(device_token, title, body, data, vapid_public_key, vap
             payload.update(data)
 
         # Extract the origin (scheme + host) from the subscription endpoint for the 'aud' claim
-        endpoint_url = subscription_info.get('endpoint', '')
-        parsed_url = urlparse(endpoint_url)
-        audience = f"{parsed_url.scheme}://{parsed_url.netloc}"
+        audience = audience_for(subscription_info)
 
-        # Send the notification - Use the correct function name: webpush
+        # Send the notification with the cached VAPID headers for this audience
         response = pywebpush.webpush(
             subscription_info=subscription_info,
             data=json.dumps(payload),
-            vapid_private_key=web_vapid_private_key,
-            vapid_claims={
-                "aud": audience, # Use the dynamically determined audience
-                "exp": None,  # Expiration not set
-                # Using a generic email for sub, consider making it configurable or app-specific
-                "sub": "mailto:admin@example.com" 
-            },
-            timeout=30 # Increased timeout as suggested earlier
+            headers=vapid_cache.headers(web_vapid_private_key, audience),
+            timeout=30, # Increased timeout as suggested earlier
+            requests_session=get_session('webpush')
         )
         
         return {
@@ -67,16 +135,30 @@ def send_web_notification(device_token, title, body, data, vapid_public_key, vap
     except pywebpush.WebPushException as e:
         logger.error(f"Web push error: {str(e)}")
         
-        # Check for specific error codes
-        if e.response and e.response.status_code == 410:  # Subscription expired
-            # Mark device as inactive - This requires the device ID, handled in the calling function
-            # Device.objects.filter(device_token=subscription_info['endpoint']).update(is_active=False)
+        if e.response is None:
+            return {
+                'success': False,
+                'error': str(e),
+                'status_code': None
+            }
+
+        # Expired subscriptions (404/410) will never accept a push again, the
+        # caller deactivates them (see api/utils/invalid_tokens.py)
+        if e.response.status_code in (404, 410):
             logger.warning(f"Web push subscription expired for endpoint: {subscription_info.get('endpoint')}")
-        
         return {
             'success': False,
             'error': str(e),
-            'status_code': e.response.status_code if e.response else None
+            'status_code': e.response.status_code,
+            'invalid_token': e.response.status_code in (404, 410),
+            'retry_after': response_retry_after(e.response)
+        }
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Web push request failed: {str(e)}")
+        return {
+            'success': False,
+            'error': str(e),
+            'unavailable': True
         }
     except Exception as e:
         logger.error(f"Web push send error: {str(e)}", exc_info=True)
@@ -85,4 +167,194 @@ def send_web_notification(device_token, title, body, data, vapid_public_key, vap
             'error': str(e)
         }
 
-# Keep other functions if any...
\ No newline at end of file
+def audience_for(subscription_info):
+    """Origin (scheme + host) of the push service, used as the VAPID 'aud' claim."""
+    parsed_url = urlparse(subscription_info.get('endpoint', ''))
+    return f"{parsed_url.scheme}://{parsed_url.netloc}"
+
+
+def encrypt_notification(subscription_info, payload):
+    """
+    Encrypt ``payload`` for one subscription (ECDH + aes128gcm).
+
+    Runs in the encryption pool, so it returns (body, error) instead of
+    raising.
+    """
+    try:
+        return pywebpush.WebPusher(subscription_info).encode(payload, 'aes128gcm')['body'], None
+    except Exception as e:
+        return None, str(e)
+
+
+def encrypt_many(subscriptions, payloads):
+    """Encrypt a chunk of messages in one call, so a pool worker gets them in one round trip."""
+    return [encrypt_notification(subscription_info, payload) for subscription_info, payload in zip(subscriptions, payloads)]
+
+
+_encryption_pool = None
+_encryption_pool_pid = None
+_encryption_pool_failed_pid = None
+_encryption_pool_lock = threading.Lock()
+
+
+def get_encryption_pool():
+    """
+    Return this process's encryption ProcessPoolExecutor, or None when
+    WEB_PUSH_ENCRYPT_PROCESSES is 0 or the pool failed in this process.
+
+    A Celery prefork child is daemonic and may not start processes, so the
+    pool only works in the delivery engine or a worker started with
+    ``--pool threads`` or ``--pool solo``. A failure is remembered, the
+    process encrypts inline from then on instead of trying every batch.
+    """
+    global _encryption_pool, _encryption_pool_pid
+    processes = settings.WEB_PUSH_ENCRYPT_PROCESSES
+    if processes <= 0:
+        return None
+    with _encryption_pool_lock:
+        if _encryption_pool_failed_pid == os.getpid():
+            return None
+        if _encryption_pool is None or _encryption_pool_pid != os.getpid():
+            try:
+                _encryption_pool = ProcessPoolExecutor(max_workers=processes)
+                _encryption_pool_pid = os.getpid()
+            except Exception as e:
+                _disable_encryption_pool(e)
+                return None
+        return _encryption_pool
+
+
+def _disable_encryption_pool(error):
+    """Stop using the encryption pool in this process (caller holds the lock)."""
+    global _encryption_pool, _encryption_pool_failed_pid
+    logger.warning(
+        f"Web push encryption pool unavailable in process {os.getpid()}, encrypting inline from now on: {str(error)}"
+    )
+    if _encryption_pool is not None and _encryption_pool_pid == os.getpid():
+        _encryption_pool.shutdown(wait=False, cancel_futures=True)
+    _encryption_pool = None
+    _encryption_pool_failed_pid = os.getpid()
+
+
+def _encrypt_all(subscriptions, payloads):
+    """Return an iterator of (body, error) per subscription, in order, as they are encrypted."""
+    pool = get_encryption_pool() if len(subscriptions) >= ENCRYPT_POOL_MIN_BATCH else None
+    if pool is None:
+        return map(encrypt_notification, subscriptions, payloads)
+
+    chunksize = max(1, min(256, len(subscriptions) // (settings.WEB_PUSH_ENCRYPT_PROCESSES * 4)))
+    try:
+        return pool.map(encrypt_notification, subscriptions, payloads, chunksize=chunksize)
+    except Exception as e:
+        # e.g. a daemonic prefork child, which may not start processes
+        with _encryption_pool_lock:
+            _disable_encryption_pool(e)
+        return map(encrypt_notification, subscriptions, payloads)
+
+
+# Posts in flight from this process, adapted to the push services' latency and errors
+web_push_limit = ConcurrencyLimit('WEB_PUSH_CONCURRENCY')
+
+
+def post_notification(subscription_info, body, vapid_private_key):
+    """POST an already encrypted message to the subscription's push service."""
+    started = web_push_limit.acquire()
+    result = None
+    try:
+        result = _post(subscription_info, body, vapid_private_key)
+        return result
+    finally:
+        web_push_limit.release(started, result is None or is_provider_failure(result))
+
+
+def _post(subscription_info, body, vapid_private_key):
+    headers = dict(vapid_cache.headers(vapid_private_key, audience_for(subscription_info)))
+    headers.update({'content-encoding': 'aes128gcm', 'ttl': '0'})
+    try:
+        response = get_session('webpush').post(
+            subscription_info['endpoint'],
+            data=body,
+            headers=headers,
+            timeout=30
+        )
+    except Exception as e:
+        logger.error(f"Web push send error: {str(e)}")
+        return {
+            'success': False,
+            'error': str(e),
+            'unavailable': True
+        }
+
+    if response.status_code > 202:
+        return {
+            'success': False,
+            'error': f"Push failed: {response.status_code} {response.reason}\nResponse body:{response.text}",
+            'invalid_token': response.status_code in (404, 410),
+            'status_code': response.status_code,
+            'retry_after': response_retry_after(response)
+        }
+    return {
+        'success': True,
+        'response': response.text,
+        'status_code': response.status_code
+    }
+
+
+def prepare_messages(messages):
+    """
+    Parse the subscriptions and build the payloads of (device_token, title,
+    body, data) messages.
+
+    Returns (results, indexes, subscriptions, payloads): ``results`` holds an
+    error dict for every message that cannot be sent and None for the
+    others, whose positions are listed in ``indexes``.
+    """
+    results = [None] * len(messages)
+    indexes, subscriptions, payloads = [], [], []
+    for index, (device_token, title, body, data) in enumerate(messages):
+        try:
+            subscription_info = json.loads(device_token) if isinstance(device_token, str) else device_token
+            if not subscription_info.get('endpoint'):
+                raise ValueError('subscription_info missing endpoint URL')
+        except Exception as e:
+            results[index] = {'success': False, 'error': str(e)}
+            continue
+        indexes.append(index)
+        subscriptions.append(subscription_info)
+        payloads.append(json.dumps({'title': title, 'body': body, **(data or {})}).encode())
+    return results, indexes, subscriptions, payloads
+
+
+def send_web_many(messages, vapid_public_key, vapid_private_key):
+    """
+    Send many (device_token, title, body, data) web pushes of one App.
+
+    Payloads are encrypted on a pool of WEB_PUSH_ENCRYPT_PROCESSES
+    processes (inline when 0) and each message is posted by one of
+    WEB_PUSH_CONCURRENCY threads as soon as it is encrypted, so encryption
+    and network time overlap. Returns one result dict per message, in order;
+    expired subscriptions are flagged ``invalid_token`` for the caller to
+    deactivate.
+    """
+    messages = list(messages)
+    if not vapid_public_key or not vapid_private_key:
+        return [{'success': False, 'error': 'Web VAPID keys not provided'} for _ in messages]
+
+    results, indexes, subscriptions, payloads = prepare_messages(messages)
+    if not subscriptions:
+        return results
+
+    # Sign the VAPID headers of each push service once, before fanning out
+    for audience in {audience_for(subscription_info) for subscription_info in subscriptions}:
+        vapid_cache.headers(vapid_private_key, audience)
+
+    pending = []
+    with ThreadPoolExecutor(max_workers=settings.WEB_PUSH_CONCURRENCY, thread_name_prefix='webpush') as senders:
+        for index, subscription_info, (encrypted, error) in zip(indexes, subscriptions, _encrypt_all(subscriptions, payloads)):
+            if error is not None:
+                results[index] = {'success': False, 'error': error}
+                continue
+            pending.append((index, senders.submit(post_notification, subscription_info, encrypted, vapid_private_key)))
+        for index, future in pending:
+            results[index] = future.result()
+    return results
@@ -2,10 +2,14 @@
 # api/views/__init__.py
 
 # Import the views from the sub-modules to make them available
-from .notification_views import SendNotificationView, BulkSendNotificationView
+from .notification_views import SendNotificationView, BulkSendNotificationView, SendToUserView
 from .device_views import DeviceRegistrationView
 from .app_views import AppListView, AppDetailView
 from .template_views import TemplateListView, TemplateDetailView, TemplatePreviewView
+from .bulk_job_views import BulkJobCreateView, BulkJobDetailView
+from .async_notification_views import AsyncSendNotificationView, AsyncBulkSendNotificationView
+from .campaign_views import CampaignListView, CampaignDetailView
+from .topic_views import TopicListView, TopicSubscribeView, TopicUnsubscribeView, TopicSendView
 # Add other imports as you create more view files
 
 # --- Define the 'doc' view function directly in __init__.py ---
@@ -38,12 +42,23 @@ def doc(request):
 __all__ = [
     'SendNotificationView',
     'BulkSendNotificationView',
+    'SendToUserView',
     'DeviceRegistrationView',
     'AppListView',
     'AppDetailView',
     'TemplateListView',
     'TemplateDetailView',
     'TemplatePreviewView',
+    'BulkJobCreateView',
+    'BulkJobDetailView',
+    'AsyncSendNotificationView',
+    'AsyncBulkSendNotificationView',
+    'CampaignListView',
+    'CampaignDetailView',
+    'TopicListView',
+    'TopicSubscribeView',
+    'TopicUnsubscribeView',
+    'TopicSendView',
     # Add other view classes/functions you want to expose via 'api.views'
     'doc', # Add 'doc' to the list of publicly importable names
 ]
@@ -0,0 +1,224 @@
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views import View
+from rest_framework import status
+import json
+import logging
+from ..models import Device, SendLog
+from ..serializers import NotificationRequestSerializer, BulkNotificationRequestSerializer
+from ..tasks.push_tasks import send_push_notification_task
+from ..utils.template_renderer import TemplateRenderer
+from ..utils.template_cache import template_resolver
+from ..utils.bulk_ingest import BulkIngest
+from ..utils.idempotency import idempotent
+from ..utils.scheduler import is_deferred, build_scheduled_notification, scheduled_result
+from ..utils.queues import queue_for_priority
+from ..utils.rate_limiter import rate_limiter, retry_after_header
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncAPIView(View):
+    """
+    Base class for the native async ingest views served under push.asgi.
+
+    DRF's APIView is sync-only, so these are plain Django views that keep
+    the same request validation and response envelope as the DRF views.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # App-key authenticated JSON API, same as DRF's APIView
+        view.csrf_exempt = True
+        return view
+
+    async def check_rate_limit(self, request, cost=1):
+        """Return a 429 response when the app is over its rate limit, else None."""
+        allowed, retry_after = await sync_to_async(rate_limiter.consume, thread_sensitive=False)(request.app, cost)
+        if allowed:
+            return None
+        response = self.respond(False, 'Rate limit exceeded', status_code=status.HTTP_429_TOO_MANY_REQUESTS)
+        response['Retry-After'] = retry_after_header(retry_after)
+        return response
+
+    def parse_json(self, request):
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+
+    def respond(self, success, message, data=None, status_code=status.HTTP_200_OK, errors=None):
+        payload = {
+            'success': success,
+            'message': message,
+            'data': data
+        }
+        if errors is not None:
+            payload['errors'] = errors
+        return JsonResponse(payload, status=status_code)
+
+
+class AsyncSendNotificationView(AsyncAPIView):
+    """
+    Async version of SendNotificationView.
+    """
+
+    @idempotent
+    async def post(self, request):
+        request_data = self.parse_json(request)
+        if request_data is None:
+            return self.respond(False, 'Invalid JSON body', status_code=status.HTTP_400_BAD_REQUEST)
+
+        throttled = await self.check_rate_limit(request)
+        if throttled is not None:
+            return throttled
+
+        serializer = NotificationRequestSerializer(data=request_data)
+        if not serializer.is_valid():
+            return self.respond(
+                False, 'Invalid request data',
+                errors=serializer.errors,
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        validated_data = serializer.validated_data
+
+        if is_deferred(validated_data):
+            scheduled = build_scheduled_notification(request.app, validated_data)
+            await scheduled.asave()
+            result = scheduled_result(scheduled)
+            return self.respond(True, result['message'], data=result['data'], status_code=status.HTTP_202_ACCEPTED)
+
+        try:
+            user_identifier = validated_data['user'].get('id') or validated_data['user'].get('email') or validated_data['user'].get('name') or 'unknown'
+
+            device, created = await Device.objects.aget_or_create(
+                app=request.app,
+                user_identifier=user_identifier,
+                platform=validated_data['platform'],
+                defaults={
+                    'device_token': validated_data['device_token'],
+                    'is_active': True
+                }
+            )
+
+            # If the device existed but the token is different, update it
+            if not created and device.device_token != validated_data['device_token']:
+                logger.info(f"Updating device token for {request.app.name} - {device.platform} - {device.user_identifier}")
+                device.device_token = validated_data['device_token']
+                device.is_active = True
+                device.push_token_updated_at = timezone.now()
+                await device.asave(update_fields=['device_token', 'is_active', 'push_token_updated_at'])
+
+            if not device.is_active:
+                return self.respond(False, 'Device is not active', status_code=status.HTTP_400_BAD_REQUEST)
+
+            template = None
+            if validated_data.get('title') and validated_data.get('body'):
+                title = validated_data['title']
+                body = validated_data['body']
+                subject = validated_data.get('subject', '')
+                data = validated_data.get('data', {})
+            else:
+                template = await sync_to_async(template_resolver.get)(request.app, validated_data['notification_type'])
+
+                if not template:
+                    return self.respond(
+                        False, f'Template "{validated_data["notification_type"]}" not found',
+                        status_code=status.HTTP_404_NOT_FOUND
+                    )
+
+                renderer = TemplateRenderer(template)
+                rendered = renderer.render(validated_data['user'], validated_data['data'])
+                title = rendered['title']
+                body = rendered['body']
+                subject = rendered['subject']
+                data = rendered['data']
+
+            send_log = await SendLog.objects.acreate(
+                app=request.app,
+                device=device,
+                template=template,
+                notification_type=validated_data['notification_type'],
+                title=title,
+                body=body,
+                subject=subject,
+                data=data,
+                raw_request=validated_data,
+                status='pending'
+            )
+
+            # Publish from a worker thread so the event loop keeps serving requests
+            try:
+                await sync_to_async(send_push_notification_task.apply_async, thread_sensitive=False)(
+                    kwargs={
+                        'send_log_id': str(send_log.id),
+                        'device_token': device.device_token,
+                        'platform': validated_data['platform'],
+                        'title': title,
+                        'body': body,
+                        'data': data,
+                        'subject': subject
+                    },
+                    queue=queue_for_priority(validated_data.get('priority'))
+                )
+            except Exception as e:
+                logger.error(f"Error queuing notification with Celery: {str(e)}", exc_info=True)
+                send_log.status = 'failed'
+                send_log.error_message = f"Celery error: {str(e)}"
+                await send_log.asave(update_fields=['status', 'error_message', 'updated_at'])
+                return self.respond(
+                    False, 'Failed to queue notification (Celery unavailable)',
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
+
+            return self.respond(True, 'Notification queued for sending', data={
+                'send_log_id': str(send_log.id),
+                'device_id': str(device.id)
+            }, status_code=status.HTTP_202_ACCEPTED)
+
+        except Exception as e:
+            logger.error(f"Error sending notification: {str(e)}", exc_info=True)
+            return self.respond(False, 'Internal server error', status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class AsyncBulkSendNotificationView(AsyncAPIView):
+    """
+    Async version of BulkSendNotificationView.
+    """
+
+    @idempotent
+    async def post(self, request):
+        request_data = self.parse_json(request)
+        if request_data is None:
+            return self.respond(False, 'Invalid JSON body', status_code=status.HTTP_400_BAD_REQUEST)
+
+        notifications = request_data.get('notifications') if isinstance(request_data, dict) else None
+        cost = len(notifications) if isinstance(notifications, list) and notifications else 1
+        throttled = await self.check_rate_limit(request, cost)
+        if throttled is not None:
+            return throttled
+
+        serializer = BulkNotificationRequestSerializer(data=request_data)
+        if not serializer.is_valid():
+            return self.respond(
+                False, 'Invalid request data',
+                errors=serializer.errors,
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            results = await BulkIngest(request.app, serializer.validated_data['notifications']).arun()
+        except Exception as e:
+            logger.error(f"Error sending bulk notification: {str(e)}", exc_info=True)
+            return self.respond(False, 'Internal server error', status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        overall_success = any(result['success'] for result in results)
+        overall_status = status.HTTP_202_ACCEPTED if overall_success else status.HTTP_500_INTERNAL_SERVER_ERROR
+
+        return self.respond(overall_success, f'Processed {len(results)} notifications', data={
+            'results': results,
+            'total_processed': len(results)
+        }, status_code=overall_status)
@@ -0,0 +1,131 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+import json
+import logging
+from ..models import BulkJob, BulkJobChunk
+from ..serializers import BulkJobSerializer
+from ..tasks.bulk_tasks import process_bulk_job_chunk
+from ..utils.idempotency import idempotent
+
+logger = logging.getLogger(__name__)
+
+
+class BulkJobCreateView(APIView):
+    """
+    API view to start a bulk job from a streamed NDJSON body.
+
+    Each line is one notification in the same shape as the single send
+    endpoint. The body is read line by line and handed to the workers in
+    chunks of BULK_JOB_CHUNK_SIZE, so memory use does not depend on the
+    size of the upload. Validation happens in the workers; the response
+    only carries the job id to poll.
+    """
+
+    @idempotent
+    def post(self, request):
+        stream = request.stream
+        if stream is None:
+            return Response({
+                'success': False,
+                'message': 'Request body is empty',
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        chunk_size = settings.BULK_JOB_CHUNK_SIZE
+        job = BulkJob.objects.create(app=request.app)
+        received = 0
+        rejected = 0
+        sequence = 0
+        parse_errors = []
+        chunk = []
+
+        for line_number, raw_line in enumerate(stream, start=1):
+            raw_line = raw_line.strip()
+            if not raw_line:
+                continue
+            received += 1
+
+            try:
+                notification = json.loads(raw_line)
+                if not isinstance(notification, dict):
+                    raise ValueError('Line must be a JSON object')
+            except ValueError as e:
+                rejected += 1
+                parse_errors.append({'line': line_number, 'message': f'Invalid JSON: {str(e)}'})
+                continue
+
+            chunk.append({'line': line_number, 'notification': notification})
+            if len(chunk) >= chunk_size:
+                self._dispatch_chunk(job, sequence, chunk)
+                sequence += 1
+                chunk = []
+
+        if chunk:
+            self._dispatch_chunk(job, sequence, chunk)
+            sequence += 1
+
+        if parse_errors:
+            # Parse failures are stored as an extra, already processed chunk
+            BulkJobChunk.objects.create(job=job, sequence=sequence, errors=parse_errors, status='done')
+
+        BulkJob.objects.filter(pk=job.pk).update(
+            status='processing',
+            total_received=received,
+            failed=F('failed') + rejected,
+            total_chunks=sequence,
+            updated_at=timezone.now()
+        )
+        BulkJob.finalize_if_done(job.pk)
+
+        return Response({
+            'success': True,
+            'message': 'Bulk job accepted',
+            'data': {
+                'job_id': str(job.id),
+                'total_received': received,
+                'total_chunks': sequence
+            }
+        }, status=status.HTTP_202_ACCEPTED)
+
+    def _dispatch_chunk(self, job, sequence, entries):
+        chunk = BulkJobChunk.objects.create(job=job, sequence=sequence, payload=entries)
+        try:
+            process_bulk_job_chunk.delay(str(chunk.id))
+        except Exception as e:
+            logger.error(f"Error queuing bulk job chunk with Celery: {str(e)}", exc_info=True)
+            BulkJobChunk.objects.filter(pk=chunk.pk).update(
+                status='done',
+                payload=[],
+                errors=[{'line': entry['line'], 'message': 'Failed to queue notification (Celery unavailable)'} for entry in entries]
+            )
+            BulkJob.objects.filter(pk=job.pk).update(
+                processed=F('processed') + len(entries),
+                failed=F('failed') + len(entries),
+                processed_chunks=F('processed_chunks') + 1
+            )
+
+
+class BulkJobDetailView(APIView):
+    """
+    API view to report the progress of a bulk job.
+    """
+
+    def get(self, request, pk):
+        try:
+            job = BulkJob.objects.get(pk=pk, app=request.app)
+        except BulkJob.DoesNotExist:
+            return Response({
+                'success': False,
+                'message': 'Bulk job not found',
+                'data': None
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({
+            'success': True,
+            'message': f'Bulk job is {job.status}',
+            'data': BulkJobSerializer(job).data
+        }, status=status.HTTP_200_OK)
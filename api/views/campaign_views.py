@@ -0,0 +1,120 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from django.utils import timezone
+import logging
+from ..models import Campaign
+from ..serializers import CampaignSerializer, CampaignCreateSerializer
+from ..tasks.campaign_tasks import dispatch_campaign
+from ..utils.template_cache import template_resolver
+from ..utils.idempotency import idempotent
+from ..utils.rate_limiter import AppRateThrottle
+
+logger = logging.getLogger(__name__)
+
+
+def start_campaign(app, validated_data, topic=None):
+    """
+    Record a campaign from validated CampaignCreateSerializer data and queue
+    its coordinator. Returns the API response.
+    """
+    template = None
+    if not (validated_data.get('title') and validated_data.get('body')):
+        # The template version is pinned for the whole campaign
+        template = template_resolver.get(app, validated_data['notification_type'])
+        if not template:
+            return Response({
+                'success': False,
+                'message': f'Template "{validated_data["notification_type"]}" not found',
+                'data': None
+            }, status=status.HTTP_404_NOT_FOUND)
+
+    campaign = Campaign.objects.create(
+        app=app,
+        template=template,
+        topic=topic,
+        name=validated_data['name'],
+        notification_type=validated_data['notification_type'],
+        title=validated_data.get('title', ''),
+        body=validated_data.get('body', ''),
+        subject=validated_data.get('subject', ''),
+        data=validated_data['data'],
+        context=validated_data['context'],
+        platforms=validated_data['platforms']
+    )
+
+    try:
+        dispatch_campaign.delay(str(campaign.id))
+    except Exception as e:
+        logger.error(f"Error queuing campaign with Celery: {str(e)}", exc_info=True)
+        Campaign.objects.filter(pk=campaign.pk).update(status='failed', updated_at=timezone.now())
+        return Response({
+            'success': False,
+            'message': 'Failed to queue campaign (Celery unavailable)',
+            'data': None
+        }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    return Response({
+        'success': True,
+        'message': 'Campaign accepted',
+        'data': CampaignSerializer(campaign).data
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+class CampaignListView(APIView):
+    """
+    API view to list an app's campaigns and to start a broadcast to every
+    active device of the app.
+
+    The request only records the campaign; a coordinator task pages
+    through the devices and hands fixed-size chunks to the workers. The
+    response carries the campaign id to poll.
+    """
+
+    def get_throttles(self):
+        # Starting a campaign counts against the rate limit, listing does not
+        return [AppRateThrottle()] if self.request.method == 'POST' else []
+
+    def get(self, request):
+        campaigns = Campaign.objects.filter(app=request.app).select_related('template', 'topic').order_by('-created_at')[:50]
+        return Response({
+            'success': True,
+            'message': 'Campaigns retrieved',
+            'data': CampaignSerializer(campaigns, many=True).data
+        }, status=status.HTTP_200_OK)
+
+    @idempotent
+    def post(self, request):
+        serializer = CampaignCreateSerializer(data=request.data)
+
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'message': 'Invalid request data',
+                'errors': serializer.errors,
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return start_campaign(request.app, serializer.validated_data)
+
+
+class CampaignDetailView(APIView):
+    """
+    API view to report the progress of a campaign.
+    """
+
+    def get(self, request, pk):
+        try:
+            campaign = Campaign.objects.select_related('template', 'topic').get(pk=pk, app=request.app)
+        except Campaign.DoesNotExist:
+            return Response({
+                'success': False,
+                'message': 'Campaign not found',
+                'data': None
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({
+            'success': True,
+            'message': f'Campaign is {campaign.status}',
+            'data': CampaignSerializer(campaign).data
+        }, status=status.HTTP_200_OK)
@@ -0,0 +1,115 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+import logging
+from ..models import DeadLetter, SendLog
+from ..serializers import DeadLetterSerializer, DeadLetterReplaySerializer
+from ..tasks.push_tasks import reopen_campaigns, send_push_batch_task
+from ..tasks.scheduler_tasks import schedule_redelivery
+from ..utils.idempotency import idempotent
+from ..utils.queues import queue_for_priority
+
+logger = logging.getLogger(__name__)
+
+
+class DeadLetterListView(APIView):
+    """
+    API view to list the notifications of an app that used up their
+    retries, most recent first. ``?platform=`` narrows the list.
+    """
+
+    def get(self, request):
+        dead_letters = DeadLetter.objects.filter(app=request.app)
+        if request.query_params.get('platform'):
+            dead_letters = dead_letters.filter(platform=request.query_params['platform'])
+
+        recent = dead_letters.select_related('send_log__device').order_by('-created_at')[:50]
+        return Response({
+            'success': True,
+            'message': 'Dead letters retrieved',
+            'data': {
+                'total': dead_letters.count(),
+                'dead_letters': DeadLetterSerializer(recent, many=True).data
+            }
+        }, status=status.HTTP_200_OK)
+
+
+class DeadLetterReplayView(APIView):
+    """
+    API view to send dead letters again.
+
+    The named dead letters (or all of the app's, oldest first, up to
+    DEAD_LETTER_REPLAY_LIMIT per request) are removed, their SendLogs reset
+    to pending with a fresh retry budget and, once that is committed,
+    queued in batches on the queue of the requested priority; batches
+    Celery does not take are left to the scheduler (see
+    schedule_redelivery). Replayed campaign notifications are taken off
+    their campaign's failed count until they complete again.
+    """
+
+    @idempotent
+    def post(self, request):
+        serializer = DeadLetterReplaySerializer(data=request.data)
+
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'message': 'Invalid request data',
+                'errors': serializer.errors,
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        dead_letters = DeadLetter.objects.filter(app=request.app)
+        if 'ids' in serializer.validated_data:
+            dead_letters = dead_letters.filter(id__in=serializer.validated_data['ids'])
+        if 'platform' in serializer.validated_data:
+            dead_letters = dead_letters.filter(platform=serializer.validated_data['platform'])
+        queue = queue_for_priority(serializer.validated_data['priority'])
+        batch_size = settings.DEAD_LETTER_REPLAY_BATCH_SIZE
+
+        with transaction.atomic():
+            # Concurrent replays each take dead letters the others have not locked
+            rows = list(
+                dead_letters.select_for_update(skip_locked=True).order_by('created_at')
+                .values_list('id', 'send_log_id', 'platform')[:settings.DEAD_LETTER_REPLAY_LIMIT]
+            )
+            by_platform = {}
+            for _, send_log_id, platform in rows:
+                by_platform.setdefault(platform, []).append(str(send_log_id))
+
+            reopen_campaigns(SendLog.objects.filter(id__in=[row[1] for row in rows], status='failed'))
+            SendLog.objects.filter(id__in=[row[1] for row in rows]).update(
+                status='pending', retry_count=0, park_count=0, error_message='', sent_at=None,
+                updated_at=timezone.now()
+            )
+            DeadLetter.objects.filter(id__in=[row[0] for row in rows]).delete()
+            transaction.on_commit(lambda: publish_replay(by_platform, queue, batch_size))
+
+        return Response({
+            'success': True,
+            'message': f'{len(rows)} dead letters queued for replay',
+            'data': {
+                'replayed': len(rows),
+                'remaining': dead_letters.count(),
+                'queue': queue
+            }
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+def publish_replay(by_platform, queue, batch_size):
+    """Queue the replayed SendLogs in batches; batches Celery does not take are left to the scheduler."""
+    for platform, send_log_ids in by_platform.items():
+        for start in range(0, len(send_log_ids), batch_size):
+            batch = send_log_ids[start:start + batch_size]
+            try:
+                send_push_batch_task.apply_async(
+                    kwargs={'send_log_ids': batch, 'platform': platform},
+                    queue=queue
+                )
+            except Exception as e:
+                logger.error(f"Error queuing dead letter replay with Celery: {str(e)}", exc_info=True)
+                send_logs = SendLog.objects.filter(id__in=batch).only('id', 'app_id')
+                schedule_redelivery(send_logs, platform, timezone.now(), queue)
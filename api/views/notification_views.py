@@ -1,13 +1,22 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from celery import group
 from django.db import transaction
 from django.utils import timezone
 import logging
-from ..models import Device, Template, SendLog
-from ..serializers import NotificationRequestSerializer, BulkNotificationRequestSerializer
-from ..tasks.push_tasks import send_push_notification_task
+from ..models import Device, SendLog
+from ..serializers import (
+    NotificationRequestSerializer, BulkNotificationRequestSerializer, UserNotificationRequestSerializer
+)
+from ..tasks.push_tasks import send_push_notification_task, send_push_batch_task
 from ..utils.template_renderer import TemplateRenderer
+from ..utils.template_cache import template_resolver
+from ..utils.bulk_ingest import BulkIngest
+from ..utils.idempotency import idempotent
+from ..utils.rate_limiter import AppRateThrottle
+from ..utils.scheduler import is_deferred, build_scheduled_notification, scheduled_result
+from ..utils.queues import queue_for_priority
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +27,9 @@ class SendNotificationView(APIView):
     """
     API view to send push notifications.
     """
+    throttle_classes = [AppRateThrottle]
     
+    @idempotent
     def post(self, request):
         serializer = NotificationRequestSerializer(data=request.data)
         
@@ -31,6 +42,12 @@ class SendNotificationView(APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         validated_data = serializer.validated_data
+
+        if is_deferred(validated_data):
+            # Held in the scheduled store until the scheduler releases it
+            scheduled = build_scheduled_notification(request.app, validated_data)
+            scheduled.save()
+            return Response(scheduled_result(scheduled), status=status.HTTP_202_ACCEPTED)
         
         try:
             with transaction.atomic():
@@ -64,6 +81,7 @@ class SendNotificationView(APIView):
                     }, status=status.HTTP_400_BAD_REQUEST)
 
                 # If title and body are provided, use them directly
+                template = None
                 if validated_data.get('title') and validated_data.get('body'):
                     title = validated_data['title']
                     body = validated_data['body']
@@ -71,11 +89,7 @@ class SendNotificationView(APIView):
                     data = validated_data.get('data', {})
                 else:
                     # Render template
-                    template = Template.objects.filter(
-                        app=request.app,
-                        name=validated_data['notification_type'],
-                        is_active=True
-                    ).order_by('-version').first()
+                    template = template_resolver.get(request.app, validated_data['notification_type'])
                     
                     if not template:
                         return Response({
@@ -85,21 +99,18 @@ class SendNotificationView(APIView):
                         }, status=status.HTTP_404_NOT_FOUND)
 
                     renderer = TemplateRenderer(template)
-                    rendered_title = renderer.render_title(validated_data['user'])
-                    rendered_body = renderer.render_body(validated_data['user'])
-                    rendered_subject = renderer.render_subject(validated_data['user'])
-                    rendered_data = renderer.render_data(validated_data['user'], validated_data['data'])
+                    rendered = renderer.render(validated_data['user'], validated_data['data'])
 
-                    title = rendered_title
-                    body = rendered_body
-                    subject = rendered_subject
-                    data = rendered_data
+                    title = rendered['title']
+                    body = rendered['body']
+                    subject = rendered['subject']
+                    data = rendered['data']
 
                 # Create send log
                 send_log = SendLog.objects.create(
                     app=request.app,
                     device=device,
-                    template=template if not created else None,
+                    template=template,
                     notification_type=validated_data['notification_type'],
                     title=title,
                     body=body,
@@ -111,14 +122,17 @@ class SendNotificationView(APIView):
 
             # Send notification asynchronously
             try:
-                send_push_notification_task.delay(
-                    send_log_id=str(send_log.id),
-                    device_token=device.device_token, # Use the potentially updated token
-                    platform=validated_data['platform'],
-                    title=title,
-                    body=body,
-                    data=data,
-                    subject=subject
+                send_push_notification_task.apply_async(
+                    kwargs={
+                        'send_log_id': str(send_log.id),
+                        'device_token': device.device_token, # Use the potentially updated token
+                        'platform': validated_data['platform'],
+                        'title': title,
+                        'body': body,
+                        'data': data,
+                        'subject': subject
+                    },
+                    queue=queue_for_priority(validated_data.get('priority'))
                 )
                 message = 'Notification queued for sending'
                 status_code = status.HTTP_202_ACCEPTED
@@ -155,12 +169,18 @@ class SendNotificationView(APIView):
 
 
 
-# Keep the BulkSendNotificationView similar, applying the same Celery error handling
 class BulkSendNotificationView(APIView):
     """
     API view to send multiple push notifications in bulk.
     """
+    throttle_classes = [AppRateThrottle]
+
+    def get_throttle_cost(self, request):
+        # Every notification in the batch counts against the app's rate limit
+        notifications = request.data.get('notifications') if isinstance(request.data, dict) else None
+        return len(notifications) if isinstance(notifications, list) and notifications else 1
     
+    @idempotent
     def post(self, request):
         serializer = BulkNotificationRequestSerializer(data=request.data)
         
@@ -172,127 +192,19 @@ class BulkSendNotificationView(APIView):
                 'data': None
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        notifications = request.data.get('notifications', [])
-        results = []
-        
-        for notification_data in notifications:
-            # Validate each notification
-            single_serializer = NotificationRequestSerializer(data=notification_data)
-            if not single_serializer.is_valid():
-                results.append({
-                    'success': False,
-                    'message': 'Invalid notification data',
-                    'errors': single_serializer.errors
-                })
-                continue
-
-            validated_data = single_serializer.validated_data
-            
-            try:
-                with transaction.atomic():
-                    # Get or create device
-                    device, created = Device.objects.get_or_create(
-                        app=request.app, # This comes from your middleware
-                        device_token=validated_data['device_token'],
-                        defaults={
-                            'platform': validated_data['platform'],
-                            'user_identifier': validated_data['user'].get('id', 'unknown'),
-                            'is_active': True
-                        }
-                    )
-                    
-                    if not device.is_active:
-                        results.append({
-                            'success': False,
-                            'message': 'Device is not active'
-                        })
-                        continue
-
-                    # Render template or use provided title/body
-                    if validated_data.get('title') and validated_data.get('body'):
-                        title = validated_data['title']
-                        body = validated_data['body']
-                        subject = validated_data.get('subject', '')
-                        data = validated_data.get('data', {})
-                    else:
-                        template = Template.objects.filter(
-                            app=request.app,
-                            name=validated_data['notification_type'],
-                            is_active=True
-                        ).order_by('-version').first()
-                        
-                        if not template:
-                            results.append({
-                                'success': False,
-                                'message': f'Template "{validated_data["notification_type"]}" not found'
-                            })
-                            continue
-
-                        renderer = TemplateRenderer(template)
-                        rendered_title = renderer.render_title(validated_data['user'])
-                        rendered_body = renderer.render_body(validated_data['user'])
-                        rendered_subject = renderer.render_subject(validated_data['user'])
-                        rendered_data = renderer.render_data(validated_data['user'], validated_data['data'])
-
-                        title = rendered_title
-                        body = rendered_body
-                        subject = rendered_subject
-                        data = rendered_data
-
-                    # Create send log
-                    send_log = SendLog.objects.create(
-                        app=request.app,
-                        device=device,
-                        template=template if not created else None,
-                        notification_type=validated_data['notification_type'],
-                        title=title,
-                        body=body,
-                        subject=subject,
-                        data=data,
-                        raw_request=validated_data,
-                        status='pending'
-                    )
-
-                    # Send notification asynchronously - wrap in try-catch for Celery issues
-                    try:
-                        send_push_notification_task.delay(
-                            send_log_id=str(send_log.id),
-                            device_token=validated_data['device_token'],
-                            platform=validated_data['platform'],
-                            title=title,
-                            body=body,
-                            data=data,
-                            subject=subject
-                        )
-                        results.append({
-                            'success': True,
-                            'message': 'Notification queued for sending',
-                            'data': {
-                                'send_log_id': str(send_log.id),
-                                'device_id': str(device.id)
-                            }
-                        })
-                    except Exception as e:
-                        logger.error(f"Error queuing notification with Celery: {str(e)}", exc_info=True)
-                        # Update the log to show it failed to queue
-                        send_log.status = 'failed'
-                        send_log.error_message = f"Celery error: {str(e)}"
-                        send_log.save(update_fields=['status', 'error_message', 'updated_at'])
-                        results.append({
-                            'success': False,
-                            'message': 'Failed to queue notification (Celery unavailable)'
-                        })
-
-            except Exception as e:
-                logger.error(f"Error sending bulk notification: {str(e)}", exc_info=True)
-                results.append({
-                    'success': False,
-                    'message': 'Internal server error'
-                })
+        try:
+            results = BulkIngest(request.app, serializer.validated_data['notifications']).run()
+        except Exception as e:
+            logger.error(f"Error sending bulk notification: {str(e)}", exc_info=True)
+            return Response({
+                'success': False,
+                'message': 'Internal server error',
+                'data': None
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         # Determine overall success based on individual results
         overall_success = any(result['success'] for result in results)
-        overall_status = status.HTTP_202_ACCEPTED if overall_success else status.HTTP_500_INTERNAL_ERROR
+        overall_status = status.HTTP_202_ACCEPTED if overall_success else status.HTTP_500_INTERNAL_SERVER_ERROR
 
         return Response({
             'success': overall_success,
@@ -301,4 +213,133 @@ class BulkSendNotificationView(APIView):
                 'results': results,
                 'total_processed': len(results)
             }
-        }, status=overall_status)
\ No newline at end of file
+        }, status=overall_status)
+
+
+class SendToUserView(APIView):
+    """
+    API view to send one notification to every active device of a user.
+    """
+    throttle_classes = [AppRateThrottle]
+
+    @idempotent
+    def post(self, request):
+        serializer = UserNotificationRequestSerializer(data=request.data)
+
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'message': 'Invalid request data',
+                'errors': serializer.errors,
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        validated_data = serializer.validated_data
+        user_identifier = validated_data['user_identifier']
+
+        try:
+            # Served by the (app, user_identifier, platform) unique index
+            devices = list(Device.objects.filter(
+                app=request.app,
+                user_identifier=user_identifier,
+                is_active=True
+            ))
+
+            if not devices:
+                return Response({
+                    'success': False,
+                    'message': f'No active devices for user "{user_identifier}"',
+                    'data': None
+                }, status=status.HTTP_404_NOT_FOUND)
+
+            template = None
+            if validated_data.get('title') and validated_data.get('body'):
+                title = validated_data['title']
+                body = validated_data['body']
+                subject = validated_data.get('subject', '')
+                data = validated_data.get('data', {})
+            else:
+                template = template_resolver.get(request.app, validated_data['notification_type'])
+
+                if not template:
+                    return Response({
+                        'success': False,
+                        'message': f'Template "{validated_data["notification_type"]}" not found',
+                        'data': None
+                    }, status=status.HTTP_404_NOT_FOUND)
+
+                # The rendered content is the same for every device of the user
+                context = {'id': user_identifier, **validated_data['user']}
+                rendered = TemplateRenderer(template).render(context, validated_data['data'])
+                title = rendered['title']
+                body = rendered['body']
+                subject = rendered['subject']
+                data = rendered['data']
+
+            send_logs = [
+                SendLog(
+                    app=request.app,
+                    device=device,
+                    template=template,
+                    notification_type=validated_data['notification_type'],
+                    title=title,
+                    body=body,
+                    subject=subject,
+                    data=data,
+                    raw_request=validated_data,
+                    status='pending'
+                )
+                for device in devices
+            ]
+            with transaction.atomic():
+                SendLog.objects.bulk_create(send_logs)
+
+            # One task per provider batch
+            batches = {}
+            for send_log in send_logs:
+                batches.setdefault(send_log.device.platform, []).append(str(send_log.id))
+
+            try:
+                group(
+                    send_push_batch_task.s(send_log_ids=send_log_ids, platform=platform).set(
+                        queue=queue_for_priority(validated_data.get('priority'))
+                    )
+                    for platform, send_log_ids in batches.items()
+                ).apply_async()
+            except Exception as e:
+                logger.error(f"Error queuing notification with Celery: {str(e)}", exc_info=True)
+                SendLog.objects.filter(id__in=[send_log.id for send_log in send_logs]).update(
+                    status='failed',
+                    error_message=f"Celery error: {str(e)}",
+                    updated_at=timezone.now()
+                )
+                return Response({
+                    'success': False,
+                    'message': 'Failed to queue notification (Celery unavailable)',
+                    'data': None
+                }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+            return Response({
+                'success': True,
+                'message': f'Notification queued for {len(send_logs)} devices',
+                'data': {
+                    'user_identifier': user_identifier,
+                    'results': [
+                        {
+                            'send_log_id': str(send_log.id),
+                            'device_id': str(send_log.device.id),
+                            'platform': send_log.device.platform
+                        }
+                        for send_log in send_logs
+                    ],
+                    'total_devices': len(send_logs)
+                }
+            }, status=status.HTTP_202_ACCEPTED)
+
+        except Exception as e:
+            logger.error(f"Error sending notification to user: {str(e)}", exc_info=True)
+            return Response({
+                'success': False,
+                'message': 'Internal server error',
+                'data': None
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,189 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+import logging
+from ..models import Device, Topic, TopicSubscription
+from ..serializers import TopicSerializer, TopicSubscriptionSerializer, TopicSendSerializer
+from ..tasks.topic_tasks import sync_fcm_topic_membership
+from ..utils.idempotency import idempotent
+from ..utils.rate_limiter import AppRateThrottle
+from .campaign_views import start_campaign
+
+logger = logging.getLogger(__name__)
+
+
+def invalid_topic_name(name):
+    """Return an error response if ``name`` is not a valid topic name, else None."""
+    try:
+        Topic._meta.get_field('name').run_validators(name)
+    except ValidationError as e:
+        return Response({
+            'success': False,
+            'message': 'Invalid topic name',
+            'errors': {'name': e.messages},
+            'data': None
+        }, status=status.HTTP_400_BAD_REQUEST)
+    return None
+
+
+def sync_provider_topic(topic, devices, subscribe):
+    """Mirror the membership change of Android devices into the FCM topic."""
+    tokens = [device.device_token for device in devices if device.platform == 'android']
+    if not tokens:
+        return
+    try:
+        sync_fcm_topic_membership.delay(str(topic.id), tokens, subscribe)
+    except Exception as e:
+        # Topic sends fall back to per-device delivery, so this is not fatal
+        logger.error(f"Error queuing FCM topic sync with Celery: {str(e)}", exc_info=True)
+
+
+class TopicListView(APIView):
+    """
+    API view to list an app's topics.
+    """
+
+    def get(self, request):
+        topics = Topic.objects.filter(app=request.app).order_by('name')
+        return Response({
+            'success': True,
+            'message': 'Topics retrieved',
+            'data': TopicSerializer(topics, many=True).data
+        }, status=status.HTTP_200_OK)
+
+
+class TopicSubscribeView(APIView):
+    """
+    API view to subscribe devices to a topic. The topic is created on first use.
+    """
+
+    def post(self, request, name):
+        error_response = invalid_topic_name(name)
+        if error_response is not None:
+            return error_response
+
+        serializer = TopicSubscriptionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'message': 'Invalid request data',
+                'errors': serializer.errors,
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        device_tokens = serializer.validated_data['device_tokens']
+        topic, _ = Topic.objects.get_or_create(app=request.app, name=name)
+        devices = list(Device.objects.filter(app=request.app, device_token__in=device_tokens))
+
+        with transaction.atomic():
+            # Serialize subscribers of the topic so each new device is counted once
+            Topic.objects.select_for_update().get(pk=topic.pk)
+            subscribed = set(
+                TopicSubscription.objects.filter(topic=topic, device__in=devices).values_list('device_id', flat=True)
+            )
+            new_devices = [device for device in devices if device.id not in subscribed]
+            TopicSubscription.objects.bulk_create(
+                [TopicSubscription(topic=topic, device=device) for device in new_devices],
+                ignore_conflicts=True
+            )
+            Topic.objects.filter(pk=topic.pk).update(
+                subscriber_count=F('subscriber_count') + len(new_devices),
+                updated_at=timezone.now()
+            )
+        sync_provider_topic(topic, new_devices, subscribe=True)
+
+        found = {device.device_token for device in devices}
+        return Response({
+            'success': True,
+            'message': f'Subscribed {len(new_devices)} devices to "{name}"',
+            'data': {
+                'topic': name,
+                'subscribed': len(new_devices),
+                'unknown_tokens': [token for token in device_tokens if token not in found]
+            }
+        }, status=status.HTTP_200_OK)
+
+
+class TopicUnsubscribeView(APIView):
+    """
+    API view to unsubscribe devices from a topic.
+    """
+
+    def post(self, request, name):
+        serializer = TopicSubscriptionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'message': 'Invalid request data',
+                'errors': serializer.errors,
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            topic = Topic.objects.get(app=request.app, name=name)
+        except Topic.DoesNotExist:
+            return Response({
+                'success': False,
+                'message': f'Topic "{name}" not found',
+                'data': None
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        with transaction.atomic():
+            Topic.objects.select_for_update().get(pk=topic.pk)
+            devices = list(Device.objects.filter(
+                app=request.app,
+                device_token__in=serializer.validated_data['device_tokens'],
+                topic_subscriptions__topic=topic
+            ))
+            removed, _ = TopicSubscription.objects.filter(topic=topic, device__in=devices).delete()
+            Topic.objects.filter(pk=topic.pk).update(
+                subscriber_count=F('subscriber_count') - removed,
+                updated_at=timezone.now()
+            )
+        sync_provider_topic(topic, devices, subscribe=False)
+
+        return Response({
+            'success': True,
+            'message': f'Unsubscribed {removed} devices from "{name}"',
+            'data': {
+                'topic': name,
+                'unsubscribed': removed
+            }
+        }, status=status.HTTP_200_OK)
+
+
+class TopicSendView(APIView):
+    """
+    API view to send a notification to every device subscribed to a topic.
+
+    Runs as a campaign over the topic's members; see CampaignListView.
+    """
+    throttle_classes = [AppRateThrottle]
+
+    @idempotent
+    def post(self, request, name):
+        try:
+            topic = Topic.objects.get(app=request.app, name=name)
+        except Topic.DoesNotExist:
+            return Response({
+                'success': False,
+                'message': f'Topic "{name}" not found',
+                'data': None
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = TopicSendSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'message': 'Invalid request data',
+                'errors': serializer.errors,
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        validated_data = dict(serializer.validated_data)
+        validated_data.setdefault('name', f'Topic {name}')
+        return start_campaign(request.app, validated_data, topic=topic)
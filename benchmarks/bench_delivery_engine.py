@@ -0,0 +1,161 @@
+"""
+Throughput benchmark for the asyncio delivery engine.
+
+Runs the APNs stand-in (api/tests/apns_stub.py) in a child process with a
+fixed per-request latency mimicking the round trip to Apple, and reports
+messages/sec for:
+
+    blocking      one push per task, like a prefork worker process
+                  (send_apns_notification, one at a time)
+    prefork 100   the best a 100-process prefork pool can do: the blocking
+                  rate times 100, or the CPUs divided by the CPU time of a
+                  blocking push when that is lower (ignores the pool's
+                  memory and scheduling costs)
+    engine        one process: DeliveryEngine.deliver() with --messages
+                  split into --batch sized task messages, all in flight
+
+Results are set on in-memory SendLogs; the database write-back is not
+timed. The stub shares the machine's CPUs with the process measured, run
+it on a machine with spare cores for numbers close to production.
+
+Usage:
+    python benchmarks/bench_delivery_engine.py [--messages 20000] [--batch 500] [--latency 0.05]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django  # noqa: E402
+from cryptography.hazmat.primitives import serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import ec  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+
+def run_stub(latency, streams, connection):
+    from api.tests.apns_stub import APNsStub
+
+    with APNsStub(latency=latency, max_concurrent_streams=streams) as stub:
+        connection.send(stub.url)
+        connection.recv()
+
+
+def configure(args, stub_url, key_file):
+    # The project settings, so the api app loads as deployed; nothing here
+    # touches the database
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'push.settings')
+    django.setup()
+    overrides = {
+        'APNS_HOST': stub_url,
+        'APNS_TOPIC': 'com.example.app',
+        'APNS_AUTH_KEY_PATH': key_file,
+        'APNS_KEY_ID': 'ABC123DEFG',
+        'APNS_TEAM_ID': 'TEAM123456',
+        'APNS_MAX_CONNECTIONS': args.connections,
+        'APNS_MAX_CONCURRENT_STREAMS': args.connections * 100,
+    }
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+
+
+def build_send_logs(count):
+    from api.models import App, Device, SendLog
+
+    app = App(id=uuid.uuid4(), name='Bench', app_key='bench')
+    send_logs = []
+    for i in range(count):
+        device = Device(id=uuid.uuid4(), app=app, platform='ios', device_token=f'token_{i}')
+        send_logs.append(SendLog(
+            id=uuid.uuid4(),
+            app=app,
+            device=device,
+            notification_type='order_shipped',
+            title='Your order shipped',
+            body=f'Order #{100000 + i} is on its way',
+            data={'order_id': i},
+        ))
+    return send_logs
+
+
+def bench_blocking(count):
+    """Return (wall seconds, CPU seconds) per push sent one at a time."""
+    from api.utils.apns_sender import send_apns_notification
+
+    send_apns_notification('warm_up', 'Your order shipped', 'On its way')
+    started, cpu_started = time.perf_counter(), time.process_time()
+    for i in range(count):
+        assert send_apns_notification(f'token_{i}', 'Your order shipped', 'On its way')['success']
+    return (time.perf_counter() - started) / count, (time.process_time() - cpu_started) / count
+
+
+async def bench_engine(send_logs, batch):
+    """Return (wall seconds, CPU seconds) to deliver all ``send_logs``."""
+    from api.utils.delivery_engine import DeliveryEngine
+
+    engine = DeliveryEngine()
+    await engine.start()
+    # Warm up: connections and the provider token
+    await engine.deliver(send_logs[:batch])
+    started, cpu_started = time.perf_counter(), time.process_time()
+    await asyncio.gather(*(
+        engine.deliver(send_logs[start:start + batch]) for start in range(0, len(send_logs), batch)
+    ))
+    elapsed, cpu = time.perf_counter() - started, time.process_time() - cpu_started
+    for provider in engine.providers.values():
+        await provider.close()
+    assert all(send_log.status == 'sent' for send_log in send_logs)
+    return elapsed, cpu
+
+
+def report(name, rate, cpu_per_message=None, baseline=None):
+    line = f"{name:<14}{rate:>12,.0f} messages/s"
+    if cpu_per_message is not None:
+        line += f"{cpu_per_message * 1e3:>8.2f} ms CPU/message"
+    if baseline:
+        line += f"{rate / baseline:>8.1f}x"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--batch', type=int, default=500, help='SendLogs per task message')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds the stub waits per push')
+    parser.add_argument('--connections', type=int, default=5, help='APNs HTTP/2 connections (100 streams each)')
+    args = parser.parse_args()
+
+    parent, child = multiprocessing.Pipe()
+    stub = multiprocessing.Process(target=run_stub, args=(args.latency, 1000, child), daemon=True)
+    stub.start()
+    stub_url = parent.recv()
+
+    with tempfile.NamedTemporaryFile('wb', suffix='.p8') as key_file:
+        key_file.write(ec.generate_private_key(ec.SECP256R1()).private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        ))
+        key_file.flush()
+        configure(args, stub_url, key_file.name)
+
+        sample = max(int(1 / args.latency), 10)
+        wall, cpu = bench_blocking(sample)
+        report('blocking', 1 / wall, cpu)
+        # 100 processes each waiting on one push, unless they run out of CPU
+        prefork = min(100 / wall, (os.cpu_count() or 1) / cpu)
+        report('prefork 100', prefork, cpu)
+        wall, cpu = asyncio.run(bench_engine(build_send_logs(args.messages), args.batch))
+        report('engine', args.messages / wall, cpu / args.messages, prefork)
+
+    parent.send('stop')
+    stub.join(timeout=5)
+
+
+if __name__ == '__main__':
+    main()
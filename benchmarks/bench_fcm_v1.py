@@ -0,0 +1,117 @@
+"""
+Throughput benchmark for the FCM HTTP v1 sender.
+
+Runs against the local FCM stand-in (api/tests/fcm_stub.py) with a fixed
+per-request latency mimicking the round trip to Google, and reports
+messages/sec for one worker process:
+
+    sequential  one message at a time, a new connection per message
+                (how the legacy sender used requests.post)
+    pooled      one message at a time over the pooled keep-alive session
+    concurrent  send_fcm_v1_many() with FCM_V1_CONCURRENCY in flight
+
+Usage:
+    python benchmarks/bench_fcm_v1.py [--messages 2000] [--latency 0.02] [--concurrency 16]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+
+def configure(args, service_account_file, stub_url):
+    settings.configure(
+        FCM_SERVICE_ACCOUNT_FILE=service_account_file,
+        FCM_API_URL=stub_url,
+        FCM_V1_CONCURRENCY=args.concurrency,
+        FCM_TOKEN_REFRESH_MARGIN=300,
+        HTTP_POOL_CONNECTIONS=10,
+        HTTP_POOL_MAXSIZE=max(args.concurrency, 20),
+        HTTP_KEEPALIVE_IDLE=60,
+        HTTP_RETRY_TOTAL=0,
+        HTTP_RETRY_BACKOFF=0,
+        HTTP_STATS_INTERVAL=3600,
+    )
+    django.setup()
+
+
+def bench_sequential(messages, service_account):
+    import requests
+    from api.utils.fcm_v1_sender import access_tokens, build_message
+
+    url = f"{settings.FCM_API_URL}/v1/projects/{service_account['project_id']}/messages:send"
+    started = time.perf_counter()
+    for message in messages:
+        requests.post(
+            url,
+            headers={'Authorization': f'Bearer {access_tokens.get(service_account)}'},
+            json={'message': build_message(*message)},
+            timeout=10
+        ).raise_for_status()
+    return time.perf_counter() - started
+
+
+def bench_pooled(messages, service_account):
+    from api.utils.fcm_v1_sender import _send
+
+    started = time.perf_counter()
+    for message in messages:
+        assert _send(service_account, *message)['success']
+    return time.perf_counter() - started
+
+
+def bench_concurrent(messages):
+    from api.utils.fcm_v1_sender import send_fcm_v1_many
+
+    started = time.perf_counter()
+    results = send_fcm_v1_many(messages)
+    elapsed = time.perf_counter() - started
+    assert all(result['success'] for result in results)
+    return elapsed
+
+
+def report(name, elapsed, count, baseline=None):
+    line = f"{name:<12}{count / elapsed:>12,.0f} messages/s{elapsed / count * 1e3:>10.2f} ms/message"
+    if baseline:
+        line += f"{baseline / elapsed:>8.1f}x"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds the stub waits per send')
+    parser.add_argument('--concurrency', type=int, default=16)
+    args = parser.parse_args()
+
+    from api.tests.fcm_stub import FCMStub
+
+    with FCMStub(latency=args.latency) as stub, tempfile.NamedTemporaryFile('w', suffix='.json') as f:
+        service_account = stub.service_account()
+        json.dump(service_account, f)
+        f.flush()
+        configure(args, f.name, stub.url)
+
+        messages = [
+            (f'token_{i}', 'Your order shipped', f'Order #{100000 + i} is on its way', {'order_id': i})
+            for i in range(args.messages)
+        ]
+        # The sequential runs are slow by design, time them on a slice
+        sample = messages[:max(args.messages // 10, 1)]
+
+        sequential = bench_sequential(sample, service_account) / len(sample)
+        report('sequential', sequential * len(sample), len(sample))
+        report('pooled', bench_pooled(sample, service_account), len(sample), sequential * len(sample))
+        report('concurrent', bench_concurrent(messages), args.messages, sequential * args.messages)
+        print(f"token requests: {stub.token_requests}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Load benchmark for the notification ingest endpoints.
+
+Fires the same request mix at the WSGI (gunicorn) and ASGI (uvicorn)
+deployments and reports requests/sec and latency percentiles for each.
+
+Usage:
+    python benchmarks/bench_ingest.py --app-key <key> \
+        --wsgi-url http://localhost:8000 --asgi-url http://localhost:8001 \
+        --requests 5000 --concurrency 500 --endpoint send
+
+Both servers must point at the same database and broker. The WSGI target
+hits /api/notifications/<endpoint>/, the ASGI target hits the native async
+views at /api/async/notifications/<endpoint>/.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+import uuid
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - benchmark-only dependency
+    sys.exit("This benchmark needs aiohttp: pip install aiohttp")
+
+
+def build_payload(endpoint, template, batch_size):
+    def notification():
+        token = uuid.uuid4().hex
+        return {
+            'notification_type': template,
+            'device_token': token,
+            'platform': 'android',
+            'user': {'id': token, 'name': 'Benchmark User'},
+            'data': {}
+        }
+
+    if endpoint == 'bulk':
+        return {'notifications': [notification() for _ in range(batch_size)]}
+    return notification()
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_target(name, url, args):
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+    headers = {'X-App-Key': args.app_key, 'Content-Type': 'application/json'}
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as session:
+        async def one_request():
+            nonlocal errors
+            body = json.dumps(build_payload(args.endpoint, args.template, args.batch_size))
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    async with session.post(url, data=body) as response:
+                        await response.read()
+                        if response.status >= 400:
+                            errors += 1
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one_request() for _ in range(args.requests)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        'target': name,
+        'requests': args.requests,
+        'errors': errors,
+        'elapsed_s': round(elapsed, 3),
+        'requests_per_s': round(args.requests / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+async def main(args):
+    targets = []
+    if args.wsgi_url:
+        targets.append(('wsgi', f"{args.wsgi_url.rstrip('/')}/api/notifications/{args.endpoint}/"))
+    if args.asgi_url:
+        targets.append(('asgi', f"{args.asgi_url.rstrip('/')}/api/async/notifications/{args.endpoint}/"))
+    if not targets:
+        sys.exit("Pass --wsgi-url and/or --asgi-url")
+
+    results = []
+    for name, url in targets:
+        results.append(await run_target(name, url, args))
+
+    print(f"{'target':<8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for result in results:
+        print(f"{result['target']:<8}{result['requests_per_s']:>10}{result['p50_ms']:>10}"
+              f"{result['p99_ms']:>10}{result['errors']:>8}")
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--app-key', required=True)
+    parser.add_argument('--wsgi-url', default='http://localhost:8000')
+    parser.add_argument('--asgi-url', default='http://localhost:8001')
+    parser.add_argument('--endpoint', choices=['send', 'bulk'], default='send')
+    parser.add_argument('--template', default='welcome', help='Template name used as notification_type')
+    parser.add_argument('--batch-size', type=int, default=100, help='Notifications per bulk request')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--json', action='store_true', help='Also print raw results as JSON')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,165 @@
+"""
+Micro-benchmark for TemplateRenderer.
+
+Compares the per-render cost of the original implementation (sanitize,
+parse and build a string.Template for every field on every render) with
+the compiled, cached form and with render_many() over the whole batch.
+
+Usage:
+    python benchmarks/bench_template_render.py [--renders 10000]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from string import Template
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django.utils.html import escape  # noqa: E402
+from api.utils.template_renderer import TemplateRenderer  # noqa: E402
+
+
+class LegacyRenderer:
+    """The renderer as it was before templates were compiled."""
+
+    def __init__(self, template):
+        self.template = template
+
+    def render_title(self, context):
+        return self._safe_render(self.template.title_template, context)
+
+    def render_body(self, context):
+        return self._safe_render(self.template.body_template, context)
+
+    def render_subject(self, context):
+        return self._safe_render(self.template.subject_template, context) if self.template.subject_template else ""
+
+    def render_data(self, context, additional_data=None):
+        if isinstance(self.template.data_template, str):
+            template_data = json.loads(self.template.data_template)
+        else:
+            template_data = self.template.data_template.copy()
+        rendered_data = {}
+        for key, value in template_data.items():
+            rendered_data[key] = self._safe_render(value, context) if isinstance(value, str) else value
+        if additional_data:
+            rendered_data.update(additional_data)
+        return rendered_data
+
+    def _safe_render(self, template_str, context):
+        if not template_str:
+            return ""
+        sanitized = re.sub(r'\{\{.*?\}\}', '', template_str)
+        sanitized = re.sub(r'\{%.*?%\}', '', sanitized)
+        sanitized = re.sub(r'\{#.*?#\}', '', sanitized)
+        re.findall(r'\{([a-zA-Z_][a-zA-Z0-9_]*(\.[a-zA-Z_][a-zA-Z0-9_]*)*)\}', sanitized)
+        safe_context = self._create_safe_context(context)
+        return escape(Template(sanitized).safe_substitute(**safe_context))
+
+    def _create_safe_context(self, context):
+        def flatten_dict(d, parent_key='', sep='.'):
+            items = []
+            for k, v in d.items():
+                new_key = f"{parent_key}{sep}{k}" if parent_key else k
+                if isinstance(v, dict):
+                    items.extend(flatten_dict(v, new_key, sep=sep).items())
+                else:
+                    items.append((new_key, escape(v) if isinstance(v, str) else v))
+            return dict(items)
+
+        safe_context = {}
+        for key, value in flatten_dict(context).items():
+            if re.match(r'^[a-zA-Z0-9_.]+$', key):
+                if isinstance(value, str) and len(value) > 1000:
+                    value = value[:1000] + "..."
+                safe_context[key] = value
+        return safe_context
+
+
+TEMPLATE = SimpleNamespace(
+    id='bench-template',
+    version=1,
+    updated_at=None,
+    title_template='Welcome back, $first_name!',
+    body_template='Hi $first_name $last_name, your order ${order_id} ships to $city on $date.',
+    subject_template='Order ${order_id} update',
+    data_template=json.dumps({'order_id': '$order_id', 'deeplink': 'app://orders/$order_id', 'priority': 2}),
+)
+
+
+def make_context(index):
+    return {
+        'id': f'user_{index}',
+        'first_name': 'Jane',
+        'last_name': 'Doe',
+        'email': 'jane@example.com',
+        'order_id': str(100000 + index),
+        'city': 'Lagos',
+        'date': '2025-01-01',
+        'preferences': {'language': 'en', 'timezone': 'UTC'},
+    }
+
+
+def bench_legacy(contexts):
+    started = time.perf_counter()
+    for context in contexts:
+        renderer = LegacyRenderer(TEMPLATE)
+        renderer.render_title(context)
+        renderer.render_body(context)
+        renderer.render_subject(context)
+        renderer.render_data(context, {})
+    return time.perf_counter() - started
+
+
+def bench_compiled(contexts):
+    started = time.perf_counter()
+    for context in contexts:
+        TemplateRenderer(TEMPLATE).render(context, {})
+    return time.perf_counter() - started
+
+
+def bench_batch(contexts):
+    started = time.perf_counter()
+    TemplateRenderer(TEMPLATE).render_many(contexts, ({} for _ in contexts))
+    return time.perf_counter() - started
+
+
+def report(name, elapsed, count, baseline=None):
+    per_render_us = elapsed / count * 1e6
+    line = f"{name:<12}{per_render_us:>10.2f} us/render{count / elapsed:>14,.0f} renders/s"
+    if baseline:
+        line += f"{baseline / elapsed:>8.1f}x"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--renders', type=int, default=10000)
+    args = parser.parse_args()
+
+    contexts = [make_context(i) for i in range(args.renders)]
+
+    # Same output, or the comparison is meaningless
+    legacy = LegacyRenderer(TEMPLATE)
+    assert TemplateRenderer(TEMPLATE).render(contexts[0], {}) == {
+        'title': legacy.render_title(contexts[0]),
+        'body': legacy.render_body(contexts[0]),
+        'subject': legacy.render_subject(contexts[0]),
+        'data': legacy.render_data(contexts[0], {}),
+    }
+    assert TemplateRenderer(TEMPLATE).render_many(contexts[:100]) == [
+        TemplateRenderer(TEMPLATE).render(context) for context in contexts[:100]
+    ]
+
+    legacy_elapsed = bench_legacy(contexts)
+    report('legacy', legacy_elapsed, args.renders)
+    report('compiled', bench_compiled(contexts), args.renders, legacy_elapsed)
+    report('batch', bench_batch(contexts), args.renders, legacy_elapsed)
+
+
+if __name__ == '__main__':
+    main()
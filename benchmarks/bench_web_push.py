@@ -0,0 +1,152 @@
+"""
+Benchmark for batched web push delivery.
+
+Builds N subscriptions and reports, separately:
+
+    encrypt inline   ECDH + aes128gcm for every subscription in this process
+    encrypt pool     the same on a pool of --processes processes
+    network          POSTing the pre-encrypted bodies to a local push
+                     service (--latency per request, --concurrency threads)
+    send_web_many    the whole pipeline, inline and with the pool, where
+                     posts start while the rest of the batch is encrypting
+
+Usage:
+    python benchmarks/bench_web_push.py [--subscriptions 10000] [--processes 4] [--latency 0.01]
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django  # noqa: E402
+from cryptography.hazmat.primitives import serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import ec  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+
+class PushServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    latency = 0.0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.latency:
+            time.sleep(self.latency)
+        self.send_response(201)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def b64url(data):
+    return base64.urlsafe_b64encode(data).strip(b'=').decode()
+
+
+def make_subscriptions(count, base_url):
+    # Browser keys are expensive to generate, share a few across subscriptions
+    keys = [ec.generate_private_key(ec.SECP256R1()).public_key() for _ in range(16)]
+    return [
+        {
+            'endpoint': f'{base_url}/push/{i}',
+            'keys': {
+                'p256dh': b64url(keys[i % len(keys)].public_bytes(
+                    serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint
+                )),
+                'auth': b64url(os.urandom(16)),
+            }
+        }
+        for i in range(count)
+    ]
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - started, result
+
+
+def report(name, elapsed, count):
+    print(f"{name:<24}{elapsed:>9.2f} s{count / elapsed:>12,.0f} msg/s{elapsed / count * 1e6:>10.0f} us/msg")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--subscriptions', type=int, default=10000)
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.01, help='Seconds the push service waits per request')
+    args = parser.parse_args()
+
+    PushServiceHandler.latency = args.latency
+    server = ThreadingHTTPServer(('127.0.0.1', 0), PushServiceHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    settings.configure(
+        WEB_PUSH_VAPID_SUBJECT='mailto:bench@example.com',
+        VAPID_TOKEN_TTL=3600,
+        VAPID_REFRESH_MARGIN=300,
+        WEB_PUSH_ENCRYPT_PROCESSES=0,
+        WEB_PUSH_CONCURRENCY=args.concurrency,
+        HTTP_POOL_CONNECTIONS=10,
+        HTTP_POOL_MAXSIZE=max(args.concurrency, 20),
+        HTTP_KEEPALIVE_IDLE=60,
+        HTTP_RETRY_TOTAL=0,
+        HTTP_RETRY_BACKOFF=0,
+        HTTP_STATS_INTERVAL=3600,
+    )
+    django.setup()
+    from api.utils import web_sender
+
+    count = args.subscriptions
+    subscriptions = make_subscriptions(count, base_url)
+    payloads = [
+        json.dumps({'title': 'Your order shipped', 'body': f'Order #{100000 + i} is on its way', 'order_id': i}).encode()
+        for i in range(count)
+    ]
+    vapid_key = b64url(ec.generate_private_key(ec.SECP256R1()).private_numbers().private_value.to_bytes(32, 'big'))
+    messages = [
+        (json.dumps(subscription), 'Your order shipped', f'Order #{100000 + i} is on its way', {'order_id': i})
+        for i, subscription in enumerate(subscriptions)
+    ]
+
+    elapsed, encrypted = timed(lambda: list(web_sender._encrypt_all(subscriptions, payloads)))
+    report('encrypt inline', elapsed, count)
+
+    settings.WEB_PUSH_ENCRYPT_PROCESSES = args.processes
+    list(web_sender._encrypt_all(subscriptions[:1000], payloads[:1000]))  # start the pool
+    elapsed, _ = timed(lambda: list(web_sender._encrypt_all(subscriptions, payloads)))
+    report(f'encrypt pool ({args.processes} proc)', elapsed, count)
+
+    def post_all():
+        with ThreadPoolExecutor(max_workers=args.concurrency) as senders:
+            return list(senders.map(
+                lambda item: web_sender.post_notification(item[0], item[1][0], vapid_key),
+                zip(subscriptions, encrypted)
+            ))
+    elapsed, results = timed(post_all)
+    assert all(result['success'] for result in results)
+    report('network', elapsed, count)
+
+    for processes in (0, args.processes):
+        settings.WEB_PUSH_ENCRYPT_PROCESSES = processes
+        elapsed, results = timed(web_sender.send_web_many, messages, 'public_key', vapid_key)
+        assert all(result['success'] for result in results)
+        report(f'send_web_many ({processes} proc)', elapsed, count)
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
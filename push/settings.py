@@ -99,30 +99,204 @@ REST_FRAMEWORK = {
         'rest_framework.parsers.FormParser',
         'rest_framework.parsers.MultiPartParser',
     ],
-    'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
-    ],
-    'DEFAULT_THROTTLE_RATES': {
-        'anon': '100/hour',
-        'user': '1000/hour'
-    }
+    # App.rate_limit is enforced on the send endpoints only, through their
+    # throttle_classes (see api/utils/rate_limiter.py)
 }
 
+# Redis Configuration (broker and shared fast-lookup state)
+REDIS_URL = os.environ.get("REDIS_URL", 'redis://localhost:6379/0')
+REDIS_SOCKET_TIMEOUT = float(os.environ.get('REDIS_SOCKET_TIMEOUT', 0.5))
+# Seconds to use local fallbacks after Redis becomes unreachable
+REDIS_RETRY_INTERVAL = float(os.environ.get('REDIS_RETRY_INTERVAL', 5))
+
 # Celery Configuration
-CELERY_BROKER_URL = os.environ.get("REDIS_URL", 'redis://localhost:6379/0')
-CELERY_RESULT_BACKEND = os.environ.get("REDIS_URL", 'redis://localhost:6379/0')
+CELERY_BROKER_URL = REDIS_URL
+CELERY_RESULT_BACKEND = REDIS_URL
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 
+# Priority delivery queues (see api/utils/queues.py). Requests pick one with
+# "priority"; bulk jobs and campaigns default to the bulk queue.
+PUSH_PRIORITY_QUEUES = {
+    'high': os.environ.get('PUSH_QUEUE_HIGH', 'push_high'),
+    'normal': os.environ.get('PUSH_QUEUE_NORMAL', 'push_normal'),
+    'bulk': os.environ.get('PUSH_QUEUE_BULK', 'push_bulk'),
+}
+CELERY_TASK_ROUTES = {
+    'api.tasks.push_tasks.*': {'queue': PUSH_PRIORITY_QUEUES['normal']},
+    'api.tasks.bulk_tasks.*': {'queue': PUSH_PRIORITY_QUEUES['bulk']},
+    'api.tasks.campaign_tasks.*': {'queue': PUSH_PRIORITY_QUEUES['bulk']},
+    'api.tasks.topic_tasks.*': {'queue': PUSH_PRIORITY_QUEUES['bulk']},
+}
+# Transient delivery failures (provider 429/5xx, timeouts) are retried on
+# their own queue, away from the delivery queues, up to PUSH_MAX_RETRIES
+# times after a jittered backoff doubling from PUSH_RETRY_BASE_DELAY up to
+# PUSH_RETRY_MAX_DELAY seconds; then they are kept as dead letters
+PUSH_RETRY_QUEUE = os.environ.get('PUSH_RETRY_QUEUE', 'push_retry')
+PUSH_MAX_RETRIES = int(os.environ.get('PUSH_MAX_RETRIES', 5))
+PUSH_RETRY_BASE_DELAY = float(os.environ.get('PUSH_RETRY_BASE_DELAY', 30))
+PUSH_RETRY_MAX_DELAY = float(os.environ.get('PUSH_RETRY_MAX_DELAY', 30 * 60))
+# Times a notification is put off for a provider's Retry-After before that
+# counts as a failed attempt (a retry, or a dead letter once out of retries)
+PUSH_MAX_PARKS = int(os.environ.get('PUSH_MAX_PARKS', 5))
+# Retries and parked batches due in more than this many seconds wait in the
+# scheduled-notification store instead of as ETA messages in the workers
+PUSH_ETA_MAX_DELAY = float(os.environ.get('PUSH_ETA_MAX_DELAY', 60))
+# Dead letters replayed per request, and SendLogs per re-queued batch
+DEAD_LETTER_REPLAY_LIMIT = int(os.environ.get('DEAD_LETTER_REPLAY_LIMIT', 10000))
+DEAD_LETTER_REPLAY_BATCH_SIZE = int(os.environ.get('DEAD_LETTER_REPLAY_BATCH_SIZE', 500))
+# Workers reserve one message at a time so a queued high-priority push is
+# never stuck behind messages prefetched by a busy process
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+# Scheduled sends: seconds between scheduler ticks, and how many due
+# notifications are released per batch / at most per tick
+SCHEDULER_INTERVAL = float(os.environ.get('SCHEDULER_INTERVAL', 1.0))
+SCHEDULER_BATCH_SIZE = int(os.environ.get('SCHEDULER_BATCH_SIZE', 500))
+SCHEDULER_MAX_BATCHES = int(os.environ.get('SCHEDULER_MAX_BATCHES', 20))
+
+CELERY_BEAT_SCHEDULE = {
+    'release-due-notifications': {
+        'task': 'api.tasks.scheduler_tasks.release_due_notifications',
+        'schedule': SCHEDULER_INTERVAL,
+        # A tick that was not picked up in time is superseded by the next one
+        'options': {'expires': SCHEDULER_INTERVAL * 10},
+    },
+}
+
+# Bulk jobs: number of NDJSON lines handed to a worker at a time
+BULK_JOB_CHUNK_SIZE = int(os.environ.get('BULK_JOB_CHUNK_SIZE', 500))
+
+# Campaigns: number of devices handed to a worker at a time
+CAMPAIGN_CHUNK_SIZE = int(os.environ.get('CAMPAIGN_CHUNK_SIZE', 1000))
+# Seconds after which a chunk still not done is taken to have lost its
+# worker and is queued again by the beat service; keep it above the time a
+# worker needs to deliver one chunk
+CAMPAIGN_CHUNK_STALL_TIMEOUT = int(os.environ.get('CAMPAIGN_CHUNK_STALL_TIMEOUT', 600))
+
+CELERY_BEAT_SCHEDULE['resume-stalled-campaign-chunks'] = {
+    'task': 'api.tasks.campaign_tasks.resume_stalled_campaign_chunks',
+    'schedule': 60.0,
+    'options': {'expires': 60.0},
+}
+
+# App-key lookup cache used by AppKeyMiddleware (seconds / entries)
+APP_KEY_CACHE_TTL = int(os.environ.get('APP_KEY_CACHE_TTL', 60))
+APP_KEY_CACHE_NEGATIVE_TTL = int(os.environ.get('APP_KEY_CACHE_NEGATIVE_TTL', 30))
+APP_KEY_CACHE_MAX_ENTRIES = int(os.environ.get('APP_KEY_CACHE_MAX_ENTRIES', 10000))
+# Broadcast App changes over Redis pub/sub so other nodes drop stale entries
+APP_KEY_CACHE_PUBSUB = os.environ.get('APP_KEY_CACHE_PUBSUB', 'False').lower() in ('true', '1', 'yes')
+
+# Latest-active-template cache: seconds between generation checks against
+# Redis, and the maximum age of an entry when Redis is unavailable
+TEMPLATE_CACHE_CHECK_INTERVAL = float(os.environ.get('TEMPLATE_CACHE_CHECK_INTERVAL', 1.0))
+TEMPLATE_CACHE_MAX_AGE = float(os.environ.get('TEMPLATE_CACHE_MAX_AGE', 300))
+TEMPLATE_CACHE_MAX_ENTRIES = int(os.environ.get('TEMPLATE_CACHE_MAX_ENTRIES', 10000))
+
+# Idempotency-Key: how long a stored response is replayed to retries, and how
+# long a key stays locked while its first request runs (seconds). The lock
+# should outlive the slowest request so a crashed worker frees it quickly.
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+IDEMPOTENCY_PENDING_TTL = int(os.environ.get('IDEMPOTENCY_PENDING_TTL', 60))
+
+# Pooled HTTP sessions used for provider calls (see api/utils/http_client.py):
+# hosts kept per process, connections kept per host, seconds of idle time
+# before TCP keep-alive probes, and retries on connection errors (responses,
+# including 429/5xx, are always returned to the caller)
+HTTP_POOL_CONNECTIONS = int(os.environ.get('HTTP_POOL_CONNECTIONS', 10))
+HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', 20))
+HTTP_KEEPALIVE_IDLE = int(os.environ.get('HTTP_KEEPALIVE_IDLE', 60))
+HTTP_RETRY_TOTAL = int(os.environ.get('HTTP_RETRY_TOTAL', 2))
+HTTP_RETRY_BACKOFF = float(os.environ.get('HTTP_RETRY_BACKOFF', 0.2))
+# Seconds between pool stats snapshots published by each process
+HTTP_STATS_INTERVAL = float(os.environ.get('HTTP_STATS_INTERVAL', 60))
+
 # Firebase Configuration
 FCM_SERVER_KEY = os.environ.get('FCM_SERVER_KEY')
+# Tokens per legacy multicast when a batch shares one payload (FCM allows 1000)
+FCM_MULTICAST_SIZE = int(os.environ.get('FCM_MULTICAST_SIZE', 500))
+# Service-account JSON for the FCM HTTP v1 API; when set, Android pushes use
+# v1 instead of the legacy server key
+FCM_SERVICE_ACCOUNT_FILE = os.environ.get('FCM_SERVICE_ACCOUNT_FILE')
+FCM_API_URL = os.environ.get('FCM_API_URL', 'https://fcm.googleapis.com')
+# v1 messages in flight per worker process (keep <= HTTP_POOL_MAXSIZE)
+FCM_V1_CONCURRENCY = int(os.environ.get('FCM_V1_CONCURRENCY', 16))
+# Seconds before expiry at which a cached OAuth2 access token is refreshed
+FCM_TOKEN_REFRESH_MARGIN = int(os.environ.get('FCM_TOKEN_REFRESH_MARGIN', 300))
 
 # APNs Configuration
 APNS_CERT_PATH = os.environ.get('APNS_CERT_PATH')
 APNS_TOPIC = os.environ.get('APNS_TOPIC')
+# Token-based authentication with a .p8 key; preferred over the certificate when set
+APNS_AUTH_KEY_PATH = os.environ.get('APNS_AUTH_KEY_PATH')
+APNS_KEY_ID = os.environ.get('APNS_KEY_ID')
+APNS_TEAM_ID = os.environ.get('APNS_TEAM_ID')
+# Seconds a signed provider token is reused (APNs accepts 20 to 60 minutes)
+APNS_TOKEN_TTL = int(os.environ.get('APNS_TOKEN_TTL', 50 * 60))
+APNS_USE_SANDBOX = os.environ.get('APNS_USE_SANDBOX', 'False') == 'True'
+APNS_HOST = os.environ.get('APNS_HOST')  # Overrides the production/sandbox host
+# HTTP/2 connections per worker process (up to 100 streams each) and pushes
+# in flight across them
+APNS_MAX_CONNECTIONS = int(os.environ.get('APNS_MAX_CONNECTIONS', 5))
+APNS_MAX_CONCURRENT_STREAMS = int(os.environ.get('APNS_MAX_CONCURRENT_STREAMS', 500))
+
+# Web Push: VAPID keys come from each App; signed VAPID headers are cached per
+# push service and re-signed VAPID_REFRESH_MARGIN seconds before they expire
+WEB_PUSH_VAPID_SUBJECT = os.environ.get('WEB_PUSH_VAPID_SUBJECT', 'mailto:admin@example.com')
+VAPID_TOKEN_TTL = int(os.environ.get('VAPID_TOKEN_TTL', 60 * 60))
+VAPID_REFRESH_MARGIN = int(os.environ.get('VAPID_REFRESH_MARGIN', 5 * 60))
+# Processes encrypting batched web push payloads in parallel, 0 to encrypt
+# inline. Only works where tasks run in the main process: the delivery
+# engine and Celery workers started with --pool threads or --pool solo
+# (prefork children may not start processes and encrypt inline)
+WEB_PUSH_ENCRYPT_PROCESSES = int(os.environ.get('WEB_PUSH_ENCRYPT_PROCESSES', 0))
+# Web pushes posted concurrently per batch (keep <= HTTP_POOL_MAXSIZE)
+WEB_PUSH_CONCURRENCY = int(os.environ.get('WEB_PUSH_CONCURRENCY', 16))
+
+# Asyncio delivery engine (python manage.py run_delivery_engine, see
+# api/utils/delivery_engine.py): queues it consumes, task messages taken
+# from the broker before they are acked, requests in flight per provider
+# (APNs uses APNS_MAX_CONCURRENT_STREAMS), and results saved per bulk_update
+# or at least every DELIVERY_WRITE_INTERVAL seconds
+DELIVERY_QUEUES = os.environ.get(
+    'DELIVERY_QUEUES', f"{PUSH_PRIORITY_QUEUES['high']},{PUSH_PRIORITY_QUEUES['normal']}"
+).split(',')
+DELIVERY_PREFETCH = int(os.environ.get('DELIVERY_PREFETCH', 1000))
+DELIVERY_FCM_CONCURRENCY = int(os.environ.get('DELIVERY_FCM_CONCURRENCY', 500))
+DELIVERY_WEB_CONCURRENCY = int(os.environ.get('DELIVERY_WEB_CONCURRENCY', 500))
+DELIVERY_WRITE_BATCH = int(os.environ.get('DELIVERY_WRITE_BATCH', 500))
+DELIVERY_WRITE_INTERVAL = float(os.environ.get('DELIVERY_WRITE_INTERVAL', 0.5))
+
+# Device tokens rejected for good by a provider are deactivated in bulk, one
+# UPDATE per INVALID_TOKEN_FLUSH_SIZE tokens or at least every
+# INVALID_TOKEN_FLUSH_INTERVAL seconds (see api/utils/invalid_tokens.py)
+INVALID_TOKEN_FLUSH_SIZE = int(os.environ.get('INVALID_TOKEN_FLUSH_SIZE', 500))
+INVALID_TOKEN_FLUSH_INTERVAL = float(os.environ.get('INVALID_TOKEN_FLUSH_INTERVAL', 1.0))
+
+# Circuit breakers per provider (FCM, APNs, web push), shared through Redis:
+# a breaker opens when CIRCUIT_FAILURE_RATIO of at least CIRCUIT_MIN_REQUESTS
+# sends within CIRCUIT_WINDOW seconds got a 429, 5xx or no answer, or when the
+# provider sends Retry-After. Pushes are parked (re-queued with a countdown)
+# while it is open; after CIRCUIT_OPEN_SECONDS one probe is let through every
+# CIRCUIT_PROBE_INTERVAL seconds and each failed probe doubles the open
+# period, up to CIRCUIT_MAX_OPEN_SECONDS
+CIRCUIT_WINDOW = int(os.environ.get('CIRCUIT_WINDOW', 30))
+CIRCUIT_MIN_REQUESTS = int(os.environ.get('CIRCUIT_MIN_REQUESTS', 20))
+CIRCUIT_FAILURE_RATIO = float(os.environ.get('CIRCUIT_FAILURE_RATIO', 0.5))
+CIRCUIT_OPEN_SECONDS = int(os.environ.get('CIRCUIT_OPEN_SECONDS', 30))
+CIRCUIT_MAX_OPEN_SECONDS = int(os.environ.get('CIRCUIT_MAX_OPEN_SECONDS', 600))
+CIRCUIT_PROBE_INTERVAL = int(os.environ.get('CIRCUIT_PROBE_INTERVAL', 5))
+
+# Adaptive concurrency: the *_CONCURRENCY / APNS_MAX_CONCURRENT_STREAMS limits
+# above are maximums; a process multiplies its limit by
+# ADAPTIVE_CONCURRENCY_BACKOFF when a provider fails or answers slower than
+# ADAPTIVE_CONCURRENCY_TARGET_LATENCY seconds, and raises it back by one per
+# round of fast successful requests, never below ADAPTIVE_CONCURRENCY_MIN
+ADAPTIVE_CONCURRENCY_TARGET_LATENCY = float(os.environ.get('ADAPTIVE_CONCURRENCY_TARGET_LATENCY', 1.0))
+ADAPTIVE_CONCURRENCY_BACKOFF = float(os.environ.get('ADAPTIVE_CONCURRENCY_BACKOFF', 0.5))
+ADAPTIVE_CONCURRENCY_MIN = int(os.environ.get('ADAPTIVE_CONCURRENCY_MIN', 1))
 
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = os.environ.get('CORS_ALLOWED_ORIGINS', 'http://localhost:3000').split(',')
@@ -174,6 +348,13 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        # httpx/httpcore log every provider request at INFO
+        'httpx': {
+            'level': 'WARNING',
+        },
+        'httpcore': {
+            'level': 'WARNING',
+        },
     },
 }
 